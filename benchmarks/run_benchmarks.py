@@ -0,0 +1,259 @@
+"""Benchmark harness for InferenceIQ.
+
+Measures tracker overhead per call_llm with a stubbed client, save_logs
+throughput, load_data time and peak RSS, every analytics getter and the
+end-to-end dashboard build on synthetic logs, and writes the results as
+JSON so runs can be compared between commits.
+
+Usage:
+    PYTHONPATH=src python benchmarks/run_benchmarks.py --rows 1000000 --output bench.json
+    PYTHONPATH=src python benchmarks/run_benchmarks.py --compare base.json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.dashboard import DashboardGenerator
+from inferenceiq.synthetic import SyntheticLogGenerator
+from inferenceiq.tracker import GenAICostTracker
+
+GETTERS = [
+    ("get_total_cost", ()),
+    ("get_cost_by_model", ()),
+    ("get_token_usage_stats", ()),
+    ("get_daily_trend", ()),
+    ("get_success_rate", ()),
+    ("get_failure_stats", ()),
+    ("calculate_potential_cache_savings", ()),
+    ("get_top_k", ("customer_id",)),
+]
+
+# Relative slowdown that --compare reports as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+class StubOpenAIClient:
+    """Minimal stand-in for ``OpenAI`` returning a canned completion."""
+
+    def __init__(self):
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=40),
+        )
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(create=lambda **kwargs: response)
+        )
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def bench_call_overhead(iterations):
+    """Per-call overhead of call_llm over the bare (stubbed) client call."""
+    tracker = GenAICostTracker(api_key="bench", provider="openai", agent_name="bench")
+    tracker.client = StubOpenAIClient()
+    messages = [
+        {"role": "system", "content": "You are a helpful banking assistant."},
+        {"role": "user", "content": "What is my account balance?"},
+    ]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        tracker.client.chat.completions.create(model="gpt-4o", messages=messages)
+    bare = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        tracker.call_llm(model="gpt-4o", messages=messages, user_id="u1", tags=["bench"])
+    tracked = time.perf_counter() - start
+
+    return {
+        "iterations": iterations,
+        "tracked_us_per_call": round(tracked / iterations * 1e6, 3),
+        "bare_us_per_call": round(bare / iterations * 1e6, 3),
+        "overhead_us_per_call": round((tracked - bare) / iterations * 1e6, 3),
+    }
+
+
+def bench_save_logs(rows, workdir):
+    """save_logs throughput for each on-disk format."""
+    entries = [e for chunk in SyntheticLogGenerator(seed=7).iter_chunks(rows) for e in chunk]
+    results = {}
+    for fmt, suffix in (("jsonl", ".jsonl"), ("binary", ".iqb")):
+        path = os.path.join(workdir, f"save_bench{suffix}")
+        if os.path.exists(path):
+            os.remove(path)
+        tracker = GenAICostTracker(api_key="bench", provider=None)
+        tracker.logs = list(entries)
+        start = time.perf_counter()
+        tracker.save_logs(path, format=fmt)
+        elapsed = time.perf_counter() - start
+        results[fmt] = {
+            "rows": rows,
+            "seconds": round(elapsed, 4),
+            "rows_per_second": round(rows / elapsed, 1),
+            "bytes": os.path.getsize(path),
+        }
+        os.remove(path)
+    return results
+
+
+def dataset_path(workdir, rows, fmt, seed):
+    """Generate (or reuse) a synthetic log of the given size."""
+    suffix = ".iqb" if fmt == "binary" else ".jsonl"
+    path = os.path.join(workdir, f"synthetic_{rows}_{seed}{suffix}")
+    if not os.path.exists(path):
+        SyntheticLogGenerator(seed=seed).write(path, rows, format=fmt)
+    return path
+
+
+def _analytics_worker(path, output_html, queue):
+    """Runs in a fresh process so peak RSS reflects this dataset only."""
+    result = {}
+    engine = AnalyticsEngine(log_file=path)
+    start = time.perf_counter()
+    engine.load_data()
+    result["load_data_seconds"] = round(time.perf_counter() - start, 4)
+    result["rows_loaded"] = len(engine.df)
+    result["peak_rss_mb_after_load"] = round(_peak_rss_mb(), 1)
+
+    getters = {}
+    for name, args in GETTERS:
+        start = time.perf_counter()
+        getattr(engine, name)(*args)
+        getters[name] = round(time.perf_counter() - start, 4)
+    result["getter_seconds"] = getters
+
+    # End to end: fresh engine, load + all metrics + charts + HTML
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DashboardGenerator(AnalyticsEngine(log_file=path)).generate_report(output_html)
+    result["generate_report_seconds"] = round(time.perf_counter() - start, 4)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    queue.put(result)
+
+
+def bench_analytics(path, workdir):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    output_html = os.path.join(workdir, "bench_dashboard.html")
+    process = ctx.Process(target=_analytics_worker, args=(path, output_html, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    result["file_bytes"] = os.path.getsize(path)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "benchmarks": {},
+    }
+    benchmarks = results["benchmarks"]
+
+    print(f"call_llm overhead ({args.call_iterations} calls)...", file=sys.stderr)
+    benchmarks["call_llm_overhead"] = bench_call_overhead(args.call_iterations)
+
+    print(f"save_logs throughput ({args.save_rows} rows)...", file=sys.stderr)
+    benchmarks["save_logs"] = bench_save_logs(args.save_rows, args.workdir)
+
+    for rows in args.rows:
+        for fmt in args.formats:
+            print(f"analytics on {rows} rows ({fmt})...", file=sys.stderr)
+            path = dataset_path(args.workdir, rows, fmt, args.seed)
+            benchmarks[f"analytics_{fmt}_{rows}"] = bench_analytics(path, args.workdir)
+
+    return results
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    return out
+
+
+def compare(base_path, new_path):
+    """Print timing deltas between two result files; returns regression count."""
+    with open(base_path) as f:
+        base = _flatten("", json.load(f)["benchmarks"], {})
+    with open(new_path) as f:
+        new = _flatten("", json.load(f)["benchmarks"], {})
+
+    regressions = 0
+    for key in sorted(set(base) & set(new)):
+        if not (key.endswith("seconds") or key.endswith("_us_per_call") or "getter_seconds" in key):
+            continue
+        old, cur = base[key], new[key]
+        change = (cur - old) / old if old else 0.0
+        flag = ""
+        if change > REGRESSION_THRESHOLD:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:60s} {old:12.4f} -> {cur:12.4f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="InferenceIQ benchmark harness")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000],
+                        help="Synthetic dataset sizes for analytics benchmarks")
+    parser.add_argument("--formats", nargs="+", default=["jsonl"], choices=["jsonl", "binary"],
+                        help="On-disk log formats to benchmark")
+    parser.add_argument("--call-iterations", type=int, default=20_000)
+    parser.add_argument("--save-rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default="bench_data",
+                        help="Directory for generated datasets (reused between runs)")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    results = run(args)
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
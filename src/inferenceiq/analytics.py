@@ -1,23 +1,61 @@
 import pandas as pd
+import numpy as np
 import json
 import os
 from typing import Dict, Any, List, Optional
 from inferenceiq.tracker import GenAICostTracker
+from inferenceiq.query import LogQuery
+from inferenceiq.index import LogIndex
+from inferenceiq import binlog
+from inferenceiq.sampling import SAMPLED_OUT
+from inferenceiq.singleflight import COALESCED
+from inferenceiq.hedging import CANCELLED
+from inferenceiq.anomaly import CostAnomalyDetector
+from inferenceiq.forecast import forecast_spend
+from inferenceiq.timing import PHASE_OWNERS, PHASES, phase_field
+from inferenceiq.retention import HOURLY, latency_points, load_rollups, raw_query
+from inferenceiq.prefixes import MIN_CACHEABLE_TOKENS, shared_prefixes
 
 class AnalyticsEngine:
     """Core engine for processing GenAI cost logs and generating metrics."""
 
-    def __init__(self, log_file: str = "genai_costs.jsonl"):
+    ATTRIBUTION_METRICS = (
+        "calls", "cost_inr", "tokens_in", "tokens_out", "tokens_total",
+        "failed_calls", "failure_waste_inr",
+    )
+
+    def __init__(self, log_file: str = "genai_costs.jsonl", query: Optional[LogQuery] = None):
         self.log_file = log_file
+        self.query = query
         self.df = pd.DataFrame()
+        # Exact totals of records dropped by tracker sampling (record_type="sampled_out")
+        self.sampled_out = pd.DataFrame()
+        # Hourly and daily rollups of compacted history (see inferenceiq.retention)
+        self.rollups = pd.DataFrame()
         # Initialize a dummy tracker to access pricing data
         try:
             self._pricing_ref = GenAICostTracker(api_key="dummy", provider="openai").PRICING_INR
         except:
             self._pricing_ref = {}
 
-    def load_data(self) -> pd.DataFrame:
-        """Load data from JSONL file into Pandas DataFrame."""
+    def load_data(self, query: Optional[LogQuery] = None) -> pd.DataFrame:
+        """Load data from JSONL (or compact binary) file into Pandas DataFrame.
+
+        When a ``query`` is given (or was passed to the constructor) its
+        filters are applied during ingestion: lines outside the time range or
+        without a matching agent, model or tag are skipped before they are
+        JSON-decoded. If the log has an up-to-date sidecar index, only the
+        blocks overlapping the time range are read at all.
+
+        For logs compacted by a ``RetentionPolicy`` the rollup tiers are
+        loaded into ``self.rollups`` and the getters that work from totals
+        (cost, tokens, calls, latency percentiles, trends, forecasts,
+        anomalies and attribution by rolled-up dimensions) combine them with
+        the raw records. Per-call reports only see the raw tier.
+        """
+        query = query or self.query
+        self.rollups = load_rollups(self.log_file, query)
+        query = raw_query(self.log_file, query)
         if not os.path.exists(self.log_file):
             print(f"Warning: Log file {self.log_file} not found. Returning empty DataFrame.")
             self.df = pd.DataFrame(columns=[
@@ -29,73 +67,270 @@ class AnalyticsEngine:
             return self.df
 
         try:
+            if binlog.is_binary_log(self.log_file):
+                return self._to_frame(binlog.read_frame(self.log_file, query))
+
             # Read JSONL file line by line
+            if query is not None and (query.since or query.until):
+                index = LogIndex(self.log_file)
+                if index.is_current():
+                    data = self._read_lines(index.iter_lines(query.since, query.until), query)
+                    return self._to_frame(data)
+
             with open(self.log_file, 'r') as f:
-                data = [json.loads(line) for line in f]
-            
-            self.df = pd.DataFrame(data)
+                data = self._read_lines(f, query)
             
-            # Convert timestamp to datetime
-            if "timestamp" in self.df.columns:
-                self.df["timestamp"] = pd.to_datetime(self.df["timestamp"])
-                
-            return self.df
+            return self._to_frame(data)
         except Exception as e:
             print(f"Error loading data: {e}")
             return pd.DataFrame()
 
+    @staticmethod
+    def _read_lines(lines, query: Optional[LogQuery]) -> List[Dict[str, Any]]:
+        """Decode JSONL lines, screening them with the query first."""
+        if query is None:
+            return [json.loads(line) for line in lines]
+        return [
+            entry for entry in (
+                json.loads(line) for line in lines if query.accepts_line(line)
+            )
+            if query.matches(entry)
+        ]
+
+    def _to_frame(self, data) -> pd.DataFrame:
+        self.df = pd.DataFrame(data)
+
+        # Convert timestamp to datetime
+        if "timestamp" in self.df.columns:
+            self.df["timestamp"] = pd.to_datetime(self.df["timestamp"], format="ISO8601")
+
+        # Sampled-out totals are not call records; keep them aside for exact totals
+        if "record_type" in self.df.columns:
+            aggregate = (self.df["record_type"] == SAMPLED_OUT).to_numpy()
+            self.sampled_out = self.df[aggregate].reset_index(drop=True)
+            self.df = self.df[~aggregate].reset_index(drop=True)
+        else:
+            self.sampled_out = pd.DataFrame()
+
+        return self.df
+
+    def _aggregates(self) -> pd.DataFrame:
+        """Sampled-out totals and rollup rows: rows standing for ``calls`` calls each."""
+        frames = [frame for frame in (self.sampled_out, self.rollups) if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        aggregates = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].copy()
+        # Sampled-out calls were all successes
+        for column, default in (("successes", aggregates["calls"]), ("failed_calls", 0.0),
+                                ("failed_cost_inr", 0.0)):
+            if column in aggregates.columns:
+                aggregates[column] = aggregates[column].fillna(default)
+            else:
+                aggregates[column] = default
+        return aggregates
+
+    def _aggregate_sum(self, column: str) -> float:
+        aggregates = self._aggregates()
+        if aggregates.empty or column not in aggregates.columns:
+            return 0
+        return aggregates[column].sum()
+
+    def _raw_sum(self, column: str) -> float:
+        if column not in self.df.columns:
+            return 0
+        return self.df[column].sum()
+
+    def _has_data(self) -> bool:
+        return not self.df.empty or not self.rollups.empty
+
+    def _with_aggregates(self, columns: List[str]) -> pd.DataFrame:
+        """Raw records plus aggregate rows, limited to ``columns`` that exist."""
+        frames = [frame[[c for c in columns if c in frame.columns]]
+                  for frame in (self.df, self._aggregates()) if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def _sample_weights(self, frame: Optional[pd.DataFrame] = None) -> np.ndarray:
+        """Inverse inclusion probability per record (1 for unsampled logs)."""
+        frame = self.df if frame is None else frame
+        if "sample_weight" not in frame.columns:
+            return np.ones(len(frame))
+        return pd.to_numeric(frame["sample_weight"], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+
     def get_total_cost(self) -> float:
         """Get total cost across all interactions."""
-        if self.df.empty:
+        if not self._has_data():
             return 0.0
-        return self.df["cost_inr"].sum()
+        return self._raw_sum("cost_inr") + self._aggregate_sum("cost_inr")
 
     def get_cost_by_model(self) -> Dict[str, float]:
         """Group cost by model."""
-        if self.df.empty:
+        if not self._has_data():
             return {}
-        return self.df.groupby("model")["cost_inr"].sum().to_dict()
+        frame = self._with_aggregates(["model", "cost_inr"])
+        return frame.groupby("model")["cost_inr"].sum().to_dict()
 
     def get_token_usage_stats(self) -> Dict[str, int]:
         """Get total token usage stats."""
-        if self.df.empty:
+        if not self._has_data():
             return {"total_input": 0, "total_output": 0, "grand_total": 0}
             
         return {
-            "total_input": int(self.df["tokens_in"].sum()),
-            "total_output": int(self.df["tokens_out"].sum()),
-            "grand_total": int(self.df["tokens_total"].sum())
+            "total_input": int(self._raw_sum("tokens_in") + self._aggregate_sum("tokens_in")),
+            "total_output": int(self._raw_sum("tokens_out") + self._aggregate_sum("tokens_out")),
+            "grand_total": int(self._raw_sum("tokens_total") + self._aggregate_sum("tokens_total"))
         }
 
     def get_daily_trend(self) -> Dict[str, float]:
         """Get daily cost trend."""
-        if self.df.empty or "timestamp" not in self.df.columns:
+        frame = self._with_aggregates(["timestamp", "cost_inr"])
+        if frame.empty or "timestamp" not in frame.columns:
             return {}
             
-        daily_cost = self.df.groupby(self.df["timestamp"].dt.date)["cost_inr"].sum()
+        daily_cost = frame.groupby(frame["timestamp"].dt.date)["cost_inr"].sum()
         # Convert keys to string for JSON compatibility
         return {str(k): v for k, v in daily_cost.items()}
 
+    def get_spend_forecast(self, horizon_days: int = 30, by: tuple = ("agent", "model"),
+                           interval: float = 0.9) -> Dict[str, Any]:
+        """Daily spend forecasts and month-end projections with prediction intervals.
+
+        Fits weekly-seasonal Holt-Winters models to every ``by`` series at
+        once; see :func:`inferenceiq.forecast.forecast_spend` for the layout.
+        """
+        return forecast_spend(self._spend_frame(by), by=by, horizon_days=horizon_days, interval=interval)
+
+    def _spend_frame(self, by: tuple) -> pd.DataFrame:
+        """Records to sum spend over per ``by`` series, counting every call once.
+
+        Like :meth:`get_cost_attribution`: when the sampled-out totals and
+        rollups keep every ``by`` dimension, raw cost at weight 1 plus those
+        exact totals; otherwise records weighted by ``sample_weight`` alone.
+        """
+        aggregates = self._aggregates()
+        if aggregates.empty or not all(name in aggregates.columns and aggregates[name].notna().all()
+                                       for name in by):
+            return self.df
+        frame = pd.concat([self.df, aggregates], ignore_index=True)
+        return frame.drop(columns="sample_weight", errors="ignore")
+
     def get_success_rate(self) -> float:
         """Calculate percentage of successful interactions."""
-        if self.df.empty:
+        if not self._has_data():
             return 0.0
         
-        total = len(self.df)
-        success = len(self.df[self.df["outcome"] == "success"])
-        return (success / total) * 100
+        # Coalesced calls got the shared response; cancelled hedge losers are extra attempts, not calls
+        outcome = self.df["outcome"] if "outcome" in self.df.columns else pd.Series(dtype=object)
+        total = (outcome != CANCELLED).sum() + self._aggregate_sum("calls")
+        success = outcome.isin(["success", COALESCED]).sum() + self._aggregate_sum("successes")
+        return (success / total) * 100 if total > 0 else 0.0
 
     def get_failure_stats(self) -> Dict[str, Any]:
         """Get failure counts and rate."""
-        if self.df.empty:
+        if not self._has_data():
             return {"count": 0, "rate": 0.0}
         
-        failed = len(self.df[self.df["outcome"] == "failed"])
-        total = len(self.df)
+        outcome = self.df["outcome"] if "outcome" in self.df.columns else pd.Series(dtype=object)
+        failed = int((outcome == "failed").sum() + self._aggregate_sum("failed_calls"))
+        total = (outcome != CANCELLED).sum() + self._aggregate_sum("calls")
         rate = (failed / total) * 100 if total > 0 else 0.0
         
         return {"count": failed, "rate": round(rate, 2)}
 
+    def get_latency_percentiles(self, percentiles: tuple = (50, 90, 99),
+                                by: Optional[str] = None, column: str = "latency_ms") -> Dict[str, Any]:
+        """Latency percentiles in ms, weighted by ``sample_weight``.
+
+        Returns ``{"p50": ..., ...}``, or a dict of those per value of ``by``.
+        ``column`` selects the latency component, e.g. ``queue_wait_ms`` for
+        time spent waiting on the rate-limit scheduler. Rolled-up history
+        contributes ``latency_ms`` through its latency sketches.
+        """
+        points = []
+        if column in self.df.columns and (by is None or by in self.df.columns):
+            raw = pd.DataFrame({"_value": pd.to_numeric(self.df[column], errors="coerce"),
+                                "_weight": self._sample_weights()}, index=self.df.index)
+            if by is not None:
+                raw[by] = self.df[by]
+            points.append(raw)
+        if column == "latency_ms" and not self.rollups.empty and (by is None or by in self.rollups.columns):
+            points.append(latency_points(self.rollups, by))
+        if not points:
+            return {}
+        frame = pd.concat(points, ignore_index=True) if len(points) > 1 else points[0]
+
+        def _percentiles(group: pd.DataFrame) -> Dict[str, float]:
+            values = self._weighted_percentiles(group["_value"].to_numpy(dtype=float),
+                                                group["_weight"].to_numpy(dtype=float), percentiles)
+            return {f"p{p}": round(v, 2) for p, v in zip(percentiles, values)}
+
+        if by is None:
+            return _percentiles(frame)
+        return {key: _percentiles(group) for key, group in frame.groupby(by, sort=True)}
+
+    @staticmethod
+    def _weighted_percentiles(values: np.ndarray, weights: np.ndarray, percentiles) -> List[float]:
+        """Percentiles of ``values`` where each counts ``weights`` times; NaNs are ignored."""
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return []
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        targets = np.asarray(percentiles, dtype=float) / 100 * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, targets), len(values) - 1)
+        return [float(values[i]) for i in positions]
+
+    def get_latency_breakdown(self, by: str = "provider", percentiles: tuple = (50, 95),
+                              slow_percentile: float = 95) -> List[Dict[str, Any]]:
+        """Where dispatched calls spend their time, per value of ``by`` and phase.
+
+        Uses the ``phase_<name>_ms`` fields the tracker logs (see
+        :mod:`inferenceiq.timing`); a phase a call did not go through, such
+        as ``connect`` on a reused connection, counts as 0. Each row has the
+        phase's ``owner`` (tracker, network or provider), weighted mean and
+        percentiles, its ``share`` of the mean call, and ``slow_mean_ms``: its
+        mean over the group's calls at or above the ``slow_percentile``
+        latency, which shows whose time slow calls are spending. Logs written
+        before the tracker recorded a provider are grouped as ``"unknown"``.
+        """
+        columns = [phase_field(p) for p in PHASES]
+        if self.df.empty or not set(columns) & set(self.df.columns):
+            return []
+        present = self.df.reindex(columns=columns)
+        frame = self.df[present.notna().any(axis=1)]
+        if by != "provider" and by not in frame.columns:
+            return []
+        phases = present.loc[frame.index].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+        groups = frame[by].fillna("unknown") if by in frame.columns else pd.Series("unknown", index=frame.index)
+        latency = pd.to_numeric(frame.get("latency_ms", np.nan), errors="coerce")
+
+        results = []
+        for key, index in groups.groupby(groups, sort=True).groups.items():
+            weights = self._sample_weights(frame.loc[index])
+            rows = phases.loc[index]
+            threshold = self._weighted_percentiles(latency.loc[index].to_numpy(dtype=float), weights,
+                                                   [slow_percentile])
+            slow = (latency.loc[index] >= threshold[0]).to_numpy() if threshold else np.ones(len(index), bool)
+            means = {c: float(np.average(rows[c], weights=weights)) for c in columns}
+            total = sum(means.values())
+            for phase, column in zip(PHASES, columns):
+                values = rows[column].to_numpy(dtype=float)
+                row = {
+                    by: key,
+                    "phase": phase,
+                    "owner": PHASE_OWNERS[phase],
+                    "calls": int(round(weights.sum())),
+                    "mean_ms": round(means[column], 3),
+                }
+                for p, v in zip(percentiles, self._weighted_percentiles(values, weights, percentiles)):
+                    row[f"p{p:g}_ms"] = round(v, 3)
+                row["slow_mean_ms"] = round(float(np.average(values[slow], weights=weights[slow])), 3)
+                row["share"] = round(means[column] / total, 4) if total > 0 else 0.0
+                results.append(row)
+        return results
+
     def calculate_potential_cache_savings(self) -> Dict[str, float]:
         """Estimate savings from caching duplicate prompts.
         Assumes 90% savings on input tokens for cache hits.
@@ -104,7 +339,7 @@ class AnalyticsEngine:
             return {"potential_savings": 0.0, "duplicate_count": 0}
             
         # Filter for success calls only
-        success_df = self.df[self.df["outcome"] == "success"].copy()
+        success_df = self.df[(self.df["outcome"] == "success") & self.df["fingerprint"].notna()]
         
         if success_df.empty:
              return {"potential_savings": 0.0, "duplicate_count": 0}
@@ -112,23 +347,554 @@ class AnalyticsEngine:
         # Identify duplicates (subsequent calls)
         duplicates = success_df[success_df.duplicated(subset=['fingerprint'], keep='first')]
         
-        potential_savings = 0.0
-        duplicate_count = len(duplicates)
+        # Calculate input cost per call; each sampled record stands for sample_weight calls
+        rates = {model: price.get("input", 0) for model, price in self._pricing_ref.items()}
+        input_rate = duplicates["model"].map(rates).fillna(0).astype(float)
+        tokens_in = duplicates["tokens_in"] if "tokens_in" in duplicates.columns else 0
+        weights = self._sample_weights(duplicates)
+        input_cost = (tokens_in * input_rate).fillna(0).to_numpy(dtype=float) * weights
         
-        for _, row in duplicates.iterrows():
-            model = row['model']
-            tokens_in = row.get('tokens_in', 0)
-            
-            # Calculate input cost for this call
-            model_price = self._pricing_ref.get(model, {})
-            input_rate = model_price.get("input", 0)
-            
-            input_cost = tokens_in * input_rate
-            
-            # Assume 90% savings
-            potential_savings += (input_cost * 0.90)
+        # Assume 90% savings
+        potential_savings = float((input_cost * 0.90).sum())
+        duplicate_count = int(round(weights.sum()))
             
         return {
             "potential_savings": round(potential_savings, 4),
             "duplicate_count": duplicate_count
         }
+
+    def get_prompt_cache_stats(self, by: tuple = ("agent", "model")) -> List[Dict[str, Any]]:
+        """Provider prompt-cache hit ratio and realized savings per group.
+
+        ``cache_hit_ratio`` is the share of input tokens served from the
+        provider cache. ``realized_savings_inr`` is what cache reads saved over
+        the plain input rate, minus the surcharge paid for cache writes.
+        Entries logged before cache tokens were recorded count as uncached.
+        Sampled records count ``sample_weight`` times.
+        """
+        if self.df.empty or "tokens_in" not in self.df.columns:
+            return []
+        keys = [k for k in by if k in self.df.columns]
+        if not keys:
+            return []
+
+        frame = self.df
+        if "outcome" in frame.columns:
+            frame = frame[frame["outcome"] == "success"]
+        if frame.empty:
+            return []
+
+        weights = pd.Series(self._sample_weights(frame), index=frame.index)
+
+        def _column(name: str) -> pd.Series:
+            if name not in frame.columns:
+                return pd.Series(0.0, index=frame.index)
+            return pd.to_numeric(frame[name], errors="coerce").fillna(0) * weights
+
+        def _rate(name: str) -> pd.Series:
+            rates = {
+                model: price.get(name, price.get("input", 0))
+                for model, price in self._pricing_ref.items()
+            }
+            return frame["model"].map(rates).fillna(0).astype(float)
+
+        input_rate = _rate("input")
+        cached = _column("tokens_cached")
+        cache_write = _column("tokens_cache_write")
+        work = pd.DataFrame({
+            "calls": weights,
+            "tokens_in": _column("tokens_in"),
+            "tokens_cached": cached,
+            "tokens_cache_write": cache_write,
+            "savings": cached * (input_rate - _rate("cached_input"))
+                       - cache_write * (_rate("cache_write") - input_rate),
+        })
+        for key in keys:
+            work[key] = frame[key]
+
+        grouped = work.groupby(keys, dropna=False, sort=True).sum()
+        results = []
+        for group, row in grouped.iterrows():
+            group = group if isinstance(group, tuple) else (group,)
+            tokens_in = int(round(row["tokens_in"]))
+            results.append({
+                **dict(zip(keys, group)),
+                "calls": int(round(row["calls"])),
+                "tokens_in": tokens_in,
+                "tokens_cached": int(round(row["tokens_cached"])),
+                "tokens_cache_write": int(round(row["tokens_cache_write"])),
+                "cache_hit_ratio": round(row["tokens_cached"] / tokens_in, 4) if tokens_in else 0.0,
+                "realized_savings_inr": round(float(row["savings"]), 4),
+            })
+        results.sort(key=lambda r: r["realized_savings_inr"], reverse=True)
+        return results
+
+    def _prefix_reuse(self, ttl_minutes: Optional[float], min_tokens: int) -> pd.DataFrame:
+        """Calls with logged prefix hashes, joined with their cacheable shared prefix."""
+        if self.df.empty or "prefix_hashes" not in self.df.columns:
+            return pd.DataFrame()
+        frame = self.df[self.df["prefix_hashes"].map(lambda v: isinstance(v, list) and len(v) > 0)]
+        if frame.empty:
+            return frame
+        frame = frame.join(shared_prefixes(frame, ttl_minutes))
+        # Providers only cache prefixes from a minimum length
+        cacheable = pd.to_numeric(frame["shared_tokens"], errors="coerce").fillna(0.0)
+        return frame.assign(_cacheable=cacheable.where(cacheable >= min_tokens, 0.0),
+                            _weight=self._sample_weights(frame))
+
+    def get_prefix_cache_opportunities(self, by: str = "agent", ttl_minutes: Optional[float] = 5.0,
+                                       min_tokens: int = MIN_CACHEABLE_TOKENS) -> List[Dict[str, Any]]:
+        """Prompt tokens a provider prefix cache could serve per ``by``, and what missing them costs.
+
+        Needs calls logged with ``prefix_hashing=True``. A call's cacheable
+        tokens are its longest prompt prefix that an earlier call sent
+        within ``ttl_minutes`` (the cache lifetime), if at least
+        ``min_tokens`` long. ``missed_tokens`` are those the provider did not
+        actually serve from cache (``tokens_cached``), valued at the model's
+        input minus cached-input rate. Prefix tokens are estimates; for
+        sampled logs records count ``sample_weight`` times, but reuse by
+        sampled-out calls is not seen.
+        """
+        frame = self._prefix_reuse(ttl_minutes, min_tokens)
+        if frame.empty or by not in frame.columns:
+            return []
+
+        weights = frame["_weight"].to_numpy(dtype=float)
+        cacheable = frame["_cacheable"].to_numpy(dtype=float)
+        cached = np.zeros(len(frame))
+        if "tokens_cached" in frame.columns:
+            cached = pd.to_numeric(frame["tokens_cached"], errors="coerce").fillna(0).to_numpy(dtype=float)
+        missed = np.maximum(cacheable - cached, 0.0)
+        discount = {model: price.get("input", 0) - price.get("cached_input", price.get("input", 0))
+                    for model, price in self._pricing_ref.items()}
+        rate = frame["model"].map(discount).fillna(0).to_numpy(dtype=float) if "model" in frame.columns \
+            else np.zeros(len(frame))
+        work = pd.DataFrame({
+            by: frame[by].to_numpy(),
+            "calls": weights,
+            "shared": (cacheable > 0) * weights,
+            "prompt_tokens": frame["prefix_tokens"].map(lambda v: v[-1]).to_numpy(dtype=float) * weights,
+            "cacheable": cacheable * weights,
+            "cached": cached * weights,
+            "missed": missed * weights,
+            "savings": missed * rate * weights,
+        })
+        grouped = work.groupby(by, sort=True).sum()
+
+        results = []
+        for key, row in grouped.iterrows():
+            prompt_tokens = row["prompt_tokens"]
+            results.append({
+                by: key,
+                "calls": int(round(row["calls"])),
+                "calls_with_shared_prefix": int(round(row["shared"])),
+                "prompt_tokens": int(round(prompt_tokens)),
+                "cacheable_tokens": int(round(row["cacheable"])),
+                "cacheable_share": round(row["cacheable"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+                "cached_tokens": int(round(row["cached"])),
+                "missed_tokens": int(round(row["missed"])),
+                "potential_savings_inr": round(float(row["savings"]), 4),
+            })
+        results.sort(key=lambda r: r["potential_savings_inr"], reverse=True)
+        return results
+
+    def get_shared_prefixes(self, top_k: int = 10, ttl_minutes: Optional[float] = 5.0,
+                            min_tokens: int = MIN_CACHEABLE_TOKENS) -> List[Dict[str, Any]]:
+        """The prompt prefixes reused the most, by cacheable tokens.
+
+        Each call counts towards its longest shared prefix only (see
+        :meth:`get_prefix_cache_opportunities`).
+        """
+        frame = self._prefix_reuse(ttl_minutes, min_tokens)
+        if frame.empty:
+            return []
+        frame = frame[frame["_cacheable"] > 0]
+        if frame.empty:
+            return []
+        agents = frame["agent"] if "agent" in frame.columns else pd.Series(None, index=frame.index)
+        work = pd.DataFrame({
+            "prefix_hash": frame["shared_hash"],
+            "depth": frame["shared_depth"].astype(int),
+            "tokens": frame["_cacheable"],
+            "calls": frame["_weight"],
+            "cacheable": frame["_cacheable"] * frame["_weight"],
+            "agent": agents,
+        })
+        grouped = work.groupby("prefix_hash", sort=False).agg(
+            depth=("depth", "max"), tokens=("tokens", "max"), calls=("calls", "sum"),
+            cacheable=("cacheable", "sum"), agents=("agent", lambda v: sorted(set(v.dropna()))),
+        )
+        grouped = grouped.sort_values("cacheable", ascending=False, kind="stable").head(top_k)
+        return [{
+            "prefix_hash": prefix_hash,
+            "messages": int(row["depth"]),
+            "tokens": int(row["tokens"]),
+            "reused_calls": int(round(row["calls"])),
+            "cacheable_tokens": int(round(row["cacheable"])),
+            "agents": row["agents"],
+        } for prefix_hash, row in grouped.iterrows()]
+
+    def get_batch_candidates(self, deferrable_tags: tuple = ("batch", "nightly", "offline"),
+                             business_hours: tuple = (9, 18),
+                             min_deferrable_share: float = 0.5) -> List[Dict[str, Any]]:
+        """Flag agents whose real-time traffic could move to a batch API.
+
+        A real-time call counts as deferrable if it carries one of
+        ``deferrable_tags`` or ran outside ``business_hours`` (start hour
+        inclusive, end exclusive). Agents whose deferrable share reaches
+        ``min_deferrable_share`` are marked ``candidate``.
+        ``potential_savings_inr`` is the batch discount on their deferrable
+        spend and ``deferrable_tokens`` the load that would leave real-time
+        rate limits. Sampled records count ``sample_weight`` times. Sorted by
+        potential savings.
+        """
+        if self.df.empty or "agent" not in self.df.columns:
+            return []
+
+        frame = self.df
+        if "mode" in frame.columns:
+            batch = frame["mode"] == "batch"
+            batch_calls = pd.Series(self._sample_weights(frame), index=frame.index).where(batch, 0.0) \
+                .groupby(frame["agent"]).sum()
+            frame = frame[~batch]
+        else:
+            batch_calls = pd.Series(dtype=int)
+        if frame.empty:
+            return []
+
+        deferrable = pd.Series(False, index=frame.index)
+        if "timestamp" in frame.columns:
+            hours = pd.to_datetime(frame["timestamp"], format="ISO8601").dt.hour
+            start, end = business_hours
+            deferrable |= (hours < start) | (hours >= end)
+        if "tags" in frame.columns:
+            wanted = set(deferrable_tags)
+            deferrable |= frame["tags"].map(
+                lambda tags: isinstance(tags, list) and not wanted.isdisjoint(tags)
+            )
+
+        weights = pd.Series(self._sample_weights(frame), index=frame.index)
+
+        def _column(name: str) -> pd.Series:
+            if name not in frame.columns:
+                return pd.Series(0.0, index=frame.index)
+            return pd.to_numeric(frame[name], errors="coerce").fillna(0) * weights
+
+        cost = _column("cost_inr")
+        tokens = _column("tokens_total")
+        work = pd.DataFrame({
+            "agent": frame["agent"],
+            "calls": weights,
+            "deferrable_calls": weights.where(deferrable, 0.0),
+            "cost_inr": cost,
+            "deferrable_cost": cost.where(deferrable, 0.0),
+            "deferrable_tokens": tokens.where(deferrable, 0.0),
+        })
+        grouped = work.groupby("agent", sort=True).sum()
+        discount = 1 - GenAICostTracker.BATCH_DISCOUNT
+
+        results = []
+        for agent, row in grouped.iterrows():
+            share = row["deferrable_calls"] / row["calls"]
+            results.append({
+                "agent": agent,
+                "realtime_calls": int(round(row["calls"])),
+                "batch_calls": int(round(batch_calls.get(agent, 0))),
+                "deferrable_calls": int(round(row["deferrable_calls"])),
+                "deferrable_share": round(float(share), 4),
+                "realtime_cost_inr": round(float(row["cost_inr"]), 4),
+                "potential_savings_inr": round(float(row["deferrable_cost"] * discount), 4),
+                "deferrable_tokens": int(round(row["deferrable_tokens"])),
+                "candidate": bool(share >= min_deferrable_share),
+            })
+        results.sort(key=lambda r: r["potential_savings_inr"], reverse=True)
+        return results
+
+    def get_coalescing_savings(self) -> List[Dict[str, Any]]:
+        """Calls, tokens and rupees saved per agent by single-flight coalescing.
+
+        Each ``outcome="coalesced"`` record stands for a call that shared an
+        identical in-flight request instead of being billed separately.
+        """
+        if self.df.empty or "outcome" not in self.df.columns:
+            return []
+        frame = self.df[self.df["outcome"] == COALESCED]
+        if frame.empty:
+            return []
+
+        def _column(name: str) -> pd.Series:
+            if name not in frame.columns:
+                return pd.Series(0.0, index=frame.index)
+            return pd.to_numeric(frame[name], errors="coerce").fillna(0)
+
+        weights = self._sample_weights(frame)
+        work = pd.DataFrame({
+            "agent": frame["agent"],
+            "coalesced_calls": weights,
+            "tokens_saved": _column("tokens_saved") * weights,
+            "savings": _column("cost_saved_inr") * weights,
+        })
+        grouped = work.groupby("agent", sort=True).sum()
+
+        results = []
+        for agent, row in grouped.iterrows():
+            results.append({
+                "agent": agent,
+                "coalesced_calls": int(round(row["coalesced_calls"])),
+                "tokens_saved": int(round(row["tokens_saved"])),
+                "savings_inr": round(float(row["savings"]), 4),
+            })
+        results.sort(key=lambda r: r["savings_inr"], reverse=True)
+        return results
+
+    def get_hedging_report(self, percentile: float = 99) -> List[Dict[str, Any]]:
+        """Tail latency gained and money spent by hedged requests, per agent.
+
+        Attempts sharing a ``hedge_group`` form one call. Its hedged latency
+        is the earliest successful attempt (backups start ``hedge_delay_ms``
+        after the primary). Its unhedged latency is the primary's; a primary
+        cancelled at time t is estimated as the mean of the agent's completed
+        latencies for that model above t (t itself when there are none, a
+        lower bound). Extra spend is everything billed in a group except the
+        winning attempt. Use ``cost_per_ms_saved_inr`` to tune the hedge
+        quantile per agent.
+        """
+        needed = {"hedge_group", "hedge_role", "latency_ms", "outcome", "agent"}
+        if self.df.empty or not needed <= set(self.df.columns):
+            return []
+        frame = self.df[self.df["hedge_group"].notna()]
+        if frame.empty:
+            return []
+
+        latency = pd.to_numeric(frame["latency_ms"], errors="coerce").fillna(0)
+        delay = pd.to_numeric(frame.get("hedge_delay_ms", 0), errors="coerce").fillna(0)
+        is_backup = frame["hedge_role"] == "backup"
+        cost = frame["cost_inr"] if "cost_inr" in frame.columns else 0.0
+        frame = frame.assign(
+            _latency=latency,
+            _finished=latency + delay.where(is_backup, 0),
+            _backup=is_backup,
+            _cost=pd.to_numeric(cost, errors="coerce"),
+        ).fillna({"_cost": 0.0})
+
+        # The winner is the successful attempt that finished first
+        succeeded = frame[frame["outcome"] == "success"]
+        winners = succeeded.loc[succeeded.groupby("hedge_group")["_finished"].idxmin()].set_index("hedge_group")
+        by_group = frame.groupby("hedge_group")
+        groups = pd.DataFrame({
+            "last_finished": by_group["_finished"].max(),
+            "fired": by_group["_backup"].any(),
+            "billed": by_group["_cost"].sum(),
+        })
+        groups["hedged"] = winners["_finished"].reindex(groups.index).fillna(groups["last_finished"])
+        groups["backup_won"] = winners["_backup"].reindex(groups.index).fillna(False).astype(bool)
+        groups["extra"] = groups["billed"] - winners["_cost"].reindex(groups.index).fillna(0)
+        primary = frame[frame["hedge_role"] == "primary"].drop_duplicates("hedge_group").set_index("hedge_group")
+        primary = primary.assign(unhedged=primary["_latency"])
+
+        # Censored primaries: expected latency given it exceeds the cancellation time
+        completed = self.df[self.df["outcome"] == "success"]
+        completed_latency = pd.to_numeric(completed["latency_ms"], errors="coerce")
+        censored = primary["outcome"] == CANCELLED
+        for (agent, model), rows in primary[censored].groupby(["agent", "model"]):
+            values = np.sort(completed_latency[(completed["agent"] == agent)
+                                               & (completed["model"] == model)].dropna().to_numpy())
+            cut = np.searchsorted(values, rows["_latency"].to_numpy(), side="right")
+            tail_sum = np.concatenate([[0.0], np.cumsum(values[::-1])])[len(values) - cut]
+            tail_count = len(values) - cut
+            estimate = np.where(tail_count > 0, tail_sum / np.maximum(tail_count, 1), rows["_latency"])
+            primary.loc[rows.index, "unhedged"] = estimate
+        groups = groups.join(primary[["agent", "unhedged"]], how="inner")
+
+        results = []
+        for agent, rows in groups.groupby("agent", sort=True):
+            unhedged = float(np.percentile(rows["unhedged"], percentile))
+            hedged_p = float(np.percentile(rows["hedged"], percentile))
+            improvement = unhedged - hedged_p
+            extra = float(rows["extra"].sum())
+            results.append({
+                "agent": agent,
+                "calls": len(rows),
+                "hedges_fired": int(rows["fired"].sum()),
+                "backup_wins": int(rows["backup_won"].sum()),
+                f"p{percentile:g}_unhedged_ms": round(unhedged, 2),
+                f"p{percentile:g}_hedged_ms": round(hedged_p, 2),
+                f"p{percentile:g}_improvement_ms": round(improvement, 2),
+                "extra_spend_inr": round(extra, 4),
+                "cost_per_ms_saved_inr": round(extra / improvement, 6) if improvement > 0 else None,
+            })
+        return results
+
+    def get_cost_anomalies(self, **params) -> List[Dict[str, Any]]:
+        """Spend spikes per agent and model over the loaded history, oldest first.
+
+        Replays the log through a fresh :class:`~inferenceiq.anomaly.CostAnomalyDetector`
+        (``params`` are its settings); records count ``sample_weight`` times
+        and hourly rollups count as spend. Sampled-out totals are left out,
+        as the weights already stand for them, and so are daily rollups,
+        which would read as once-a-day spikes.
+        """
+        aggregates = self._aggregates()
+        if not aggregates.empty and "tier" in aggregates.columns:
+            aggregates = aggregates[aggregates["tier"].isna() | (aggregates["tier"] == HOURLY)]
+        frame = pd.concat([self.df, aggregates], ignore_index=True)
+        return CostAnomalyDetector(**params).detect(frame)
+
+    def get_compression_savings(self) -> List[Dict[str, Any]]:
+        """Tokens and rupees saved per agent by context compression.
+
+        Uses the ``context_tokens_before``/``context_tokens_after`` counts the
+        tracker logs when a ``ContextCompressor`` is attached; removed tokens
+        are valued at each call's model input rate. Sampled records count
+        ``sample_weight`` times.
+        """
+        needed = {"agent", "model", "context_tokens_before", "context_tokens_after"}
+        if self.df.empty or not needed <= set(self.df.columns):
+            return []
+
+        frame = self.df[self.df["context_tokens_before"].notna()]
+        if frame.empty:
+            return []
+        weights = pd.Series(self._sample_weights(frame), index=frame.index)
+        before = pd.to_numeric(frame["context_tokens_before"], errors="coerce").fillna(0) * weights
+        after = pd.to_numeric(frame["context_tokens_after"], errors="coerce").fillna(0) * weights
+        rates = {model: price.get("input", 0) for model, price in self._pricing_ref.items()}
+        input_rate = frame["model"].map(rates).fillna(0).astype(float)
+        saved = before - after
+
+        work = pd.DataFrame({
+            "agent": frame["agent"],
+            "calls": weights,
+            "compressed_calls": weights.where(saved > 0, 0.0),
+            "tokens_before": before,
+            "tokens_after": after,
+            "savings": saved * input_rate,
+        })
+        grouped = work.groupby("agent", sort=True).sum()
+
+        results = []
+        for agent, row in grouped.iterrows():
+            tokens_before = int(round(row["tokens_before"]))
+            tokens_after = int(round(row["tokens_after"]))
+            tokens_saved = tokens_before - tokens_after
+            results.append({
+                "agent": agent,
+                "calls": int(round(row["calls"])),
+                "compressed_calls": int(round(row["compressed_calls"])),
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+                "tokens_saved": tokens_saved,
+                "reduction": round(tokens_saved / tokens_before, 4) if tokens_before else 0.0,
+                "savings_inr": round(float(row["savings"]), 4),
+            })
+        results.sort(key=lambda r: r["savings_inr"], reverse=True)
+        return results
+
+    def get_cost_attribution(self, dimension: str, top_k: Optional[int] = None,
+                             metric: str = "cost_inr") -> List[Dict[str, Any]]:
+        """Attribute cost, tokens and failure waste to any logged dimension.
+
+        Works for top-level fields (``agent``, ``user_id``, ``session_id``) as
+        well as flattened ``metadata`` keys such as ``customer_id``. List-valued
+        fields like ``tags`` are exploded, so a call tagged ``["prod", "kyc"]``
+        counts in full towards both tags. Rows without a value are skipped.
+
+        Groups are built by factorizing the key column (hash-based categorical
+        encoding) and summing with ``np.bincount``, which stays linear in the
+        number of rows even with millions of distinct customers. When
+        ``top_k`` is given only the k largest groups by ``metric`` are
+        selected with a partial sort; the result is always ordered by
+        ``metric`` descending.
+
+        For sampled logs, dimensions kept in the sampled-out totals (agent,
+        model) are exact; any other dimension is estimated from the records
+        weighted by ``sample_weight``. Likewise only dimensions kept in the
+        retention rollups include compacted history.
+        """
+        if metric not in self.ATTRIBUTION_METRICS:
+            raise ValueError(f"Unsupported attribution metric: {metric}")
+
+        # _count: calls a row stands for; _scale: multiplier for its per-call values.
+        # Cancelled hedge losers cost money but are not calls.
+        calls = np.ones(len(self.df))
+        if "outcome" in self.df.columns:
+            calls = (self.df["outcome"] != CANCELLED).to_numpy(dtype=float)
+        aggregates = self._aggregates()
+        if not aggregates.empty and dimension in aggregates.columns \
+                and aggregates[dimension].notna().all():
+            frame = pd.concat([
+                self.df.assign(_count=calls, _scale=1.0),
+                aggregates.assign(_count=aggregates["calls"].astype(float), _scale=1.0),
+            ], ignore_index=True)
+        else:
+            weights = self._sample_weights()
+            frame = self.df.assign(_count=weights * calls, _scale=weights)
+        if frame.empty or dimension not in frame.columns:
+            return []
+        keys = frame[dimension]
+        first = keys.first_valid_index()
+        if first is not None and isinstance(keys.loc[first], (list, tuple)):
+            frame = frame.explode(dimension)
+            keys = frame[dimension]
+
+        codes, uniques = pd.factorize(keys, sort=False)
+        valid = codes >= 0
+        codes = codes[valid]
+        n_groups = len(uniques)
+        if n_groups == 0:
+            return []
+
+        def _column(name: str) -> np.ndarray:
+            if name not in frame.columns:
+                return np.zeros(len(codes))
+            values = pd.to_numeric(frame[name], errors="coerce").fillna(0)
+            return values.to_numpy(dtype=float)[valid] * scale
+
+        scale = frame["_scale"].to_numpy(dtype=float)[valid]
+        count = frame["_count"].to_numpy(dtype=float)[valid]
+        cost = _column("cost_inr")
+        if "outcome" in frame.columns:
+            failed = (frame["outcome"] == "failed").to_numpy()[valid]
+        else:
+            failed = np.zeros(len(codes), dtype=bool)
+        # Aggregate rows carry their failures as counts
+        failed_calls = failed * count + _column("failed_calls")
+        failure_waste = cost * failed + _column("failed_cost_inr")
+
+        totals = {
+            "calls": np.bincount(codes, weights=count, minlength=n_groups),
+            "cost_inr": np.bincount(codes, weights=cost, minlength=n_groups),
+            "tokens_in": np.bincount(codes, weights=_column("tokens_in"), minlength=n_groups),
+            "tokens_out": np.bincount(codes, weights=_column("tokens_out"), minlength=n_groups),
+            "tokens_total": np.bincount(codes, weights=_column("tokens_total"), minlength=n_groups),
+            "failed_calls": np.bincount(codes, weights=failed_calls, minlength=n_groups),
+            "failure_waste_inr": np.bincount(codes, weights=failure_waste, minlength=n_groups),
+        }
+
+        ranking = totals[metric]
+        if top_k is not None and top_k < n_groups:
+            if top_k <= 0:
+                return []
+            selected = np.argpartition(-ranking, top_k - 1)[:top_k]
+        else:
+            selected = np.arange(n_groups)
+        selected = selected[np.argsort(-ranking[selected], kind="stable")]
+
+        results = []
+        for idx in selected:
+            results.append({
+                dimension: uniques[idx],
+                "calls": int(round(totals["calls"][idx])),
+                "cost_inr": round(float(totals["cost_inr"][idx]), 4),
+                "tokens_in": int(round(totals["tokens_in"][idx])),
+                "tokens_out": int(round(totals["tokens_out"][idx])),
+                "tokens_total": int(round(totals["tokens_total"][idx])),
+                "failed_calls": int(round(totals["failed_calls"][idx])),
+                "failure_waste_inr": round(float(totals["failure_waste_inr"][idx]), 4),
+            })
+        return results
+
+    def get_top_k(self, dimension: str, k: int = 10,
+                  metric: str = "cost_inr") -> List[Dict[str, Any]]:
+        """Return the k most expensive values of a dimension (e.g. customers)."""
+        return self.get_cost_attribution(dimension, top_k=k, metric=metric)
@@ -0,0 +1,469 @@
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from inferenceiq.index import timestamp_to_micros
+from inferenceiq.sampling import SAMPLED_OUT
+
+SEVERITIES = ("warning", "critical")
+HOURS_PER_WEEK = 168
+STATE_VERSION = 1
+_EPOCH = datetime(1970, 1, 1)
+_MICROS_PER_HOUR = 3_600_000_000
+
+SeriesKey = Tuple[str, str]
+
+
+def hour_of_week(hour: Any):
+    """Hour-of-week slot (0 = Monday 00:00) of an epoch hour; works on arrays."""
+    # 1970-01-01 was a Thursday
+    return ((hour // 24 + 3) % 7) * 24 + hour % 24
+
+
+class _Series:
+    """Baselines of one agent/model series plus its open hour."""
+
+    __slots__ = ("bucket", "spend", "level", "mean", "var", "n",
+                 "seasonal_mean", "seasonal_var", "seasonal_n")
+
+    def __init__(self, bucket: int):
+        self.bucket = bucket
+        self.spend = 0.0
+        self.level = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+        self.seasonal_mean = np.zeros(HOURS_PER_WEEK)
+        self.seasonal_var = np.zeros(HOURS_PER_WEEK)
+        self.seasonal_n = np.zeros(HOURS_PER_WEEK, dtype=np.int64)
+
+    def to_dict(self, key: SeriesKey) -> Dict[str, Any]:
+        return {
+            "agent": key[0], "model": key[1], "bucket": self.bucket, "spend": self.spend,
+            "level": self.level, "mean": self.mean, "var": self.var, "n": self.n,
+            "seasonal_mean": self.seasonal_mean.tolist(),
+            "seasonal_var": self.seasonal_var.tolist(),
+            "seasonal_n": self.seasonal_n.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Series":
+        series = cls(int(data["bucket"]))
+        series.spend = float(data["spend"])
+        series.level = int(data["level"])
+        series.mean = float(data["mean"])
+        series.var = float(data["var"])
+        series.n = int(data["n"])
+        series.seasonal_mean = np.asarray(data["seasonal_mean"], dtype=float)
+        series.seasonal_var = np.asarray(data["seasonal_var"], dtype=float)
+        series.seasonal_n = np.asarray(data["seasonal_n"], dtype=np.int64)
+        return series
+
+
+class CostAnomalyDetector:
+    """Online spend-spike detector over tracker log records.
+
+    Spend (``cost_inr`` times ``sample_weight``) is summed per agent/model
+    and hour; sampled-out totals are skipped, as the weighted records
+    already stand for the calls they count. Each series keeps an EWMA of its hourly spend and variance,
+    plus the same per hour-of-week slot (168 of them), so memory per series
+    is constant. An open hour is flagged as soon as its running spend
+    exceeds ``threshold`` deviations over the EWMA and, once the slot has
+    ``min_seasonal_periods`` observations, over the seasonal baseline too;
+    a nightly job is therefore not an anomaly but the same spend at noon is.
+    Crossing ``critical`` deviations escalates to ``"critical"``. Nothing is
+    flagged until a series has ``min_periods`` hours of history or for spend
+    under ``min_cost_inr``. Records for an hour that is already closed are
+    counted in the open hour.
+
+    :meth:`update` consumes one record at a time (tail mode), :meth:`detect`
+    replays a whole history vectorized, with identical results; :meth:`save`
+    and :meth:`load` persist the baselines and the position in the log.
+    """
+
+    def __init__(self, alpha: float = 0.1, seasonal_alpha: float = 0.3, threshold: float = 4.0,
+                 critical: float = 8.0, min_periods: int = 24, min_seasonal_periods: int = 2,
+                 min_cost_inr: float = 1.0, min_std_ratio: float = 0.1, min_std_inr: float = 0.05):
+        for name, value in (("alpha", alpha), ("seasonal_alpha", seasonal_alpha)):
+            if not 0 < value <= 1:
+                raise ValueError(f"{name} must be in (0, 1]: {value}")
+        if critical < threshold:
+            raise ValueError(f"critical ({critical}) must not be below threshold ({threshold})")
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.critical = critical
+        self.min_periods = min_periods
+        self.min_seasonal_periods = min_seasonal_periods
+        self.min_cost_inr = min_cost_inr
+        self.min_std_ratio = min_std_ratio
+        self.min_std_inr = min_std_inr
+        # Byte offset of the next unread line of the followed log
+        self.offset = 0
+        # Inode and first line of the followed log, and the last line read from it
+        self.log_identity: Optional[Dict[str, Any]] = None
+        self._series: Dict[SeriesKey, _Series] = {}
+
+    def params(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in (
+            "alpha", "seasonal_alpha", "threshold", "critical", "min_periods",
+            "min_seasonal_periods", "min_cost_inr", "min_std_ratio", "min_std_inr",
+        )}
+
+    # -- Baselines ---------------------------------------------------------
+
+    def _std(self, mean, var):
+        return np.maximum(np.maximum(np.sqrt(var), self.min_std_ratio * mean), self.min_std_inr)
+
+    def _bounds(self, mean, var, n, seasonal_mean, seasonal_var, seasonal_n):
+        """Warning and critical spend bounds; NaN where the series is still warming up."""
+        std = self._std(mean, var)
+        seasonal_std = self._std(seasonal_mean, seasonal_var)
+        seasonal = seasonal_n >= self.min_seasonal_periods
+        bounds = []
+        for z in (self.threshold, self.critical):
+            bound = np.where(seasonal, np.maximum(mean + z * std, seasonal_mean + z * seasonal_std),
+                             mean + z * std)
+            bounds.append(np.where(n >= self.min_periods, np.maximum(bound, self.min_cost_inr), np.nan))
+        return bounds
+
+    def _score(self, spend, mean, var, seasonal_mean, seasonal_var, seasonal_n):
+        """Deviation score and the baseline that bounds it."""
+        z = (spend - mean) / self._std(mean, var)
+        seasonal_z = (spend - seasonal_mean) / self._std(seasonal_mean, seasonal_var)
+        seasonal = (seasonal_n >= self.min_seasonal_periods) & (seasonal_z < z)
+        return np.where(seasonal, seasonal_z, z), np.where(seasonal, "seasonal", "ewma"), \
+            np.where(seasonal, seasonal_mean, mean)
+
+    def _close(self, series: _Series, bucket: int):
+        """Fold the open hour into the baselines and skip to ``bucket``, counting empty hours as 0."""
+        a = self.alpha
+        x = series.spend
+        if series.n == 0:
+            series.mean = x
+        else:
+            diff = x - series.mean
+            series.mean += a * diff
+            series.var = (1 - a) * (series.var + a * diff * diff)
+        series.n += 1
+
+        slot = hour_of_week(series.bucket)
+        a = self.seasonal_alpha
+        if series.seasonal_n[slot] == 0:
+            series.seasonal_mean[slot] = x
+        else:
+            diff = x - series.seasonal_mean[slot]
+            series.seasonal_mean[slot] += a * diff
+            series.seasonal_var[slot] = (1 - a) * (series.seasonal_var[slot] + a * diff * diff)
+        series.seasonal_n[slot] += 1
+
+        gap = bucket - series.bucket - 1
+        if gap > 0:
+            # k zero observations in closed form: mean * d, d * (var + mean^2 * (1 - d)), d = (1-a)^k
+            decay = (1 - self.alpha) ** gap
+            series.var = decay * (series.var + series.mean ** 2 * (1 - decay))
+            series.mean *= decay
+            series.n += gap
+
+            cycles, rest = divmod(gap, HOURS_PER_WEEK)
+            counts = np.full(HOURS_PER_WEEK, cycles, dtype=np.int64)
+            np.add.at(counts, hour_of_week(np.arange(series.bucket + 1, series.bucket + 1 + rest)), 1)
+            decay = (1 - self.seasonal_alpha) ** counts
+            series.seasonal_var = decay * (series.seasonal_var + series.seasonal_mean ** 2 * (1 - decay))
+            series.seasonal_mean = series.seasonal_mean * decay
+            series.seasonal_n = series.seasonal_n + counts
+
+        series.bucket = bucket
+        series.spend = 0.0
+        series.level = 0
+
+    # -- Online ------------------------------------------------------------
+
+    def update(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Consume one log record; returns the anomalies it triggered (usually none)."""
+        if record.get("record_type") == SAMPLED_OUT:
+            return []
+        micros = timestamp_to_micros(record.get("timestamp"))
+        if micros is None:
+            return []
+        hour = micros // _MICROS_PER_HOUR
+        key = (str(record.get("agent") or "unknown"), str(record.get("model") or "unknown"))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(hour)
+        elif hour > series.bucket:
+            self._close(series, hour)
+
+        weight = record.get("sample_weight")
+        series.spend += float(record.get("cost_inr") or 0) * (1.0 if weight is None else float(weight))
+
+        slot = hour_of_week(series.bucket)
+        stats = (series.mean, series.var, series.n, series.seasonal_mean[slot],
+                 series.seasonal_var[slot], series.seasonal_n[slot])
+        warn, crit = self._bounds(*stats)
+        level = 2 if series.spend >= crit else 1 if series.spend >= warn else 0
+        if level <= series.level:
+            return []
+        series.level = level
+        z, baseline, expected = self._score(series.spend, *stats[:2], *stats[3:])
+        return [self._anomaly(record.get("timestamp"), record.get("interaction_id"), key, series.bucket,
+                              series.spend, float(expected), float(crit if level == 2 else warn), float(z),
+                              str(baseline), level)]
+
+    @staticmethod
+    def _anomaly(timestamp, interaction_id, key, bucket, spend, expected, bound, z, baseline, level):
+        return {
+            "timestamp": str(timestamp),
+            "hour": (_EPOCH + timedelta(hours=int(bucket))).isoformat(),
+            "agent": key[0],
+            "model": key[1],
+            "severity": SEVERITIES[level - 1],
+            "spend_inr": round(spend, 4),
+            "expected_inr": round(expected, 4),
+            "threshold_inr": round(bound, 4),
+            "z_score": round(z, 2),
+            "baseline": baseline,
+            "interaction_id": interaction_id,
+        }
+
+    def feed(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        anomalies = []
+        for record in records:
+            anomalies.extend(self.update(record))
+        return anomalies
+
+    # -- Batch -------------------------------------------------------------
+
+    @staticmethod
+    def _spend_frame(frame: pd.DataFrame) -> pd.DataFrame:
+        """Hour, series and weighted spend of each record, in log order."""
+        if frame.empty or "timestamp" not in frame.columns:
+            return pd.DataFrame()
+
+        def _column(name: str, default: Any) -> pd.Series:
+            if name not in frame.columns:
+                return pd.Series(default, index=frame.index)
+            return frame[name]
+
+        timestamp = pd.to_datetime(frame["timestamp"], format="ISO8601", errors="coerce")
+        if timestamp.dt.tz is not None:
+            timestamp = timestamp.dt.tz_localize(None)
+        valid = timestamp.notna().to_numpy()
+        if "record_type" in frame.columns:
+            valid = valid & (frame["record_type"] != SAMPLED_OUT).to_numpy()
+        cost = pd.to_numeric(_column("cost_inr", 0.0), errors="coerce").fillna(0.0)
+        weight = pd.to_numeric(_column("sample_weight", 1.0), errors="coerce").fillna(1.0)
+        records = pd.DataFrame({
+            "agent": _column("agent", None).fillna("unknown").astype(str),
+            "model": _column("model", None).fillna("unknown").astype(str),
+            "hour": timestamp.fillna(_EPOCH).to_numpy().astype("datetime64[h]").astype(np.int64),
+            "spend": (cost * weight).to_numpy(dtype=float),
+            "timestamp": frame["timestamp"].map(lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v)),
+            "interaction_id": _column("interaction_id", None),
+        })
+        return records[valid].reset_index(drop=True)
+
+    def _ewm(self, values: pd.Series, groups: List[pd.Series], alpha: float):
+        """Baseline state before each row: mean, var and count, per group (in row order)."""
+        def _smooth(series: pd.Series) -> pd.Series:
+            smoothed = series.groupby(groups, sort=False).ewm(alpha=alpha, adjust=False).mean()
+            return smoothed.droplevel(list(range(len(groups)))).reindex(series.index)
+
+        mean = _smooth(values)
+        previous = mean.groupby(groups, sort=False).shift(1)
+        diff = values - previous.fillna(values)
+        var = _smooth((1 - alpha) * diff ** 2)
+        return (previous.fillna(0.0), var.groupby(groups, sort=False).shift(1).fillna(0.0),
+                values.groupby(groups, sort=False).cumcount(), mean, var)
+
+    def detect(self, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Replay a log history in one vectorized pass.
+
+        ``frame`` holds log records in log order (e.g. ``AnalyticsEngine.df``).
+        Afterwards the detector holds the same state as if every record had
+        gone through :meth:`update`, so tail mode can continue from it.
+        """
+        if self._series:
+            raise ValueError("detect() replays a full history and needs a fresh detector")
+        records = self._spend_frame(frame)
+        if records.empty:
+            return []
+        records["bucket"] = records.groupby(["agent", "model"], sort=False)["hour"].cummax()
+
+        # Dense hourly grid per series, empty hours as zero spend
+        keys = records[["agent", "model"]].drop_duplicates().reset_index(drop=True)
+        records = records.merge(keys.reset_index().rename(columns={"index": "series"}),
+                                on=["agent", "model"], how="left", sort=False)
+        totals = records.groupby(["series", "bucket"], sort=True)["spend"].sum()
+        spans = records.groupby("series", sort=True)["bucket"].agg(["min", "max"])
+        lengths = (spans["max"] - spans["min"] + 1).to_numpy()
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        dense = pd.DataFrame({
+            "series": np.repeat(spans.index.to_numpy(), lengths),
+            "bucket": np.repeat(spans["min"].to_numpy(), lengths) + np.arange(lengths.sum()) - starts,
+        })
+        dense["x"] = totals.reindex(pd.MultiIndex.from_frame(dense[["series", "bucket"]])).fillna(0.0).to_numpy()
+        dense["slot"] = hour_of_week(dense["bucket"])
+
+        mean, var, n, _, _ = self._ewm(dense["x"], [dense["series"]], self.alpha)
+        s_mean, s_var, s_n, s_final_mean, s_final_var = self._ewm(
+            dense["x"], [dense["series"], dense["slot"]], self.seasonal_alpha)
+        stats = (mean.to_numpy(), var.to_numpy(), n.to_numpy(),
+                 s_mean.to_numpy(), s_var.to_numpy(), s_n.to_numpy())
+        warn, crit = self._bounds(*stats)
+
+        # Running spend within each hour; an hour is flagged at the record crossing a bound
+        position = pd.MultiIndex.from_frame(dense[["series", "bucket"]])
+        row = position.get_indexer(pd.MultiIndex.from_frame(records[["series", "bucket"]]))
+        cumulative = records.groupby(["series", "bucket"], sort=False)["spend"].cumsum().to_numpy()
+        before = cumulative - records["spend"].to_numpy()
+        level = np.zeros(len(records), dtype=int)
+        for value, bound in ((1, warn[row]), (2, crit[row])):
+            with np.errstate(invalid="ignore"):
+                level[(before < bound) & (cumulative >= bound)] = value
+        flagged = np.flatnonzero(level)
+        anomalies = []
+        if len(flagged):
+            r = row[flagged]
+            z, baseline, expected = self._score(
+                cumulative[flagged], stats[0][r], stats[1][r], stats[3][r], stats[4][r], stats[5][r])
+            for i, index in enumerate(flagged):
+                record = records.iloc[index]
+                interaction_id = record["interaction_id"]
+                anomalies.append(self._anomaly(
+                    record["timestamp"], None if pd.isna(interaction_id) else interaction_id,
+                    (record["agent"], record["model"]), record["bucket"], float(cumulative[index]),
+                    float(expected[i]), float((crit if level[index] == 2 else warn)[r[i]]), float(z[i]),
+                    str(baseline[i]), int(level[index]),
+                ))
+
+        # Leave each series with its last hour open, as update() would
+        last = dense.groupby("series", sort=True).tail(1)
+        closed = dense.drop(last.index)
+        seasonal_rows = closed.groupby(["series", "slot"], sort=False).tail(1)
+        seasonal_counts = closed.groupby(["series", "slot"], sort=False).size()
+        levels = pd.Series(level).groupby([records["series"], records["bucket"]]).max()
+        for series_id, row_index in zip(last["series"], last.index):
+            series = _Series(int(dense.at[row_index, "bucket"]))
+            series.spend = float(dense.at[row_index, "x"])
+            series.level = int(levels.get((series_id, series.bucket), 0))
+            series.mean = float(mean.at[row_index])
+            series.var = float(var.at[row_index])
+            series.n = int(n.at[row_index])
+            own = seasonal_rows[seasonal_rows["series"] == series_id]
+            if not own.empty:
+                slots = own["slot"].to_numpy()
+                series.seasonal_mean[slots] = s_final_mean.loc[own.index].to_numpy()
+                series.seasonal_var[slots] = s_final_var.loc[own.index].to_numpy()
+                series.seasonal_n[slots] = seasonal_counts.loc[series_id].reindex(slots).to_numpy()
+            key = (keys.at[series_id, "agent"], keys.at[series_id, "model"])
+            self._series[key] = series
+        return anomalies
+
+    # -- Persistence and tail mode ----------------------------------------
+
+    def save(self, path: str):
+        """Write the baselines and log offset (atomically) so a restart resumes without replay."""
+        state = {
+            "version": STATE_VERSION,
+            "params": self.params(),
+            "offset": self.offset,
+            "log": self.log_identity,
+            "series": [series.to_dict(key) for key, series in self._series.items()],
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CostAnomalyDetector":
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported anomaly state version: {state.get('version')}")
+        detector = cls(**state["params"])
+        detector.offset = int(state["offset"])
+        detector.log_identity = state.get("log")
+        for data in state["series"]:
+            detector._series[(data["agent"], data["model"])] = _Series.from_dict(data)
+        return detector
+
+    def _resume(self, f, identity: Dict[str, Any]) -> Tuple[int, Optional[int]]:
+        """Where to continue in a rewritten log: just past the last line read, if it is still there.
+
+        Otherwise (rotated to a new log, or that line was purged) the log is
+        read from the start, skipping records not newer than the last one seen.
+        """
+        f.seek(0)
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if zlib.crc32(line) == identity["last_line"]:
+                return offset, None
+        return 0, identity["seen_until"]
+
+    def consume(self, log_file: str) -> List[Dict[str, Any]]:
+        """Process the complete lines appended to a JSONL log since the last call.
+
+        A fresh detector replays the existing history with :meth:`detect`.
+        A rewritten log (rotated, truncated or compacted by a
+        :class:`~inferenceiq.retention.RetentionPolicy`), told apart by its
+        inode and first line, is resumed after the last line already read,
+        so no history is counted twice.
+        """
+        identity = self.log_identity
+        inode = os.stat(log_file).st_ino
+        seen_until = None
+        with open(log_file, "rb") as f:
+            head = zlib.crc32(f.readline())
+            if identity is not None and self.offset > 0 and (
+                    inode != identity["inode"] or head != identity["head"]
+                    or os.path.getsize(log_file) < self.offset):
+                self.offset, seen_until = self._resume(f, identity)
+            elif os.path.getsize(log_file) < self.offset:
+                self.offset = 0
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return []
+        lines = [line for line in data[:end].splitlines(keepends=True) if line.strip()]
+        records = [json.loads(line) for line in lines]
+        self.offset += end
+        micros = [timestamp_to_micros(record.get("timestamp")) for record in records]
+        if seen_until is not None:
+            records = [record for record, m in zip(records, micros) if m is not None and m > seen_until]
+        if lines:
+            known = [m for m in micros if m is not None]
+            if identity is not None and identity["seen_until"] is not None:
+                known.append(identity["seen_until"])
+            self.log_identity = {"inode": inode, "head": head, "last_line": zlib.crc32(lines[-1]),
+                                 "seen_until": max(known, default=None)}
+        if not self._series:
+            return self.detect(pd.DataFrame(records))
+        return self.feed(records)
+
+    def follow(self, log_file: str, state_file: Optional[str] = None, poll_interval: float = 1.0,
+               should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict[str, Any]]:
+        """Tail a JSONL log, yielding anomalies as they happen.
+
+        State is saved to ``state_file`` after every poll that read new lines.
+        """
+        while True:
+            offset = self.offset
+            anomalies = self.consume(log_file)
+            if state_file and self.offset != offset:
+                self.save(state_file)
+            yield from anomalies
+            if should_stop is not None and should_stop():
+                return
+            time.sleep(poll_interval)
@@ -0,0 +1,326 @@
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+
+def _count(value: Any) -> int:
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def _openai_result(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one line of an OpenAI batch output or error file."""
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    error = record.get("error") or body.get("error")
+    if error or response.get("status_code", 200) >= 400:
+        error = error or {}
+        return {
+            "custom_id": record.get("custom_id"),
+            "error_type": error.get("code") or error.get("type") or "BatchRequestError",
+            "error": error.get("message") or f"HTTP {response.get('status_code')}",
+        }
+    usage = body.get("usage") or {}
+    return {
+        "custom_id": record.get("custom_id"),
+        "content": body["choices"][0]["message"]["content"],
+        "usage": {
+            "tokens_in": _count(usage.get("prompt_tokens")),
+            "tokens_out": _count(usage.get("completion_tokens")),
+            "tokens_cached": _count((usage.get("prompt_tokens_details") or {}).get("cached_tokens")),
+            "tokens_cache_write": 0,
+        },
+    }
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: upload the JSONL file, create a batch, read output files."""
+
+    format = "openai"
+    TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, input_file: str) -> str:
+        with open(input_file, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def is_done(self, status: str) -> bool:
+        return status in self.TERMINAL
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield _openai_result(json.loads(line))
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API. Requests are sent inline from the JSONL file."""
+
+    format = "anthropic"
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, input_file: str) -> str:
+        with open(input_file, "r") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.messages.batches.retrieve(batch_id).processing_status
+
+    def is_done(self, status: str) -> bool:
+        return status == "ended"
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        for item in self.client.messages.batches.results(batch_id):
+            result = item.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                yield {
+                    "custom_id": item.custom_id,
+                    "error_type": f"Batch{result.type.capitalize()}",
+                    "error": str(getattr(error, "error", error) or result.type),
+                }
+                continue
+            message = result.message
+            cached = _count(getattr(message.usage, "cache_read_input_tokens", None))
+            cache_write = _count(getattr(message.usage, "cache_creation_input_tokens", None))
+            yield {
+                "custom_id": item.custom_id,
+                "content": message.content[0].text,
+                "usage": {
+                    "tokens_in": message.usage.input_tokens + cached + cache_write,
+                    "tokens_out": message.usage.output_tokens,
+                    "tokens_cached": cached,
+                    "tokens_cache_write": cache_write,
+                },
+            }
+
+
+def _echo(body: Dict[str, Any]) -> str:
+    return body["messages"][-1]["content"]
+
+
+class LocalBatchBackend:
+    """Offline stand-in for the OpenAI batch endpoint, for tests and dry runs.
+
+    Reads the submitted JSONL file and answers every request with
+    ``responder(body)`` (default: echo the last message). Token counts are
+    estimated at four characters per token. A batch reports ``in_progress``
+    for ``polls_until_done`` status checks before completing; a responder
+    exception becomes a per-request error.
+    """
+
+    format = "openai"
+    TERMINAL = OpenAIBatchBackend.TERMINAL
+
+    def __init__(self, responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 polls_until_done: int = 1):
+        self.responder = responder or _echo
+        self.polls_until_done = polls_until_done
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, input_file: str) -> str:
+        with open(input_file, "r") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        batch_id = f"batch_local_{len(self._batches) + 1}"
+        self._batches[batch_id] = {"requests": requests, "polls": 0}
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        return "completed" if batch["polls"] > self.polls_until_done else "in_progress"
+
+    def is_done(self, status: str) -> bool:
+        return status in self.TERMINAL
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        for request in self._batches[batch_id]["requests"]:
+            body = request["body"]
+            try:
+                content = self.responder(body)
+            except Exception as e:
+                record = {"custom_id": request["custom_id"], "response": None,
+                          "error": {"code": type(e).__name__, "message": str(e)}}
+            else:
+                prompt = sum(len(str(m.get("content", ""))) for m in body["messages"])
+                record = {
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {
+                        "choices": [{"message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": max(1, prompt // 4),
+                                  "completion_tokens": max(1, len(content) // 4)},
+                    }},
+                    "error": None,
+                }
+            yield _openai_result(record)
+
+
+class BatchQueue:
+    """Deferrable requests for a tracker, sent through a provider batch API.
+
+    Requests are queued with :meth:`add`, written as the provider's batch
+    JSONL input file and submitted with :meth:`submit`. :meth:`wait` polls
+    until the batch finishes and :meth:`reconcile` turns the results into
+    standard log entries (``mode="batch"``, batch pricing, ``latency_ms`` is
+    the submit-to-result turnaround). Requests without a result are logged as
+    failed. A manifest per batch is kept in ``workdir`` so a batch can be
+    reconciled by a later process.
+    """
+
+    def __init__(self, tracker, backend=None, workdir: str = "batches"):
+        self.tracker = tracker
+        self.backend = backend
+        self.workdir = workdir
+        self.pending: List[Dict[str, Any]] = []
+
+    def _backend(self):
+        if self.backend is None:
+            if self.tracker.provider == "openai":
+                self.backend = OpenAIBatchBackend(self.tracker.client)
+            elif self.tracker.provider == "anthropic":
+                self.backend = AnthropicBatchBackend(self.tracker.client)
+            else:
+                raise ValueError(f"No batch API for provider: {self.tracker.provider}")
+        return self.backend
+
+    def add(self, model, messages, max_tokens=None, metadata=None, user_id=None,
+            session_id=None, tags=None) -> str:
+        """Queue one request. Returns its interaction id (the batch custom_id)."""
+        interaction_id = self.tracker._new_interaction_id()
+        self.pending.append({
+            "custom_id": interaction_id,
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "compliance": self.tracker._compliance_data(messages, user_id, session_id, tags),
+            "metadata": metadata or {},
+        })
+        return interaction_id
+
+    def _input_line(self, request: Dict[str, Any], format: str) -> Dict[str, Any]:
+        if format == "anthropic":
+            return {"custom_id": request["custom_id"], "params": {
+                "model": request["model"],
+                "max_tokens": request["max_tokens"] or 1024,
+                "messages": request["messages"],
+            }}
+        body = {"model": request["model"], "messages": request["messages"]}
+        if request["max_tokens"]:
+            body["max_tokens"] = request["max_tokens"]
+        return {"custom_id": request["custom_id"], "method": "POST",
+                "url": BATCH_ENDPOINT, "body": body}
+
+    def write_input(self, path: str, requests: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Write requests (default: the queue) as the backend's batch JSONL file."""
+        format = self._backend().format
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            for request in self.pending if requests is None else requests:
+                f.write(json.dumps(self._input_line(request, format)) + "\n")
+        return path
+
+    def _manifest_path(self, batch_id: str) -> str:
+        return os.path.join(self.workdir, f"{batch_id}.manifest.json")
+
+    def submit(self) -> str:
+        """Send every queued request as one batch. Returns the batch id."""
+        if not self.pending:
+            raise ValueError("No queued batch requests")
+        backend = self._backend()
+        requests, self.pending = self.pending, []
+        input_file = os.path.join(self.workdir, f"batch_{int(time.time() * 1000)}.jsonl")
+        try:
+            self.write_input(input_file, requests)
+            batch_id = backend.submit(input_file)
+        except Exception:
+            # Nothing was sent: queue the requests again, ahead of any added meanwhile
+            self.pending = requests + self.pending
+            raise
+        with open(self._manifest_path(batch_id), "w") as f:
+            json.dump({"batch_id": batch_id, "submitted_at": time.time(),
+                       "input_file": input_file, "requests": requests}, f)
+        return batch_id
+
+    def wait(self, batch_id: str, poll_interval: float = 60.0,
+             timeout: Optional[float] = None) -> str:
+        """Poll until the batch reaches a terminal status and return it."""
+        backend = self._backend()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = backend.status(batch_id)
+            if backend.is_done(status):
+                return status
+            if deadline is not None and time.monotonic() + poll_interval > deadline:
+                raise TimeoutError(f"Batch {batch_id} still {status} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def reconcile(self, batch_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Log the results of a finished batch and return the new entries."""
+        manifest_path = self._manifest_path(batch_id)
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        results = {r["custom_id"]: r for r in self._backend().results(batch_id)}
+        latency_ms = (time.time() - manifest["submitted_at"]) * 1000
+        tracker = self.tracker
+
+        entries = []
+        for request in manifest["requests"]:
+            model = request["model"]
+            result = results.get(request["custom_id"])
+            extra = {"mode": "batch", "batch_id": batch_id}
+            if result is not None and "usage" in result:
+                usage = result["usage"]
+                cost_inr = tracker.calculate_cost(
+                    model, usage["tokens_in"], usage["tokens_out"],
+                    cached_tokens=usage["tokens_cached"],
+                    cache_write_tokens=usage["tokens_cache_write"],
+                    batch=True,
+                )
+                entry = tracker._success_entry(
+                    request["custom_id"], model, usage, cost_inr, latency_ms,
+                    request["compliance"], request["metadata"], **extra
+                )
+            else:
+                if result is None:
+                    error_type = "BatchIncomplete"
+                    error = f"No result in batch {batch_id} (status: {status or 'unknown'})"
+                else:
+                    error_type, error = result["error_type"], result["error"]
+                entry = tracker._failure_entry(
+                    request["custom_id"], model, error_type, error, latency_ms,
+                    request["compliance"], request["metadata"], **extra
+                )
+            tracker.log_interaction(entry)
+            entries.append(entry)
+
+        os.remove(manifest_path)
+        return entries
+
+    def run(self, poll_interval: float = 60.0, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Submit the queue, wait for the batch and reconcile it."""
+        batch_id = self.submit()
+        status = self.wait(batch_id, poll_interval=poll_interval, timeout=timeout)
+        return self.reconcile(batch_id, status)
@@ -0,0 +1,333 @@
+import json
+import os
+import struct
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from inferenceiq.index import timestamp_to_micros
+from inferenceiq.query import LogQuery
+
+MAGIC = b"IQB1"
+BINARY_EXTENSION = ".iqb"
+_HEADER_LEN = struct.Struct("<I")
+_MISSING = object()
+_EPOCH = datetime(1970, 1, 1)
+_NULL_TS = np.iinfo(np.int64).min
+
+
+def is_binary_log(path: str) -> bool:
+    """True if the file starts with the compact binary segment magic."""
+    if not os.path.exists(path):
+        return path.endswith(BINARY_EXTENSION)
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _micros_to_iso(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _parse_timestamps(present: List[Any]) -> Optional[np.ndarray]:
+    """Vectorized ISO parse, only for strings that ``isoformat()`` reproduces."""
+    if not all(
+        type(v) is str and len(v) in (19, 26) and v[10] == "T" and not v.endswith(".000000")
+        for v in present
+    ):
+        return None
+    try:
+        return np.array(present, dtype="datetime64[us]")
+    except ValueError:
+        return None
+
+
+def _column_kind(name: str, present: List[Any]) -> str:
+    types = set(map(type, present))
+    if not types:
+        return "json"
+    if types == {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        if name == "timestamp":
+            return "ts"
+        # Low-cardinality strings (model, agent, outcome...) use a dictionary
+        if len(set(present)) <= max(16, len(present) // 4):
+            return "dict"
+        return "str"
+    if types == {list} and set(map(type, (t for v in present for t in v))) <= {str}:
+        return "tags"
+    return "json"
+
+
+def _encode_strings(strings: List[str]) -> List[bytes]:
+    joined = "".join(strings)
+    if joined.isascii():
+        blob = joined.encode("ascii")
+        lengths = np.fromiter(map(len, strings), dtype="<i8", count=len(strings))
+    else:
+        encoded = [s.encode("utf-8") for s in strings]
+        blob = b"".join(encoded)
+        lengths = np.fromiter(map(len, encoded), dtype="<i8", count=len(encoded))
+    offsets = np.zeros(len(strings) + 1, dtype="<i8")
+    np.cumsum(lengths, out=offsets[1:])
+    return [offsets.tobytes(), blob]
+
+
+def _encode_column(name: str, values: List[Any], valid: np.ndarray) -> Dict[str, Any]:
+    present = values if valid.all() else [v for v, ok in zip(values, valid) if ok]
+    kind = _column_kind(name, present)
+    micros = None
+    if kind == "ts":
+        micros = _parse_timestamps(present)
+        if micros is None:
+            kind = "str" if len(set(present)) > max(16, len(present) // 4) else "dict"
+
+    column: Dict[str, Any] = {"name": name, "kind": kind}
+    parts = [np.packbits(valid).tobytes()]
+
+    if kind in ("int", "float", "ts"):
+        data = np.zeros(len(values), dtype="<f8" if kind == "float" else "<i8")
+        if kind == "ts":
+            data[:] = _NULL_TS
+            data[valid] = micros.astype(np.int64)
+        else:
+            data[valid] = present
+        parts.append(data.tobytes())
+    elif kind == "dict":
+        codes, uniques = pd.factorize(np.array(present, dtype=object))
+        data = np.zeros(len(values), dtype="<u4")
+        data[valid] = codes
+        parts.append(data.tobytes())
+        column["values"] = list(uniques)
+    elif kind == "tags":
+        counts = np.zeros(len(values), dtype="<u4")
+        counts[valid] = np.fromiter(map(len, present), dtype="<u4", count=len(present))
+        flat = [t for v in present for t in v]
+        codes, uniques = pd.factorize(np.array(flat, dtype=object)) if flat else ([], [])
+        parts.append(counts.tobytes())
+        parts.append(np.asarray(codes, dtype="<u4").tobytes())
+        column["values"] = list(uniques)
+    else:
+        if kind == "json":
+            strings = [json.dumps(v) if ok else "" for v, ok in zip(values, valid)]
+        elif valid.all():
+            strings = values
+        else:
+            strings = [v if ok else "" for v, ok in zip(values, valid)]
+        parts.extend(_encode_strings(strings))
+
+    column["sizes"] = [len(p) for p in parts]
+    column["_parts"] = parts
+    return column
+
+
+def encode_segment(entries: List[Dict[str, Any]]) -> bytes:
+    """Encode log entries as one self-describing columnar segment."""
+    counts = Counter(chain.from_iterable(entries))
+
+    columns = []
+    n = len(entries)
+    for name, count in counts.items():
+        if count == n:
+            values = [entry[name] for entry in entries]
+            valid = np.ones(n, dtype=bool)
+        else:
+            values = [entry.get(name, _MISSING) for entry in entries]
+            valid = np.fromiter((v is not _MISSING for v in values), dtype=bool, count=n)
+        columns.append(_encode_column(name, values, valid))
+
+    payload = []
+    for column in columns:
+        payload.extend(column.pop("_parts"))
+    header = json.dumps({"rows": n, "columns": columns}).encode()
+    return b"".join([MAGIC, _HEADER_LEN.pack(len(header)), header] + payload)
+
+
+def write_segment(f: BinaryIO, entries: List[Dict[str, Any]]) -> int:
+    """Append one segment to an open binary file. Returns bytes written."""
+    data = encode_segment(entries)
+    f.write(data)
+    return len(data)
+
+
+class _Segment:
+    """Decoded column buffers of one segment."""
+
+    def __init__(self, header: Dict[str, Any], payload: memoryview):
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+        self.buffers: Dict[str, List[memoryview]] = {}
+        offset = 0
+        for column in self.columns:
+            parts = []
+            for size in column["sizes"]:
+                parts.append(payload[offset:offset + size])
+                offset += size
+            self.buffers[column["name"]] = parts
+
+    def valid(self, name: str) -> np.ndarray:
+        bits = np.frombuffer(self.buffers[name][0], dtype=np.uint8)
+        return np.unpackbits(bits, count=self.rows).astype(bool)
+
+    def timestamps(self) -> Optional[np.ndarray]:
+        for column in self.columns:
+            if column["name"] == "timestamp" and column["kind"] == "ts":
+                return np.frombuffer(self.buffers["timestamp"][1], dtype="<i8")
+        return None
+
+    def decode(self, column: Dict[str, Any], rows: np.ndarray) -> np.ndarray:
+        """Values for the selected rows as an object/float array (None = missing)."""
+        name, kind = column["name"], column["kind"]
+        parts = self.buffers[name]
+        valid = self.valid(name)[rows]
+
+        if kind == "int":
+            data = np.frombuffer(parts[1], dtype="<i8")[rows]
+            if valid.all():
+                return data
+            return np.where(valid, data.astype(float), np.nan)
+        if kind == "float":
+            return np.where(valid, np.frombuffer(parts[1], dtype="<f8")[rows], np.nan)
+        if kind == "ts":
+            micros = np.frombuffer(parts[1], dtype="<i8")[rows]
+            return np.where(valid, micros, _NULL_TS).astype("datetime64[us]")
+
+        out = np.full(len(rows), None, dtype=object)
+        if kind == "dict":
+            table = np.array(column["values"] + [None], dtype=object)
+            codes = np.frombuffer(parts[1], dtype="<u4")[rows]
+            out[valid] = table[codes[valid]]
+        elif kind == "tags":
+            counts = np.frombuffer(parts[1], dtype="<u4")
+            starts = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+            codes = np.frombuffer(parts[2], dtype="<u4")
+            table = column["values"]
+            for i, row in enumerate(rows.tolist()):
+                if valid[i]:
+                    out[i] = [table[c] for c in codes[starts[row]:starts[row + 1]].tolist()]
+        else:
+            offsets = np.frombuffer(parts[1], dtype="<i8").tolist()
+            blob = bytes(parts[2])
+            # ASCII blobs decode once; byte offsets are then character offsets
+            text = blob.decode("ascii") if blob.isascii() else None
+            for i, row in enumerate(rows.tolist()):
+                if valid[i]:
+                    start, end = offsets[row], offsets[row + 1]
+                    value = text[start:end] if text is not None else blob[start:end].decode("utf-8")
+                    out[i] = json.loads(value) if kind == "json" else value
+        return out
+
+    def values(self, column: Dict[str, Any], rows: np.ndarray) -> List[Any]:
+        """Values for the selected rows as plain Python objects."""
+        kind, parts = column["kind"], self.buffers[column["name"]]
+        if kind in ("int", "ts"):
+            data = np.frombuffer(parts[1], dtype="<i8")[rows].tolist()
+            if kind == "ts":
+                valid = self.valid(column["name"])[rows]
+                data = [_micros_to_iso(m) if ok else None for m, ok in zip(data, valid)]
+            return data
+        if kind == "float":
+            return np.frombuffer(parts[1], dtype="<f8")[rows].tolist()
+        return self.decode(column, rows).tolist()
+
+
+def iter_segments(path: str) -> Iterator[_Segment]:
+    """Stream segments from a binary log one at a time."""
+    with open(path, "rb") as f:
+        while True:
+            magic = f.read(len(MAGIC))
+            if not magic:
+                return
+            if magic != MAGIC:
+                raise ValueError(f"Corrupt binary log segment in {path}")
+            (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(header_len))
+            payload_size = sum(sum(c["sizes"]) for c in header["columns"])
+            yield _Segment(header, memoryview(f.read(payload_size)))
+
+
+def _selected_rows(segment: _Segment, query: Optional[LogQuery]) -> np.ndarray:
+    rows = np.arange(segment.rows)
+    if query is None or not (query.since or query.until):
+        return rows
+    micros = segment.timestamps()
+    if micros is None:
+        return rows
+    keep = np.ones(segment.rows, dtype=bool)
+    if query.since:
+        keep &= micros >= timestamp_to_micros(query.since)
+    if query.until:
+        keep &= micros < timestamp_to_micros(query.until)
+    return rows[keep]
+
+
+def read_frame(path: str, query: Optional[LogQuery] = None) -> pd.DataFrame:
+    """Load a binary log straight into a DataFrame.
+
+    Columns are built from the decoded arrays without materializing
+    per-row dicts. Time filters are evaluated on the timestamp column before
+    any other column is decoded.
+    """
+    frames = []
+    for segment in iter_segments(path):
+        rows = _selected_rows(segment, query)
+        if len(rows) == 0:
+            continue
+        frames.append(pd.DataFrame({
+            column["name"]: segment.decode(column, rows) for column in segment.columns
+        }))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if query is not None:
+        df = query.apply(df).reset_index(drop=True)
+    return df
+
+
+def iter_records(path: str, query: Optional[LogQuery] = None) -> Iterator[Dict[str, Any]]:
+    """Stream log entries back as dicts equal to what was written."""
+    for segment in iter_segments(path):
+        rows = _selected_rows(segment, query)
+        decoded = [
+            (column["name"], segment.values(column, rows), segment.valid(column["name"])[rows])
+            for column in segment.columns
+        ]
+        for i in range(len(rows)):
+            entry = {name: values[i] for name, values, valid in decoded if valid[i]}
+            if query is None or query.matches(entry):
+                yield entry
+
+
+def jsonl_to_binary(src: str, dst: str, batch_size: int = 65536) -> int:
+    """Convert a JSONL log to the binary format. Returns records written."""
+    count = 0
+    with open(src, "r") as fin, open(dst, "wb") as fout:
+        batch = []
+        for line in fin:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                write_segment(fout, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            write_segment(fout, batch)
+            count += len(batch)
+    return count
+
+
+def binary_to_jsonl(src: str, dst: str) -> int:
+    """Convert a binary log back to JSONL. Returns records written."""
+    count = 0
+    with open(dst, "w") as fout:
+        for entry in iter_records(src):
+            fout.write(json.dumps(entry) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+import shutil
+import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from inferenceiq import binlog
+from inferenceiq.hedging import CANCELLED
+from inferenceiq.query import LogQuery
+from inferenceiq.retention import load_rollups, raw_query
+from inferenceiq.sampling import SAMPLED_OUT
+
+FORMATS = ("csv", "json")
+LINE_FIELDS = ("calls", "cost_inr", "tokens_in", "tokens_out", "failed_calls", "failure_waste_inr")
+SUMMARY_FILE = "summary.csv"
+STATEMENTS_DIR = "statements"
+# Longest customer id used verbatim in a statement file name
+MAX_NAME_LENGTH = 120
+
+
+def month_query(month: Optional[str]) -> Optional[LogQuery]:
+    """Time range of a ``YYYY-MM`` billing month."""
+    if not month:
+        return None
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return LogQuery(since=start, until=end)
+
+
+def partition_of(customer: str, partitions: int) -> int:
+    """Stable partition of a customer id (the same in every run)."""
+    return zlib.crc32(customer.encode()) % partitions
+
+
+def statement_name(customer: str) -> str:
+    """File-name-safe, collision-free name for a customer's statement."""
+    name = urllib.parse.quote(customer, safe="-_.@")
+    if name.startswith("."):
+        # quote() never emits %2E, so this stays distinct from every other id
+        name = "%2E" + name[1:]
+    if not name or len(name) > MAX_NAME_LENGTH:
+        name = f"{name[:40]}~{zlib.crc32(customer.encode()):08x}{len(customer)}"
+    return name
+
+
+def _iter_records(log_file: str, query: Optional[LogQuery]) -> Iterator[Dict[str, Any]]:
+    if binlog.is_binary_log(log_file):
+        yield from binlog.iter_records(log_file, query)
+        return
+    with open(log_file) as f:
+        for line in f:
+            if not line.strip() or (query is not None and not query.accepts_line(line)):
+                continue
+            entry = json.loads(line)
+            if query is None or query.matches(entry):
+                yield entry
+
+
+def _lines(log_file: str, key: str, query: Optional[LogQuery]) -> Iterator[Tuple[str, str, Tuple[float, ...]]]:
+    """(customer, model, LINE_FIELDS) per billable record or rollup row."""
+    for entry in _iter_records(log_file, raw_query(log_file, query)):
+        customer = entry.get(key)
+        if customer is None or entry.get("record_type") == SAMPLED_OUT:
+            continue
+        weight = entry.get("sample_weight") or 1.0
+        cost = (entry.get("cost_inr") or 0) * weight
+        failed = entry.get("outcome") == "failed"
+        yield str(customer), entry.get("model") or "unknown", (
+            0.0 if entry.get("outcome") == CANCELLED else weight,
+            cost,
+            (entry.get("tokens_in") or 0) * weight,
+            (entry.get("tokens_out") or 0) * weight,
+            weight if failed else 0.0,
+            cost + (entry.get("failed_cost_inr") or 0) * weight if failed else 0.0,
+        )
+    # Compacted history counts when the retention policy kept the key
+    rollups = load_rollups(log_file, query)
+    if rollups.empty or key not in rollups.columns:
+        return
+    for row in rollups[rollups[key].notna()].to_dict("records"):
+        yield str(row[key]), row.get("model") or "unknown", (
+            row["calls"], row["cost_inr"], row["tokens_in"], row["tokens_out"],
+            row["failed_calls"], row["failed_cost_inr"],
+        )
+
+
+class _Spill:
+    """Hash-partitioned spill files with a bounded map-side combiner."""
+
+    def __init__(self, directory: str, partitions: int, combine_limit: int):
+        self.directory = directory
+        self.partitions = partitions
+        self.combine_limit = combine_limit
+        self._totals: Dict[Tuple[str, str], List[float]] = {}
+        self._files = [open(self.path(p), "w", newline="", buffering=1 << 20) for p in range(partitions)]
+        self._writers = [csv.writer(f) for f in self._files]
+
+    def path(self, partition: int) -> str:
+        return os.path.join(self.directory, f"part-{partition:04d}.csv")
+
+    def add(self, customer: str, model: str, values: Tuple[float, ...]):
+        totals = self._totals.get((customer, model))
+        if totals is None:
+            if len(self._totals) >= self.combine_limit:
+                self.flush()
+            self._totals[(customer, model)] = list(values)
+            return
+        for i, value in enumerate(values):
+            totals[i] += value
+
+    def flush(self):
+        for (customer, model), totals in self._totals.items():
+            self._writers[partition_of(customer, self.partitions)].writerow([customer, model, *totals])
+        self._totals = {}
+
+    def close(self):
+        self.flush()
+        for f in self._files:
+            f.close()
+
+
+def _write_statement(path: str, fmt: str, key: str, customer: str, period: Optional[str],
+                     models: np.ndarray, lines: np.ndarray, total: np.ndarray):
+    if fmt == "json":
+        statement = {key: customer, "period": period, "currency": "INR",
+                     **_amounts(total), "lines": [{"model": m, **_amounts(v)} for m, v in zip(models, lines)]}
+        with open(path, "w") as f:
+            json.dump(statement, f, indent=2)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["model", *LINE_FIELDS])
+        for model, values in zip(models, lines):
+            writer.writerow([model, *_amounts(values).values()])
+        writer.writerow(["TOTAL", *_amounts(total).values()])
+
+
+def _amounts(values: np.ndarray) -> Dict[str, Any]:
+    return {
+        field: round(float(value), 4) if field in ("cost_inr", "failure_waste_inr") else int(round(value))
+        for field, value in zip(LINE_FIELDS, values)
+    }
+
+
+def _reduce_partition(spill_path: str, output_dir: str, key: str, fmt: str, period: Optional[str],
+                      shard: str) -> Tuple[str, int]:
+    """Aggregate one spill partition and write its statements and summary rows."""
+    summary_path = f"{spill_path}.summary"
+    if not os.path.getsize(spill_path):
+        open(summary_path, "w").close()
+        return summary_path, 0
+    frame = pd.read_csv(spill_path, header=None, names=["customer", "model", *LINE_FIELDS],
+                        dtype={"customer": str, "model": str}, keep_default_na=False)
+    grouped = frame.groupby(["customer", "model"], sort=True)[list(LINE_FIELDS)].sum()
+    customers = grouped.index.get_level_values(0).to_numpy()
+    models = grouped.index.get_level_values(1).to_numpy()
+    values = grouped.to_numpy(dtype=float)
+    # Rows are sorted by customer: each customer is one contiguous block
+    starts = np.flatnonzero(np.r_[True, customers[1:] != customers[:-1]])
+    ends = np.r_[starts[1:], len(customers)]
+
+    directory = os.path.join(output_dir, STATEMENTS_DIR, shard)
+    os.makedirs(directory, exist_ok=True)
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for start, end in zip(starts, ends):
+            customer = customers[start]
+            total = values[start:end].sum(axis=0)
+            relative = os.path.join(STATEMENTS_DIR, shard, f"{statement_name(customer)}.{fmt}")
+            _write_statement(os.path.join(output_dir, relative), fmt, key, customer, period,
+                             models[start:end], values[start:end], total)
+            writer.writerow([customer, *_amounts(total).values(), relative])
+    return summary_path, len(starts)
+
+
+def export_chargeback(log_file: str, output_dir: str, key: str = "customer_id", month: Optional[str] = None,
+                      fmt: str = "csv", partitions: int = 64, workers: int = 4,
+                      combine_limit: int = 200_000) -> Dict[str, Any]:
+    """Write one statement per customer (``key`` value) from a single pass over the log.
+
+    Records are streamed once and hash-partitioned by customer into spill
+    files under ``output_dir``, combining repeated (customer, model) pairs
+    in a dict of at most ``combine_limit`` entries first. ``workers``
+    threads then reduce the partitions independently, so memory is bounded
+    by the combiner and the largest partition however many customers
+    there are. Each statement has per-model lines and a total (calls,
+    cost, tokens, failed calls and failure waste) and lives at
+    ``statements/<partition>/<customer>.<fmt>``; ``summary.csv`` lists
+    every customer's total and statement path.
+
+    Sampled records count ``sample_weight`` times (sampled-out totals have
+    no customer), cancelled hedge attempts cost money but are not calls,
+    and compacted history is included only where the retention rollups
+    kept ``key`` (rollups hold unweighted totals, as in
+    ``AnalyticsEngine.get_cost_attribution``).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported statement format: {fmt}")
+    if partitions < 1 or workers < 1:
+        raise ValueError("partitions and workers must be at least 1")
+    query = month_query(month)
+    spill_dir = os.path.join(output_dir, ".spill")
+    os.makedirs(spill_dir, exist_ok=True)
+    shutil.rmtree(os.path.join(output_dir, STATEMENTS_DIR), ignore_errors=True)
+
+    spill = _Spill(spill_dir, partitions, combine_limit)
+    records = 0
+    try:
+        for customer, model, values in _lines(log_file, key, query):
+            spill.add(customer, model, values)
+            records += 1
+    finally:
+        spill.close()
+
+    width = len(str(partitions - 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inferenceiq-chargeback") as pool:
+        results = list(pool.map(
+            lambda p: _reduce_partition(spill.path(p), output_dir, key, fmt, month, f"{p:0{width}d}"),
+            range(partitions),
+        ))
+
+    summary = os.path.join(output_dir, SUMMARY_FILE)
+    tmp_path = f"{summary}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as out:
+        csv.writer(out).writerow([key, *LINE_FIELDS, "statement"])
+        for summary_path, _ in results:
+            with open(summary_path, newline="") as part:
+                shutil.copyfileobj(part, out)
+    os.replace(tmp_path, summary)
+    shutil.rmtree(spill_dir)
+    return {"records": records, "customers": sum(count for _, count in results),
+            "summary": summary, "statements": os.path.join(output_dir, STATEMENTS_DIR)}
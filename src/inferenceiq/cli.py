@@ -1,10 +1,304 @@
 import argparse
+import asyncio
+import json
 import sys
 import os
-from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.sql import BACKENDS, create_engine
 from inferenceiq.dashboard import DashboardGenerator
+from inferenceiq.query import LogQuery
+from inferenceiq.index import LogIndex
+from inferenceiq.infra import InfraCostEngine, InfraPricing
+from inferenceiq.anomaly import CostAnomalyDetector
+from inferenceiq.collector import CollectorServer
+from inferenceiq.retention import RetentionPolicy
+from inferenceiq.chargeback import FORMATS, export_chargeback
+from inferenceiq import binlog
+
+def audit_main(argv):
+    """Fetch logged interactions for audit requests via the sidecar index."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq audit",
+        description="Look up logged interactions for audit requests (RBI Rec 22/23)"
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="genai_costs.jsonl",
+        help="Path to the JSONL log file (default: genai_costs.jsonl)"
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    get_parser = subparsers.add_parser("get", help="Fetch an interaction by interaction_id")
+    get_parser.add_argument("interaction_id")
+    session_parser = subparsers.add_parser("session", help="Fetch every call of a session_id")
+    session_parser.add_argument("session_id")
+    subparsers.add_parser("reindex", help="Rebuild the sidecar index from scratch")
+
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Log file '{args.log_file}' not found.")
+        sys.exit(1)
+
+    if args.action == "reindex":
+        index = LogIndex.build(args.log_file)
+        print(f"Indexed {len(index.blocks())} blocks for {args.log_file}.")
+        return
+
+    # Index anything appended without an index so the lookup is complete
+    index = LogIndex(args.log_file)
+    index.refresh()
+
+    if args.action == "get":
+        entries = index.lookup("interaction_id", args.interaction_id)
+    else:
+        entries = index.lookup("session_id", args.session_id)
+
+    if not entries:
+        print("Error: No matching interactions found.", file=sys.stderr)
+        sys.exit(1)
+    for entry in entries:
+        print(json.dumps(entry))
+
+def convert_main(argv):
+    """Convert logs between JSONL and the compact binary format."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq convert",
+        description="Convert between JSONL and compact binary (.iqb) logs"
+    )
+    parser.add_argument("source", help="Input log file (format is auto-detected)")
+    parser.add_argument("destination", help="Output log file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print(f"Error: Log file '{args.source}' not found.")
+        sys.exit(1)
+
+    if binlog.is_binary_log(args.source):
+        count = binlog.binary_to_jsonl(args.source, args.destination)
+        target = "JSONL"
+    else:
+        count = binlog.jsonl_to_binary(args.source, args.destination)
+        target = "binary"
+    print(f"Converted {count} records to {target}: {args.destination}")
+
+def anomalies_main(argv):
+    """Print spend anomalies in a log, optionally following it as it grows."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq anomalies",
+        description="Detect per-agent/model spend spikes (JSON lines on stdout)"
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="genai_costs.jsonl",
+        help="Path to the JSONL log file (default: genai_costs.jsonl)"
+    )
+    parser.add_argument(
+        "--state",
+        type=str,
+        help="Detector state file; resumes from it and is updated, so history is not replayed"
+    )
+    parser.add_argument("--follow", action="store_true", help="Keep watching the log for new records")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between polls with --follow (default: 5)"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Log file '{args.log_file}' not found.")
+        sys.exit(1)
+    if binlog.is_binary_log(args.log_file):
+        print("Error: Anomaly detection reads JSONL logs; convert binary logs first.")
+        sys.exit(1)
+
+    try:
+        if args.state and os.path.exists(args.state):
+            detector = CostAnomalyDetector.load(args.state)
+        else:
+            detector = CostAnomalyDetector()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Could not load detector state: {e}")
+        sys.exit(1)
+
+    if not args.follow:
+        for anomaly in detector.consume(args.log_file):
+            print(json.dumps(anomaly))
+        if args.state:
+            detector.save(args.state)
+        return
+
+    try:
+        for anomaly in detector.follow(args.log_file, args.state, poll_interval=args.interval):
+            print(json.dumps(anomaly), flush=True)
+    except KeyboardInterrupt:
+        if args.state:
+            detector.save(args.state)
+
+def forecast_main(argv):
+    """Write daily spend forecasts and month-end projections as JSON."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq forecast",
+        description="Forecast daily spend per series with prediction intervals (JSON)"
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="genai_costs.jsonl",
+        help="Path to the log file (default: genai_costs.jsonl)"
+    )
+    parser.add_argument("--output", type=str, help="JSON output path (default: stdout)")
+    parser.add_argument("--horizon", type=int, default=30, help="Days to forecast (default: 30)")
+    parser.add_argument(
+        "--by",
+        action="append",
+        help="Series column (repeatable, default: agent and model)"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.9,
+        help="Prediction interval coverage (default: 0.9)"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Log file '{args.log_file}' not found.")
+        sys.exit(1)
+
+    engine = create_engine(args.log_file)
+    engine.load_data()
+    try:
+        forecast = engine.get_spend_forecast(
+            horizon_days=args.horizon, by=tuple(args.by or ("agent", "model")), interval=args.interval
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(forecast, f, indent=2)
+        print(f"Forecast for {len(forecast['month_end'])} series written to {args.output}")
+    else:
+        print(json.dumps(forecast, indent=2))
+
+def collect_main(argv):
+    """Run the collector service that trackers on other nodes send events to."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq collect",
+        description="Receive tracker events over HTTP into date-partitioned JSONL"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="collected",
+        help="Directory for dt=YYYY-MM-DD partitions (default: collected)"
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8787, help="Port to listen on (default: 8787)")
+    parser.add_argument(
+        "--dedup-days",
+        type=int,
+        default=2,
+        help="Newest partitions whose interaction ids are deduplicated (default: 2)"
+    )
+    args = parser.parse_args(argv)
+
+    server = CollectorServer(args.output_dir, host=args.host, port=args.port, dedup_days=args.dedup_days)
+    print(f"Collecting into {args.output_dir} on {args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def compact_main(argv):
+    """Roll up and purge expired raw records of a log."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq compact",
+        description="Apply tiered retention: raw records, then hourly and daily rollups"
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="genai_costs.jsonl",
+        help="Path to the log file (default: genai_costs.jsonl)"
+    )
+    parser.add_argument("--raw-days", type=int, default=7, help="Days of raw records to keep (default: 7)")
+    parser.add_argument(
+        "--hourly-days",
+        type=int,
+        default=90,
+        help="Days of hourly rollups to keep before folding them into daily ones (default: 90)"
+    )
+    parser.add_argument("--daily-days", type=int, help="Days of daily rollups to keep (default: forever)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Log file '{args.log_file}' not found.")
+        sys.exit(1)
+    try:
+        policy = RetentionPolicy(args.raw_days, args.hourly_days, args.daily_days)
+        result = policy.compact(args.log_file)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+def chargeback_main(argv):
+    """Write per-customer cost statements in one streaming pass over a log."""
+    parser = argparse.ArgumentParser(
+        prog="inferenceiq chargeback",
+        description="Per-customer chargeback statements (totals, per-model lines, failure waste)"
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="genai_costs.jsonl",
+        help="Path to the log file (default: genai_costs.jsonl)"
+    )
+    parser.add_argument("--output-dir", type=str, default="chargeback", help="Output directory (default: chargeback)")
+    parser.add_argument("--month", type=str, help="Billing month as YYYY-MM (default: the whole log)")
+    parser.add_argument("--key", type=str, default="customer_id", help="Customer field (default: customer_id)")
+    parser.add_argument("--format", type=str, choices=FORMATS, default="csv", help="Statement format (default: csv)")
+    parser.add_argument("--partitions", type=int, default=64, help="Hash partitions of customers (default: 64)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel statement writers (default: 4)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Log file '{args.log_file}' not found.")
+        sys.exit(1)
+    try:
+        result = export_chargeback(
+            args.log_file, args.output_dir, key=args.key, month=args.month, fmt=args.format,
+            partitions=args.partitions, workers=args.workers,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Statements for {result['customers']} customers written to {result['statements']} "
+          f"(summary: {result['summary']})")
+
+COMMANDS = {
+    "audit": audit_main,
+    "convert": convert_main,
+    "anomalies": anomalies_main,
+    "forecast": forecast_main,
+    "collect": collect_main,
+    "compact": compact_main,
+    "chargeback": chargeback_main,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
 
-def main():
     parser = argparse.ArgumentParser(description="InferenceIQ Dashboard Generator")
     parser.add_argument(
         "--log-file", 
@@ -18,8 +312,42 @@ def main():
         default="dashboard.html", 
         help="Path to the output HTML dashboard (default: dashboard.html)"
     )
-    
-    args = parser.parse_args()
+    parser.add_argument(
+        "--since",
+        type=str,
+        help="Only include calls at or after this time (ISO date/time or relative, e.g. 7d, 12h)"
+    )
+    parser.add_argument(
+        "--until",
+        type=str,
+        help="Only include calls before this time (a bare date includes that whole day)"
+    )
+    parser.add_argument("--agent", action="append", help="Filter by agent name (repeatable)")
+    parser.add_argument("--model", action="append", help="Filter by model (repeatable)")
+    parser.add_argument("--tag", action="append", help="Filter by tag (repeatable)")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="pandas",
+        help="Analytics backend: in-memory pandas (default) or embedded SQL (sqlite, duckdb, auto)"
+    )
+    parser.add_argument(
+        "--infra-snapshots",
+        action="append",
+        help="Kubernetes usage snapshots (metrics-server JSON/JSONL or CSV) to add infra cost per agent (repeatable)"
+    )
+    parser.add_argument(
+        "--infra-rates",
+        type=str,
+        help="JSON file of per node type on_demand/spot CPU and memory rates in INR"
+    )
+    parser.add_argument(
+        "--forecast-days",
+        type=int,
+        help="Add a spend forecast for this many days and month-end projections"
+    )
+
+    args = parser.parse_args(argv)
     
     # Validate input file
     if not os.path.exists(args.log_file):
@@ -28,15 +356,34 @@ def main():
         sys.exit(1)
 
     print(f"Loading data from {args.log_file}...")
-    engine = AnalyticsEngine(log_file=args.log_file)
-    engine.load_data()
+    try:
+        query = LogQuery.from_args(args)
+    except ValueError as e:
+        print(f"Error: Invalid filter: {e}")
+        sys.exit(1)
+    engine = create_engine(args.log_file, backend=args.backend, query=query)
+    if (args.infra_snapshots or args.forecast_days) and args.backend != "pandas":
+        # The infra join and the forecast work on call rows
+        engine.load_data(materialize=True)
+    else:
+        engine.load_data()
     
-    if engine.df.empty:
+    if args.backend == "pandas" and engine.df.empty and engine.rollups.empty:
         print("Warning: No data loaded. Dashboard will be empty.")
 
+    infra_engine = None
+    if args.infra_snapshots:
+        try:
+            pricing = InfraPricing.from_file(args.infra_rates) if args.infra_rates else None
+            infra_engine = InfraCostEngine(args.infra_snapshots, pricing=pricing)
+            infra_engine.load_data()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: Could not load infra snapshots: {e}")
+            sys.exit(1)
+
     print(f"Generating dashboard to {args.output}...")
     try:
-        generator = DashboardGenerator(engine)
+        generator = DashboardGenerator(engine, infra_engine, forecast_days=args.forecast_days)
         generator.generate_report(args.output)
         print("Success! Dashboard ready.")
     except Exception as e:
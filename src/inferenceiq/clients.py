@@ -0,0 +1,189 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from inferenceiq.timing import current_timer
+
+ClientKey = Tuple[str, str, Optional[str], bool]
+
+
+class ClientRegistry:
+    """Process-wide pool of provider SDK clients shared by trackers.
+
+    Clients are keyed by (provider, api_key, base_url, async) so every
+    tracker for the same account borrows one client and therefore one HTTP
+    connection pool, instead of paying a TLS handshake per tracker. Pool
+    limits and keep-alive apply to every client the registry creates.
+
+    Connection reuse is observed through the HTTP transport's trace hooks:
+    every request and every newly opened TCP connection is counted, and the
+    socket of each connection is kept until it closes to tell how many are
+    still open, see :meth:`stats`. The same hooks time the network phases of the
+    call being dispatched (see :class:`~inferenceiq.timing.PhaseTimer`).
+
+    Async clients can only be closed from an event loop: :meth:`close`
+    closes the sync ones and :meth:`aclose` all of them.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._lock = threading.Lock()
+        self._clients: Dict[ClientKey, Any] = {}
+        self._http_clients: Dict[ClientKey, Any] = {}
+        self._counters = {"clients_created": 0, "borrows": 0, "requests": 0, "connections_opened": 0}
+        self._sockets: List[Any] = []
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _trace(self, event: str, info: Dict[str, Any]):
+        timer = current_timer()
+        if timer is not None:
+            timer.on_trace(event)
+        if event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            stream = info.get("return_value")
+            sock = stream.get_extra_info("socket") if stream is not None else None
+            with self._lock:
+                if event == "connection.connect_tcp.complete":
+                    self._counters["connections_opened"] += 1
+                # TLS wraps (and takes over) the TCP socket
+                self._sockets = [s for s in self._sockets if s.fileno() != -1 and s is not sock]
+                if sock is not None:
+                    self._sockets.append(sock)
+
+    async def _async_trace(self, event: str, info: Dict[str, Any]):
+        self._trace(event, info)
+
+    def _on_request(self, request):
+        self._count("requests")
+        timer = current_timer()
+        if timer is not None:
+            timer.on_request()
+        request.extensions["trace"] = self._trace
+
+    async def _on_async_request(self, request):
+        self._on_request(request)
+        request.extensions["trace"] = self._async_trace
+
+    def _build(self, provider: str, api_key: str, base_url: Optional[str], asynchronous: bool):
+        if provider == "openai":
+            import openai as sdk
+            client_cls = sdk.AsyncOpenAI if asynchronous else sdk.OpenAI
+        elif provider == "anthropic":
+            import anthropic as sdk
+            client_cls = sdk.AsyncAnthropic if asynchronous else sdk.Anthropic
+        else:
+            return None, None
+
+        # Use the Limits class of whichever HTTP library this SDK release ships with
+        limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        if asynchronous:
+            http_client = sdk.DefaultAsyncHttpxClient(
+                limits=limits, event_hooks={"request": [self._on_async_request]}
+            )
+        else:
+            http_client = sdk.DefaultHttpxClient(
+                limits=limits, event_hooks={"request": [self._on_request]}
+            )
+
+        kwargs = {"api_key": api_key, "http_client": http_client}
+        if base_url:
+            kwargs["base_url"] = base_url
+        return client_cls(**kwargs), http_client
+
+    def get_client(self, provider: str, api_key: str, base_url: Optional[str] = None,
+                   asynchronous: bool = False):
+        """Borrow the shared client for this account, creating it on first use.
+
+        Returns None for providers without an SDK client.
+        """
+        key = (provider, api_key, base_url, asynchronous)
+        with self._lock:
+            self._counters["borrows"] += 1
+            client = self._clients.get(key)
+            if client is not None or key in self._clients:
+                return client
+            client, http_client = self._build(provider, api_key, base_url, asynchronous)
+            self._clients[key] = client
+            if http_client is not None:
+                self._http_clients[key] = http_client
+                self._counters["clients_created"] += 1
+            return client
+
+    def _open_connections(self) -> int:
+        self._sockets = [sock for sock in self._sockets if sock.fileno() != -1]
+        return len(self._sockets)
+
+    def stats(self) -> Dict[str, Any]:
+        """Client and connection reuse statistics.
+
+        ``reuse_ratio`` is the share of requests served on an already open
+        connection; ``client_reuse_ratio`` the share of tracker borrows that
+        got an existing client.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            open_connections = self._open_connections()
+        requests = counters["requests"]
+        borrows = counters["borrows"]
+        counters.update({
+            "clients": len(self._http_clients),
+            "open_connections": open_connections,
+            "reuse_ratio": round(1 - counters["connections_opened"] / requests, 4) if requests else 0.0,
+            "client_reuse_ratio": round(1 - counters["clients_created"] / borrows, 4) if borrows else 0.0,
+        })
+        return counters
+
+    def _take(self, asynchronous: bool) -> List[Any]:
+        """Forget the sync or async clients; returns their HTTP clients."""
+        with self._lock:
+            keys = [key for key in self._clients if key[3] == asynchronous]
+            for key in keys:
+                del self._clients[key]
+            return [self._http_clients.pop(key) for key in keys if key in self._http_clients]
+
+    def close(self):
+        """Close the pooled connections of the sync clients and forget them.
+
+        Async clients stay registered (and usable) until :meth:`aclose`.
+        """
+        for http_client in self._take(asynchronous=False):
+            http_client.close()
+
+    async def aclose(self):
+        """Close every pooled connection, async clients included, and forget the clients."""
+        self.close()
+        for http_client in self._take(asynchronous=True):
+            await http_client.aclose()
+
+
+_default_registry: Optional[ClientRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_default_registry() -> ClientRegistry:
+    """The registry trackers use unless given their own."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ClientRegistry()
+        return _default_registry
+
+
+def set_default_registry(registry: ClientRegistry) -> ClientRegistry:
+    """Replace the process-wide registry, e.g. to change pool limits.
+
+    Returns the previous registry so callers can close it.
+    """
+    global _default_registry
+    with _default_lock:
+        previous = _default_registry
+        _default_registry = registry
+        return previous
@@ -0,0 +1,413 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from inferenceiq.sampling import SAMPLED_OUT
+
+INGEST_PATH = "/v1/events"
+ROLLUPS_PATH = "/v1/rollups"
+HEALTH_PATH = "/healthz"
+NDJSON = "application/x-ndjson"
+PARTITION_FILE = "events.jsonl"
+SPOOL_SUFFIX = ".ndjson.gz"
+REJECTED_DIR = "rejected"
+# Status codes worth retrying later; other 4xx answers mean the batch itself is bad
+RETRY_STATUSES = (408, 429)
+
+
+def encode_batch(entries: Iterable[Dict[str, Any]]) -> bytes:
+    """Gzip-compressed JSON lines, the collector's wire format."""
+    return gzip.compress(b"".join(json.dumps(entry).encode() + b"\n" for entry in entries))
+
+
+def decode_batch(body: bytes, encoding: Optional[str] = None) -> List[Dict[str, Any]]:
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding not in (None, "", "identity"):
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Every line must be a JSON object")
+    return records
+
+
+def partition_of(record: Dict[str, Any]) -> str:
+    """Storage partition (``dt=YYYY-MM-DD``) of a record, by its timestamp's date."""
+    day = str(record.get("timestamp") or "")[:10]
+    if len(day) == 10 and day[4] == "-" and day[7] == "-" and day.replace("-", "").isdigit():
+        return f"dt={day}"
+    return "dt=unknown"
+
+
+class CollectorSink:
+    """Ships tracker log entries to an ``inferenceiq collect`` service.
+
+    Entries are buffered and sent by a background thread in gzip-compressed
+    JSON-lines batches of up to ``batch_size`` entries, at least every
+    ``flush_interval`` seconds. A batch the collector cannot take right now
+    (connection error, timeout, 5xx, 408/429) is written to ``spool_dir``
+    and resent, oldest first, once the collector answers again; a batch it
+    rejects as malformed is moved to ``spool_dir/rejected`` for inspection.
+    The collector deduplicates by ``interaction_id``, so resending a batch
+    that was in fact received is harmless.
+
+    Sampled-out totals are only written by ``save_logs``, not sent.
+    """
+
+    def __init__(self, url: str, spool_dir: str, batch_size: int = 200, flush_interval: float = 2.0,
+                 timeout: float = 5.0):
+        self.url = url.rstrip("/") + INGEST_PATH
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"sent": 0, "batches_sent": 0, "batches_spooled": 0, "batches_rejected": 0}
+
+    def send(self, entry: Dict[str, Any]):
+        """Queue one log entry (copied, so later changes to it are not sent)."""
+        with self._lock:
+            self._buffer.append(dict(entry))
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inferenceiq-collector-sink",
+                                                daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _spool_files(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(SPOOL_SUFFIX))
+
+    def _spool(self, payload: bytes, directory: Optional[str] = None) -> str:
+        directory = directory or self.spool_dir
+        os.makedirs(directory, exist_ok=True)
+        # Names sort in write order
+        path = os.path.join(directory, f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}{SPOOL_SUFFIX}")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return path
+
+    def _post(self, payload: bytes) -> Optional[bool]:
+        """True when accepted, False to retry later, None when rejected for good."""
+        request = urllib.request.Request(self.url, data=payload, method="POST", headers={
+            "Content-Type": NDJSON, "Content-Encoding": "gzip",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code >= 500 or e.code in RETRY_STATUSES:
+                return False
+            return None
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def _deliver(self, payload: bytes, records: int = 0) -> bool:
+        """Send one batch; quarantine it if rejected. False when the collector is unreachable."""
+        outcome = self._post(payload)
+        if outcome is False:
+            return False
+        with self._lock:
+            if outcome:
+                self._counters["sent"] += records
+                self._counters["batches_sent"] += 1
+            else:
+                self._counters["batches_rejected"] += 1
+        if outcome is None:
+            self._spool(payload, os.path.join(self.spool_dir, REJECTED_DIR))
+        return True
+
+    def flush(self) -> bool:
+        """Send everything buffered and spooled. False if some of it is still spooled."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if batch:
+                payload = encode_batch(batch)
+                # Keep order: spooled batches go first
+                if self._spool_files() or not self._deliver(payload, len(batch)):
+                    self._spool(payload)
+                    with self._lock:
+                        self._counters["batches_spooled"] += 1
+            for name in self._spool_files():
+                path = os.path.join(self.spool_dir, name)
+                with open(path, "rb") as f:
+                    payload = f.read()
+                if not self._deliver(payload, len(gzip.decompress(payload).splitlines())):
+                    return False
+                os.remove(path)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["buffered"] = len(self._buffer)
+        counters["spooled_batches"] = len(self._spool_files())
+        return counters
+
+    def close(self):
+        """Stop the background thread after a final flush."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+class CollectorServer:
+    """The ``inferenceiq collect`` service: receives tracker batches over HTTP.
+
+    Requests are served concurrently on one asyncio event loop:
+
+    * ``POST /v1/events`` - gzip or plain JSON lines. Records whose
+      ``interaction_id`` was already stored are dropped; the rest are
+      appended to ``<output_dir>/dt=YYYY-MM-DD/events.jsonl`` by timestamp
+      date. Answers ``{"accepted": n, "duplicates": n}``.
+    * ``GET /v1/rollups`` - live calls, failures, tokens and cost per day,
+      agent and model (weighted by ``sample_weight``).
+    * ``GET /healthz``.
+
+    Ids are remembered for the newest ``dedup_days`` partitions, which
+    covers retries from tracker spools. On start the existing partitions
+    are scanned once to rebuild the rollups and the id window.
+    """
+
+    def __init__(self, output_dir: str, host: str = "127.0.0.1", port: int = 8787,
+                 dedup_days: int = 2, max_body_bytes: int = 32 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.host = host
+        self.port = port
+        self.dedup_days = dedup_days
+        self.max_body_bytes = max_body_bytes
+        self._seen: Dict[str, Set[str]] = {}
+        self._rollups: Dict[Tuple[str, str, str], List[float]] = {}
+        self._counters = {"requests": 0, "accepted": 0, "duplicates": 0}
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- State -------------------------------------------------------------
+
+    def _partitions(self) -> List[str]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(name for name in os.listdir(self.output_dir) if name.startswith("dt="))
+
+    def _recover(self):
+        """Rebuild rollups and the dedup window from stored partitions."""
+        recent = set(p for p in self._partitions() if p != "dt=unknown")
+        recent = set(sorted(recent)[-self.dedup_days:]) if self.dedup_days > 0 else set()
+        for partition in self._partitions():
+            path = os.path.join(self.output_dir, partition, PARTITION_FILE)
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            self._roll_up(records)
+            if partition in recent:
+                self._seen.setdefault(partition, set()).update(
+                    str(r["interaction_id"]) for r in records if r.get("interaction_id"))
+
+    def _roll_up(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            key = (partition_of(record)[3:], str(record.get("agent") or "unknown"),
+                   str(record.get("model") or "unknown"))
+            totals = self._rollups.setdefault(key, [0.0] * 5)
+            if record.get("record_type") == SAMPLED_OUT:
+                weight, calls = 1.0, float(record.get("calls") or 0)
+            else:
+                weight = float(record.get("sample_weight") or 1.0)
+                calls = weight
+            totals[0] += calls
+            totals[1] += weight if record.get("outcome") == "failed" else 0.0
+            totals[2] += (record.get("tokens_in") or 0) * weight
+            totals[3] += (record.get("tokens_out") or 0) * weight
+            totals[4] += (record.get("cost_inr") or 0) * weight
+
+    def rollups(self) -> List[Dict[str, Any]]:
+        """Totals per day, agent and model, most expensive first."""
+        results = [{
+            "date": day, "agent": agent, "model": model,
+            "calls": round(v[0], 4), "failed_calls": round(v[1], 4),
+            "tokens_in": round(v[2]), "tokens_out": round(v[3]), "cost_inr": round(v[4], 4),
+        } for (day, agent, model), v in self._rollups.items()]
+        results.sort(key=lambda r: r["cost_inr"], reverse=True)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+    def _claim(self, records: List[Dict[str, Any]]) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Tuple[str, str]]]:
+        """New records by partition, and the ids they claimed in the dedup window."""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        claimed = []
+        for record in records:
+            partition = partition_of(record)
+            interaction_id = record.get("interaction_id")
+            if interaction_id:
+                interaction_id = str(interaction_id)
+                if any(interaction_id in ids for ids in self._seen.values()):
+                    continue
+                self._seen.setdefault(partition, set()).add(interaction_id)
+                claimed.append((partition, interaction_id))
+            groups.setdefault(partition, []).append(record)
+        # Forget ids from partitions that fell out of the window
+        dated = sorted(p for p in self._seen if p != "dt=unknown")
+        for partition in dated[:-self.dedup_days] if self.dedup_days > 0 else dated:
+            del self._seen[partition]
+        return groups, claimed
+
+    def _write(self, groups: Dict[str, List[Dict[str, Any]]]):
+        for partition, records in groups.items():
+            directory = os.path.join(self.output_dir, partition)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, PARTITION_FILE), "ab") as f:
+                f.write(b"".join(json.dumps(record).encode() + b"\n" for record in records))
+
+    async def ingest(self, records: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Deduplicate, store and roll up one batch."""
+        groups, claimed = self._claim(records)
+        accepted = sum(len(batch) for batch in groups.values())
+        if groups:
+            try:
+                async with self._write_lock:
+                    await asyncio.to_thread(self._write, groups)
+            except BaseException:
+                for partition, interaction_id in claimed:
+                    self._seen.get(partition, set()).discard(interaction_id)
+                raise
+            for batch in groups.values():
+                self._roll_up(batch)
+        self._counters["accepted"] += accepted
+        self._counters["duplicates"] += len(records) - accepted
+        return {"accepted": accepted, "duplicates": len(records) - accepted}
+
+    # -- HTTP --------------------------------------------------------------
+
+    async def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        path = path.split("?")[0]
+        if path == INGEST_PATH:
+            if method != "POST":
+                return 405, {"error": "method not allowed"}
+            try:
+                records = decode_batch(body, headers.get("content-encoding"))
+            except (ValueError, OSError, EOFError) as e:
+                return 400, {"error": str(e)}
+            try:
+                return 200, await self.ingest(records)
+            except OSError as e:
+                return 503, {"error": str(e)}
+        if path == ROLLUPS_PATH and method == "GET":
+            return 200, self.rollups()
+        if path == HEALTH_PATH and method == "GET":
+            return 200, {"status": "ok", **self.stats()}
+        return 404, {"error": "not found"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if length > self.max_body_bytes:
+                    status, payload, keep_alive = 413, {"error": "batch too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    self._counters["requests"] += 1
+                    status, payload = await self._route(method, path, headers, body)
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> asyncio.AbstractServer:
+        """Recover stored state and start listening (``port=0`` picks a free port)."""
+        await asyncio.to_thread(self._recover)
+        self._write_lock = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self) -> "CollectorServer":
+        """Run the service on a background event loop (for embedding and tests)."""
+        started = threading.Event()
+        errors: Deque[BaseException] = deque()
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except BaseException as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=_run, name="inferenceiq-collector", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        """Stop a service started with :meth:`start_in_thread`."""
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
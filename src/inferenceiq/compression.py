@@ -0,0 +1,108 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from inferenceiq.tokens import MESSAGE_OVERHEAD, REPLY_OVERHEAD, TokenEstimator, exchanges, message_text
+
+TRUNCATION_MARKER = " …[truncated]"
+SUMMARY_PREFIX = "Summary of earlier conversation: "
+SUMMARY_ACK = "Understood, continuing from that summary."
+
+
+class ContextCompressor:
+    """History compression stage run on ``messages`` before dispatch.
+
+    In order, it:
+
+    1. drops repeated system prompts (identical content seen earlier),
+    2. compresses non-system turns older than the last ``keep_last`` - either
+       into one summary via ``summarizer(old_messages) -> str`` or, without
+       a summarizer, by truncating each to ``truncate_chars``. The summary
+       is sent as a user turn (answered by a short assistant turn when the
+       kept history starts with a user turn), since the Anthropic Messages
+       API rejects system messages there and OpenAI would read one as an
+       instruction rather than history,
+    3. drops the oldest user/assistant exchanges (see
+       :func:`~inferenceiq.tokens.exchanges`; the summary and its answer are
+       one) until the context fits ``max_context_tokens``. The latest
+       exchange is always kept.
+
+    ``keep_last`` must be at least 1 so the latest message is never
+    summarized away; ``None`` disables step 2.
+
+    Each message is tokenized once, so the stage is linear in message size.
+    """
+
+    def __init__(self, keep_last: Optional[int] = 6, truncate_chars: int = 200,
+                 max_context_tokens: Optional[int] = None,
+                 summarizer: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+                 estimator: Optional[TokenEstimator] = None):
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1 (or None to keep every turn)")
+        self.keep_last = keep_last
+        self.truncate_chars = truncate_chars
+        self.max_context_tokens = max_context_tokens
+        self.summarizer = summarizer
+        self.estimator = estimator or TokenEstimator()
+
+    def _count(self, message: Dict[str, Any], model: Optional[str]) -> int:
+        return MESSAGE_OVERHEAD + self.estimator.count_text(message_text(message), model)
+
+    def _truncate(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        content = message.get("content")
+        if not isinstance(content, str) or len(content) <= self.truncate_chars:
+            return message
+        return {**message, "content": content[:self.truncate_chars] + TRUNCATION_MARKER}
+
+    def compress(self, messages: List[Dict[str, Any]],
+                 model: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Return the compressed messages and before/after token counts."""
+        counts = [self._count(m, model) for m in messages]
+        tokens_before = REPLY_OVERHEAD + sum(counts)
+
+        # 1. Deduplicate system prompts
+        seen = set()
+        kept: List[Tuple[Dict[str, Any], int]] = []
+        for message, count in zip(messages, counts):
+            if message.get("role") == "system":
+                key = message_text(message)
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append((message, count))
+
+        # 2. Summarize or truncate turns older than the last keep_last
+        turns = [i for i, (m, _) in enumerate(kept) if m.get("role") != "system"]
+        if self.keep_last is not None and len(turns) > self.keep_last:
+            old = set(turns[:len(turns) - self.keep_last])
+            if self.summarizer is not None:
+                summary = [{"role": "user", "content": SUMMARY_PREFIX
+                            + self.summarizer([kept[i][0] for i in sorted(old)])}]
+                # Keep user and assistant turns alternating
+                if kept[turns[-self.keep_last]][0].get("role") == "user":
+                    summary.append({"role": "assistant", "content": SUMMARY_ACK})
+                first_old = min(old)
+                rebuilt = []
+                for i, item in enumerate(kept):
+                    if i == first_old:
+                        rebuilt.extend((message, self._count(message, model)) for message in summary)
+                    if i not in old:
+                        rebuilt.append(item)
+                kept = rebuilt
+            else:
+                for i in old:
+                    message = self._truncate(kept[i][0])
+                    if message is not kept[i][0]:
+                        kept[i] = (message, self._count(message, model))
+
+        # 3. Cap the total to the token budget, oldest exchanges first
+        total = REPLY_OVERHEAD + sum(count for _, count in kept)
+        if self.max_context_tokens is not None and total > self.max_context_tokens:
+            drop = set()
+            for exchange in exchanges([message for message, _ in kept])[:-1]:
+                if total <= self.max_context_tokens:
+                    break
+                drop.update(exchange)
+                total -= sum(kept[i][1] for i in exchange)
+            kept = [item for i, item in enumerate(kept) if i not in drop]
+
+        compressed = [message for message, _ in kept]
+        return compressed, {"context_tokens_before": tokens_before, "context_tokens_after": total}
@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from .analytics import AnalyticsEngine
+from .infra import InfraCostEngine
 import jinja2
 
 class DashboardGenerator:
@@ -72,6 +73,18 @@ class DashboardGenerator:
                 grid-template-columns: 1fr 1fr;
                 gap: 20px;
             }
+            table {
+                width: 100%;
+                border-collapse: collapse;
+            }
+            th, td {
+                padding: 8px 12px;
+                border-bottom: 1px solid #334155;
+                text-align: right;
+            }
+            th:first-child, td:first-child {
+                text-align: left;
+            }
             @media (max-width: 768px) {
                 .charts-grid, .stats-grid {
                     grid-template-columns: 1fr;
@@ -119,13 +132,59 @@ class DashboardGenerator:
                     <div>{{ plot_daily_trend | safe }}</div>
                 </div>
             </div>
+
+            {% if forecast %}
+            <div class="charts-grid" style="margin-top: 20px;">
+                <div class="card">
+                    <div>{{ plot_forecast | safe }}</div>
+                </div>
+                <div class="card">
+                    <h3>Month-End Projection ({{ forecast.total.month_end.month }})</h3>
+                    <table>
+                        <tr><th>Series</th><th>To Date</th><th>Projected</th><th>{{ "%d"|format(forecast.interval * 100) }}% Range</th></tr>
+                        {% for row in [forecast.total.month_end] + forecast.month_end[:10] %}
+                        <tr>
+                            <td>{% for name in forecast.by %}{{ row[name] }}{% if not loop.last %} / {% endif %}{% endfor %}</td>
+                            <td>₹{{ "%.2f"|format(row.to_date_inr) }}</td>
+                            <td>₹{{ "%.2f"|format(row.projected_inr) }}</td>
+                            <td>₹{{ "%.2f"|format(row.lower_inr) }} – ₹{{ "%.2f"|format(row.upper_inr) }}</td>
+                        </tr>
+                        {% endfor %}
+                    </table>
+                </div>
+            </div>
+            {% endif %}
+
+            {% if infra_by_agent %}
+            <div class="card" style="margin-top: 20px;">
+                <h3>Infra + API Cost per Agent</h3>
+                <table>
+                    <tr><th>Agent</th><th>Calls</th><th>API</th><th>Infra</th><th>Idle Infra</th><th>Total</th></tr>
+                    {% for row in infra_by_agent %}
+                    <tr>
+                        <td>{{ row.agent }}</td>
+                        <td>{{ "{:,}".format(row.calls) }}</td>
+                        <td>₹{{ "%.2f"|format(row.api_cost_inr) }}</td>
+                        <td>₹{{ "%.2f"|format(row.infra_cost_inr) }}</td>
+                        <td>₹{{ "%.2f"|format(row.idle_infra_cost_inr) }}</td>
+                        <td>₹{{ "%.2f"|format(row.total_cost_inr) }}</td>
+                    </tr>
+                    {% endfor %}
+                </table>
+            </div>
+            {% endif %}
         </div>
     </body>
     </html>
     """
 
-    def __init__(self, analytics_engine: AnalyticsEngine):
+    def __init__(self, analytics_engine: AnalyticsEngine,
+                 infra_engine: Optional[InfraCostEngine] = None,
+                 forecast_days: Optional[int] = None):
         self.engine = analytics_engine
+        self.infra_engine = infra_engine
+        # Days of spend forecast to chart; None leaves the forecast section out
+        self.forecast_days = forecast_days
 
     def _generate_cost_by_model_chart(self) -> str:
         """Generates the HTML div for Cost by Model chart."""
@@ -171,6 +230,38 @@ class DashboardGenerator:
         )
         return fig.to_html(full_html=False, include_plotlyjs=False)
 
+    def _generate_forecast_chart(self, forecast: Dict[str, Any]) -> str:
+        """Generates the HTML div for the total spend forecast with its interval band."""
+        rows = forecast["total"]["daily"]
+        if not rows:
+            return "<div>No Data</div>"
+
+        history = pd.DataFrame(list(self.engine.get_daily_trend().items()), columns=['Date', 'Cost'])
+        history = history.sort_values('Date').tail(60)
+        future = pd.DataFrame(rows)
+        band = f"{forecast['interval']:.0%} interval"
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=future['date'], y=future['upper_inr'], mode='lines',
+                                 line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=future['date'], y=future['lower_inr'], mode='lines',
+                                 line=dict(width=0), fill='tonexty',
+                                 fillcolor='rgba(56, 189, 248, 0.2)', name=band))
+        fig.add_trace(go.Scatter(x=history['Date'], y=history['Cost'], mode='lines+markers',
+                                 line=dict(color='#38bdf8', width=3), name='Actual'))
+        fig.add_trace(go.Scatter(x=future['date'], y=future['forecast_inr'], mode='lines',
+                                 line=dict(color='#f59e0b', width=3, dash='dash'), name='Forecast'))
+        fig.update_layout(
+            title='Daily Spend Forecast (INR)',
+            template='plotly_dark',
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font={'color': '#f2f5fa'},
+            xaxis=dict(showgrid=True, gridcolor='#334155'),
+            yaxis=dict(showgrid=True, gridcolor='#334155')
+        )
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
     def generate_report(self, output_path: str = "dashboard.html"):
         """Generates the full HTML report and saves it."""
         # Ensure data is loaded
@@ -192,6 +283,21 @@ class DashboardGenerator:
         potential_savings = cache_stats.get('potential_savings', 0.0)
         duplicate_count = cache_stats.get('duplicate_count', 0)
 
+        infra_by_agent = []
+        if self.infra_engine is not None:
+            if self.infra_engine.usage.empty:
+                self.infra_engine.load_data()
+            infra_by_agent = self.infra_engine.get_cost_by_agent(self.engine)
+
+        forecast = None
+        plot_forecast = ""
+        if self.forecast_days:
+            forecast = self.engine.get_spend_forecast(horizon_days=self.forecast_days)
+            if forecast["total"]["month_end"] is None:
+                forecast = None
+            else:
+                plot_forecast = self._generate_forecast_chart(forecast)
+
         # Generate Charts
         plot_cost_by_model = self._generate_cost_by_model_chart()
         plot_daily_trend = self._generate_daily_trend_chart()
@@ -207,7 +313,10 @@ class DashboardGenerator:
             duplicate_count=duplicate_count,
             total_tokens=total_tokens,
             plot_cost_by_model=plot_cost_by_model,
-            plot_daily_trend=plot_daily_trend
+            plot_daily_trend=plot_daily_trend,
+            infra_by_agent=infra_by_agent,
+            forecast=forecast,
+            plot_forecast=plot_forecast
         )
 
         # Write to file
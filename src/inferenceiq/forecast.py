@@ -0,0 +1,199 @@
+import calendar
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEASON_DAYS = 7
+# Smoothing grid searched per series: level, trend and seasonal weights
+ALPHAS = (0.1, 0.3, 0.6)
+BETAS = (0.0, 0.05, 0.2)
+GAMMAS = (0.05, 0.3)
+TOTAL_KEY = "all"
+
+
+def daily_spend_matrix(frame: pd.DataFrame, by: Sequence[str] = ("agent", "model")
+                       ) -> Tuple[pd.DatetimeIndex, List[Tuple], np.ndarray]:
+    """Dense day x series matrix of spend (``cost_inr`` times ``sample_weight``).
+
+    Returns the days, the series keys (tuples of ``by`` values) and the
+    matrix; days without spend are 0.
+    """
+    if frame.empty or "timestamp" not in frame.columns or "cost_inr" not in frame.columns:
+        return pd.DatetimeIndex([]), [], np.zeros((0, 0))
+    by = list(by)
+    cost = pd.to_numeric(frame["cost_inr"], errors="coerce").fillna(0.0)
+    if "sample_weight" in frame.columns:
+        cost = cost * pd.to_numeric(frame["sample_weight"], errors="coerce").fillna(1.0)
+    day = pd.to_datetime(frame["timestamp"], format="ISO8601", errors="coerce").dt.normalize()
+    if day.dt.tz is not None:
+        day = day.dt.tz_localize(None)
+    keys = pd.DataFrame({name: frame[name] if name in frame.columns else None for name in by},
+                        index=frame.index).fillna("unknown").astype(str)
+    spend = pd.concat([keys, day.rename("_day"), cost.rename("_spend")], axis=1).dropna(subset=["_day"])
+    if spend.empty:
+        return pd.DatetimeIndex([]), [], np.zeros((0, 0))
+
+    table = spend.groupby(["_day"] + by, sort=True)["_spend"].sum().unstack(by, fill_value=0.0)
+    dates = pd.date_range(table.index.min(), table.index.max(), freq="D")
+    table = table.reindex(dates, fill_value=0.0)
+    series_keys = [key if isinstance(key, tuple) else (key,) for key in table.columns]
+    return dates, series_keys, table.to_numpy(dtype=float)
+
+
+class HoltWinters:
+    """Additive Holt-Winters (level, trend, weekly season) fitted to many series at once.
+
+    ``fit`` runs the smoothing recursion over the day axis of a day x series
+    matrix for every grid combination of smoothing weights together, so
+    the cost is one NumPy pass per day rather than a model per series;
+    each series then keeps the combination with the lowest one-step error.
+    Series start at their first day with spend. With two weekly seasons of
+    history the level, trend and season are initialised from the first
+    week, otherwise from the first day with no trend or season.
+    """
+
+    def __init__(self, season_length: int = SEASON_DAYS, alphas: Sequence[float] = ALPHAS,
+                 betas: Sequence[float] = BETAS, gammas: Sequence[float] = GAMMAS):
+        self.season_length = season_length
+        grid = np.array([(a, b, g) for a in alphas for b in betas for g in gammas], dtype=float)
+        self._alpha, self._beta, self._gamma = grid[:, :1], grid[:, 1:2], grid[:, 2:3]
+
+    def fit(self, values: np.ndarray) -> "HoltWinters":
+        values = np.asarray(values, dtype=float)
+        days, count = values.shape
+        m = self.season_length
+        columns = np.arange(count)
+        spent = values > 0
+        start = np.where(spent.any(axis=0), spent.argmax(axis=0), days - 1)
+
+        full = days - start >= 2 * m
+        window = values[np.minimum(start[:, None] + np.arange(m), days - 1), columns[:, None]]
+        level = np.where(full, window.mean(axis=1), window[:, 0])
+        second = values[np.minimum(start[:, None] + m + np.arange(m), days - 1), columns[:, None]]
+        trend = np.where(full, (second.mean(axis=1) - level) / m, 0.0)
+        season = np.zeros((m, count))
+        season[(start[:, None] + np.arange(m)) % m, columns[:, None]] = np.where(
+            full[:, None], window - level[:, None], 0.0)
+        begin = start + np.where(full, m, 1)
+
+        combos = len(self._alpha)
+        a, b, g = self._alpha, self._beta, self._gamma
+        level = np.repeat(level[None, :], combos, axis=0)
+        trend = np.repeat(trend[None, :], combos, axis=0)
+        season = np.repeat(season[None, :, :], combos, axis=0)
+        sse = np.zeros((combos, count))
+        steps = np.zeros(count)
+        for t in range(int(begin.min()), days):
+            active = t >= begin
+            phase = t % m
+            y = values[t]
+            seasonal = season[:, phase, :]
+            error = y - (level + trend + seasonal)
+            sse += np.where(active, error * error, 0.0)
+            steps += active
+            new_level = a * (y - seasonal) + (1 - a) * (level + trend)
+            trend = np.where(active, b * (new_level - level) + (1 - b) * trend, trend)
+            season[:, phase, :] = np.where(active, g * (y - new_level) + (1 - g) * seasonal, seasonal)
+            level = np.where(active, new_level, level)
+
+        best = np.argmin(sse, axis=0)
+        self.alpha, self.beta, self.gamma = a[best, 0], b[best, 0], g[best, 0]
+        self.level = level[best, columns]
+        self.trend = trend[best, columns]
+        self.season = season[best, :, columns].T
+        self.days = days
+        # Residual scale; series too short for one-step errors use their own spread
+        observed = np.where(np.arange(days)[:, None] >= start, values, np.nan)
+        fallback = np.nan_to_num(np.nanstd(observed, axis=0))
+        self.sigma = np.where(steps >= 2, np.sqrt(sse[best, columns] / np.maximum(steps, 1)), fallback)
+        return self
+
+    def _error_weights(self, horizon: int) -> np.ndarray:
+        """c_j = alpha + j*alpha*beta (+ gamma every season), horizon x series."""
+        j = np.arange(1, horizon + 1)[:, None]
+        return self.alpha + j * self.alpha * self.beta + np.where(j % self.season_length == 0, self.gamma, 0.0)
+
+    def forecast(self, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Point forecasts and their standard errors for the next ``horizon`` days."""
+        h = np.arange(1, horizon + 1)[:, None]
+        phase = (self.days - 1 + h[:, 0]) % self.season_length
+        mean = self.level + h * self.trend + self.season[phase]
+        weights = self._error_weights(horizon)
+        variance = 1 + np.vstack([np.zeros((1, len(self.level))), np.cumsum(weights ** 2, axis=0)[:-1]])
+        return mean, self.sigma * np.sqrt(variance)
+
+    def total_std(self, horizon: int) -> np.ndarray:
+        """Standard error of the summed forecast over the next ``horizon`` days."""
+        if horizon == 0:
+            return np.zeros(len(self.level))
+        weights = self._error_weights(horizon)
+        cumulative = np.vstack([np.zeros((1, len(self.level))), np.cumsum(weights, axis=0)[:-1]])
+        return self.sigma * np.sqrt(((1 + cumulative) ** 2).sum(axis=0))
+
+
+def forecast_spend(frame: pd.DataFrame, by: Sequence[str] = ("agent", "model"), horizon_days: int = 30,
+                   interval: float = 0.9) -> Dict[str, Any]:
+    """Daily spend forecasts with prediction intervals, per series and in total.
+
+    Returns a JSON-ready dict: ``daily`` rows (one per series and future
+    day), ``month_end`` rows projecting each series' calendar month total
+    (month to date plus the forecast for its remaining days) and the same
+    for all spend under ``total``. The last logged day counts as complete.
+    Forecasts and lower bounds are clipped at zero.
+    """
+    if not 0 < interval < 1:
+        raise ValueError(f"Forecast interval must be in (0, 1): {interval}")
+    by = list(by)
+    dates, keys, values = daily_spend_matrix(frame, by)
+    result = {"by": by, "interval": interval, "horizon_days": horizon_days,
+              "as_of": None, "daily": [], "month_end": [], "total": {"daily": [], "month_end": None}}
+    if not keys:
+        return result
+
+    # The total is fitted as one more series, so its interval is not a sum of independent ones
+    values = np.column_stack([values, values.sum(axis=1)])
+    last = dates[-1]
+    month_days = calendar.monthrange(last.year, last.month)[1] - last.day
+    horizon = max(horizon_days, month_days)
+    model = HoltWinters().fit(values)
+    mean, std = model.forecast(horizon)
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    lower = np.maximum(mean - z * std, 0.0)
+    upper = np.maximum(mean + z * std, 0.0)
+    mean = np.maximum(mean, 0.0)
+
+    in_month = (dates.year == last.year) & (dates.month == last.month)
+    to_date = values[in_month].sum(axis=0)
+    remaining = mean[:month_days].sum(axis=0)
+    remaining_std = model.total_std(month_days)
+
+    future = pd.date_range(last + pd.Timedelta(days=1), periods=horizon_days, freq="D")
+    labels = [dict(zip(by, key)) for key in keys] + [{name: TOTAL_KEY for name in by}]
+    daily = []
+    month_end = []
+    for s, label in enumerate(labels):
+        rows = [{**label, "date": day.date().isoformat(), "forecast_inr": round(float(mean[h, s]), 4),
+                 "lower_inr": round(float(lower[h, s]), 4), "upper_inr": round(float(upper[h, s]), 4)}
+                for h, day in enumerate(future)]
+        projected = to_date[s] + remaining[s]
+        margin = z * remaining_std[s]
+        projection = {
+            **label,
+            "month": last.strftime("%Y-%m"),
+            "to_date_inr": round(float(to_date[s]), 4),
+            "remaining_days": month_days,
+            "forecast_remaining_inr": round(float(remaining[s]), 4),
+            "projected_inr": round(float(projected), 4),
+            "lower_inr": round(float(to_date[s] + max(remaining[s] - margin, 0.0)), 4),
+            "upper_inr": round(float(projected + margin), 4),
+        }
+        if s < len(keys):
+            daily.extend(rows)
+            month_end.append(projection)
+        else:
+            result["total"] = {"daily": rows, "month_end": projection}
+    month_end.sort(key=lambda r: r["projected_inr"], reverse=True)
+    result.update(as_of=last.date().isoformat(), daily=daily, month_end=month_end)
+    return result
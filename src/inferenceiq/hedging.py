@@ -0,0 +1,63 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+CANCELLED = "cancelled"
+
+Backup = Union[str, Tuple[Any, str]]
+
+
+class HedgePolicy:
+    """When and where ``acall_llm`` fires a backup request.
+
+    ``backups`` maps a primary model to an equivalent backup: a model name
+    on the same tracker, or ``(tracker, model)`` for another provider (give
+    that tracker the same ``agent_name``). The backup is sent once the
+    primary has been outstanding for the ``quantile`` of the latencies
+    observed for that agent and model over the last ``window`` calls; until
+    ``min_samples`` latencies are known ``initial_delay_ms`` is used, and
+    with no initial delay calls are not hedged.
+    """
+
+    def __init__(self, backups: Dict[str, Backup], quantile: float = 0.95, window: int = 500,
+                 min_samples: int = 20, initial_delay_ms: Optional[float] = None,
+                 min_delay_ms: float = 0.0):
+        if not 0 < quantile < 1:
+            raise ValueError(f"Hedge quantile must be in (0, 1): {quantile}")
+        self.backups = dict(backups)
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_delay_ms = initial_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def observe(self, agent: str, model: str, latency_ms: float):
+        """Record the latency of a completed call."""
+        with self._lock:
+            samples = self._latencies.get((agent, model))
+            if samples is None:
+                samples = self._latencies[(agent, model)] = deque(maxlen=self.window)
+            samples.append(latency_ms)
+
+    def delay_ms(self, agent: str, model: str) -> Optional[float]:
+        """How long to wait on the primary before hedging, None to not hedge."""
+        with self._lock:
+            samples = list(self._latencies.get((agent, model), ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay_ms
+        return max(self.min_delay_ms, float(np.quantile(samples, self.quantile)))
+
+    def plan(self, tracker, model: str) -> Optional[Tuple[Any, str, float]]:
+        """``(backup_tracker, backup_model, delay_ms)`` for a call, or None."""
+        backup = self.backups.get(model)
+        if backup is None:
+            return None
+        delay = self.delay_ms(tracker.agent_name, model)
+        if delay is None:
+            return None
+        backup_tracker, backup_model = (tracker, backup) if isinstance(backup, str) else backup
+        return backup_tracker, backup_model, delay
@@ -0,0 +1,324 @@
+import bisect
+import hashlib
+import json
+import os
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Fixed-size records so the last block can be extended in place:
+# start offset, end offset, line count, min/max timestamp (epoch micros)
+BLOCK_RECORD = struct.Struct("<QQIqq")
+BLOCK_DTYPE = np.dtype([("start", "<u8"), ("end", "<u8"), ("lines", "<u4"),
+                        ("min_ts", "<i8"), ("max_ts", "<i8")])
+ID_DTYPE = np.dtype([("key", "<u8"), ("offset", "<u8")])
+
+TS_MIN = -(2 ** 63)
+TS_MAX = 2 ** 63 - 1
+_EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_to_micros(value: Any) -> Optional[int]:
+    """Convert an ISO timestamp to naive epoch microseconds, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except ValueError:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _key_hash(field: str, value: Any) -> int:
+    digest = hashlib.blake2b(f"{field}\0{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class LogIndex:
+    """Sparse sidecar index over an append-only JSONL log.
+
+    Two files live next to the log:
+
+    * ``<log>.blocks`` - one fixed-size record per block of up to
+      ``BLOCK_LINES`` lines with its byte range and min/max timestamp, used to
+      seek straight to a time range.
+    * ``<log>.ids`` - (64-bit key hash, byte offset) pairs for every
+      ``INDEXED_FIELDS`` value, used for point lookups. Hash collisions are
+      resolved by checking the decoded line.
+
+    The pairs are kept as runs sorted by key hash, whose ends (in pairs) are
+    listed in ``<log>.idruns``. Each append writes one sorted run and merges
+    it into the runs before it while they are at most ``MERGE_RATIO`` times
+    its size, so there are O(log n) runs and a lookup is a binary search in
+    each over the memory-mapped file instead of a scan.
+    """
+
+    BLOCK_LINES = 4096
+    INDEXED_FIELDS = ("interaction_id", "session_id")
+    MERGE_RATIO = 2
+
+    def __init__(self, log_file: str):
+        self.log_file = log_file
+        self.blocks_file = log_file + ".blocks"
+        self.ids_file = log_file + ".ids"
+        self.runs_file = log_file + ".idruns"
+
+    # -- Writing -----------------------------------------------------------
+
+    def exists(self) -> bool:
+        return os.path.exists(self.blocks_file) and os.path.exists(self.ids_file)
+
+    def indexed_until(self) -> int:
+        """Byte offset up to which the log is covered by the index."""
+        last_block = self._read_last_block()
+        return last_block[1] if last_block else 0
+
+    def is_current(self) -> bool:
+        """True if every byte of the log is covered by the index."""
+        if not self.exists() or not os.path.exists(self.log_file):
+            return False
+        return self.indexed_until() == os.path.getsize(self.log_file)
+
+    def append(self, records: Iterable[Tuple[int, int, Dict[str, Any]]]):
+        """Index freshly written lines given as (offset, length, entry).
+
+        Any unindexed gap before the first record (lines written without
+        indexing) is scanned first so the index never has holes.
+        """
+        records = list(records)
+        if not records:
+            return
+        if records[0][0] > self.indexed_until():
+            self.refresh(upto=records[0][0])
+
+        # Keep filling the last block if it is short and ends where we start
+        last_block = self._read_last_block()
+        rewrite_last = bool(last_block) and last_block[2] < self.BLOCK_LINES \
+            and last_block[1] == records[0][0]
+        blocks = [list(last_block)] if rewrite_last else []
+        current = blocks[0] if rewrite_last else None
+        ids = []
+
+        for offset, length, entry in records:
+            ts = timestamp_to_micros(entry.get("timestamp"))
+            if current is None:
+                current = [offset, offset, 0, TS_MAX, TS_MIN]
+                blocks.append(current)
+            current[1] = offset + length
+            current[2] += 1
+            if ts is None:
+                current[3], current[4] = TS_MIN, TS_MAX
+            else:
+                current[3] = min(current[3], ts)
+                current[4] = max(current[4], ts)
+            if current[2] >= self.BLOCK_LINES:
+                current = None
+
+            for field in self.INDEXED_FIELDS:
+                value = entry.get(field)
+                if value is not None:
+                    ids.append((_key_hash(field, value), offset))
+
+        self._write_blocks(blocks, rewrite_last)
+        if ids:
+            runs = self._runs()
+            run = np.array(ids, dtype=ID_DTYPE)
+            with open(self.ids_file, "ab") as f:
+                run[np.argsort(run["key"], kind="stable")].tofile(f)
+            runs.append((runs[-1] if runs else 0) + len(run))
+            self._merge_runs(runs)
+        elif not os.path.exists(self.ids_file):
+            open(self.ids_file, "ab").close()
+
+    def _id_count(self) -> int:
+        if not os.path.exists(self.ids_file):
+            return 0
+        return os.path.getsize(self.ids_file) // ID_DTYPE.itemsize
+
+    def _runs(self) -> List[int]:
+        """End of each sorted run in ``.ids``, in pairs.
+
+        Pairs past the last listed run (an append interrupted before the run
+        list was updated) form one more run; an index written before runs
+        existed is sorted once into a single run.
+        """
+        count = self._id_count()
+        if os.path.exists(self.runs_file):
+            runs = [end for end in np.fromfile(self.runs_file, dtype="<u8").tolist() if end <= count]
+        elif count:
+            self._sort_pairs(0, count)
+            runs = []
+        else:
+            return []
+        if count > (runs[-1] if runs else 0):
+            runs.append(count)
+        return runs
+
+    def _sort_pairs(self, start: int, end: int):
+        """Sort pairs ``start:end`` of ``.ids`` by key hash, in place."""
+        pairs = np.fromfile(self.ids_file, dtype=ID_DTYPE, count=end - start,
+                            offset=start * ID_DTYPE.itemsize)
+        with open(self.ids_file, "r+b") as f:
+            f.seek(start * ID_DTYPE.itemsize)
+            pairs[np.argsort(pairs["key"], kind="stable")].tofile(f)
+
+    def _merge_runs(self, runs: List[int]):
+        """Merge trailing runs of similar size, then record the run list atomically."""
+        while len(runs) > 1:
+            start = runs[-3] if len(runs) > 2 else 0
+            if runs[-2] - start > self.MERGE_RATIO * (runs[-1] - runs[-2]):
+                break
+            self._sort_pairs(start, runs[-1])
+            del runs[-2]
+        tmp_path = f"{self.runs_file}.{os.getpid()}.tmp"
+        np.array(runs, dtype="<u8").tofile(tmp_path)
+        os.replace(tmp_path, self.runs_file)
+
+    def _read_last_block(self) -> Optional[tuple]:
+        if not os.path.exists(self.blocks_file):
+            return None
+        count = os.path.getsize(self.blocks_file) // BLOCK_RECORD.size
+        if count == 0:
+            return None
+        with open(self.blocks_file, "rb") as f:
+            f.seek((count - 1) * BLOCK_RECORD.size)
+            return BLOCK_RECORD.unpack(f.read(BLOCK_RECORD.size))
+
+    def _write_blocks(self, blocks: List[list], rewrite_last: bool):
+        if not rewrite_last:
+            with open(self.blocks_file, "ab") as f:
+                for block in blocks:
+                    f.write(BLOCK_RECORD.pack(*block))
+            return
+        count = os.path.getsize(self.blocks_file) // BLOCK_RECORD.size
+        with open(self.blocks_file, "r+b") as f:
+            f.seek((count - 1) * BLOCK_RECORD.size)
+            for block in blocks:
+                f.write(BLOCK_RECORD.pack(*block))
+
+    def refresh(self, upto: Optional[int] = None) -> int:
+        """Index any lines appended since the last update.
+
+        Rebuilds from scratch if the log shrank (e.g. it was rewritten).
+        Returns the number of newly indexed lines.
+        """
+        size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        end = size if upto is None else min(upto, size)
+        start = self.indexed_until()
+        if start > size:
+            self.clear()
+            start = 0
+        if start >= end:
+            if not self.exists() and os.path.exists(self.log_file):
+                open(self.blocks_file, "ab").close()
+                open(self.ids_file, "ab").close()
+            return 0
+
+        records = []
+        with open(self.log_file, "rb") as f:
+            f.seek(start)
+            offset = start
+            while offset < end:
+                line = f.readline()
+                # Stop at a partially written trailing line
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = {}
+                records.append((offset, len(line), entry))
+                offset += len(line)
+        if records:
+            self.append(records)
+        return len(records)
+
+    def clear(self):
+        for path in (self.blocks_file, self.ids_file, self.runs_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def build(cls, log_file: str) -> "LogIndex":
+        """(Re)build the index for an existing log file."""
+        index = cls(log_file)
+        index.clear()
+        index.refresh()
+        return index
+
+    # -- Reading -----------------------------------------------------------
+
+    def blocks(self) -> np.ndarray:
+        """All block records as a structured array."""
+        if not os.path.exists(self.blocks_file):
+            return np.zeros(0, dtype=BLOCK_DTYPE)
+        count = os.path.getsize(self.blocks_file) // BLOCK_RECORD.size
+        return np.fromfile(self.blocks_file, dtype=BLOCK_DTYPE, count=count)
+
+    def byte_ranges(self, since: Optional[str] = None,
+                    until: Optional[str] = None) -> List[Tuple[int, int]]:
+        """Merged byte ranges of blocks that may hold entries in [since, until)."""
+        blocks = self.blocks()
+        mask = np.ones(len(blocks), dtype=bool)
+        since_us = timestamp_to_micros(since)
+        until_us = timestamp_to_micros(until)
+        if since_us is not None:
+            mask &= blocks["max_ts"] >= since_us
+        if until_us is not None:
+            mask &= blocks["min_ts"] < until_us
+
+        ranges: List[Tuple[int, int]] = []
+        for start, end in zip(blocks["start"][mask].tolist(), blocks["end"][mask].tolist()):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def iter_lines(self, since: Optional[str] = None,
+                   until: Optional[str] = None) -> Iterator[str]:
+        """Yield raw lines from the blocks overlapping the time range."""
+        with open(self.log_file, "rb") as f:
+            for start, end in self.byte_ranges(since, until):
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    line = f.readline()
+                    if not line:
+                        break
+                    remaining -= len(line)
+                    yield line.decode("utf-8")
+
+    def lookup(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        """Return every entry whose ``field`` equals ``value``."""
+        if field not in self.INDEXED_FIELDS:
+            raise ValueError(f"Field is not indexed: {field}")
+        runs = self._runs()
+        if not runs:
+            return []
+        pairs = np.memmap(self.ids_file, dtype=ID_DTYPE, mode="r", shape=(runs[-1],))
+        keys = pairs["key"]
+        key = np.uint64(_key_hash(field, value))
+        offsets = set()
+        start = 0
+        for end in runs:
+            lo = bisect.bisect_left(keys, key, start, end)
+            hi = bisect.bisect_right(keys, key, lo, end)
+            offsets.update(pairs["offset"][lo:hi].tolist())
+            start = end
+        del keys, pairs
+
+        results = []
+        with open(self.log_file, "rb") as f:
+            for offset in sorted(offsets):
+                f.seek(offset)
+                try:
+                    entry = json.loads(f.readline())
+                except ValueError:
+                    continue
+                if entry.get(field) == value:
+                    results.append(entry)
+        return results
@@ -0,0 +1,326 @@
+import csv
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# INR per vCPU-hour and per GiB-hour, by node type and capacity type
+DEFAULT_NODE_RATES_INR = {
+    "default": {
+        "on_demand": {"cpu_core_hour": 3.5, "memory_gib_hour": 0.45},
+        "spot": {"cpu_core_hour": 1.2, "memory_gib_hour": 0.15},
+    },
+}
+DEFAULT_AGENT_LABELS = ("inferenceiq.io/agent", "app.kubernetes.io/name", "app")
+NODE_TYPE_LABEL = "node.kubernetes.io/instance-type"
+CAPACITY_TYPE_LABELS = ("karpenter.sh/capacity-type", "eks.amazonaws.com/capacityType",
+                        "cloud.google.com/gke-spot")
+
+SNAPSHOT_COLUMNS = ["timestamp", "namespace", "pod", "agent", "node_type", "capacity_type",
+                    "cpu_cores", "memory_gib", "window_s"]
+
+_CPU_SUFFIXES = {"n": 1e-9, "u": 1e-6, "m": 1e-3}
+_MEMORY_SUFFIXES = {
+    "Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40,
+    "k": 1e3, "K": 1e3, "M": 1e6, "G": 1e9, "T": 1e12,
+}
+_QUANTITY = re.compile(r"^\s*([0-9.]+(?:[eE][-+]?[0-9]+)?)\s*([A-Za-z]*)\s*$")
+
+
+def _split_quantity(value: Any):
+    if isinstance(value, (int, float)):
+        return float(value), ""
+    match = _QUANTITY.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid Kubernetes quantity: {value!r}")
+    return float(match.group(1)), match.group(2)
+
+
+def parse_cpu(value: Any) -> float:
+    """Kubernetes CPU quantity ("250m", "1500000n", "2") in cores."""
+    number, suffix = _split_quantity(value)
+    if suffix and suffix not in _CPU_SUFFIXES:
+        raise ValueError(f"Invalid CPU quantity: {value!r}")
+    return number * _CPU_SUFFIXES.get(suffix, 1.0)
+
+
+def parse_memory(value: Any) -> float:
+    """Kubernetes memory quantity ("512Mi", "1G", bytes) in GiB."""
+    number, suffix = _split_quantity(value)
+    if suffix and suffix not in _MEMORY_SUFFIXES:
+        raise ValueError(f"Invalid memory quantity: {value!r}")
+    return number * _MEMORY_SUFFIXES.get(suffix, 1) / 2 ** 30
+
+
+def _capacity_type(value: Any) -> str:
+    return "spot" if str(value).lower() in ("spot", "true", "preemptible") else "on_demand"
+
+
+def _seconds(window: Any) -> Optional[float]:
+    if window in (None, ""):
+        return None
+    if isinstance(window, (int, float)):
+        return float(window)
+    total, matched = 0.0, False
+    for number, unit in re.findall(r"([0-9.]+)(ms|h|m|s)", str(window)):
+        total += float(number) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+        matched = True
+    return total if matched else float(window)
+
+
+class InfraPricing:
+    """Per node type on-demand and spot rates for CPU and memory.
+
+    ``rates`` maps node type -> capacity type (``on_demand``/``spot``) ->
+    ``{"cpu_core_hour": ..., "memory_gib_hour": ...}`` in INR. Unknown node
+    types use the ``default`` entry.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None):
+        self.rates = rates or DEFAULT_NODE_RATES_INR
+        if "default" not in self.rates:
+            self.rates = {**DEFAULT_NODE_RATES_INR, **self.rates}
+
+    @classmethod
+    def from_file(cls, path: str) -> "InfraPricing":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def rate(self, node_type: Optional[str], capacity_type: str) -> Dict[str, float]:
+        by_capacity = self.rates.get(node_type) or self.rates["default"]
+        rates = by_capacity.get(capacity_type) or by_capacity.get("on_demand")
+        if rates is None:
+            raise ValueError(f"No {capacity_type} rates for node type {node_type!r}")
+        return rates
+
+
+def _first_label(labels: Dict[str, str], names: Iterable[str]) -> Optional[str]:
+    for name in names:
+        if labels.get(name):
+            return labels[name]
+    return None
+
+
+def _pod_metrics_rows(dump: Dict[str, Any], agent_labels) -> List[Dict[str, Any]]:
+    """Rows from a metrics-server ``PodMetricsList`` (``kubectl get --raw``)."""
+    rows = []
+    for item in dump.get("items", []):
+        metadata = item.get("metadata", {})
+        labels = metadata.get("labels") or {}
+        containers = item.get("containers", [])
+        rows.append({
+            "timestamp": item.get("timestamp") or dump.get("timestamp"),
+            "namespace": metadata.get("namespace"),
+            "pod": metadata.get("name"),
+            "agent": _first_label(labels, agent_labels),
+            "node_type": labels.get(NODE_TYPE_LABEL),
+            "capacity_type": _capacity_type(_first_label(labels, CAPACITY_TYPE_LABELS)),
+            "cpu_cores": sum(parse_cpu(c.get("usage", {}).get("cpu", 0)) for c in containers),
+            "memory_gib": sum(parse_memory(c.get("usage", {}).get("memory", 0)) for c in containers),
+            "window_s": _seconds(item.get("window")),
+        })
+    return rows
+
+
+def _csv_rows(path: str) -> List[Dict[str, Any]]:
+    """Rows from an exported CSV (timestamp, pod, agent, cpu, memory, ...)."""
+    rows = []
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            rows.append({
+                "timestamp": record["timestamp"],
+                "namespace": record.get("namespace") or None,
+                "pod": record.get("pod") or None,
+                "agent": record.get("agent") or record.get("workload") or None,
+                "node_type": record.get("node_type") or None,
+                "capacity_type": _capacity_type(record.get("capacity_type")),
+                "cpu_cores": parse_cpu(record["cpu"]),
+                "memory_gib": parse_memory(record["memory"]),
+                "window_s": _seconds(record.get("window")),
+            })
+    return rows
+
+
+def load_snapshots(path: str, agent_labels: Iterable[str] = DEFAULT_AGENT_LABELS) -> pd.DataFrame:
+    """Read resource-usage snapshots into one row per pod and scrape.
+
+    Accepts a metrics-server ``PodMetricsList`` JSON dump, a JSON array of
+    dumps, JSONL with one dump per line (e.g. a cron job appending
+    ``kubectl get --raw /apis/metrics.k8s.io/v1beta1/pods``) or a CSV export
+    with ``timestamp, pod, agent, node_type, capacity_type, cpu, memory``
+    columns. Pods are attributed to agents through the first of
+    ``agent_labels`` they carry.
+    """
+    agent_labels = tuple(agent_labels)
+    if path.endswith(".csv"):
+        rows = _csv_rows(path)
+    else:
+        with open(path) as f:
+            text = f.read()
+        try:
+            dumps = json.loads(text)
+        except json.JSONDecodeError:
+            dumps = [json.loads(line) for line in text.splitlines() if line.strip()]
+        if isinstance(dumps, dict):
+            dumps = [dumps]
+        rows = [row for dump in dumps for row in _pod_metrics_rows(dump, agent_labels)]
+    return pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS)
+
+
+def _naive(timestamps: pd.Series, timezone: Optional[str]) -> pd.Series:
+    """Timestamps as naive wall-clock time, converting offset-aware ones to ``timezone``."""
+    values = pd.to_datetime(timestamps, format="ISO8601")
+    if values.dt.tz is None:
+        return values
+    tz = timezone or datetime.now().astimezone().tzinfo
+    return values.dt.tz_convert(tz).dt.tz_localize(None)
+
+
+class InfraCostEngine:
+    """Prices Kubernetes usage snapshots and joins them to LLM call logs.
+
+    Usage is summed per agent and scrape time, and each scrape is priced
+    over the interval until that agent's next scrape (``default_interval_s``
+    when the next scrape is missing or more than ``max_gap_s`` away). Calls
+    are matched to the interval containing them with a sorted as-of merge
+    per agent, so the join is O((calls + intervals) log n) rather than a
+    cross product. Each interval's cost is split across its calls; intervals
+    without calls are idle cost.
+
+    Snapshot timestamps with an offset (``Z``) are converted to ``timezone``
+    (default: the local zone, which is what the tracker logs in).
+    """
+
+    def __init__(self, snapshot_files, pricing: Optional[InfraPricing] = None,
+                 agent_labels: Iterable[str] = DEFAULT_AGENT_LABELS,
+                 default_interval_s: float = 60.0, max_gap_s: float = 300.0,
+                 timezone: Optional[str] = None):
+        self.snapshot_files = [snapshot_files] if isinstance(snapshot_files, str) else list(snapshot_files)
+        self.pricing = pricing or InfraPricing()
+        self.agent_labels = tuple(agent_labels)
+        self.default_interval_s = default_interval_s
+        self.max_gap_s = max_gap_s
+        self.timezone = timezone
+        self.usage = pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        self._intervals: Optional[pd.DataFrame] = None
+
+    def load_data(self) -> pd.DataFrame:
+        frames = [load_snapshots(path, self.agent_labels) for path in self.snapshot_files]
+        usage = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        usage = usage[usage["agent"].notna() & usage["timestamp"].notna()].reset_index(drop=True)
+        if not usage.empty:
+            usage["timestamp"] = _naive(usage["timestamp"], self.timezone)
+            cpu_rate, memory_rate = [], []
+            for node_type, capacity in zip(usage["node_type"], usage["capacity_type"]):
+                rate = self.pricing.rate(node_type, capacity)
+                cpu_rate.append(rate["cpu_core_hour"])
+                memory_rate.append(rate["memory_gib_hour"])
+            # INR per hour the pod costs at this scrape
+            usage["cost_rate_inr_hour"] = (usage["cpu_cores"] * np.array(cpu_rate)
+                                           + usage["memory_gib"] * np.array(memory_rate))
+        self.usage = usage
+        self._intervals = None
+        return usage
+
+    def get_intervals(self) -> pd.DataFrame:
+        """Priced usage intervals: agent, start, end, cpu_cores, memory_gib, cost_inr."""
+        if self._intervals is not None:
+            return self._intervals
+        columns = ["agent", "start", "end", "cpu_cores", "memory_gib", "cost_inr"]
+        if self.usage.empty:
+            self._intervals = pd.DataFrame(columns=columns)
+            return self._intervals
+
+        scrapes = (self.usage.groupby(["agent", "timestamp"], sort=True)
+                   .agg(cpu_cores=("cpu_cores", "sum"), memory_gib=("memory_gib", "sum"),
+                        cost_rate=("cost_rate_inr_hour", "sum"))
+                   .reset_index())
+        start = scrapes["timestamp"]
+        next_start = scrapes.groupby("agent")["timestamp"].shift(-1)
+        gap = (next_start - start).dt.total_seconds()
+        duration = gap.where(gap.notna() & (gap <= self.max_gap_s), self.default_interval_s)
+
+        self._intervals = pd.DataFrame({
+            "agent": scrapes["agent"],
+            "start": start,
+            "end": start + pd.to_timedelta(duration, unit="s"),
+            "cpu_cores": scrapes["cpu_cores"],
+            "memory_gib": scrapes["memory_gib"],
+            "cost_inr": scrapes["cost_rate"] * duration / 3600,
+        })
+        return self._intervals
+
+    def join_calls(self, calls: pd.DataFrame) -> pd.DataFrame:
+        """Calls with the ``interval`` they ran in and their ``infra_cost_inr`` share.
+
+        Calls are weighted by ``sample_weight`` when present; calls outside
+        every interval get no interval and zero infra cost.
+        """
+        intervals = self.get_intervals()
+        if calls.empty or "agent" not in calls.columns or "timestamp" not in calls.columns:
+            return calls.assign(interval=pd.Series(dtype=float), infra_cost_inr=pd.Series(dtype=float))
+
+        left = pd.DataFrame({
+            "_row": np.arange(len(calls)),
+            "agent": calls["agent"].to_numpy(),
+            "timestamp": _naive(calls["timestamp"], self.timezone).to_numpy(),
+        })
+        left = left[left["agent"].notna() & left["timestamp"].notna()].sort_values("timestamp")
+        right = intervals.reset_index(drop=True).assign(interval=lambda f: np.arange(len(f), dtype=float))
+        right = right[["agent", "start", "end", "interval"]].sort_values("start")
+        right["start"] = right["start"].astype(left["timestamp"].dtype)
+        right["end"] = right["end"].astype(left["timestamp"].dtype)
+
+        matched = pd.merge_asof(left, right, left_on="timestamp", right_on="start",
+                                by="agent", direction="backward")
+        matched.loc[~(matched["timestamp"] < matched["end"]), "interval"] = np.nan
+
+        interval = np.full(len(calls), np.nan)
+        interval[matched["_row"].to_numpy()] = matched["interval"].to_numpy()
+        weights = (pd.to_numeric(calls["sample_weight"], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+                   if "sample_weight" in calls.columns else np.ones(len(calls)))
+        found = ~np.isnan(interval)
+        codes = interval[found].astype(int)
+        per_interval = np.bincount(codes, weights=weights[found], minlength=len(intervals))
+        share = np.zeros(len(calls))
+        costs = intervals["cost_inr"].to_numpy(dtype=float)
+        share[found] = costs[codes] / per_interval[codes]
+        return calls.assign(interval=interval, infra_cost_inr=share)
+
+    def get_cost_by_agent(self, analytics_engine) -> List[Dict[str, Any]]:
+        """Combined API and infra cost per agent, most expensive first.
+
+        API cost comes from the engine's attribution (exact for sampled
+        logs); infra cost is split into what ran alongside calls and idle
+        cost of intervals without any call.
+        """
+        intervals = self.get_intervals()
+        api = {row["agent"]: row for row in analytics_engine.get_cost_attribution("agent")}
+        joined = self.join_calls(analytics_engine.df)
+
+        infra = intervals.groupby("agent")["cost_inr"].sum().to_dict()
+        used = np.zeros(len(intervals), dtype=bool)
+        if "interval" in joined.columns:
+            matched = joined["interval"].dropna().astype(int).unique()
+            used[matched] = True
+        idle = intervals[~used].groupby("agent")["cost_inr"].sum().to_dict()
+
+        results = []
+        for agent in sorted(set(api) | set(infra)):
+            api_cost = api[agent]["cost_inr"] if agent in api else 0.0
+            calls = api[agent]["calls"] if agent in api else 0
+            infra_cost = float(infra.get(agent, 0.0))
+            results.append({
+                "agent": agent,
+                "calls": calls,
+                "api_cost_inr": round(api_cost, 4),
+                "infra_cost_inr": round(infra_cost, 4),
+                "idle_infra_cost_inr": round(float(idle.get(agent, 0.0)), 4),
+                "total_cost_inr": round(api_cost + infra_cost, 4),
+                "infra_cost_per_call_inr": round(infra_cost / calls, 4) if calls else None,
+            })
+        results.sort(key=lambda r: r["total_cost_inr"], reverse=True)
+        return results
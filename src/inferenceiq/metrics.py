@@ -0,0 +1,187 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+LABELS = ("provider", "model", "agent", "outcome")
+DEFAULT_LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Label value used once a label has seen max_label_values distinct values
+OVERFLOW_VALUE = "__other__"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """In-process counters and latency histograms fed by tracker log entries.
+
+    Series are labeled by provider, model, agent and outcome. Each label
+    keeps at most ``max_label_values`` distinct values; later values are
+    folded into ``__other__`` so cardinality (and memory) stays bounded no
+    matter what callers pass in. Per-user fields are never used as labels.
+
+    Metrics are exposed in the Prometheus text format through
+    :meth:`render`, an optional local HTTP ``/metrics`` endpoint
+    (:meth:`serve`) or a node-exporter style textfile (:meth:`write_textfile`).
+    """
+
+    def __init__(self, max_label_values: int = 100,
+                 latency_buckets_ms: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS_MS,
+                 namespace: str = "inferenceiq"):
+        self.max_label_values = max_label_values
+        self.latency_buckets_ms = tuple(sorted(latency_buckets_ms))
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._label_values: Dict[str, set] = {label: set() for label in LABELS}
+        # labels -> [calls, tokens_in, tokens_out, tokens_cached, cost_inr, latency_sum, latency_count, *buckets]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def _bounded(self, label: str, value: Any) -> str:
+        value = "unknown" if value is None else str(value)
+        seen = self._label_values[label]
+        if value in seen:
+            return value
+        if len(seen) >= self.max_label_values:
+            return OVERFLOW_VALUE
+        seen.add(value)
+        return value
+
+    def record(self, entry: Dict[str, Any], provider: Optional[str] = None):
+        """Count one log entry."""
+        latency = entry.get("latency_ms")
+        with self._lock:
+            key = (
+                self._bounded("provider", provider),
+                self._bounded("model", entry.get("model")),
+                self._bounded("agent", entry.get("agent")),
+                self._bounded("outcome", entry.get("outcome")),
+            )
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (7 + len(self.latency_buckets_ms))
+            series[0] += 1
+            series[1] += entry.get("tokens_in") or 0
+            series[2] += entry.get("tokens_out") or 0
+            series[3] += entry.get("tokens_cached") or 0
+            series[4] += entry.get("cost_inr") or 0
+            if isinstance(latency, (int, float)):
+                series[5] += latency
+                series[6] += 1
+                # Non-cumulative counts; render() accumulates them per bucket
+                position = bisect.bisect_left(self.latency_buckets_ms, latency)
+                if position < len(self.latency_buckets_ms):
+                    series[7 + position] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {key: list(values) for key, values in self._series.items()}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        series = sorted(self.snapshot().items())
+        ns = self.namespace
+        lines: List[str] = []
+
+        def labels(key, **extra):
+            pairs = list(zip(LABELS, key)) + list(extra.items())
+            return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+        lines += [f"# HELP {ns}_calls_total LLM calls tracked.", f"# TYPE {ns}_calls_total counter"]
+        lines += [f"{ns}_calls_total{labels(key)} {_number(v[0])}" for key, v in series]
+
+        lines += [f"# HELP {ns}_tokens_total Tokens by type (input includes cached).",
+                  f"# TYPE {ns}_tokens_total counter"]
+        for key, v in series:
+            for kind, value in (("input", v[1]), ("output", v[2]), ("cached", v[3])):
+                lines.append(f"{ns}_tokens_total{labels(key, type=kind)} {_number(value)}")
+
+        lines += [f"# HELP {ns}_cost_inr_total Cost in INR.", f"# TYPE {ns}_cost_inr_total counter"]
+        lines += [f"{ns}_cost_inr_total{labels(key)} {_number(round(v[4], 6))}" for key, v in series]
+
+        lines += [f"# HELP {ns}_latency_ms Call latency in milliseconds.",
+                  f"# TYPE {ns}_latency_ms histogram"]
+        for key, v in series:
+            cumulative = 0.0
+            for bound, count in zip(self.latency_buckets_ms, v[7:]):
+                cumulative += count
+                lines.append(f"{ns}_latency_ms_bucket{labels(key, le=_number(bound))} {_number(cumulative)}")
+            lines.append(f"{ns}_latency_ms_bucket{labels(key, le='+Inf')} {_number(v[6])}")
+            lines.append(f"{ns}_latency_ms_sum{labels(key)} {_number(round(v[5], 3))}")
+            lines.append(f"{ns}_latency_ms_count{labels(key)} {_number(v[6])}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Atomically write the metrics for a textfile collector."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_textfile_writer(self, path: str, interval: float = 15.0) -> threading.Event:
+        """Rewrite ``path`` every ``interval`` seconds. Set the returned event to stop."""
+        stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(interval):
+                self.write_textfile(path)
+            self.write_textfile(path)
+
+        self.write_textfile(path)
+        threading.Thread(target=_loop, name="inferenceiq-metrics-textfile", daemon=True).start()
+        return stop
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve ``/metrics`` on a background thread. Call ``shutdown()`` to stop."""
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name="inferenceiq-metrics-http",
+                         daemon=True).start()
+        return server
+
+
+_default_metrics: Optional[MetricsRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_default_metrics() -> MetricsRegistry:
+    """The metrics registry trackers record into unless given their own."""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = MetricsRegistry()
+        return _default_metrics
+
+
+def set_default_metrics(registry: MetricsRegistry) -> MetricsRegistry:
+    """Replace the process-wide metrics registry. Returns the previous one."""
+    global _default_metrics
+    with _default_lock:
+        previous = _default_metrics
+        _default_metrics = registry
+        return previous
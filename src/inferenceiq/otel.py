@@ -0,0 +1,160 @@
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # optional dependency
+    trace = None
+
+INSTRUMENTATION_NAME = "inferenceiq"
+
+# Log entry field -> span attribute (OpenTelemetry GenAI semantic conventions where they exist)
+ENTRY_ATTRIBUTES = {
+    "tokens_in": "gen_ai.usage.input_tokens",
+    "tokens_out": "gen_ai.usage.output_tokens",
+    "tokens_cached": "inferenceiq.usage.cached_tokens",
+    "cost_inr": "inferenceiq.cost_inr",
+    "outcome": "inferenceiq.outcome",
+    "interaction_id": "inferenceiq.interaction_id",
+    "session_id": "session.id",
+    "error_type": "error.type",
+    "mode": "inferenceiq.mode",
+}
+
+
+def _require_api():
+    if trace is None:
+        raise ImportError("OpenTelemetry tracing requires the 'opentelemetry-api' package")
+
+
+class CallSpan:
+    """Span of one tracked call, current for the duration of the call."""
+
+    def __init__(self, span):
+        self.span = span
+        self.finished = False
+        self._token = otel_context.attach(trace.set_span_in_context(span))
+
+    def ids(self) -> Dict[str, str]:
+        """trace_id/span_id to log with the entry, empty for non-recording spans."""
+        ctx = self.span.get_span_context()
+        if not isinstance(ctx.trace_id, int) or not ctx.is_valid:
+            return {}
+        return {"trace_id": format(ctx.trace_id, "032x"), "span_id": format(ctx.span_id, "016x")}
+
+    def finish(self, entry: Dict[str, Any], error: Optional[BaseException] = None):
+        """Copy the log entry onto the span, set its status and end it.
+
+        Only the first call has any effect.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        span = self.span
+        try:
+            span.set_attribute("gen_ai.response.model", entry.get("model"))
+            for field, attribute in ENTRY_ATTRIBUTES.items():
+                value = entry.get(field)
+                if isinstance(value, (str, bool, int, float)):
+                    span.set_attribute(attribute, value)
+            if error is not None:
+                span.record_exception(error)
+                span.set_status(Status(StatusCode.ERROR, str(error)))
+            span.end()
+        finally:
+            otel_context.detach(self._token)
+
+
+class CallTracer:
+    """Creates an OpenTelemetry CLIENT span for every tracked LLM call.
+
+    Spans are children of whatever span is current when ``call_llm`` runs
+    (e.g. the agent step that made the call), carry GenAI semantic
+    attributes plus cost and outcome, and stay current during the provider
+    request so HTTP client instrumentation nests under them. Without a
+    configured SDK the OpenTelemetry API hands out no-op spans.
+    """
+
+    def __init__(self, tracer_provider=None, tracer=None):
+        _require_api()
+        self.tracer = tracer or trace.get_tracer(INSTRUMENTATION_NAME, tracer_provider=tracer_provider)
+
+    def start_call(self, provider: Optional[str], model: str, agent: str,
+                   max_tokens: Optional[int] = None) -> CallSpan:
+        attributes = {
+            "gen_ai.operation.name": "chat",
+            "gen_ai.system": provider or "unknown",
+            "gen_ai.request.model": model,
+            "inferenceiq.agent": agent,
+        }
+        if max_tokens is not None:
+            attributes["gen_ai.request.max_tokens"] = max_tokens
+        span = self.tracer.start_span(f"chat {model}", kind=SpanKind.CLIENT, attributes=attributes)
+        return CallSpan(span)
+
+
+@contextmanager
+def remote_parent(headers: Mapping[str, str]) -> Iterator[None]:
+    """Make a W3C ``traceparent`` from incoming request headers the current parent."""
+    _require_api()
+    token = otel_context.attach(propagate.extract(dict(headers)))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add the current trace context to outgoing request headers."""
+    _require_api()
+    headers = {} if headers is None else headers
+    propagate.inject(headers)
+    return headers
+
+
+class JsonlSpanExporter:
+    """Span exporter appending one JSON object per span to a file.
+
+    Lets traces be inspected or shipped later without running a collector.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        lines = [json.dumps(json.loads(span.to_json())) + "\n" for span in spans]
+        with self._lock, open(self.path, "a") as f:
+            f.writelines(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def configure_tracing(exporter, batch: bool = True, service_name: str = "inferenceiq",
+                      set_global: bool = False):
+    """Build an SDK TracerProvider exporting through ``exporter``.
+
+    Uses a ``BatchSpanProcessor`` (spans are queued and exported off the
+    request path) unless ``batch=False``. Requires ``opentelemetry-sdk``.
+    Returns the provider; pass it to ``CallTracer(tracer_provider=...)``.
+    """
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    processor = BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter)
+    provider.add_span_processor(processor)
+    if set_global:
+        trace.set_tracer_provider(provider)
+    return provider
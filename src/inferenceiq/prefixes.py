@@ -0,0 +1,86 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from inferenceiq.tokens import MESSAGE_OVERHEAD, REPLY_OVERHEAD, TokenEstimator, message_text
+
+# Smallest prompt prefix OpenAI and Anthropic cache
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def prefix_hashes(messages: List[Dict[str, Any]]) -> List[str]:
+    """Hash of every cumulative prefix ``messages[:1]``, ``messages[:2]``, ...
+
+    Each hash chains the previous one with the next message, so the whole
+    list costs one pass over the messages and two calls share a hash exactly
+    when they share every message up to that point.
+    """
+    hashes = []
+    state = b""
+    for message in messages:
+        state = hashlib.blake2b(state + json.dumps(message, sort_keys=True).encode(), digest_size=8).digest()
+        hashes.append(state.hex())
+    return hashes
+
+
+def prefix_fields(messages: List[Dict[str, Any]], model: Optional[str] = None,
+                  estimator: Optional[TokenEstimator] = None) -> Dict[str, List]:
+    """``prefix_hashes`` and estimated cumulative ``prefix_tokens`` log fields."""
+    estimator = estimator or TokenEstimator()
+    try:
+        hashes = prefix_hashes(messages)
+    except (TypeError, ValueError):
+        return {}
+    tokens = []
+    total = REPLY_OVERHEAD
+    for message in messages:
+        total += MESSAGE_OVERHEAD + estimator.count_text(message_text(message), model)
+        tokens.append(total)
+    return {"prefix_hashes": hashes, "prefix_tokens": tokens}
+
+
+def shared_prefixes(frame: pd.DataFrame, ttl_minutes: Optional[float] = 5.0) -> pd.DataFrame:
+    """Longest prompt prefix each call shares with an earlier call.
+
+    Every (call, prefix) pair becomes a row of a hash index; sorting it by
+    prefix hash and time puts each prefix's previous use next to it, so one
+    vectorized pass finds, for every call, the deepest prefix that was also
+    sent at most ``ttl_minutes`` before (any time with ``None``) - the part
+    of the prompt a provider cache could have served. Returns one row per
+    call that shares a prefix, indexed like ``frame``, with
+    ``shared_depth`` (messages), ``shared_tokens`` and ``shared_hash``.
+    """
+    columns = ["shared_depth", "shared_tokens", "shared_hash"]
+    if frame.empty or "prefix_hashes" not in frame.columns or "prefix_tokens" not in frame.columns:
+        return pd.DataFrame(columns=columns)
+    logged = frame["prefix_hashes"].map(lambda v: isinstance(v, list) and len(v) > 0)
+    frame = frame[logged]
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+
+    lengths = frame["prefix_hashes"].map(len).to_numpy()
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    index = pd.DataFrame({
+        "call": np.repeat(frame.index.to_numpy(), lengths),
+        "depth": np.arange(lengths.sum()) - starts + 1,
+        "hash": np.concatenate(frame["prefix_hashes"].to_numpy()),
+        "tokens": np.concatenate(frame["prefix_tokens"].to_numpy()).astype(float),
+        "time": np.repeat(pd.to_datetime(frame["timestamp"], format="ISO8601").to_numpy(), lengths),
+    })
+    index = index.sort_values(["hash", "time", "call"], kind="stable")
+    previous = index.groupby("hash", sort=False)["time"].shift()
+    hit = previous.notna()
+    if ttl_minutes is not None:
+        hit &= (index["time"] - previous) <= pd.Timedelta(minutes=ttl_minutes)
+    hits = index[hit]
+    if hits.empty:
+        return pd.DataFrame(columns=columns)
+    deepest = hits.loc[hits.groupby("call")["depth"].idxmax()]
+    return pd.DataFrame({
+        "shared_depth": deepest["depth"].to_numpy(),
+        "shared_tokens": deepest["tokens"].to_numpy(),
+        "shared_hash": deepest["hash"].to_numpy(),
+    }, index=deepest["call"].to_numpy())
@@ -0,0 +1,151 @@
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+TimeBound = Union[str, datetime, None]
+
+# The tracker always writes "timestamp" as the first key, so the ISO string
+# can be sliced out of a raw line without decoding it.
+TIMESTAMP_PREFIX = '{"timestamp": "'
+
+_RELATIVE_RE = re.compile(r"^(\d+)([smhdw])$")
+_RELATIVE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_time_bound(value: TimeBound, end_of_day: bool = False,
+                     now: Optional[datetime] = None) -> Optional[str]:
+    """Normalize a time bound to a naive ISO-8601 string.
+
+    Accepts datetimes, ISO strings and relative offsets such as ``"7d"`` or
+    ``"12h"`` (measured back from ``now``). A bare date used as an upper
+    bound (``end_of_day=True``) covers that whole day.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat()
+
+    text = str(value).strip()
+    match = _RELATIVE_RE.match(text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        reference = now or datetime.now()
+        return (reference - timedelta(**{_RELATIVE_UNITS[unit]: amount})).isoformat()
+
+    parsed = datetime.fromisoformat(text).replace(tzinfo=None)
+    if end_of_day and len(text) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+
+class LogQuery:
+    """Time-range and dimension filters pushed down into log ingestion.
+
+    ``since`` is inclusive and ``until`` is exclusive. Raw lines are screened
+    with :meth:`accepts_line` before JSON decoding, then decoded entries are
+    checked exactly with :meth:`matches`.
+    """
+
+    def __init__(self, since: TimeBound = None, until: TimeBound = None,
+                 agents: Optional[Iterable[str]] = None,
+                 models: Optional[Iterable[str]] = None,
+                 tags: Optional[Iterable[str]] = None):
+        self.since = parse_time_bound(since)
+        self.until = parse_time_bound(until, end_of_day=True)
+        self.agents = set(agents) if agents else None
+        self.models = set(models) if models else None
+        self.tags = set(tags) if tags else None
+
+        # Any matching line must contain at least one of these encoded values
+        self._needles = []
+        for values in (self.agents, self.models, self.tags):
+            if values:
+                self._needles.append(self._encodings(values))
+
+    @staticmethod
+    def _encodings(values: Iterable[str]) -> tuple:
+        encoded = set()
+        for value in values:
+            encoded.add(json.dumps(value))
+            encoded.add(json.dumps(value, ensure_ascii=False))
+        return tuple(encoded)
+
+    @classmethod
+    def from_args(cls, args: Any) -> Optional["LogQuery"]:
+        """Build a query from parsed CLI arguments, or None if unfiltered."""
+        query = cls(
+            since=getattr(args, "since", None),
+            until=getattr(args, "until", None),
+            agents=getattr(args, "agent", None),
+            models=getattr(args, "model", None),
+            tags=getattr(args, "tag", None),
+        )
+        return None if query.is_empty() else query
+
+    def is_empty(self) -> bool:
+        return not (self.since or self.until or self.agents or self.models or self.tags)
+
+    def accepts_timestamp(self, timestamp: str) -> bool:
+        """Check an ISO timestamp string against the time range."""
+        if self.since and timestamp < self.since:
+            return False
+        if self.until and timestamp >= self.until:
+            return False
+        return True
+
+    def accepts_line(self, line: str) -> bool:
+        """Cheap pre-decode screen for a raw JSONL line.
+
+        May return True for lines that do not match, never False for lines
+        that do.
+        """
+        if (self.since or self.until) and line.startswith(TIMESTAMP_PREFIX):
+            end = line.find('"', len(TIMESTAMP_PREFIX))
+            timestamp = line[len(TIMESTAMP_PREFIX):end]
+            # Offsets and "Z" suffixes do not compare lexically; decode those
+            if end > 0 and "+" not in timestamp and not timestamp.endswith("Z"):
+                if not self.accepts_timestamp(timestamp):
+                    return False
+        for needles in self._needles:
+            if not any(needle in line for needle in needles):
+                return False
+        return True
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        """Exact check of a decoded log entry."""
+        if self.since or self.until:
+            timestamp = entry.get("timestamp")
+            if timestamp is None:
+                return False
+            if not self.accepts_timestamp(parse_time_bound(timestamp)):
+                return False
+        if self.agents and entry.get("agent") not in self.agents:
+            return False
+        if self.models and entry.get("model") not in self.models:
+            return False
+        if self.tags and not self.tags.intersection(entry.get("tags") or []):
+            return False
+        return True
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Filter an already loaded DataFrame with the same semantics."""
+        if df.empty:
+            return df
+        mask = pd.Series(True, index=df.index)
+        if (self.since or self.until) and "timestamp" in df.columns:
+            timestamps = pd.to_datetime(df["timestamp"], format="ISO8601")
+            if self.since:
+                mask &= timestamps >= pd.Timestamp(self.since)
+            if self.until:
+                mask &= timestamps < pd.Timestamp(self.until)
+        if self.agents:
+            mask &= df.get("agent", pd.Series(index=df.index)).isin(self.agents)
+        if self.models:
+            mask &= df.get("model", pd.Series(index=df.index)).isin(self.models)
+        if self.tags:
+            tags = df.get("tags", pd.Series(index=df.index))
+            mask &= tags.map(lambda v: isinstance(v, list) and bool(self.tags.intersection(v)))
+        return df[mask]
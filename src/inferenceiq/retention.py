@@ -0,0 +1,413 @@
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from inferenceiq import binlog
+from inferenceiq.hedging import CANCELLED
+from inferenceiq.index import LogIndex
+from inferenceiq.query import TIMESTAMP_PREFIX, LogQuery, parse_time_bound
+from inferenceiq.sampling import SAMPLED_OUT
+from inferenceiq.singleflight import COALESCED
+
+ROLLUP = "rollup"
+HOURLY = "hourly"
+DAILY = "daily"
+WATERMARKS = ("raw_from", "hourly_from", "daily_from")
+SUMMED_FIELDS = ("cost_inr", "tokens_in", "tokens_out", "tokens_total", "tokens_cached")
+SEGMENT_RECORDS = 65536
+
+
+def tier_path(log_file: str, tier: str) -> str:
+    """Rollup file of a tier, next to the log (``<log>.hourly.jsonl``)."""
+    return f"{log_file}.{tier}.jsonl"
+
+
+def manifest_path(log_file: str) -> str:
+    return f"{log_file}.retention.json"
+
+
+def load_watermarks(log_file: str) -> Dict[str, Optional[str]]:
+    """Where each tier starts; all None for logs that were never compacted.
+
+    The raw log covers ``raw_from`` onwards, the hourly tier
+    ``[hourly_from, raw_from)`` and the daily tier ``[daily_from,
+    hourly_from)``. Records outside their tier's range are ignored.
+    """
+    marks = dict.fromkeys(WATERMARKS)
+    path = manifest_path(log_file)
+    if os.path.exists(path):
+        with open(path) as f:
+            marks.update(json.load(f))
+    return marks
+
+
+def _write_atomic(path: str, data: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _timestamp(entry: Dict[str, Any]) -> Optional[str]:
+    value = entry.get("timestamp")
+    return parse_time_bound(value) if value else None
+
+
+def _line_timestamp(line: str) -> Optional[str]:
+    """Timestamp of a raw JSONL line, decoding it only when it cannot be sliced out."""
+    if line.startswith(TIMESTAMP_PREFIX):
+        end = line.find('"', len(TIMESTAMP_PREFIX))
+        timestamp = line[len(TIMESTAMP_PREFIX):end]
+        if end > 0 and "+" not in timestamp and not timestamp.endswith("Z"):
+            return timestamp
+    return _timestamp(json.loads(line))
+
+
+def _in_range(timestamp: Optional[str], lower: Optional[str], upper: Optional[str]) -> bool:
+    if timestamp is None:
+        return False
+    return (lower is None or timestamp >= lower) and (upper is None or timestamp < upper)
+
+
+class LatencySketch:
+    """Mergeable latency histogram with bounded relative error.
+
+    Latencies fall into logarithmic buckets ``gamma**(i-1) < v <= gamma**i``
+    and each bucket is read back at a point within ``RELATIVE_ACCURACY`` of
+    every value in it, so percentiles of merged hourly or daily sketches
+    stay within 1% of the exact ones (the DDSketch scheme). Values below
+    ``MIN_VALUE`` ms share the lowest bucket.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    MIN_VALUE = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+    __slots__ = ("buckets",)
+
+    def __init__(self, buckets: Optional[Iterable[Tuple[int, float]]] = None):
+        self.buckets: Dict[int, float] = dict(buckets or ())
+
+    def add(self, values: Sequence[float], weights: Optional[Sequence[float]] = None):
+        values = np.asarray(values, dtype=float)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        keep = ~np.isnan(values)
+        if not keep.any():
+            return
+        index = np.ceil(np.log(np.maximum(values[keep], self.MIN_VALUE)) / math.log(self.GAMMA))
+        keys, inverse = np.unique(index.astype(np.int64), return_inverse=True)
+        for key, weight in zip(keys.tolist(), np.bincount(inverse, weights=weights[keep]).tolist()):
+            self.buckets[key] = self.buckets.get(key, 0.0) + weight
+
+    def merge(self, other: "LatencySketch"):
+        for key, weight in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0.0) + weight
+
+    def points(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Bucket values and weights, for weighted percentiles."""
+        keys = np.fromiter(self.buckets.keys(), dtype=float, count=len(self.buckets))
+        weights = np.fromiter(self.buckets.values(), dtype=float, count=len(self.buckets))
+        return 2 * self.GAMMA ** keys / (self.GAMMA + 1), weights
+
+    def to_dict(self) -> Dict[str, List]:
+        keys = sorted(self.buckets)
+        return {"index": keys, "weight": [round(self.buckets[k], 6) for k in keys]}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, List]]) -> "LatencySketch":
+        if not data:
+            return cls()
+        return cls(zip(data["index"], data["weight"]))
+
+
+class _Rollup:
+    """Totals of the calls in one period for one series."""
+
+    __slots__ = ("calls", "successes", "failed_calls", "failed_cost_inr", "sums", "sketch",
+                 "latencies", "weights")
+
+    def __init__(self):
+        self.calls = 0.0
+        self.successes = 0.0
+        self.failed_calls = 0.0
+        self.failed_cost_inr = 0.0
+        self.sums = [0.0] * len(SUMMED_FIELDS)
+        self.sketch = LatencySketch()
+        self.latencies: List[float] = []
+        self.weights: List[float] = []
+
+    def add_record(self, entry: Dict[str, Any]):
+        for i, field in enumerate(SUMMED_FIELDS):
+            self.sums[i] += entry.get(field) or 0
+        if entry.get("record_type") == SAMPLED_OUT:
+            calls = entry.get("calls") or 0
+            self.calls += calls
+            self.successes += calls
+            return
+        outcome = entry.get("outcome")
+        if outcome != CANCELLED:
+            self.calls += 1
+        if outcome in ("success", COALESCED):
+            self.successes += 1
+        elif outcome == "failed":
+            self.failed_calls += 1
+            self.failed_cost_inr += (entry.get("cost_inr") or 0) + (entry.get("failed_cost_inr") or 0)
+        if entry.get("latency_ms") is not None:
+            self.latencies.append(entry["latency_ms"])
+            self.weights.append(entry.get("sample_weight") or 1.0)
+
+    def add_row(self, row: Dict[str, Any]):
+        self.calls += row["calls"]
+        self.successes += row["successes"]
+        self.failed_calls += row["failed_calls"]
+        self.failed_cost_inr += row["failed_cost_inr"]
+        for i, field in enumerate(SUMMED_FIELDS):
+            self.sums[i] += row[field]
+        self.sketch.merge(LatencySketch.from_dict(row.get("latency_sketch")))
+
+    def to_row(self, timestamp: str, tier: str, key: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latencies:
+            self.sketch.add(self.latencies, self.weights)
+            self.latencies, self.weights = [], []
+        row = {"timestamp": timestamp, "record_type": ROLLUP, "tier": tier, **key,
+               "calls": self.calls, "successes": self.successes, "failed_calls": self.failed_calls,
+               "failed_cost_inr": round(self.failed_cost_inr, 6)}
+        for field, total in zip(SUMMED_FIELDS, self.sums):
+            row[field] = round(total, 6) if field == "cost_inr" else total
+        row["latency_sketch"] = self.sketch.to_dict()
+        return row
+
+
+def read_rows(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_rows(path: str, rows: List[Dict[str, Any]]):
+    _write_atomic(path, "".join(json.dumps(row) + "\n" for row in rows))
+
+
+def load_rollups(log_file: str, query: Optional[LogQuery] = None) -> pd.DataFrame:
+    """Committed hourly and daily rollup rows of a log, filtered by ``query``.
+
+    Rows are matched by the start of their hour or day; tag filters never
+    match them (rollups do not keep tags).
+    """
+    marks = load_watermarks(log_file)
+    rows = []
+    for tier, lower, upper in ((HOURLY, marks["hourly_from"], marks["raw_from"]),
+                               (DAILY, marks["daily_from"], marks["hourly_from"])):
+        if upper is None:
+            continue
+        rows.extend(row for row in read_rows(tier_path(log_file, tier))
+                    if _in_range(row["timestamp"], lower, upper) and (query is None or query.matches(row)))
+    frame = pd.DataFrame(rows)
+    if not frame.empty:
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601")
+    return frame
+
+
+def raw_query(log_file: str, query: Optional[LogQuery] = None) -> Optional[LogQuery]:
+    """``query`` narrowed to the raw tier of a compacted log."""
+    raw_from = load_watermarks(log_file)["raw_from"]
+    if raw_from is None:
+        return query
+    if query is None:
+        return LogQuery(since=raw_from)
+    return LogQuery(since=max(query.since or raw_from, raw_from), until=query.until,
+                    agents=query.agents, models=query.models, tags=query.tags)
+
+
+def latency_points(rollups: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """Rollup latency sketches as weighted ``_value``/``_weight`` points (plus ``by``)."""
+    parts = []
+    if "latency_sketch" in rollups.columns:
+        keys = rollups[by] if by is not None else [None] * len(rollups)
+        for key, data in zip(keys, rollups["latency_sketch"]):
+            values, weights = LatencySketch.from_dict(data if isinstance(data, dict) else None).points()
+            if len(values):
+                part = pd.DataFrame({"_value": values, "_weight": weights})
+                if by is not None:
+                    part[by] = key
+                parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=["_value", "_weight"] + ([by] if by is not None else []))
+    return pd.concat(parts, ignore_index=True)
+
+
+class RetentionPolicy:
+    """Tiered retention for a tracker log: raw, then hourly, then daily rollups.
+
+    :meth:`compact` keeps raw records for ``raw_days``, rolls older ones up
+    per hour and ``dimensions`` value (calls, successes, failures, cost,
+    tokens and a :class:`LatencySketch`), folds hourly rows older than
+    ``hourly_days`` into daily rows and, with ``daily_days``, drops daily
+    rows after that. Cost, token and call totals stay exact; sampled-out
+    totals are folded in like any other record.
+
+    Rollups are written first and only count once the watermark manifest
+    is replaced, after which expired raw records and hourly rows are
+    purged, so an interrupted run never double counts and is finished by
+    the next one. Records that arrive with timestamps before ``raw_from``
+    after a compaction are ignored. Writers appending to a JSONL log during
+    the purge are picked up unless they append while the file is replaced.
+    """
+
+    def __init__(self, raw_days: int = 7, hourly_days: int = 90, daily_days: Optional[int] = None,
+                 dimensions: Sequence[str] = ("agent", "model")):
+        if raw_days < 0 or hourly_days < raw_days:
+            raise ValueError(f"Need 0 <= raw_days <= hourly_days: {raw_days}, {hourly_days}")
+        if daily_days is not None and daily_days < hourly_days:
+            raise ValueError(f"daily_days must be at least hourly_days: {daily_days}")
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.dimensions = tuple(dimensions)
+
+    def watermarks(self, now: datetime, previous: Optional[Dict[str, Optional[str]]] = None
+                   ) -> Dict[str, Optional[str]]:
+        """Tier boundaries for ``now``; they never move back from ``previous``."""
+        hour = now.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        day = hour.replace(hour=0)
+        marks = {
+            "raw_from": (hour - timedelta(days=self.raw_days)).isoformat(),
+            "hourly_from": (day - timedelta(days=self.hourly_days)).isoformat(),
+            "daily_from": (day - timedelta(days=self.daily_days)).isoformat()
+            if self.daily_days is not None else None,
+        }
+        for name, value in (previous or {}).items():
+            if value is not None and (marks.get(name) is None or value > marks[name]):
+                marks[name] = value
+        return marks
+
+    def _key(self, entry: Dict[str, Any]) -> Tuple:
+        return tuple(entry.get(name) for name in self.dimensions)
+
+    def _roll_up(self, entries: Iterable[Tuple[str, Dict[str, Any]]], tier: str, rows: bool
+                 ) -> List[Dict[str, Any]]:
+        width = 13 if tier == HOURLY else 10
+        groups: Dict[Tuple, _Rollup] = {}
+        for timestamp, entry in entries:
+            rollup = groups.setdefault((timestamp[:width], self._key(entry)), _Rollup())
+            if rows:
+                rollup.add_row(entry)
+            else:
+                rollup.add_record(entry)
+        suffix = ":00:00" if tier == HOURLY else "T00:00:00"
+        return [rollup.to_row(period + suffix, tier, dict(zip(self.dimensions, key)))
+                for (period, key), rollup in sorted(groups.items(), key=lambda item: item[0][0])]
+
+    @staticmethod
+    def _iter_raw(log_file: str, lower: Optional[str], upper: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Raw records with ``lower <= timestamp < upper``."""
+        if not os.path.exists(log_file):
+            return
+        if binlog.is_binary_log(log_file):
+            for entry in binlog.iter_records(log_file, LogQuery(since=lower, until=upper)):
+                yield _timestamp(entry), entry
+            return
+        with open(log_file) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                timestamp = _line_timestamp(line)
+                if _in_range(timestamp, lower, upper):
+                    yield parse_time_bound(timestamp), json.loads(line)
+
+    @staticmethod
+    def _purge_raw(log_file: str, raw_from: str) -> int:
+        """Drop raw records before ``raw_from``; returns how many were dropped."""
+        if not os.path.exists(log_file):
+            return 0
+        tmp_path = f"{log_file}.{os.getpid()}.tmp"
+        purged = 0
+        if binlog.is_binary_log(log_file):
+            with open(tmp_path, "wb") as dst:
+                batch = []
+                for entry in binlog.iter_records(log_file):
+                    timestamp = _timestamp(entry)
+                    if timestamp is not None and timestamp < raw_from:
+                        purged += 1
+                        continue
+                    batch.append(entry)
+                    if len(batch) >= SEGMENT_RECORDS:
+                        binlog.write_segment(dst, batch)
+                        batch = []
+                if batch:
+                    binlog.write_segment(dst, batch)
+        else:
+            size = os.path.getsize(log_file)
+            with open(log_file, "rb") as src, open(tmp_path, "wb") as dst:
+                offset = 0
+                for line in src:
+                    if offset >= size:
+                        break
+                    offset += len(line)
+                    text = line.decode()
+                    timestamp = _line_timestamp(text) if text.strip() else None
+                    if timestamp is not None and timestamp < raw_from:
+                        purged += 1
+                    else:
+                        dst.write(line)
+                # Keep whatever was appended while we were reading
+                src.seek(size)
+                dst.write(src.read())
+        if not purged:
+            os.remove(tmp_path)
+            return 0
+        os.replace(tmp_path, log_file)
+        index = LogIndex(log_file)
+        if index.exists():
+            LogIndex.build(log_file)
+        # The SQL backend's sidecar holds the purged records; it is rebuilt on next use
+        sidecar = f"{log_file}.sqlite"
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        return purged
+
+    def compact(self, log_file: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Roll up and purge expired data of ``log_file``; returns what was done."""
+        previous = load_watermarks(log_file)
+        marks = self.watermarks(now or datetime.now(), previous)
+        hourly_file, daily_file = tier_path(log_file, HOURLY), tier_path(log_file, DAILY)
+
+        # 1. Stage rollups; rows past the old watermarks are leftovers of an interrupted run
+        new_hourly = self._roll_up(self._iter_raw(log_file, previous["raw_from"], marks["raw_from"]),
+                                   HOURLY, rows=False)
+        hourly = []
+        if previous["raw_from"] is not None:
+            hourly = [row for row in read_rows(hourly_file)
+                      if _in_range(row["timestamp"], previous["hourly_from"], previous["raw_from"])]
+        hourly = sorted(hourly + new_hourly, key=lambda row: row["timestamp"])
+        expiring = [(row["timestamp"], row) for row in hourly
+                    if _in_range(row["timestamp"], previous["hourly_from"], marks["hourly_from"])]
+        daily = []
+        if previous["hourly_from"] is not None:
+            daily = [row for row in read_rows(daily_file) if row["timestamp"] < previous["hourly_from"]]
+        daily = sorted(daily + self._roll_up(expiring, DAILY, rows=True), key=lambda row: row["timestamp"])
+        _write_rows(hourly_file, hourly)
+        _write_rows(daily_file, daily)
+
+        # 2. Commit
+        _write_atomic(manifest_path(log_file), json.dumps(marks))
+
+        # 3. Purge what the new watermarks expired
+        purged = self._purge_raw(log_file, marks["raw_from"])
+        hourly = [row for row in hourly if row["timestamp"] >= marks["hourly_from"]]
+        daily = [row for row in daily if _in_range(row["timestamp"], marks["daily_from"], None)]
+        _write_rows(hourly_file, hourly)
+        _write_rows(daily_file, daily)
+        return {
+            **marks,
+            "calls_rolled_up": int(sum(row["calls"] for row in new_hourly)),
+            "raw_purged": purged,
+            "hourly_rows": len(hourly),
+            "daily_rows": len(daily),
+        }
@@ -1,4 +1,5 @@
-from typing import Tuple, List
+from typing import Optional, Tuple, List
+from inferenceiq.tokens import TokenEstimator
 
 class ModelRouter:
     """
@@ -12,17 +13,24 @@ class ModelRouter:
         "script", "python"
     ]
     
-    def __init__(self, length_threshold: int = 100):
+    def __init__(self, length_threshold: int = 100, token_threshold: Optional[int] = None,
+                 estimator: Optional[TokenEstimator] = None):
         self.length_threshold = length_threshold
+        # When set, prompt size is measured in estimated tokens instead of characters
+        self.token_threshold = token_threshold
+        self.estimator = estimator or TokenEstimator()
 
-    def is_complex(self, prompt: str) -> bool:
+    def is_complex(self, prompt: str, model: Optional[str] = None) -> bool:
         """
         Determine if a prompt is complex based on length and keywords.
         """
         prompt_lower = prompt.lower()
         
         # Rule 1: Length check
-        if len(prompt) > self.length_threshold:
+        if self.token_threshold is not None:
+            if self.estimator.count_text(prompt, model) > self.token_threshold:
+                return True
+        elif len(prompt) > self.length_threshold:
             return True
             
         # Rule 2: Keyword check
@@ -35,6 +43,6 @@ class ModelRouter:
         """
         Returns (selected_model, reason).
         """
-        if self.is_complex(prompt):
+        if self.is_complex(prompt, weak_model):
             return strong_model, "complexity_high"
         return weak_model, "complexity_low"
@@ -0,0 +1,96 @@
+import random
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+SAMPLED_OUT = "sampled_out"
+
+
+class SamplingPolicy:
+    """Per-agent sampling of successful call records.
+
+    Failures, calls costing at least ``keep_cost_above_inr`` and calls slower
+    than ``keep_latency_above_ms`` are always kept (weight 1). Other
+    successes are kept with the agent's rate (``agent_rates`` or the default
+    ``rate``) and carry ``sample_weight = 1 / rate`` so weighted analytics
+    stay unbiased. The decision is made once the outcome is known, so rare
+    interesting calls are never lost.
+    """
+
+    def __init__(self, rate: float = 1.0, agent_rates: Optional[Dict[str, float]] = None,
+                 keep_cost_above_inr: Optional[float] = None,
+                 keep_latency_above_ms: Optional[float] = None, seed: Optional[int] = None):
+        for value in [rate, *(agent_rates or {}).values()]:
+            if not 0 < value <= 1:
+                raise ValueError(f"Sampling rate must be in (0, 1]: {value}")
+        self.rate = rate
+        self.agent_rates = dict(agent_rates or {})
+        self.keep_cost_above_inr = keep_cost_above_inr
+        self.keep_latency_above_ms = keep_latency_above_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def rate_for(self, agent: Optional[str]) -> float:
+        return self.agent_rates.get(agent, self.rate)
+
+    def weight(self, entry: Dict[str, Any]) -> Optional[float]:
+        """Sampling weight if the record is kept, None if it is dropped."""
+        if entry.get("outcome") != "success":
+            return 1.0
+        cost = entry.get("cost_inr") or 0
+        if self.keep_cost_above_inr is not None and cost >= self.keep_cost_above_inr:
+            return 1.0
+        latency = entry.get("latency_ms") or 0
+        if self.keep_latency_above_ms is not None and latency >= self.keep_latency_above_ms:
+            return 1.0
+        rate = self.rate_for(entry.get("agent"))
+        if rate >= 1:
+            return 1.0
+        with self._lock:
+            keep = self._random.random() < rate
+        return 1.0 / rate if keep else None
+
+
+class SampledOutCounter:
+    """Exact totals of dropped records, per agent, model and hour.
+
+    Drained into ``record_type="sampled_out"`` rows when logs are saved so
+    analytics can report exact totals alongside the sampled records.
+    """
+
+    FIELDS = ("tokens_in", "tokens_out", "tokens_cached", "cost_inr")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, Any, Any], List[float]] = {}
+
+    def add(self, entry: Dict[str, Any]):
+        hour = str(entry.get("timestamp") or datetime.now().isoformat())[:13] + ":00:00"
+        key = (hour, entry.get("agent"), entry.get("model"))
+        with self._lock:
+            totals = self._totals.setdefault(key, [0] * (len(self.FIELDS) + 1))
+            totals[0] += 1
+            for i, field in enumerate(self.FIELDS, start=1):
+                totals[i] += entry.get(field) or 0
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Return and reset the accumulated totals as log records."""
+        with self._lock:
+            totals, self._totals = self._totals, {}
+        records = []
+        for (hour, agent, model), values in sorted(totals.items(), key=lambda item: item[0][0]):
+            calls, tokens_in, tokens_out, tokens_cached, cost = values
+            records.append({
+                "timestamp": hour,
+                "record_type": SAMPLED_OUT,
+                "agent": agent,
+                "model": model,
+                "outcome": "success",
+                "calls": calls,
+                "tokens_in": tokens_in,
+                "tokens_out": tokens_out,
+                "tokens_total": tokens_in + tokens_out,
+                "tokens_cached": tokens_cached,
+                "cost_inr": round(cost, 4),
+            })
+        return records
@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from inferenceiq.tokens import DEFAULT_MAX_TOKENS, TokenEstimator
+
+LANES = ("interactive", "background")
+# How often async waiters that are not at the head of their queue re-check
+ASYNC_POLL_SECONDS = 0.01
+
+LimitKey = Tuple[Optional[str], str]
+
+
+class TokenBucket:
+    """Bucket refilling continuously at ``per_minute`` units per minute.
+
+    Holds at most ``burst`` units (default: one minute's worth). The level
+    may go negative when actual usage is charged after the fact, which
+    delays later admissions by exactly the overdraft.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        if per_minute <= 0:
+            raise ValueError(f"Rate limit must be positive: {per_minute}")
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (clamped to the capacity)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Return (positive) or charge (negative) units after the fact."""
+        self._refill()
+        self.level = min(self.capacity, self.level + delta)
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class Ticket:
+    """An admitted call: what it reserved and how long it queued."""
+
+    __slots__ = ("key", "lane", "tokens", "queue_wait_ms")
+
+    def __init__(self, key: LimitKey, lane: str, tokens: int, queue_wait_ms: float):
+        self.key = key
+        self.lane = lane
+        self.tokens = tokens
+        self.queue_wait_ms = queue_wait_ms
+
+
+class RateLimitScheduler:
+    """Client-side admission control for provider RPM/TPM limits.
+
+    ``limits`` maps ``(provider, model)`` to ``{"rpm": ..., "tpm": ...}``
+    (either may be omitted); calls to unlisted models are admitted at once.
+    Each key gets a request bucket and a token bucket. A call reserves one
+    request and its pre-flight token estimate (prompt plus ``max_tokens``,
+    which is what providers count against TPM); :meth:`settle` corrects the
+    token bucket with the actual usage afterwards, and :meth:`throttled`
+    empties both buckets when the provider still answers 429.
+
+    Waiting calls are queued per key in priority lanes (``lanes``, highest
+    first, FIFO within a lane); only the head of a queue is admitted, so
+    background work never takes capacity an interactive call is waiting for.
+    Keeping every key just under its limit sustains goodput instead of
+    oscillating between bursts and 429 errors.
+    """
+
+    def __init__(self, limits: Dict[LimitKey, Dict[str, float]], lanes: Sequence[str] = LANES,
+                 burst_seconds: float = 60.0, estimator: Optional[TokenEstimator] = None):
+        self.limits = dict(limits)
+        self.lanes = tuple(lanes)
+        self.burst_seconds = burst_seconds
+        self.estimator = estimator or TokenEstimator()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._buckets: Dict[LimitKey, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._queues: Dict[LimitKey, List[Tuple[int, int]]] = {}
+
+    @property
+    def default_lane(self) -> str:
+        return self.lanes[0]
+
+    def reservation(self, model: str, messages: List[Dict[str, Any]],
+                    max_tokens: Optional[int] = None) -> int:
+        """Tokens to reserve for a call: estimated prompt plus the output allowance."""
+        return self.estimator.count_messages(messages, model) + (max_tokens or DEFAULT_MAX_TOKENS)
+
+    def _buckets_for(self, key: LimitKey):
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            limit = self.limits.get(key)
+            if limit is None:
+                return None
+            buckets = tuple(
+                TokenBucket(limit[name], limit[name] * self.burst_seconds / 60.0) if limit.get(name) else None
+                for name in ("rpm", "tpm")
+            )
+            self._buckets[key] = buckets
+        return buckets
+
+    def _rank(self, lane: Optional[str]) -> int:
+        lane = lane or self.default_lane
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown priority lane: {lane}")
+        return self.lanes.index(lane)
+
+    def _try_admit(self, key: LimitKey, entry: Tuple[int, int], tokens: int) -> float:
+        """Admit ``entry`` if it heads its queue and fits; else seconds to wait (inf: not head)."""
+        if self._queues[key][0] != entry:
+            return math.inf
+        requests, token_bucket = self._buckets[key]
+        wait = max(requests.wait_time(1) if requests else 0.0,
+                   token_bucket.wait_time(tokens) if token_bucket else 0.0)
+        if wait > 0:
+            return wait
+        if requests:
+            requests.take(1)
+        if token_bucket:
+            token_bucket.take(tokens)
+        return 0.0
+
+    def _enqueue(self, key: LimitKey, lane: Optional[str]) -> Tuple[int, int]:
+        entry = (self._rank(lane), next(self._seq))
+        heapq.heappush(self._queues.setdefault(key, []), entry)
+        return entry
+
+    def _dequeue(self, key: LimitKey, entry: Tuple[int, int]):
+        queue = self._queues[key]
+        queue.remove(entry)
+        heapq.heapify(queue)
+        # The next waiter may be admissible now
+        self._cond.notify_all()
+
+    def acquire(self, provider: Optional[str], model: str, tokens: int = 0,
+                lane: Optional[str] = None, timeout: Optional[float] = None) -> Ticket:
+        """Block until the call may be sent. Raises ``TimeoutError`` after ``timeout`` seconds."""
+        key = (provider, model)
+        lane = self.lanes[self._rank(lane)]
+        start = time.monotonic()
+        with self._cond:
+            if self._buckets_for(key) is None:
+                return Ticket(key, lane, tokens, 0.0)
+            entry = self._enqueue(key, lane)
+            try:
+                while True:
+                    wait = self._try_admit(key, entry, tokens)
+                    if wait == 0:
+                        break
+                    if timeout is not None:
+                        remaining = start + timeout - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(f"Rate limit queue wait exceeded {timeout}s for {model}")
+                        wait = min(wait, remaining)
+                    self._cond.wait(None if wait == math.inf else wait)
+            finally:
+                self._dequeue(key, entry)
+        return Ticket(key, lane, tokens, (time.monotonic() - start) * 1000)
+
+    async def aacquire(self, provider: Optional[str], model: str, tokens: int = 0,
+                       lane: Optional[str] = None, timeout: Optional[float] = None) -> Ticket:
+        """Async :meth:`acquire`; waits without blocking the event loop."""
+        key = (provider, model)
+        lane = self.lanes[self._rank(lane)]
+        start = time.monotonic()
+        with self._cond:
+            if self._buckets_for(key) is None:
+                return Ticket(key, lane, tokens, 0.0)
+            entry = self._enqueue(key, lane)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(key, entry, tokens)
+                if wait == 0:
+                    break
+                if timeout is not None:
+                    remaining = start + timeout - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Rate limit queue wait exceeded {timeout}s for {model}")
+                    wait = min(wait, remaining)
+                await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS) if wait == math.inf else wait)
+        finally:
+            with self._cond:
+                self._dequeue(key, entry)
+        return Ticket(key, lane, tokens, (time.monotonic() - start) * 1000)
+
+    def settle(self, ticket: Ticket, actual_tokens: int):
+        """Correct the token bucket with the call's actual usage."""
+        with self._cond:
+            buckets = self._buckets.get(ticket.key)
+            if buckets and buckets[1]:
+                buckets[1].adjust(min(ticket.tokens, buckets[1].capacity) - actual_tokens)
+                self._cond.notify_all()
+
+    def throttled(self, ticket: Ticket):
+        """The provider rejected the call with 429: stop admitting until the buckets refill."""
+        with self._cond:
+            for bucket in self._buckets.get(ticket.key) or ():
+                if bucket:
+                    bucket.drain()
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for provider 429 responses (OpenAI/Anthropic ``RateLimitError``)."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
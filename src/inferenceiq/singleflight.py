@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+COALESCED = "coalesced"
+
+# Result a cancelled async leader hands its followers: elect a new leader
+_RETRY = object()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs concurrent calls that share a key only once.
+
+    The first caller for a key (the leader) executes the work; callers
+    arriving while it is in flight wait for it and get the same result or
+    exception. Nothing is cached: once the leader finishes, the next call
+    runs again. Threads use :meth:`do`, coroutines :meth:`ado`; each mode
+    only coalesces with callers of the same mode (and event loop). If an
+    async leader is cancelled its followers are not: one of them becomes
+    the new leader and runs the work again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._futures)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per in-flight ``key``. Returns ``(result, is_leader)``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, True
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async :meth:`do`: await ``fn()`` once per in-flight ``key``."""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._futures.get(loop_key)
+                leader = future is None
+                if leader:
+                    future = self._futures[loop_key] = loop.create_future()
+            if leader:
+                break
+            # A cancelled follower must not cancel the shared request
+            result = await asyncio.shield(future)
+            if result is not _RETRY:
+                return result, False
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; don't warn when there were none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._futures[loop_key]
+        return result, True
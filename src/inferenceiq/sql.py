@@ -0,0 +1,412 @@
+import json
+import os
+import sqlite3
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from inferenceiq import binlog
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.query import LogQuery, parse_time_bound
+from inferenceiq.retention import load_rollups, raw_query
+from inferenceiq.sampling import SAMPLED_OUT
+from inferenceiq.singleflight import COALESCED
+from inferenceiq.hedging import CANCELLED
+
+BACKENDS = ("pandas", "sqlite", "duckdb", "auto")
+
+# Columns the SQL getters need, in table order
+COLUMNS = [
+    ("ts", "TEXT"), ("agent", "TEXT"), ("model", "TEXT"), ("outcome", "TEXT"),
+    ("tokens_in", "REAL"), ("tokens_out", "REAL"), ("tokens_total", "REAL"),
+    ("cost_inr", "REAL"), ("fingerprint", "TEXT"), ("tags", "TEXT"),
+    ("record_type", "TEXT"), ("calls", "REAL"), ("sample_weight", "REAL"),
+]
+INGEST_BATCH = 50_000
+# Leading bytes hashed to recognise a rewritten log
+HEAD_BYTES = 4096
+
+
+def _number(value: Any) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _row(entry: Dict[str, Any]) -> Tuple:
+    timestamp = entry.get("timestamp")
+    try:
+        ts = parse_time_bound(timestamp) if timestamp else None
+    except ValueError:
+        ts = None
+    tags = entry.get("tags")
+    return (
+        ts, entry.get("agent"), entry.get("model"), entry.get("outcome"),
+        _number(entry.get("tokens_in")), _number(entry.get("tokens_out")),
+        _number(entry.get("tokens_total")), _number(entry.get("cost_inr")),
+        entry.get("fingerprint"), json.dumps(tags) if isinstance(tags, list) else None,
+        entry.get("record_type"), _number(entry.get("calls")), _number(entry.get("sample_weight")),
+    )
+
+
+class SQLiteBackend:
+    """Ingests the log into a sidecar SQLite database and queries it there.
+
+    Ingestion streams the log in batches and is incremental: only lines
+    appended since the last run are read. A rewritten log (a new inode or
+    different leading bytes, e.g. after compaction) is re-ingested even if
+    it has since grown past the old offset. Memory stays bounded regardless
+    of log size.
+    """
+
+    name = "sqlite"
+    date_expr = "substr(ts, 1, 10)"
+    ts_param = "?"
+
+    def __init__(self, log_file: str, db_path: Optional[str] = None):
+        self.log_file = log_file
+        self.db_path = db_path or log_file + ".sqlite"
+        self.conn = sqlite3.connect(self.db_path)
+        columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS logs (seq INTEGER PRIMARY KEY, {columns});
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+
+    def _meta(self, key: str) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _insert(self, rows: List[Tuple]):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        names = ", ".join(name for name, _ in COLUMNS)
+        self.conn.executemany(f"INSERT INTO logs ({names}) VALUES ({placeholders})", rows)
+
+    def _head(self, length: int) -> int:
+        """crc32 of the first ``length`` bytes of the log."""
+        if not length:
+            return 0
+        with open(self.log_file, "rb") as f:
+            return zlib.crc32(f.read(length))
+
+    def prepare(self):
+        exists = os.path.exists(self.log_file)
+        size = os.path.getsize(self.log_file) if exists else 0
+        inode = os.stat(self.log_file).st_ino if exists else 0
+        offset = self._meta("ingested_until")
+        binary = binlog.is_binary_log(self.log_file)
+        head_bytes = self._meta("head_bytes")
+        # Rewritten log, or a binary log that grew (segments are re-read whole)
+        reingest = offset > size or (binary and offset != size) or (offset > 0 and (
+            self._meta("inode") != inode or head_bytes > size or self._meta("head_crc") != self._head(head_bytes)))
+        if reingest:
+            offset = 0
+        if offset == size and not reingest:
+            return
+
+        with self.conn:
+            if reingest:
+                self.conn.execute("DELETE FROM logs")
+            if binary:
+                batch = []
+                for entry in binlog.iter_records(self.log_file):
+                    batch.append(_row(entry))
+                    if len(batch) >= INGEST_BATCH:
+                        self._insert(batch)
+                        batch = []
+                self._insert(batch)
+                offset = size
+            else:
+                with open(self.log_file, "rb") as f:
+                    f.seek(offset)
+                    batch = []
+                    for line in f:
+                        # Stop at a partially written trailing line
+                        if not line.endswith(b"\n"):
+                            break
+                        offset += len(line)
+                        if line.strip():
+                            batch.append(_row(json.loads(line)))
+                        if len(batch) >= INGEST_BATCH:
+                            self._insert(batch)
+                            batch = []
+                    self._insert(batch)
+            head_bytes = min(offset, HEAD_BYTES)
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("ingested_until", offset), ("inode", inode),
+                ("head_bytes", head_bytes), ("head_crc", self._head(head_bytes)),
+            ])
+
+    def set_pricing(self, rates: Dict[str, float]):
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS pricing (model TEXT PRIMARY KEY, input_rate REAL)")
+            self.conn.execute("DELETE FROM pricing")
+            self.conn.executemany("INSERT INTO pricing VALUES (?, ?)", rates.items())
+
+    def tags_condition(self, tags: List[str]) -> Tuple[str, List[Any]]:
+        placeholders = ", ".join("?" for _ in tags)
+        return (f"EXISTS (SELECT 1 FROM json_each(logs.tags) WHERE json_each.value IN ({placeholders}))",
+                list(tags))
+
+    def execute(self, sql: str, params: List[Any]) -> List[Tuple]:
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+class DuckDBBackend:
+    """Queries JSONL or Parquet logs in place with DuckDB (out of core, multi-threaded)."""
+
+    name = "duckdb"
+    date_expr = "CAST(CAST(ts AS DATE) AS VARCHAR)"
+    ts_param = "CAST(? AS TIMESTAMP)"
+
+    def __init__(self, log_file: str, threads: Optional[int] = None):
+        import duckdb
+        if binlog.is_binary_log(log_file):
+            raise ValueError("The duckdb backend reads JSONL or Parquet logs; use sqlite for binary logs")
+        self.log_file = log_file
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+
+    def prepare(self):
+        path = self.log_file.replace("'", "''")
+        if self.log_file.endswith(".parquet"):
+            source = f"read_parquet('{path}', union_by_name = true)"
+        else:
+            types = {name: "DOUBLE" if kind == "REAL" else "VARCHAR" for name, kind in COLUMNS}
+            types.update({"timestamp": "VARCHAR", "tags": "VARCHAR[]"})
+            del types["ts"]
+            columns = ", ".join(f"'{name}': '{kind}'" for name, kind in types.items())
+            source = f"read_json('{path}', format = 'newline_delimited', columns = {{{columns}}})"
+        self.conn.execute(f"""
+            CREATE OR REPLACE VIEW logs AS
+            SELECT row_number() OVER () AS seq,
+                   try_cast(regexp_replace("timestamp", '(Z|[+-][0-9][0-9]:[0-9][0-9])$', '') AS TIMESTAMP) AS ts,
+                   * EXCLUDE ("timestamp")
+            FROM {source}
+        """)
+
+    def set_pricing(self, rates: Dict[str, float]):
+        self.conn.execute("CREATE OR REPLACE TEMP TABLE pricing (model VARCHAR, input_rate DOUBLE)")
+        if rates:
+            self.conn.executemany("INSERT INTO pricing VALUES (?, ?)", list(rates.items()))
+
+    def tags_condition(self, tags: List[str]) -> Tuple[str, List[Any]]:
+        return "len(list_intersect(tags, CAST(? AS VARCHAR[]))) > 0", [list(tags)]
+
+    def execute(self, sql: str, params: List[Any]) -> List[Tuple]:
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def _duckdb_available() -> bool:
+    try:
+        import duckdb  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SQLAnalyticsEngine(AnalyticsEngine):
+    """AnalyticsEngine whose headline getters run as SQL in an embedded engine.
+
+    ``get_total_cost``, ``get_cost_by_model``, ``get_token_usage_stats``,
+    ``get_daily_trend``, ``get_success_rate``, ``get_failure_stats`` and
+    ``calculate_potential_cache_savings`` are compiled to SQL, so the log is
+    never loaded into memory as a DataFrame. Results match the pandas path,
+    including query filters, sampled-out totals and retention rollups
+    (which are small and read with pandas). Other getters work on
+    ``self.df`` and need ``load_data(materialize=True)``.
+
+    ``backend="duckdb"`` scans JSONL/Parquet files in place with DuckDB;
+    ``"sqlite"`` keeps an incrementally ingested sidecar SQLite database;
+    ``"auto"`` picks DuckDB when installed and the log is not binary.
+    """
+
+    def __init__(self, log_file: str = "genai_costs.jsonl", query: Optional[LogQuery] = None,
+                 backend: str = "auto", db_path: Optional[str] = None):
+        super().__init__(log_file, query=query)
+        if backend == "auto":
+            use_duckdb = _duckdb_available() and not binlog.is_binary_log(log_file)
+            backend = "duckdb" if use_duckdb else "sqlite"
+        if backend == "duckdb":
+            self.backend = DuckDBBackend(log_file)
+        elif backend == "sqlite":
+            self.backend = SQLiteBackend(log_file, db_path)
+        else:
+            raise ValueError(f"Unsupported SQL backend: {backend}")
+        self._active_query = query
+        self._prepared = False
+
+    def load_data(self, query: Optional[LogQuery] = None, materialize: bool = False) -> pd.DataFrame:
+        """Make the log queryable; with ``materialize=True`` also fill ``self.df``."""
+        self.rollups = load_rollups(self.log_file, query or self.query)
+        self._active_query = raw_query(self.log_file, query or self.query)
+        if not os.path.exists(self.log_file):
+            print(f"Warning: Log file {self.log_file} not found.")
+            return self.df
+        self.backend.prepare()
+        self.backend.set_pricing({m: p.get("input", 0) for m, p in self._pricing_ref.items()})
+        self._prepared = True
+        if materialize:
+            return super().load_data(query)
+        return self.df
+
+    def _where(self, records_only: bool = False, extra: str = "") -> Tuple[str, List[Any]]:
+        conditions, params = [], []
+        if records_only:
+            conditions.append(f"(record_type IS NULL OR record_type != '{SAMPLED_OUT}')")
+        query = self._active_query
+        if query is not None:
+            if query.since or query.until:
+                conditions.append("ts IS NOT NULL")
+            if query.since:
+                conditions.append(f"ts >= {self.backend.ts_param}")
+                params.append(query.since)
+            if query.until:
+                conditions.append(f"ts < {self.backend.ts_param}")
+                params.append(query.until)
+            for column, values in (("agent", query.agents), ("model", query.models)):
+                if values:
+                    conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                    params.extend(sorted(values))
+            if query.tags:
+                condition, tag_params = self.backend.tags_condition(sorted(query.tags))
+                conditions.append(condition)
+                params.extend(tag_params)
+        if extra:
+            conditions.append(extra)
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def _query(self, sql: str, params: List[Any]) -> List[Tuple]:
+        if not self._prepared:
+            return []
+        return self.backend.execute(sql, params)
+
+    # Calls a row stands for: sampled-out rows carry their own count
+    _CALLS = f"CASE WHEN record_type = '{SAMPLED_OUT}' THEN calls ELSE 1 END"
+
+    def _record_count(self) -> int:
+        where, params = self._where(records_only=True)
+        rows = self._query(f"SELECT COUNT(*) FROM logs {where}", params)
+        return rows[0][0] if rows else 0
+
+    def _has_data(self) -> bool:
+        return bool(self._record_count()) or not self.rollups.empty
+
+    def _rollup_sum(self, column: str) -> float:
+        if self.rollups.empty or column not in self.rollups.columns:
+            return 0
+        return self.rollups[column].sum()
+
+    def get_total_cost(self) -> float:
+        if not self._has_data():
+            return 0.0
+        where, params = self._where()
+        cost = self._query(f"SELECT COALESCE(SUM(cost_inr), 0) FROM logs {where}", params)
+        return (cost[0][0] if cost else 0.0) + self._rollup_sum("cost_inr")
+
+    def get_cost_by_model(self) -> Dict[str, float]:
+        if not self._has_data():
+            return {}
+        where, params = self._where(extra="model IS NOT NULL")
+        by_model = dict(self._query(
+            f"SELECT model, COALESCE(SUM(cost_inr), 0) FROM logs {where} GROUP BY model ORDER BY model",
+            params,
+        ))
+        if not self.rollups.empty:
+            for model, cost in self.rollups.groupby("model")["cost_inr"].sum().items():
+                by_model[model] = by_model.get(model, 0) + cost
+        return dict(sorted(by_model.items()))
+
+    def get_token_usage_stats(self) -> Dict[str, int]:
+        if not self._has_data():
+            return {"total_input": 0, "total_output": 0, "grand_total": 0}
+        where, params = self._where()
+        rows = self._query(
+            "SELECT COALESCE(SUM(tokens_in), 0), COALESCE(SUM(tokens_out), 0), "
+            f"COALESCE(SUM(tokens_total), 0) FROM logs {where}", params,
+        )
+        tokens_in, tokens_out, total = rows[0] if rows else (0, 0, 0)
+        return {
+            "total_input": int(tokens_in + self._rollup_sum("tokens_in")),
+            "total_output": int(tokens_out + self._rollup_sum("tokens_out")),
+            "grand_total": int(total + self._rollup_sum("tokens_total")),
+        }
+
+    def get_daily_trend(self) -> Dict[str, float]:
+        if not self._has_data():
+            return {}
+        date = self.backend.date_expr
+        where, params = self._where(extra="ts IS NOT NULL")
+        trend = {str(day): cost for day, cost in self._query(
+            f"SELECT {date} AS day, COALESCE(SUM(cost_inr), 0) FROM logs {where} GROUP BY day ORDER BY day",
+            params,
+        )}
+        if not self.rollups.empty:
+            for day, cost in self.rollups.groupby(self.rollups["timestamp"].dt.date)["cost_inr"].sum().items():
+                trend[str(day)] = trend.get(str(day), 0) + cost
+        return dict(sorted(trend.items()))
+
+    def _outcome_counts(self) -> Tuple[float, float, float]:
+        where, params = self._where()
+        rows = self._query(
+            f"SELECT COALESCE(SUM(CASE WHEN outcome = '{CANCELLED}' THEN 0 ELSE {self._CALLS} END), 0), "
+            f"COALESCE(SUM(CASE WHEN outcome IN ('success', '{COALESCED}') THEN {self._CALLS} ELSE 0 END), 0), "
+            "COALESCE(SUM(CASE WHEN outcome = 'failed' AND "
+            f"(record_type IS NULL OR record_type != '{SAMPLED_OUT}') THEN 1 ELSE 0 END), 0) "
+            f"FROM logs {where}", params,
+        )
+        total, success, failed = rows[0] if rows else (0, 0, 0)
+        return (total + self._rollup_sum("calls"), success + self._rollup_sum("successes"),
+                failed + self._rollup_sum("failed_calls"))
+
+    def get_success_rate(self) -> float:
+        if not self._has_data():
+            return 0.0
+        total, success, _ = self._outcome_counts()
+        return (success / total) * 100 if total > 0 else 0.0
+
+    def get_failure_stats(self) -> Dict[str, Any]:
+        if not self._has_data():
+            return {"count": 0, "rate": 0.0}
+        total, _, failed = self._outcome_counts()
+        rate = (failed / total) * 100 if total > 0 else 0.0
+        return {"count": int(failed), "rate": round(rate, 2)}
+
+    def calculate_potential_cache_savings(self) -> Dict[str, float]:
+        where, params = self._where(records_only=True,
+                                    extra="outcome = 'success' AND fingerprint IS NOT NULL")
+        rows = self._query(f"""
+            WITH ranked AS (
+                SELECT model, tokens_in, sample_weight,
+                       ROW_NUMBER() OVER (PARTITION BY fingerprint ORDER BY seq) AS occurrence
+                FROM logs {where}
+            )
+            SELECT COALESCE(SUM(COALESCE(tokens_in * pricing.input_rate, 0)
+                                * COALESCE(sample_weight, 1)), 0),
+                   COALESCE(SUM(COALESCE(sample_weight, 1)), 0)
+            FROM ranked LEFT JOIN pricing ON ranked.model = pricing.model
+            WHERE occurrence > 1
+        """, params)
+        if not rows:
+            return {"potential_savings": 0.0, "duplicate_count": 0}
+        input_cost, duplicates = rows[0]
+        return {
+            "potential_savings": round(input_cost * 0.90, 4),
+            "duplicate_count": int(round(duplicates)),
+        }
+
+
+def create_engine(log_file: str, backend: str = "pandas",
+                  query: Optional[LogQuery] = None) -> AnalyticsEngine:
+    """Build an analytics engine for the given backend name."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported analytics backend: {backend}")
+    if backend == "pandas":
+        return AnalyticsEngine(log_file, query=query)
+    return SQLAnalyticsEngine(log_file, query=query, backend=backend)
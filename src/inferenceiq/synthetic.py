@@ -0,0 +1,153 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from inferenceiq import binlog
+from inferenceiq.tracker import GenAICostTracker
+
+# (model, traffic share, failure rate, mean input tokens, mean output tokens)
+MODEL_MIX = [
+    ("gpt-4o-mini", 0.45, 0.04, 400, 150),
+    ("gpt-4o", 0.25, 0.08, 1200, 400),
+    ("claude-3-5-sonnet-20241022", 0.15, 0.06, 1500, 500),
+    ("claude-3-haiku-20240307", 0.10, 0.03, 300, 120),
+    ("o1", 0.05, 0.12, 2500, 1500),
+]
+AGENTS = ["billing_bot", "support_bot", "kyc_agent", "fraud_screener", "summarizer", "search_agent"]
+AGENT_WEIGHTS = [0.30, 0.25, 0.15, 0.10, 0.12, 0.08]
+TAGS = ["prod", "beta", "batch", "priority", "kyc", "retail", "corporate"]
+ERRORS = [("APITimeoutError", "Request timed out."), ("RateLimitError", "Rate limit reached"),
+          ("APIConnectionError", "Connection error."), ("BadRequestError", "context_length_exceeded")]
+
+# Relative traffic per hour of day (business-hours peak)
+DIURNAL = np.array([1, 1, 1, 1, 1, 2, 3, 5, 8, 10, 10, 9, 8, 9, 10, 10, 9, 7, 5, 4, 3, 2, 2, 1], dtype=float)
+
+
+class SyntheticLogGenerator:
+    """Generates realistic tracker logs at scale for benchmarks and demos.
+
+    Rows are produced in vectorized chunks so memory stays bounded for 1M to
+    100M rows. Distributions: weighted model/agent mix, Zipf-distributed
+    customers and prompts (so duplicates occur naturally), per-model failure
+    rates, log-normal token counts and a diurnal timestamp profile.
+    """
+
+    def __init__(self, seed: int = 42, start: Optional[datetime] = None, days: int = 30,
+                 customers: int = 100_000, distinct_prompts: int = 1_000_000):
+        self.rng = np.random.default_rng(seed)
+        self.start = start or datetime(2026, 1, 1)
+        self.days = days
+        self.customers = customers
+        self.distinct_prompts = distinct_prompts
+        self.pricing = GenAICostTracker(api_key="dummy", provider=None).PRICING_INR
+
+        self._models = [m[0] for m in MODEL_MIX]
+        self._model_share = np.array([m[1] for m in MODEL_MIX])
+        self._failure_rate = np.array([m[2] for m in MODEL_MIX])
+        self._mean_in = np.array([m[3] for m in MODEL_MIX], dtype=float)
+        self._mean_out = np.array([m[4] for m in MODEL_MIX], dtype=float)
+        self._rate_in = np.array([self.pricing.get(m, {}).get("input", 0.0) for m in self._models])
+        self._rate_out = np.array([self.pricing.get(m, {}).get("output", 0.0) for m in self._models])
+        # Cumulative traffic over every hour of the period, for time-ordered sampling
+        intensity = np.tile(DIURNAL, days)
+        self._hour_cdf = np.concatenate(([0.0], np.cumsum(intensity))) / intensity.sum()
+        self._counter = 0
+
+    def _zipf(self, size: int, upper: int) -> np.ndarray:
+        return (self.rng.zipf(1.3, size) - 1) % upper
+
+    def iter_chunks(self, rows: int, chunk_size: int = 100_000) -> Iterator[List[Dict]]:
+        """Yield time-ordered lists of log entries, ``chunk_size`` at a time."""
+        done = 0
+        while done < rows:
+            n = min(chunk_size, rows - done)
+            yield self._chunk(n, done / rows, (done + n) / rows)
+            done += n
+
+    def _chunk(self, n: int, q_start: float, q_end: float) -> List[Dict]:
+        rng = self.rng
+        model_idx = rng.choice(len(self._models), size=n, p=self._model_share)
+        agent_idx = rng.choice(len(AGENTS), size=n, p=AGENT_WEIGHTS)
+        failed = rng.random(n) < self._failure_rate[model_idx]
+
+        tokens_in = np.maximum(1, rng.lognormal(np.log(self._mean_in[model_idx]), 0.6)).astype(np.int64)
+        tokens_out = np.maximum(1, rng.lognormal(np.log(self._mean_out[model_idx]), 0.8)).astype(np.int64)
+        cost = tokens_in * self._rate_in[model_idx] + tokens_out * self._rate_out[model_idx]
+        latency = np.round(rng.lognormal(np.log(300 + tokens_out * 15.0), 0.4), 2)
+
+        # Inverse-CDF sampling of the diurnal profile keeps the file time-ordered
+        quantiles = np.sort(rng.uniform(q_start, q_end, n))
+        hours = np.interp(quantiles, self._hour_cdf, np.arange(len(self._hour_cdf)))
+        micros = (hours * 3600 * 1_000_000).astype(np.int64)
+
+        customers = self._zipf(n, self.customers)
+        prompts = self._zipf(n, self.distinct_prompts)
+        sessions = rng.integers(0, max(1, n // 5), n)
+        tag_a = rng.integers(0, len(TAGS), n)
+        tag_b = rng.integers(-len(TAGS), len(TAGS), n)
+        error_idx = rng.integers(0, len(ERRORS), n)
+
+        # Plain lists index far faster than numpy scalars in the row loop
+        model_idx, agent_idx, failed = model_idx.tolist(), agent_idx.tolist(), failed.tolist()
+        tokens_in, tokens_out = tokens_in.tolist(), tokens_out.tolist()
+        cost, latency, micros = cost.tolist(), latency.tolist(), micros.tolist()
+        customers, prompts, sessions = customers.tolist(), prompts.tolist(), sessions.tolist()
+        tag_a, tag_b, error_idx = tag_a.tolist(), tag_b.tolist(), error_idx.tolist()
+
+        entries = []
+        base = self.start
+        for i in range(n):
+            self._counter += 1
+            timestamp = base + timedelta(microseconds=micros[i])
+            tags = [TAGS[tag_a[i]]]
+            if tag_b[i] >= 0 and tag_b[i] != tag_a[i]:
+                tags.append(TAGS[tag_b[i]])
+            entry = {
+                "timestamp": timestamp.isoformat(),
+                "interaction_id": f"int_{self._counter:012d}",
+                "agent": AGENTS[agent_idx[i]],
+                "model": self._models[model_idx[i]],
+            }
+            if failed[i]:
+                error_type, error = ERRORS[error_idx[i]]
+                entry.update({
+                    "outcome": "failed",
+                    "error_type": error_type,
+                    "error": error,
+                    "latency_ms": latency[i],
+                })
+            else:
+                entry.update({
+                    "tokens_in": tokens_in[i],
+                    "tokens_out": tokens_out[i],
+                    "tokens_total": tokens_in[i] + tokens_out[i],
+                    "cost_inr": round(cost[i], 4),
+                    "latency_ms": latency[i],
+                    "outcome": "success",
+                })
+            entry.update({
+                "user_id": f"user_{customers[i] * 7 % 999_983}",
+                "session_id": f"sess_{self._counter // 1_000_000}_{sessions[i]}",
+                "tags": tags,
+                "fingerprint": f"{prompts[i]:032x}",
+                "customer_id": f"cust_{customers[i]}",
+            })
+            entries.append(entry)
+        return entries
+
+    def write(self, path: str, rows: int, format: str = "jsonl",
+              chunk_size: int = 100_000) -> int:
+        """Stream ``rows`` entries to ``path`` as JSONL or binary. Returns bytes."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            for chunk in self.iter_chunks(rows, chunk_size):
+                if format == "binary":
+                    binlog.write_segment(f, chunk)
+                else:
+                    f.write("".join(json.dumps(e) + "\n" for e in chunk).encode())
+        return os.path.getsize(path)
@@ -0,0 +1,130 @@
+import contextlib
+import contextvars
+import time
+from typing import Dict, Iterator, Optional
+
+# Phases of a tracked call, in order; logged as ``phase_<name>_ms``
+PHASES = ("preprocess", "queue", "pool_wait", "connect", "ttfb", "transfer", "sdk", "parse", "log")
+# Who a phase's time belongs to: our process, the network path, or the provider
+PHASE_OWNERS = {
+    "preprocess": "tracker", "queue": "tracker", "sdk": "tracker", "parse": "tracker", "log": "tracker",
+    "pool_wait": "network", "connect": "network", "transfer": "network",
+    "ttfb": "provider",
+}
+
+_current: contextvars.ContextVar[Optional["PhaseTimer"]] = contextvars.ContextVar(
+    "inferenceiq_phase_timer", default=None
+)
+
+
+def phase_field(phase: str) -> str:
+    return f"phase_{phase}_ms"
+
+
+def current_timer() -> Optional["PhaseTimer"]:
+    """Timer of the call being dispatched in this thread or task, if any."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def activate(timer: "PhaseTimer") -> Iterator["PhaseTimer"]:
+    """Route HTTP hook events in this context to ``timer``."""
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def _ms(start: Optional[int], end: Optional[int]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return max(0, end - start) / 1e6
+
+
+class PhaseTimer:
+    """Splits one call's wall time into :data:`PHASES` using ``perf_counter_ns``.
+
+    The tracker marks its own stage boundaries (``prepared``, ``admitted``,
+    ``received``, ``parsed``); :class:`~inferenceiq.clients.ClientRegistry`
+    feeds the HTTP request hook and the transport's trace events. Network
+    phases come from the last attempt: ``pool_wait`` runs from the request
+    hook to the first connection event (httpcore has no pool-acquired event,
+    so it includes transport overhead), ``connect`` is TCP plus TLS setup,
+    ``ttfb`` runs from sending the request to the response headers and
+    ``transfer`` covers the response body. Whatever else the SDK call took
+    (request building, retries and their backoff, closing) is ``sdk``.
+    """
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.marks: Dict[str, int] = {}
+        self.events: Dict[str, int] = {}
+        self.request_ns: Optional[int] = None
+        self.attempts = 0
+
+    def mark(self, name: str):
+        self.marks[name] = time.perf_counter_ns()
+
+    def since_ms(self, name: str) -> float:
+        return _ms(self.marks.get(name, self.start_ns), time.perf_counter_ns())
+
+    def on_request(self):
+        """An HTTP attempt is starting; earlier attempts' events are dropped."""
+        self.attempts += 1
+        self.request_ns = time.perf_counter_ns()
+        self.events = {}
+
+    def on_trace(self, event: str):
+        now = time.perf_counter_ns()
+        # "http11.send_request_headers.started" and "http2.…" time the same step
+        protocol, _, rest = event.partition(".")
+        if protocol in ("http11", "http2"):
+            event = rest
+        self.events.setdefault(event, now)
+
+    def _event_ms(self, step: str) -> Optional[float]:
+        return _ms(self.events.get(f"{step}.started"), self.events.get(f"{step}.complete"))
+
+    def _network(self) -> Dict[str, float]:
+        if self.request_ns is None:
+            return {}
+        events = self.events
+        network = {}
+        first = events.get("connection.connect_tcp.started", events.get("send_request_headers.started"))
+        if first is not None:
+            network["pool_wait"] = _ms(self.request_ns, first)
+        setup = [ms for ms in (self._event_ms("connection.connect_tcp"),
+                               self._event_ms("connection.start_tls")) if ms is not None]
+        if setup:
+            network["connect"] = sum(setup)
+        ttfb = _ms(events.get("send_request_headers.started"), events.get("receive_response_headers.complete"))
+        if ttfb is not None:
+            network["ttfb"] = ttfb
+        transfer = self._event_ms("receive_response_body")
+        if transfer is not None:
+            network["transfer"] = transfer
+        return network
+
+    def phases(self) -> Dict[str, float]:
+        """Phase durations in ms known so far, keyed by phase name."""
+        marks = self.marks
+        phases = {}
+        if "prepared" in marks:
+            phases["preprocess"] = _ms(self.start_ns, marks["prepared"])
+        if "admitted" in marks:
+            phases["queue"] = _ms(marks.get("prepared"), marks["admitted"])
+        dispatch = _ms(marks.get("admitted"), marks.get("received"))
+        if dispatch is not None:
+            network = self._network()
+            phases.update(network)
+            phases["sdk"] = max(0.0, dispatch - sum(network.values()))
+        parse = _ms(marks.get("received"), marks.get("parsed"))
+        if parse is not None:
+            phases["parse"] = parse
+        return phases
+
+    def fields(self) -> Dict[str, float]:
+        """:meth:`phases` as log entry fields, in phase order."""
+        phases = self.phases()
+        return {phase_field(p): round(phases[p], 3) for p in PHASES if p in phases}
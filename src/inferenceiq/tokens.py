@@ -0,0 +1,224 @@
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Chat framing: tokens added per message and to prime the reply
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+# Assumed completion budget when a call does not set max_tokens
+DEFAULT_MAX_TOKENS = 1024
+
+# Model prefix -> tiktoken encoding. Models not listed use the heuristic.
+ENCODINGS = [
+    ("gpt-4o", "o200k_base"),
+    ("gpt-4.1", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+]
+# Characters per token for the heuristic, by model family
+CHARS_PER_TOKEN = {"claude": 3.5, "default": 4.0}
+
+
+class PromptTooLargeError(ValueError):
+    """A call was refused before dispatch because it exceeds the agent's limits."""
+
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        # Multi-part content: count the text parts only
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+def _opens_exchange(message: Dict[str, Any]) -> bool:
+    content = message.get("content")
+    # Anthropic tool results are user turns that continue the exchange
+    return message.get("role") == "user" and not (
+        isinstance(content, list)
+        and any(isinstance(part, dict) and part.get("type") == "tool_result" for part in content)
+    )
+
+
+def exchanges(messages: List[Dict[str, Any]]) -> List[List[int]]:
+    """Indices of the non-system messages, grouped into exchanges.
+
+    An exchange runs from a user turn up to the next one, so it holds the
+    assistant reply and any tool calls and results. Dropping whole
+    exchanges keeps the history starting with a user turn.
+    """
+    groups: List[List[int]] = []
+    for i, message in enumerate(messages):
+        if message.get("role") == "system":
+            continue
+        if not groups or _opens_exchange(message):
+            groups.append([])
+        groups[-1].append(i)
+    return groups
+
+
+class TokenEstimator:
+    """Fast local token counts for pre-flight checks.
+
+    Uses the model family's tiktoken encoding when ``tiktoken`` is installed
+    (encoders are loaded once and shared), otherwise an O(n) character
+    heuristic: ASCII text at the family's characters-per-token ratio, every
+    other character as one token.
+    """
+
+    _encoders: Dict[str, Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, use_tiktoken: bool = True):
+        self.use_tiktoken = use_tiktoken
+
+    @staticmethod
+    def encoding_name(model: Optional[str]) -> Optional[str]:
+        if not model:
+            return None
+        for prefix, name in ENCODINGS:
+            if model.startswith(prefix):
+                return name
+        return None
+
+    def _encoder(self, model: Optional[str]):
+        name = self.encoding_name(model) if self.use_tiktoken else None
+        if name is None:
+            return None
+        with self._lock:
+            if name not in self._encoders:
+                try:
+                    import tiktoken
+                    self._encoders[name] = tiktoken.get_encoding(name)
+                except Exception:
+                    # tiktoken missing or its encoding files unavailable offline
+                    self._encoders[name] = None
+            return self._encoders[name]
+
+    @staticmethod
+    def heuristic_count(text: str, chars_per_token: float = CHARS_PER_TOKEN["default"]) -> int:
+        if not text:
+            return 0
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return math.ceil(ascii_chars / chars_per_token) + (len(text) - ascii_chars)
+
+    def count_text(self, text: str, model: Optional[str] = None) -> int:
+        """Estimated tokens in a plain string."""
+        encoder = self._encoder(model)
+        if encoder is not None:
+            return len(encoder.encode(text, disallowed_special=()))
+        ratio = CHARS_PER_TOKEN["claude"] if model and "claude" in model else CHARS_PER_TOKEN["default"]
+        return self.heuristic_count(text, ratio)
+
+    def count_messages(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> int:
+        """Estimated input tokens of a chat request, including message framing."""
+        tokens = REPLY_OVERHEAD
+        for message in messages:
+            tokens += MESSAGE_OVERHEAD + self.count_text(message_text(message), model)
+        return tokens
+
+    def estimate(self, model: str, messages: List[Dict[str, Any]], pricing: Dict[str, Dict[str, float]],
+                 max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Input tokens and the cost ceiling (input + full ``max_tokens`` output)."""
+        return self.ceiling(model, self.count_messages(messages, model), pricing, max_tokens)
+
+    @staticmethod
+    def ceiling(model: str, tokens_in: int, pricing: Dict[str, Dict[str, float]],
+                max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Estimate fields for an already-counted prompt of ``tokens_in`` tokens."""
+        max_out = max_tokens or DEFAULT_MAX_TOKENS
+        rates = pricing.get(model, {})
+        ceiling = tokens_in * rates.get("input", 0) + max_out * rates.get("output", 0)
+        return {"tokens_in_estimate": tokens_in, "cost_ceiling_inr": round(ceiling, 4)}
+
+
+_default_estimator = TokenEstimator()
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Estimated tokens in ``text`` using the shared estimator."""
+    return _default_estimator.count_text(text, model)
+
+
+class PromptGuard:
+    """Per-agent prompt-size and cost-ceiling limits enforced before dispatch.
+
+    Attach one to a tracker (trackers are per agent). When a call exceeds
+    ``max_input_tokens`` or ``max_cost_inr`` the guard applies ``action``:
+
+    * ``"trim"`` - drop the oldest user/assistant exchanges (see
+      :func:`exchanges`) until the call fits; refuses if the latest exchange
+      alone is still too large.
+    * ``"refuse"`` - raise :class:`PromptTooLargeError` without calling the
+      provider.
+    * ``"route"`` - send the call to ``fallback_model`` instead; only the cost
+      ceiling is re-checked for the fallback.
+    """
+
+    ACTIONS = ("trim", "refuse", "route")
+
+    def __init__(self, max_input_tokens: Optional[int] = None, max_cost_inr: Optional[float] = None,
+                 action: str = "trim", fallback_model: Optional[str] = None,
+                 estimator: Optional[TokenEstimator] = None):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unsupported guard action: {action}")
+        if action == "route" and not fallback_model:
+            raise ValueError("action='route' requires a fallback_model")
+        self.max_input_tokens = max_input_tokens
+        self.max_cost_inr = max_cost_inr
+        self.action = action
+        self.fallback_model = fallback_model
+        self.estimator = estimator or _default_estimator
+
+    def _violation(self, estimate: Dict[str, Any], check_tokens: bool = True) -> Optional[str]:
+        if check_tokens and self.max_input_tokens is not None \
+                and estimate["tokens_in_estimate"] > self.max_input_tokens:
+            return f"~{estimate['tokens_in_estimate']} input tokens exceeds limit of {self.max_input_tokens}"
+        if self.max_cost_inr is not None and estimate["cost_ceiling_inr"] > self.max_cost_inr:
+            return f"cost ceiling INR {estimate['cost_ceiling_inr']} exceeds limit of {self.max_cost_inr}"
+        return None
+
+    def apply(self, model: str, messages: List[Dict[str, Any]], pricing: Dict[str, Dict[str, float]],
+              max_tokens: Optional[int] = None) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        """Return the (model, messages) to send and the estimate fields to log.
+
+        Raises :class:`PromptTooLargeError` if the call must be refused.
+        """
+        estimate = self.estimator.estimate(model, messages, pricing, max_tokens)
+        violation = self._violation(estimate)
+        if violation is None:
+            return model, messages, estimate
+
+        if self.action == "route":
+            routed = self.estimator.estimate(self.fallback_model, messages, pricing, max_tokens)
+            routed.update({"guard_action": "routed", "requested_model": model})
+            violation = self._violation(routed, check_tokens=False)
+            if violation is None:
+                return self.fallback_model, messages, routed
+            raise PromptTooLargeError(f"Refused: {violation}", {**routed, "guard_action": "refused"})
+
+        if self.action == "trim":
+            # Count each message once, then subtract as the oldest exchanges are dropped
+            counts = [MESSAGE_OVERHEAD + self.estimator.count_text(message_text(m), model) for m in messages]
+            tokens_in = REPLY_OVERHEAD + sum(counts)
+            dropped = set()
+            for exchange in exchanges(messages)[:-1]:
+                if violation is None:
+                    break
+                dropped.update(exchange)
+                tokens_in -= sum(counts[i] for i in exchange)
+                estimate = self.estimator.ceiling(model, tokens_in, pricing, max_tokens)
+                violation = self._violation(estimate)
+            if violation is None:
+                trimmed = [m for i, m in enumerate(messages) if i not in dropped]
+                estimate.update({"guard_action": "trimmed",
+                                 "messages_dropped": len(messages) - len(trimmed)})
+                return model, trimmed, estimate
+
+        raise PromptTooLargeError(f"Refused: {violation}", {**estimate, "guard_action": "refused"})
@@ -1,52 +1,151 @@
+import asyncio
 import json
+import sys
 import time
+import uuid
 from datetime import datetime
-from openai import OpenAI
+from inferenceiq.clients import get_default_registry
+from inferenceiq.hedging import CANCELLED
+from inferenceiq.metrics import get_default_metrics
+from inferenceiq.prefixes import prefix_fields
+from inferenceiq.sampling import SampledOutCounter
+from inferenceiq.scheduler import is_rate_limit_error
+from inferenceiq.singleflight import COALESCED
+from inferenceiq.timing import PhaseTimer, activate, phase_field
+from inferenceiq.tokens import PromptTooLargeError, TokenEstimator
+
+
+def may_be_billed(error: BaseException) -> bool:
+    """True for failures the provider may have billed: timeouts and 5xx after dispatch.
+
+    Rejections (429, 4xx) and connection errors are not billed.
+    """
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
 
 class GenAICostTracker:
     """Production-ready cost tracking wrapper for LLM APIs"""
+
+    # OpenAI and Anthropic batch APIs bill every token at half price
+    BATCH_DISCOUNT = 0.5
     
-    def __init__(self, api_key, provider="openai", agent_name="default"):
+    def __init__(self, api_key, provider="openai", agent_name="default", base_url=None,
+                 client_registry=None, prompt_guard=None, context_compressor=None, metrics=None,
+                 tracer=None, sampling=None, single_flight=None, scheduler=None, hedge_policy=None, sink=None,
+                 prefix_hashing=False):
         self.api_key = api_key
         self.provider = provider
         self.agent_name = agent_name
+        self.base_url = base_url
         self.logs = []
+        self._batch_queue = None
+        # Optional PromptGuard enforcing this agent's prompt-size limits before dispatch
+        self.prompt_guard = prompt_guard
+        # Optional ContextCompressor pruning history before the guard and dispatch
+        self.context_compressor = context_compressor
         
-        if provider == "openai":
-            self.client = OpenAI(api_key=api_key)
-        elif provider == "anthropic":
-            import anthropic
-            self.client = anthropic.Anthropic(api_key=api_key)
-        else:
-            self.client = None
+        # Borrow a shared client (and its connection pool) instead of creating one per tracker
+        self.client_registry = client_registry or get_default_registry()
+        self.client = self.client_registry.get_client(provider, api_key, base_url)
+        self._async_client = None
+        # In-process counters for the /metrics endpoint or textfile collector
+        self.metrics = metrics or get_default_metrics()
+        # Optional otel.CallTracer turning every call into an OpenTelemetry span
+        self.tracer = tracer
+        # Optional SamplingPolicy; dropped records are kept as exact per-hour totals
+        self.sampling = sampling
+        self._sampled_out = SampledOutCounter()
+        # Optional SingleFlight sharing one upstream request between identical concurrent calls
+        self.single_flight = single_flight
+        # Optional RateLimitScheduler admitting calls under provider RPM/TPM limits
+        self.scheduler = scheduler
+        # Optional HedgePolicy for acall_llm: backup requests against tail latency
+        self.hedge_policy = hedge_policy
+        # Optional collector.CollectorSink also shipping kept entries to a collect service
+        self.sink = sink
+        # Log prefix_hashes/prefix_tokens of each prompt for shared-prefix (prompt cache) analysis
+        self.prefix_hashing = prefix_hashing
+        self._estimator = TokenEstimator()
         
         # ✅ LATEST PRICING (January 2026) - Update from official pricing pages
+        # "cached_input" prices prompt-cache reads, "cache_write" prompt-cache writes;
+        # models without them bill those tokens at the plain input rate.
         self.PRICING_INR = {
-            # OpenAI
-            "gpt-4o": {"input": 0.0020750, "output": 0.0083000},  # $2.50/$10 * 83
-            "gpt-4o-mini": {"input": 0.0001245, "output": 0.0004980},  # $0.15/$0.60 * 83
+            # OpenAI (cached input at 50%, no write surcharge)
+            "gpt-4o": {"input": 0.0020750, "output": 0.0083000, "cached_input": 0.0010375},  # $2.50/$10 * 83
+            "gpt-4o-mini": {"input": 0.0001245, "output": 0.0004980, "cached_input": 0.00006225},  # $0.15/$0.60 * 83
             "gpt-4-turbo": {"input": 0.0083000, "output": 0.0249000},  # $10/$30 * 83
-            "o1": {"input": 0.0124500, "output": 0.0498000},  # $15/$60 * 83
+            "o1": {"input": 0.0124500, "output": 0.0498000, "cached_input": 0.0062250},  # $15/$60 * 83
             
-            # Anthropic
-            "claude-3-5-sonnet-20241022": {"input": 0.0024900, "output": 0.0124500},  # $3/$15 * 83
-            "claude-3-opus-20240229": {"input": 0.0124500, "output": 0.0622500},  # $15/$75 * 83
-            "claude-3-haiku-20240307": {"input": 0.0002075, "output": 0.0010375},  # $0.25/$1.25 * 83
+            # Anthropic (cache reads at 10%, cache writes at 125% of input)
+            "claude-3-5-sonnet-20241022": {"input": 0.0024900, "output": 0.0124500,
+                                           "cached_input": 0.0002490, "cache_write": 0.0031125},  # $3/$15 * 83
+            "claude-3-opus-20240229": {"input": 0.0124500, "output": 0.0622500,
+                                       "cached_input": 0.0012450, "cache_write": 0.0155625},  # $15/$75 * 83
+            "claude-3-haiku-20240307": {"input": 0.0002075, "output": 0.0010375,
+                                        "cached_input": 0.00002075, "cache_write": 0.000259375},  # $0.25/$1.25 * 83
             
             # AWS Bedrock (same models, AWS pricing)
-            "anthropic.claude-3-5-sonnet-20241022-v2:0": {"input": 0.0024900, "output": 0.0124500},
-            "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.0002075, "output": 0.0010375},
+            "anthropic.claude-3-5-sonnet-20241022-v2:0": {"input": 0.0024900, "output": 0.0124500,
+                                                          "cached_input": 0.0002490, "cache_write": 0.0031125},
+            "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.0002075, "output": 0.0010375,
+                                                       "cached_input": 0.00002075, "cache_write": 0.000259375},
         }
 
-    def calculate_cost(self, model, tokens_in, tokens_out):
-        """Calculate cost in INR based on model and token usage"""
+    def calculate_cost(self, model, tokens_in, tokens_out, cached_tokens=0, cache_write_tokens=0,
+                       batch=False):
+        """Calculate cost in INR based on model and token usage.
+
+        ``tokens_in`` is the total prompt size; ``cached_tokens`` and
+        ``cache_write_tokens`` are the parts of it served from / written to the
+        provider prompt cache and are priced at their own rates. ``batch``
+        applies the batch API discount.
+        """
         pricing = self.PRICING_INR.get(model, {})
+        input_rate = pricing.get("input", 0)
+        uncached = tokens_in - cached_tokens - cache_write_tokens
         cost_inr = (
-            tokens_in * pricing.get("input", 0) + 
+            uncached * input_rate +
+            cached_tokens * pricing.get("cached_input", input_rate) +
+            cache_write_tokens * pricing.get("cache_write", input_rate) +
             tokens_out * pricing.get("output", 0)
         )
+        if batch:
+            cost_inr *= self.BATCH_DISCOUNT
         return cost_inr
 
+    @staticmethod
+    def _usage_count(obj, *path):
+        """Read an optional integer usage field, 0 if absent."""
+        for name in path:
+            obj = getattr(obj, name, None)
+            if obj is None:
+                return 0
+        return obj if isinstance(obj, int) and not isinstance(obj, bool) else 0
+
+    def _extract_usage(self, response):
+        """Normalize provider usage to total input/output plus cache breakdown."""
+        if self.provider == "openai":
+            # prompt_tokens already includes the cached part
+            return {
+                "tokens_in": response.usage.prompt_tokens,
+                "tokens_out": response.usage.completion_tokens,
+                "tokens_cached": self._usage_count(response.usage, "prompt_tokens_details", "cached_tokens"),
+                "tokens_cache_write": 0,
+            }
+        # Anthropic reports cache reads and writes separately from input_tokens
+        cached = self._usage_count(response.usage, "cache_read_input_tokens")
+        cache_write = self._usage_count(response.usage, "cache_creation_input_tokens")
+        return {
+            "tokens_in": response.usage.input_tokens + cached + cache_write,
+            "tokens_out": response.usage.output_tokens,
+            "tokens_cached": cached,
+            "tokens_cache_write": cache_write,
+        }
+
     def _compute_fingerprint(self, messages):
         """Generate a hash of the input messages for duplicate detection"""
         try:
@@ -57,100 +156,534 @@ class GenAICostTracker:
         except Exception:
             return "unknown"
 
-    def call_llm(self, model, messages, max_tokens=None, metadata=None, user_id=None, session_id=None, tags=None):
-        """Unified LLM call with automatic cost tracking and compliance logging"""
-        start_time = time.time()
-        interaction_id = f"int_{int(time.time() * 1000)}"
-        fingerprint = self._compute_fingerprint(messages)
-        
-        # Prepare compliance metadata
-        compliance_data = {
+    def _new_interaction_id(self):
+        # Random suffix keeps ids unique for audit lookups within the same millisecond
+        return f"int_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+
+    def _compliance_data(self, messages, user_id=None, session_id=None, tags=None):
+        return {
             "user_id": user_id,
             "session_id": session_id,
             "tags": tags or [],
-            "fingerprint": fingerprint
+            "fingerprint": self._compute_fingerprint(messages)
+        }
+
+    def _success_entry(self, interaction_id, model, usage, cost_inr, latency_ms,
+                       compliance_data, metadata=None, **extra):
+        """Log entry for a completed call; ``extra`` fields precede compliance data."""
+        tokens_in = usage["tokens_in"]
+        tokens_out = usage["tokens_out"]
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "interaction_id": interaction_id,
+            "agent": self.agent_name,
+            "provider": self.provider,
+            "model": model,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_total": tokens_in + tokens_out,
+            "tokens_cached": usage["tokens_cached"],
+            "tokens_cache_write": usage["tokens_cache_write"],
+            "tokens_uncached": tokens_in - usage["tokens_cached"] - usage["tokens_cache_write"],
+            "cost_inr": round(cost_inr, 4),
+            "latency_ms": round(latency_ms, 2),
+            "outcome": "success",
+            **extra,
+            **compliance_data,
+            **(metadata or {}),
+        }
+
+    def _failure_entry(self, interaction_id, model, error_type, error, latency_ms,
+                       compliance_data, metadata=None, tokens_in=None, **extra):
+        """Log entry for a failed call.
+
+        Failures carry no billed usage. One that may still have been billed
+        (``tokens_in`` is its estimated prompt, see :func:`may_be_billed`)
+        logs the prompt's cost as ``failed_cost_inr``: the failure waste
+        analytics report, kept out of ``cost_inr`` totals.
+        """
+        usage = {}
+        if tokens_in is not None:
+            usage = {
+                "tokens_in_estimate": tokens_in,
+                "failed_cost_inr": round(self.calculate_cost(model, tokens_in, 0), 4),
+            }
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "interaction_id": interaction_id,
+            "agent": self.agent_name,
+            "provider": self.provider,
+            "model": model,
+            **usage,
+            "outcome": "failed",
+            "error_type": error_type,
+            "error": error,
+            "latency_ms": round(latency_ms, 2),
+            **extra,
+            **compliance_data,
+            **(metadata or {}),
+        }
+
+    def _coalesced_entry(self, interaction_id, result, latency_ms, compliance_data,
+                         metadata=None, **extra):
+        """Log entry for a call that shared an identical in-flight call's response (no cost)."""
+        usage = result["usage"]
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "interaction_id": interaction_id,
+            "agent": self.agent_name,
+            "provider": self.provider,
+            "model": result["model"],
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "tokens_total": 0,
+            "cost_inr": 0.0,
+            "latency_ms": round(latency_ms, 2),
+            "outcome": COALESCED,
+            "coalesced_with": result["interaction_id"],
+            "tokens_saved": usage["tokens_in"] + usage["tokens_out"],
+            "cost_saved_inr": round(result["cost_inr"], 4),
+            **extra,
+            **compliance_data,
+            **(metadata or {}),
+        }
+
+    def _cancelled_entry(self, interaction_id, model, tokens_in, latency_ms, compliance_data,
+                         metadata=None, **extra):
+        """Log entry for a call cancelled after dispatch, billed for its estimated prompt."""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "interaction_id": interaction_id,
+            "agent": self.agent_name,
+            "provider": self.provider,
+            "model": model,
+            "tokens_in": tokens_in,
+            "tokens_out": 0,
+            "tokens_total": tokens_in,
+            "cost_inr": round(self.calculate_cost(model, tokens_in, 0), 4),
+            "latency_ms": round(latency_ms, 2),
+            "outcome": CANCELLED,
+            "tokens_estimated": True,
+            **extra,
+            **compliance_data,
+            **(metadata or {}),
         }
+
+    @property
+    def async_client(self):
+        """Async SDK client for :meth:`acall_llm`, borrowed from the client registry."""
+        if self._async_client is None:
+            self._async_client = self.client_registry.get_client(
+                self.provider, self.api_key, self.base_url, asynchronous=True
+            )
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+
+    def _prepare(self, model, messages, max_tokens, info):
+        """Run the compression stage and prompt guard; their stats go into ``info``.
+
+        With ``prefix_hashing`` the prefixes of the messages actually sent are
+        hashed too.
+        """
+        if self.context_compressor is not None:
+            messages, stats = self.context_compressor.compress(messages, model)
+            info.update(stats)
+        if self.prompt_guard is not None:
+            model, messages, guard_info = self.prompt_guard.apply(
+                model, messages, self.PRICING_INR, max_tokens
+            )
+            info.update(guard_info)
+        if self.prefix_hashing:
+            info.update(prefix_fields(messages, model, self._estimator))
+        return model, messages
+
+    def _request(self, client, model, messages, max_tokens):
+        """SDK resource and arguments for one chat call (same surface for sync and async clients)."""
+        if self.provider == "openai":
+            return client.chat.completions, dict(model=model, messages=messages, max_tokens=max_tokens)
+        if self.provider == "anthropic":
+            return client.messages, dict(model=model, max_tokens=max_tokens or 1024, messages=messages)
+        raise ValueError(f"Unsupported provider: {self.provider}")
+
+    def _result(self, interaction_id, model, response):
+        """Content, usage and cost of a provider response."""
+        if self.provider == "openai":
+            content = response.choices[0].message.content
+        else:
+            content = response.content[0].text
+        usage = self._extract_usage(response)
+        cost_inr = self.calculate_cost(
+            model, usage["tokens_in"], usage["tokens_out"],
+            cached_tokens=usage["tokens_cached"],
+            cache_write_tokens=usage["tokens_cache_write"],
+        )
+        return {"interaction_id": interaction_id, "model": model, "content": content,
+                "usage": usage, "cost_inr": cost_inr}
+
+    def _admit(self, model, messages, max_tokens, priority, info):
+        if self.scheduler is None:
+            return None
+        ticket = self.scheduler.acquire(
+            self.provider, model, self.scheduler.reservation(model, messages, max_tokens), lane=priority
+        )
+        info.update(queue_wait_ms=round(ticket.queue_wait_ms, 2), priority=ticket.lane)
+        return ticket
+
+    async def _aadmit(self, model, messages, max_tokens, priority, info):
+        if self.scheduler is None:
+            return None
+        ticket = await self.scheduler.aacquire(
+            self.provider, model, self.scheduler.reservation(model, messages, max_tokens), lane=priority
+        )
+        info.update(queue_wait_ms=round(ticket.queue_wait_ms, 2), priority=ticket.lane)
+        return ticket
+
+    def _settle(self, ticket, result=None, error=None):
+        """Report actual usage (or a 429) of an admitted call back to the scheduler."""
+        if ticket is None:
+            return
+        if result is not None:
+            usage = result["usage"]
+            self.scheduler.settle(ticket, usage["tokens_in"] + usage["tokens_out"])
+        elif is_rate_limit_error(error):
+            self.scheduler.throttled(ticket)
+
+    def _dispatch(self, api, kwargs, timer):
+        with activate(timer):
+            try:
+                return api.create(**kwargs)
+            finally:
+                timer.mark("received")
+
+    async def _adispatch(self, api, kwargs, timer):
+        with activate(timer):
+            try:
+                return await api.create(**kwargs)
+            finally:
+                timer.mark("received")
+
+    def _execute(self, interaction_id, model, messages, max_tokens, info, priority=None, timer=None):
+        timer = timer or PhaseTimer()
+        model, messages = self._prepare(model, messages, max_tokens, info)
+        api, kwargs = self._request(self.client, model, messages, max_tokens)
+        timer.mark("prepared")
+        ticket = self._admit(model, messages, max_tokens, priority, info)
+        timer.mark("admitted")
+        try:
+            result = self._result(interaction_id, model, self._dispatch(api, kwargs, timer))
+            timer.mark("parsed")
+        except Exception as e:
+            if may_be_billed(e):
+                # The prompt may already have been processed
+                info["_billed_tokens_in"] = self._estimator.count_messages(messages, model)
+            self._settle(ticket, error=e)
+            raise
+        self._settle(ticket, result)
+        return result
+
+    async def _aexecute(self, interaction_id, model, messages, max_tokens, info, priority=None,
+                        timer=None):
+        timer = timer or PhaseTimer()
+        model, messages = self._prepare(model, messages, max_tokens, info)
+        api, kwargs = self._request(self.async_client, model, messages, max_tokens)
+        timer.mark("prepared")
+        ticket = await self._aadmit(model, messages, max_tokens, priority, info)
+        timer.mark("admitted")
+        try:
+            result = self._result(interaction_id, model, await self._adispatch(api, kwargs, timer))
+            timer.mark("parsed")
+        except asyncio.CancelledError:
+            # Cancelled after dispatch: the provider still bills the prompt
+            info["_billed_tokens_in"] = self._estimator.count_messages(messages, model)
+            raise
+        except Exception as e:
+            if may_be_billed(e):
+                info["_billed_tokens_in"] = self._estimator.count_messages(messages, model)
+            self._settle(ticket, error=e)
+            raise
+        self._settle(ticket, result)
+        return result
+
+    def _flight_key(self, model, compliance_data, max_tokens):
+        """Single-flight key: identical model, prompt and parameters."""
+        if self.single_flight is None or compliance_data["fingerprint"] == "unknown":
+            return None
+        return (self.provider, model, compliance_data["fingerprint"], max_tokens)
+
+    def _start_call(self, model, max_tokens):
+        timer = PhaseTimer()
+        preflight = {}
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.start_call(self.provider, model, self.agent_name, max_tokens)
+            preflight.update(span.ids())
+        return preflight, span, timer
+
+    @staticmethod
+    def _end_span(span, model):
+        """End a span the logging path did not finish (e.g. a sink raised)."""
+        if span is not None:
+            span.finish({"model": model}, sys.exc_info()[1])
+
+    def _log_timed(self, log_entry, timer):
+        """Log an entry; calls that were dispatched also record how long logging took."""
+        timer.mark("logging")
+        self.log_interaction(log_entry, timer)
+
+    def _log_result(self, result, leader, interaction_id, start_time, compliance_data,
+                    metadata, preflight, span, timer):
+        latency_ms = (time.time() - start_time) * 1000
+        if leader:
+            if self.hedge_policy is not None:
+                self.hedge_policy.observe(self.agent_name, result["model"], latency_ms)
+            log_entry = self._success_entry(
+                interaction_id, result["model"], result["usage"], result["cost_inr"], latency_ms,
+                compliance_data, metadata, **preflight, **timer.fields()
+            )
+        else:
+            log_entry = self._coalesced_entry(
+                interaction_id, result, latency_ms, compliance_data, metadata, **preflight
+            )
+        self._log_timed(log_entry, timer)
+        if span is not None:
+            span.finish(log_entry)
+        return result["content"]
+
+    def _log_error(self, error, interaction_id, model, start_time, compliance_data,
+                   metadata, preflight, span, timer):
+        latency_ms = (time.time() - start_time) * 1000
+        if isinstance(error, PromptTooLargeError):
+            preflight.update(error.details)
+        billed = preflight.pop("_billed_tokens_in", None)
+        log_entry = self._failure_entry(
+            interaction_id, model, type(error).__name__, str(error), latency_ms, compliance_data,
+            metadata, tokens_in=billed, **preflight, **timer.fields()
+        )
+        self._log_timed(log_entry, timer)
+        if span is not None:
+            span.finish(log_entry, error)
+
+    def call_llm(self, model, messages, max_tokens=None, metadata=None, user_id=None, session_id=None, tags=None,
+                 priority=None):
+        """Unified LLM call with automatic cost tracking and compliance logging
+
+        With ``single_flight`` set, concurrent calls with the same model,
+        prompt and ``max_tokens`` share one upstream request; the callers that
+        waited are logged as ``outcome="coalesced"`` with zero cost.
+
+        With a ``scheduler`` the call waits in the ``priority`` lane until the
+        provider/model rate limits admit it; the wait is logged as
+        ``queue_wait_ms`` (and is included in ``latency_ms``).
+
+        Dispatched calls also log where their time went as ``phase_<name>_ms``
+        fields, see :mod:`inferenceiq.timing`.
+        """
+        start_time = time.time()
+        interaction_id = self._new_interaction_id()
+        
+        # Prepare compliance metadata
+        compliance_data = self._compliance_data(messages, user_id, session_id, tags)
+        preflight, span, timer = self._start_call(model, max_tokens)
         
         try:
-            if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                )
-                tokens_in = response.usage.prompt_tokens
-                tokens_out = response.usage.completion_tokens
-                content = response.choices[0].message.content
-            
-            elif self.provider == "anthropic":
-                response = self.client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens or 1024,
-                    messages=messages,
-                )
-                tokens_in = response.usage.input_tokens
-                tokens_out = response.usage.output_tokens
-                content = response.content[0].text
+            work = lambda: self._execute(interaction_id, model, messages, max_tokens, preflight, priority,
+                                         timer)
+            key = self._flight_key(model, compliance_data, max_tokens)
+            if key is None:
+                result, leader = work(), True
             else:
-                raise ValueError(f"Unsupported provider: {self.provider}")
-            
-            # Calculate cost
-            cost_inr = self.calculate_cost(model, tokens_in, tokens_out)
-            latency_ms = (time.time() - start_time) * 1000
-            
-            # Log to buffer
-            log_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "interaction_id": interaction_id,
-                "agent": self.agent_name,
-                "model": model,
-                "tokens_in": tokens_in,
-                "tokens_out": tokens_out,
-                "tokens_total": tokens_in + tokens_out,
-                "cost_inr": round(cost_inr, 4),
-                "latency_ms": round(latency_ms, 2),
-                "outcome": "success",
-                **compliance_data,
-                **(metadata or {}),
-            }
-            
-            self.log_interaction(log_entry)
-            return content
-            
+                result, leader = self.single_flight.do(key, work)
         except Exception as e:
-            latency_ms = (time.time() - start_time) * 1000
-            log_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "interaction_id": interaction_id,
-                "agent": self.agent_name,
-                "model": model,
-                "outcome": "failed",
-                "error_type": type(e).__name__,
-                "error": str(e),
-                "latency_ms": round(latency_ms, 2),
-                **compliance_data,
-                **(metadata or {}),
-            }
-            self.log_interaction(log_entry)
+            self._log_error(e, interaction_id, model, start_time, compliance_data, metadata, preflight,
+                            span, timer)
             raise
+        else:
+            return self._log_result(result, leader, interaction_id, start_time, compliance_data,
+                                    metadata, preflight, span, timer)
+        finally:
+            self._end_span(span, model)
 
-    def log_interaction(self, interaction_data):
-        """Store interaction data in the internal buffer"""
+    async def acall_llm(self, model, messages, max_tokens=None, metadata=None, user_id=None,
+                        session_id=None, tags=None, priority=None, hedge=None):
+        """Async :meth:`call_llm` using the provider's async client.
+
+        With a :class:`~inferenceiq.hedging.HedgePolicy` (``hedge``, or the
+        tracker's ``hedge_policy`` unless ``hedge=False``) a backup request to
+        the equivalent model is sent if the primary has not answered within
+        its observed latency quantile. The first successful response wins and
+        the other attempt is cancelled; both are logged with a shared
+        ``hedge_group``, the loser as ``outcome="cancelled"`` with its
+        estimated billed input tokens.
+        """
+        policy = self.hedge_policy if hedge is None or hedge is True else (hedge or None)
+        plan = policy.plan(self, model) if policy is not None else None
+        kwargs = dict(max_tokens=max_tokens, metadata=metadata, user_id=user_id,
+                      session_id=session_id, tags=tags, priority=priority)
+        if plan is None:
+            return await self._acall(model, messages, **kwargs)
+        return await self._ahedged(plan, model, messages, kwargs)
+
+    async def _acall(self, model, messages, max_tokens=None, metadata=None, user_id=None,
+                     session_id=None, tags=None, priority=None, extra=None):
+        start_time = time.time()
+        interaction_id = self._new_interaction_id()
+        compliance_data = self._compliance_data(messages, user_id, session_id, tags)
+        preflight, span, timer = self._start_call(model, max_tokens)
+        preflight.update(extra or {})
+
+        try:
+            work = lambda: self._aexecute(interaction_id, model, messages, max_tokens, preflight,
+                                          priority, timer)
+            key = self._flight_key(model, compliance_data, max_tokens)
+            if key is None:
+                result, leader = await work(), True
+            else:
+                result, leader = await self.single_flight.ado(key, work)
+        except asyncio.CancelledError:
+            billed = preflight.pop("_billed_tokens_in", None)
+            if billed is not None:
+                latency_ms = (time.time() - start_time) * 1000
+                log_entry = self._cancelled_entry(
+                    interaction_id, model, billed, latency_ms, compliance_data, metadata, **preflight
+                )
+                self.log_interaction(log_entry)
+                if span is not None:
+                    span.finish(log_entry)
+            elif span is not None:
+                span.finish({"model": model, "outcome": CANCELLED})
+            raise
+        except Exception as e:
+            self._log_error(e, interaction_id, model, start_time, compliance_data, metadata, preflight,
+                            span, timer)
+            raise
+        else:
+            return self._log_result(result, leader, interaction_id, start_time, compliance_data,
+                                    metadata, preflight, span, timer)
+        finally:
+            self._end_span(span, model)
+
+    async def _ahedged(self, plan, model, messages, kwargs):
+        """Race the primary against a delayed backup; the first success wins."""
+        backup_tracker, backup_model, delay_ms = plan
+        hedge = {"hedge_group": f"hedge_{uuid.uuid4().hex[:12]}", "hedge_delay_ms": round(delay_ms, 2)}
+        primary = asyncio.ensure_future(
+            self._acall(model, messages, extra={**hedge, "hedge_role": "primary"}, **kwargs)
+        )
+        attempts = {primary}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay_ms / 1000)
+            if done:
+                return primary.result()
+            backup = asyncio.ensure_future(
+                backup_tracker._acall(backup_model, messages, extra={**hedge, "hedge_role": "backup"}, **kwargs)
+            )
+            attempts.add(backup)
+            while attempts:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        return task.result()
+            # Both attempts failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+
+    @property
+    def batch_queue(self):
+        """Requests queued for the provider batch API (see ``inferenceiq.batch``)."""
+        if self._batch_queue is None:
+            from inferenceiq.batch import BatchQueue
+            self._batch_queue = BatchQueue(self)
+        return self._batch_queue
+
+    def queue_batch(self, model, messages, max_tokens=None, metadata=None, user_id=None,
+                    session_id=None, tags=None):
+        """Defer a call to the provider batch API. Returns its interaction id.
+
+        Nothing is sent until :meth:`run_batch` (or ``batch_queue.submit()``);
+        results are logged with ``mode="batch"`` and batch pricing.
+        """
+        return self.batch_queue.add(model, messages, max_tokens=max_tokens, metadata=metadata,
+                                    user_id=user_id, session_id=session_id, tags=tags)
+
+    def run_batch(self, poll_interval=60.0, timeout=None):
+        """Submit queued requests, wait for the batch and log its results.
+
+        Returns the reconciled log entries.
+        """
+        return self.batch_queue.run(poll_interval=poll_interval, timeout=timeout)
+
+    def log_interaction(self, interaction_data, timer=None):
+        """Store interaction data in the internal buffer
+
+        Given the call's ``timer``, a dispatched call records the logging
+        phase (metrics and sampling) as ``phase_log_ms`` before the entry is
+        buffered and sent to the sink, so every copy carries it.
+        """
+        self.metrics.record(interaction_data, self.provider)
+        if self.sampling is not None:
+            weight = self.sampling.weight(interaction_data)
+            if weight is None:
+                self._sampled_out.add(interaction_data)
+                return
+            interaction_data["sample_weight"] = weight
+        if timer is not None and "received" in timer.marks:
+            interaction_data[phase_field("log")] = round(timer.since_ms("logging"), 3)
         self.logs.append(interaction_data)
+        if self.sink is not None:
+            self.sink.send(interaction_data)
 
-    def save_logs(self, filename="genai_costs.jsonl"):
-        """Append logs to JSONL file"""
+    def save_logs(self, filename="genai_costs.jsonl", index=False, format=None):
+        """Append logs to JSONL file.
+
+        With ``index=True`` the sparse sidecar index (see ``LogIndex``) is
+        updated with the byte offsets of the new lines. ``format="binary"``
+        (or a ``.iqb`` filename) appends one compact columnar segment instead
+        of JSON lines; see ``inferenceiq.binlog``. Totals of records dropped
+        by sampling are written as ``record_type="sampled_out"`` rows.
+        """
+        self.logs.extend(self._sampled_out.drain())
         if not self.logs:
             return 0
             
         import os
+        from inferenceiq import binlog
         directory = os.path.dirname(filename)
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
+
+        if format is None:
+            format = "binary" if filename.endswith(binlog.BINARY_EXTENSION) else "jsonl"
+        if format == "binary":
+            if index:
+                raise ValueError("Sidecar index is only supported for JSONL logs")
+            with open(filename, 'ab') as f:
+                binlog.write_segment(f, self.logs)
+            saved_count = len(self.logs)
+            self.logs = []
+            return saved_count
+        if format != "jsonl":
+            raise ValueError(f"Unsupported log format: {format}")
             
-        with open(filename, 'a') as f:
+        with open(filename, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            records = []
             for log in self.logs:
-                f.write(json.dumps(log) + '\n')
+                line = (json.dumps(log) + '\n').encode()
+                f.write(line)
+                records.append((offset, len(line), log))
+                offset += len(line)
+
+        if index:
+            from inferenceiq.index import LogIndex
+            LogIndex(filename).append(records)
         
         saved_count = len(self.logs)
         self.logs = []
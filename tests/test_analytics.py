@@ -1,7 +1,9 @@
 import pytest
 import pandas as pd
 import json
+from unittest.mock import MagicMock
 from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.tracker import GenAICostTracker
 
 @pytest.fixture
 def sample_log_file(tmp_path):
@@ -152,3 +154,276 @@ def test_calculate_potential_cache_savings(sample_log_file):
     assert stats["duplicate_count"] == 1
     # 0.18675 might round to 0.1867 or 0.1868 depending on float precision
     assert stats["potential_savings"] == pytest.approx(0.1867, 0.0001)
+
+def _failed_call_entry(**metadata):
+    """Log entry the tracker writes for a call that failed after dispatch."""
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="billing_bot")
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.side_effect = TimeoutError("Request timed out")
+    with pytest.raises(TimeoutError):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "Explain my invoice"}],
+                         metadata=metadata, tags=["prod"])
+    return tracker.logs[0]
+
+@pytest.fixture
+def failed_entry():
+    return {**_failed_call_entry(customer_id="cust_b"), "timestamp": "2026-01-15T11:00:00"}
+
+@pytest.fixture
+def attribution_log_file(tmp_path, failed_entry):
+    log_file = tmp_path / "attribution_logs.jsonl"
+    data = [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "tokens_in": 100, "tokens_out": 50, "tokens_total": 150, "cost_inr": 3.0,
+         "outcome": "success", "customer_id": "cust_a", "tags": ["prod", "kyc"]},
+        failed_entry,
+        {"timestamp": "2026-01-16T09:00:00", "agent": "support_bot", "model": "gpt-4o-mini",
+         "tokens_in": 200, "tokens_out": 100, "tokens_total": 300, "cost_inr": 0.5,
+         "outcome": "success", "customer_id": "cust_a", "tags": []},
+        {"timestamp": "2026-01-16T10:00:00", "agent": "support_bot", "model": "gpt-4o-mini",
+         "tokens_in": 20, "tokens_out": 10, "tokens_total": 30, "cost_inr": 0.25,
+         "outcome": "success", "tags": ["kyc"]},
+    ]
+    with open(log_file, 'w') as f:
+        for entry in data:
+            f.write(json.dumps(entry) + '\n')
+    return str(log_file)
+
+def test_get_cost_attribution_by_customer(attribution_log_file, failed_entry):
+    engine = AnalyticsEngine(log_file=attribution_log_file)
+    engine.load_data()
+
+    rows = engine.get_cost_attribution("customer_id")
+    # Rows without customer_id are not attributed
+    assert [r["customer_id"] for r in rows] == ["cust_a", "cust_b"]
+    assert rows[0]["cost_inr"] == 3.5
+    assert rows[0]["calls"] == 2
+    assert rows[0]["tokens_total"] == 450
+    assert rows[1]["failed_calls"] == 1
+    # Waste is the estimated prompt cost the tracker logs for the timed-out call
+    assert rows[1]["cost_inr"] == 0
+    assert rows[1]["failure_waste_inr"] == failed_entry["failed_cost_inr"] > 0
+
+def test_get_cost_attribution_explodes_tags(attribution_log_file, failed_entry):
+    engine = AnalyticsEngine(log_file=attribution_log_file)
+    engine.load_data()
+
+    rows = {r["tags"]: r for r in engine.get_cost_attribution("tags")}
+    assert set(rows) == {"prod", "kyc"}
+    assert rows["prod"]["cost_inr"] == 3.0
+    assert rows["prod"]["failure_waste_inr"] == failed_entry["failed_cost_inr"]
+    assert rows["kyc"]["cost_inr"] == 3.25
+    assert rows["kyc"]["calls"] == 2
+
+def test_get_top_k(attribution_log_file):
+    engine = AnalyticsEngine(log_file=attribution_log_file)
+    engine.load_data()
+
+    top = engine.get_top_k("agent", k=1)
+    assert len(top) == 1
+    assert top[0]["agent"] == "billing_bot"
+
+    by_tokens = engine.get_top_k("agent", k=1, metric="tokens_total")
+    assert by_tokens[0]["agent"] == "support_bot"
+
+    with pytest.raises(ValueError):
+        engine.get_top_k("agent", metric="latency")
+
+def test_get_cost_attribution_missing_dimension(sample_log_file):
+    engine = AnalyticsEngine(log_file=sample_log_file)
+    engine.load_data()
+    assert engine.get_cost_attribution("customer_id") == []
+
+def test_get_prompt_cache_stats(tmp_path):
+    log_file = tmp_path / "cache_logs.jsonl"
+    data = [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "tokens_in": 1000, "tokens_out": 10, "tokens_cached": 800, "tokens_cache_write": 0,
+         "outcome": "success"},
+        # Legacy entry without cache fields counts as uncached
+        {"timestamp": "2026-01-15T11:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "tokens_in": 1000, "tokens_out": 10, "outcome": "success"},
+        {"timestamp": "2026-01-15T12:00:00", "agent": "support_bot",
+         "model": "claude-3-5-sonnet-20241022", "tokens_in": 1000, "tokens_out": 10,
+         "tokens_cached": 0, "tokens_cache_write": 1000, "outcome": "success"},
+        {"timestamp": "2026-01-15T13:00:00", "agent": "support_bot",
+         "model": "claude-3-5-sonnet-20241022", "outcome": "failed"},
+    ]
+    with open(log_file, 'w') as f:
+        for entry in data:
+            f.write(json.dumps(entry) + '\n')
+
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    rows = engine.get_prompt_cache_stats()
+
+    assert [(r["agent"], r["model"]) for r in rows] == [
+        ("billing_bot", "gpt-4o"), ("support_bot", "claude-3-5-sonnet-20241022")]
+    billing, support = rows
+    assert billing["calls"] == 2
+    assert billing["cache_hit_ratio"] == 0.4
+    # 800 * (0.0020750 - 0.0010375)
+    assert billing["realized_savings_inr"] == pytest.approx(0.83, 0.001)
+    # Cache writes cost 25% more than plain input: 1000 * -0.0006225
+    assert support["calls"] == 1
+    assert support["realized_savings_inr"] == pytest.approx(-0.6225, 0.001)
+
+    by_agent = engine.get_prompt_cache_stats(by=("agent",))
+    assert {r["agent"] for r in by_agent} == {"billing_bot", "support_bot"}
+
+def test_get_batch_candidates(tmp_path):
+    log_file = tmp_path / "batch_logs.jsonl"
+    data = [
+        # Nightly summarizer: off-hours real-time traffic
+        {"timestamp": "2026-01-15T02:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 1000, "cost_inr": 4.0, "outcome": "success", "tags": []},
+        {"timestamp": "2026-01-15T14:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 500, "cost_inr": 2.0, "outcome": "success", "tags": ["nightly"]},
+        {"timestamp": "2026-01-15T03:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 500, "cost_inr": 1.0, "outcome": "success", "tags": [],
+         "mode": "batch"},
+        # Interactive bot during business hours
+        {"timestamp": "2026-01-15T11:00:00", "agent": "support_bot", "model": "gpt-4o",
+         "tokens_total": 800, "cost_inr": 3.0, "outcome": "success", "tags": ["prod"]},
+        {"timestamp": "2026-01-15T20:00:00", "agent": "support_bot", "model": "gpt-4o",
+         "tokens_total": 200, "cost_inr": 1.0, "outcome": "success", "tags": ["prod"]},
+    ]
+    with open(log_file, 'w') as f:
+        for entry in data:
+            f.write(json.dumps(entry) + '\n')
+
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    rows = engine.get_batch_candidates(min_deferrable_share=0.75)
+
+    assert [r["agent"] for r in rows] == ["summarizer", "support_bot"]
+    summarizer, support = rows
+    assert summarizer["candidate"] is True
+    assert summarizer["realtime_calls"] == 2
+    assert summarizer["batch_calls"] == 1
+    assert summarizer["deferrable_share"] == 1.0
+    assert summarizer["potential_savings_inr"] == 3.0
+    assert summarizer["deferrable_tokens"] == 1500
+    assert support["candidate"] is False
+    assert support["deferrable_share"] == 0.5
+    assert support["potential_savings_inr"] == 0.5
+
+    assert [r["agent"] for r in engine.get_batch_candidates() if r["candidate"]] == ["summarizer", "support_bot"]
+
+def _sampled_and_expanded(tmp_path, records):
+    """Engines over a sampled log and over the same log with each record repeated ``sample_weight`` times."""
+    engines = []
+    for name, rows in (
+        ("sampled.jsonl", records),
+        ("expanded.jsonl", [{k: v for k, v in r.items() if k != "sample_weight"}
+                            for r in records for _ in range(int(r.get("sample_weight", 1)))]),
+    ):
+        log_file = tmp_path / name
+        with open(log_file, 'w') as f:
+            for entry in rows:
+                f.write(json.dumps(entry) + '\n')
+        engine = AnalyticsEngine(log_file=str(log_file))
+        engine.load_data()
+        engines.append(engine)
+    return engines
+
+def test_prompt_cache_stats_weight_sampled_records(tmp_path):
+    records = [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "tokens_in": 1000, "tokens_out": 10, "tokens_cached": 800, "tokens_cache_write": 0,
+         "outcome": "success", "sample_weight": 10.0},
+        {"timestamp": "2026-01-15T11:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "tokens_in": 4000, "tokens_out": 10, "tokens_cached": 0, "tokens_cache_write": 4000,
+         "outcome": "success"},
+        {"timestamp": "2026-01-15T12:00:00", "agent": "billing_bot", "model": "gpt-4o", "outcome": "failed"},
+    ]
+    sampled, expanded = _sampled_and_expanded(tmp_path, records)
+    (row,) = sampled.get_prompt_cache_stats()
+    assert row == expanded.get_prompt_cache_stats()[0]
+    assert row["calls"] == 11
+    assert row["cache_hit_ratio"] == round(8000 / 14000, 4)
+
+def test_batch_candidates_weight_sampled_records(tmp_path):
+    records = [
+        {"timestamp": "2026-01-15T02:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 1000, "cost_inr": 0.5, "outcome": "success", "tags": [], "sample_weight": 8.0},
+        {"timestamp": "2026-01-15T14:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 5000, "cost_inr": 6.0, "outcome": "failed", "tags": []},
+        {"timestamp": "2026-01-15T15:00:00", "agent": "summarizer", "model": "gpt-4o",
+         "tokens_total": 500, "cost_inr": 0.25, "outcome": "success", "tags": [], "mode": "batch",
+         "sample_weight": 4.0},
+    ]
+    sampled, expanded = _sampled_and_expanded(tmp_path, records)
+    (row,) = sampled.get_batch_candidates()
+    assert row == expanded.get_batch_candidates()[0]
+    assert (row["realtime_calls"], row["batch_calls"], row["deferrable_calls"]) == (9, 4, 8)
+    assert row["candidate"] is True
+    assert row["potential_savings_inr"] == 2.0
+
+def test_get_coalescing_savings(tmp_path):
+    log_file = tmp_path / "coalesced_logs.jsonl"
+    data = [
+        {"timestamp": "2026-01-15T10:00:00", "interaction_id": "int_1", "agent": "support_bot",
+         "model": "gpt-4o", "tokens_in": 100, "tokens_out": 50, "tokens_total": 150,
+         "cost_inr": 0.6, "outcome": "success"},
+        {"timestamp": "2026-01-15T10:00:00", "agent": "support_bot", "model": "gpt-4o",
+         "tokens_in": 0, "tokens_out": 0, "tokens_total": 0, "cost_inr": 0.0,
+         "outcome": "coalesced", "coalesced_with": "int_1", "tokens_saved": 150, "cost_saved_inr": 0.6},
+        {"timestamp": "2026-01-15T10:00:00", "agent": "support_bot", "model": "gpt-4o",
+         "tokens_in": 0, "tokens_out": 0, "tokens_total": 0, "cost_inr": 0.0,
+         "outcome": "coalesced", "coalesced_with": "int_1", "tokens_saved": 150, "cost_saved_inr": 0.6},
+        {"timestamp": "2026-01-15T11:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "outcome": "failed"},
+    ]
+    with open(log_file, 'w') as f:
+        for entry in data:
+            f.write(json.dumps(entry) + '\n')
+
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    assert engine.get_coalescing_savings() == [
+        {"agent": "support_bot", "coalesced_calls": 2, "tokens_saved": 300, "savings_inr": 1.2}]
+    # Coalesced callers got a response
+    assert engine.get_success_rate() == 75.0
+    assert engine.get_total_cost() == pytest.approx(0.6)
+
+
+def test_get_latency_breakdown(tmp_path):
+    log_file = tmp_path / "phase_logs.jsonl"
+    data = [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "support_bot", "provider": "openai",
+         "model": "gpt-4o", "outcome": "success", "latency_ms": 100.0,
+         "phase_preprocess_ms": 2.0, "phase_ttfb_ms": 90.0, "phase_sdk_ms": 8.0},
+        {"timestamp": "2026-01-15T10:00:01", "agent": "support_bot", "provider": "openai",
+         "model": "gpt-4o", "outcome": "success", "latency_ms": 1000.0,
+         "phase_preprocess_ms": 2.0, "phase_connect_ms": 40.0, "phase_ttfb_ms": 950.0,
+         "phase_sdk_ms": 8.0},
+        {"timestamp": "2026-01-15T10:00:02", "agent": "kyc_agent", "provider": "anthropic",
+         "model": "claude-3-haiku-20240307", "outcome": "success", "latency_ms": 50.0,
+         "phase_queue_ms": 30.0, "phase_ttfb_ms": 20.0},
+        # Never dispatched: no phases, left out
+        {"timestamp": "2026-01-15T10:00:03", "agent": "support_bot", "provider": "openai",
+         "model": "gpt-4o", "outcome": "failed", "latency_ms": 1.0},
+    ]
+    with open(log_file, 'w') as f:
+        for entry in data:
+            f.write(json.dumps(entry) + '\n')
+
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    rows = {(r["provider"], r["phase"]): r for r in engine.get_latency_breakdown(percentiles=(50,))}
+
+    ttfb = rows[("openai", "ttfb")]
+    assert ttfb["owner"] == "provider"
+    assert ttfb["calls"] == 2
+    assert ttfb["mean_ms"] == 520.0
+    assert ttfb["p50_ms"] == 90.0
+    assert ttfb["slow_mean_ms"] == 950.0
+    assert ttfb["share"] == pytest.approx(520 / 550, abs=1e-4)
+    # A reused connection counts as zero connect time
+    assert rows[("openai", "connect")]["mean_ms"] == 20.0
+    assert rows[("anthropic", "queue")]["share"] == 0.6
+    assert sum(r["share"] for (provider, _), r in rows.items() if provider == "openai") == pytest.approx(1, abs=1e-3)
+
+    assert engine.get_latency_breakdown(by="agent")[0]["agent"] == "kyc_agent"
+    assert engine.get_latency_breakdown(by="region") == []
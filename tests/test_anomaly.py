@@ -0,0 +1,179 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.anomaly import CostAnomalyDetector, hour_of_week
+from inferenceiq.retention import RetentionPolicy
+
+SPIKE_HOUR = datetime(2026, 1, 25, 12)
+
+
+def _history(weeks=3):
+    """Hourly traffic for two agents with a nightly batch job and one spike at the end."""
+    rng = np.random.default_rng(0)
+    records = []
+    start = datetime(2026, 1, 5)
+    for h in range(24 * 7 * weeks):
+        hour = start + timedelta(hours=h)
+        for agent in ("support_bot", "billing_bot"):
+            if agent == "billing_bot" and hour.hour in (3, 4, 5):
+                continue
+            calls = 3 if 9 <= hour.hour < 18 else 1
+            if agent == "support_bot" and hour.hour == 2:
+                calls = 20
+            if agent == "support_bot" and hour == SPIKE_HOUR:
+                calls = 60
+            for i in range(calls):
+                records.append({
+                    "timestamp": (hour + timedelta(minutes=i)).isoformat(),
+                    "interaction_id": f"{agent}_{h}_{i}",
+                    "agent": agent,
+                    "model": "gpt-4o",
+                    "cost_inr": float(rng.uniform(0.8, 1.2)),
+                    "outcome": "success",
+                })
+    return records
+
+
+def _write(path, records):
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _assert_same_state(a, b):
+    assert a._series.keys() == b._series.keys()
+    for key, series in a._series.items():
+        other = b._series[key]
+        for field in series.__slots__:
+            assert np.allclose(getattr(series, field), getattr(other, field)), (key, field)
+
+
+def test_hour_of_week():
+    monday = int(np.datetime64("2026-01-05T00").astype("datetime64[h]").astype(np.int64))
+    assert hour_of_week(monday) == 0
+    assert hour_of_week(monday + 24 * 6 + 23) == 167
+
+
+def test_seasonal_baseline_learns_nightly_job_and_flags_spike():
+    anomalies = CostAnomalyDetector().feed(_history())
+
+    nightly = [a for a in anomalies if a["hour"].endswith("T02:00:00")]
+    # Flagged until its hour-of-week slot has two weeks of history
+    assert nightly and max(a["hour"] for a in nightly) < "2026-01-19"
+    spike = [a for a in anomalies if a["hour"] == SPIKE_HOUR.isoformat()]
+    assert [a["severity"] for a in spike] == ["warning", "critical"]
+    assert spike[0]["agent"] == "support_bot"
+    assert spike[0]["spend_inr"] >= spike[0]["threshold_inr"] > spike[0]["expected_inr"]
+    assert {a["agent"] for a in anomalies} == {"support_bot"}
+
+
+def test_batch_matches_online():
+    records = _history()
+    online = CostAnomalyDetector()
+    batch = CostAnomalyDetector()
+
+    assert batch.detect(pd.DataFrame(records)) == online.feed(records)
+    _assert_same_state(online, batch)
+    with pytest.raises(ValueError):
+        batch.detect(pd.DataFrame(records))
+
+
+def test_weighted_and_late_records():
+    detector = CostAnomalyDetector(min_periods=0)
+    detector.update({"timestamp": "2026-01-05T10:00:00", "agent": "a", "model": "m",
+                     "cost_inr": 0.5, "sample_weight": 4})
+    # A late record counts in the open hour
+    detector.update({"timestamp": "2026-01-05T09:00:00", "agent": "a", "model": "m", "cost_inr": 1.0})
+    series = detector._series[("a", "m")]
+    assert series.spend == 3.0
+    assert detector.update({"timestamp": "not a time", "cost_inr": 100}) == []
+
+
+def test_resume_from_saved_state(tmp_path):
+    records = _history()
+    log_file = tmp_path / "costs.jsonl"
+    state_file = tmp_path / "anomaly_state.json"
+    split = len(records) * 2 // 3
+
+    _write(log_file, records[:split])
+    first = CostAnomalyDetector()
+    found = first.consume(str(log_file))
+    first.save(str(state_file))
+
+    _write(log_file, records[split:])
+    resumed = CostAnomalyDetector.load(str(state_file))
+    found += resumed.consume(str(log_file))
+    assert resumed.consume(str(log_file)) == []
+
+    full = CostAnomalyDetector()
+    assert found == full.feed(records)
+    _assert_same_state(full, resumed)
+
+
+def test_consume_skips_partial_line_and_restarts_after_rotation(tmp_path):
+    log_file = tmp_path / "costs.jsonl"
+    log_file.write_text('{"timestamp": "2026-01-05T10:00:00", "agent": "a", "cost_inr": 1.0}\n{"timest')
+    detector = CostAnomalyDetector()
+    detector.consume(str(log_file))
+    assert detector.offset == len(log_file.read_text().split("\n")[0]) + 1
+
+    log_file.write_text("")
+    detector.consume(str(log_file))
+    assert detector.offset == 0
+
+
+def test_analytics_get_cost_anomalies(tmp_path):
+    log_file = tmp_path / "costs.jsonl"
+    _write(log_file, _history())
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+
+    anomalies = engine.get_cost_anomalies()
+    assert anomalies == CostAnomalyDetector().feed(_history())
+    assert engine.get_cost_anomalies(threshold=100, critical=100) == []
+
+
+def test_consume_resumes_after_compaction(tmp_path):
+    log_file = tmp_path / "costs.jsonl"
+    state_file = tmp_path / "anomaly_state.json"
+    start = datetime(2026, 1, 5)
+    flat = [{"timestamp": (start + timedelta(hours=h, minutes=m)).isoformat(), "agent": "bot",
+             "model": "gpt-4o", "cost_inr": 1.0, "outcome": "success"}
+            for h in range(24 * 20) for m in (0, 30)]
+    _write(log_file, flat)
+    detector = CostAnomalyDetector()
+    assert detector.consume(str(log_file)) == []
+    detector.save(str(state_file))
+
+    RetentionPolicy(raw_days=7).compact(str(log_file), now=start + timedelta(days=20))
+    _write(log_file, [{**flat[0], "timestamp": (start + timedelta(days=20, minutes=m)).isoformat()}
+                      for m in (0, 30)])
+    resumed = CostAnomalyDetector.load(str(state_file))
+    assert resumed.consume(str(log_file)) == []
+    assert resumed._series[("bot", "gpt-4o")].spend == 2.0
+
+    # A rotated log whose last read line is gone: only newer records count
+    _write(log_file, [{**flat[0], "timestamp": (start + timedelta(days=20, hours=1)).isoformat()}])
+    log_file.rename(tmp_path / "costs.1.jsonl")
+    _write(log_file, flat[-4:] + [{**flat[0], "timestamp": (start + timedelta(days=20, hours=2)).isoformat()}])
+    assert resumed.consume(str(log_file)) == []
+    assert resumed._series[("bot", "gpt-4o")].spend == 1.0
+    assert resumed._series[("bot", "gpt-4o")].bucket == (start + timedelta(days=20, hours=2) - datetime(1970, 1, 1)) \
+        // timedelta(hours=1)
+
+
+def test_sampled_out_totals_are_skipped(tmp_path):
+    weighted = {"timestamp": "2026-01-05T10:00:00", "agent": "a", "model": "m", "cost_inr": 1.0,
+                "sample_weight": 10.0}
+    totals = {"timestamp": "2026-01-05T10:00:00", "record_type": "sampled_out", "agent": "a", "model": "m",
+              "calls": 9, "cost_inr": 9.0}
+    online = CostAnomalyDetector(min_periods=0)
+    online.feed([weighted, totals])
+    batch = CostAnomalyDetector(min_periods=0)
+    batch.detect(pd.DataFrame([weighted, totals]))
+    assert online._series[("a", "m")].spend == batch._series[("a", "m")].spend == 10.0
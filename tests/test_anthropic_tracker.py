@@ -38,6 +38,29 @@ def test_call_anthropic_success():
     # 0.03735 + 0.31125 = 0.3486
     assert pytest.approx(log["cost_inr"], 0.0001) == 0.3486
 
+def test_call_anthropic_cache_tokens():
+    tracker = GenAICostTracker(api_key="fake", provider="anthropic")
+
+    mock_response = MagicMock()
+    mock_response.content = [MagicMock(text="ok")]
+    mock_response.usage.input_tokens = 100
+    mock_response.usage.output_tokens = 20
+    mock_response.usage.cache_read_input_tokens = 800
+    mock_response.usage.cache_creation_input_tokens = 100
+
+    tracker.client = MagicMock()
+    tracker.client.messages.create.return_value = mock_response
+    tracker.call_llm(model="claude-3-5-sonnet-20241022", messages=[{"role": "user", "content": "hi"}])
+
+    log = tracker.logs[0]
+    # Anthropic's input_tokens excludes cache reads and writes
+    assert log["tokens_in"] == 1000
+    assert log["tokens_cached"] == 800
+    assert log["tokens_cache_write"] == 100
+    assert log["tokens_uncached"] == 100
+    # 100 * 0.00249 + 800 * 0.000249 + 100 * 0.0031125 + 20 * 0.01245
+    assert pytest.approx(log["cost_inr"], 0.001) == 0.249 + 0.1992 + 0.31125 + 0.249
+
 def test_call_anthropic_failure():
     tracker = GenAICostTracker(api_key="fake", provider="anthropic")
     tracker.client = MagicMock()
@@ -0,0 +1,187 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from inferenceiq.batch import (AnthropicBatchBackend, BatchQueue, LocalBatchBackend,
+                               OpenAIBatchBackend)
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _queue(tmp_path, backend, provider="openai"):
+    tracker = GenAICostTracker(api_key="fake", provider=provider, agent_name="summarizer")
+    tracker._batch_queue = BatchQueue(tracker, backend=backend, workdir=str(tmp_path / "batches"))
+    return tracker
+
+
+def test_local_batch_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr("inferenceiq.batch.time.sleep", lambda seconds: None)
+    backend = LocalBatchBackend(responder=lambda body: "x" * 40, polls_until_done=2)
+    tracker = _queue(tmp_path, backend)
+
+    first = tracker.queue_batch("gpt-4o-mini", [{"role": "user", "content": "a" * 400}],
+                                user_id="u1", tags=["nightly"], metadata={"customer_id": "c1"})
+    second = tracker.queue_batch("gpt-4o-mini", [{"role": "user", "content": "b" * 40}])
+    assert tracker.logs == []
+
+    entries = tracker.run_batch(poll_interval=0.01)
+
+    assert [e["interaction_id"] for e in entries] == [first, second]
+    assert tracker.logs == entries
+    entry = entries[0]
+    assert entry["mode"] == "batch"
+    assert entry["batch_id"] == "batch_local_1"
+    assert entry["outcome"] == "success"
+    assert entry["agent"] == "summarizer"
+    assert entry["tokens_in"] == 100
+    assert entry["tokens_out"] == 10
+    assert entry["user_id"] == "u1"
+    assert entry["customer_id"] == "c1"
+    # Batch pricing is half the real-time price
+    realtime = tracker.calculate_cost("gpt-4o-mini", 100, 10)
+    assert entry["cost_inr"] == round(realtime * 0.5, 4)
+    # Manifest is removed once reconciled
+    assert not list((tmp_path / "batches").glob("*.manifest.json"))
+
+
+def test_batch_input_file_formats(tmp_path):
+    tracker = _queue(tmp_path, LocalBatchBackend())
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "hi"}], max_tokens=50)
+    path = tracker.batch_queue.write_input(str(tmp_path / "openai.jsonl"))
+    line = json.loads(open(path).readline())
+    assert line["method"] == "POST"
+    assert line["url"] == "/v1/chat/completions"
+    assert line["body"] == {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}],
+                            "max_tokens": 50}
+
+    tracker.batch_queue.backend = AnthropicBatchBackend(MagicMock())
+    path = tracker.batch_queue.write_input(str(tmp_path / "anthropic.jsonl"))
+    line = json.loads(open(path).readline())
+    assert line["params"]["max_tokens"] == 50
+    assert line["custom_id"] == tracker.batch_queue.pending[0]["custom_id"]
+
+
+def test_batch_request_errors_are_logged_as_failed(tmp_path):
+    def responder(body):
+        if "bad" in body["messages"][0]["content"]:
+            raise ValueError("context_length_exceeded")
+        return "ok"
+
+    tracker = _queue(tmp_path, LocalBatchBackend(responder=responder, polls_until_done=0))
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "bad"}])
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "good"}])
+    failed, ok = tracker.run_batch(poll_interval=0)
+    assert failed["outcome"] == "failed"
+    assert failed["error_type"] == "ValueError"
+    assert failed["mode"] == "batch"
+    assert "cost_inr" not in failed
+    assert ok["outcome"] == "success"
+
+
+def test_batch_reconcile_from_manifest_after_restart(tmp_path):
+    backend = LocalBatchBackend(polls_until_done=0)
+    tracker = _queue(tmp_path, backend)
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "hello"}])
+    batch_id = tracker.batch_queue.submit()
+
+    # A new process only knows the batch id
+    fresh = _queue(tmp_path, backend)
+    status = fresh.batch_queue.wait(batch_id, poll_interval=0)
+    entries = fresh.batch_queue.reconcile(batch_id, status)
+    assert len(entries) == 1
+    assert fresh.logs == entries
+
+
+def test_batch_missing_results_and_timeout(tmp_path):
+    backend = LocalBatchBackend(polls_until_done=100)
+    tracker = _queue(tmp_path, backend)
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "hello"}])
+    batch_id = tracker.batch_queue.submit()
+    with pytest.raises(TimeoutError):
+        tracker.batch_queue.wait(batch_id, poll_interval=0.01, timeout=0)
+
+    backend._batches[batch_id]["requests"] = []
+    (entry,) = tracker.batch_queue.reconcile(batch_id, "expired")
+    assert entry["error_type"] == "BatchIncomplete"
+    assert "expired" in entry["error"]
+
+
+def test_submit_requires_queued_requests(tmp_path):
+    tracker = _queue(tmp_path, LocalBatchBackend())
+    with pytest.raises(ValueError):
+        tracker.batch_queue.submit()
+
+
+def test_failed_submit_keeps_queued_requests(tmp_path, monkeypatch):
+    backend = LocalBatchBackend(polls_until_done=0)
+    tracker = _queue(tmp_path, backend)
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "hello"}])
+    tracker.queue_batch("gpt-4o", [{"role": "user", "content": "bye"}])
+    queued = list(tracker.batch_queue.pending)
+
+    def full_disk(path, requests=None):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(tracker.batch_queue, "write_input", full_disk)
+    with pytest.raises(OSError):
+        tracker.batch_queue.submit()
+    assert tracker.batch_queue.pending == queued
+
+    monkeypatch.undo()
+    tracker.batch_queue.submit()
+    assert tracker.batch_queue.pending == []
+
+
+def test_openai_batch_backend(tmp_path):
+    client = MagicMock()
+    client.files.create.return_value = SimpleNamespace(id="file_in")
+    client.batches.create.return_value = SimpleNamespace(id="batch_1")
+    client.batches.retrieve.return_value = SimpleNamespace(
+        status="completed", output_file_id="file_out", error_file_id=None
+    )
+    tracker = _queue(tmp_path, OpenAIBatchBackend(client))
+    custom_id = tracker.queue_batch("gpt-4o", [{"role": "user", "content": "hi"}])
+    client.files.content.return_value = SimpleNamespace(text=json.dumps({
+        "custom_id": custom_id,
+        "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "done"}}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": 100,
+                      "prompt_tokens_details": {"cached_tokens": 200}},
+        }},
+        "error": None,
+    }) + "\n")
+
+    (entry,) = tracker.run_batch(poll_interval=0)
+
+    assert client.batches.create.call_args.kwargs["endpoint"] == "/v1/chat/completions"
+    assert client.files.create.call_args.kwargs["purpose"] == "batch"
+    assert entry["tokens_cached"] == 200
+    expected = tracker.calculate_cost("gpt-4o", 1000, 100, cached_tokens=200, batch=True)
+    assert entry["cost_inr"] == round(expected, 4)
+
+
+def test_anthropic_batch_backend(tmp_path):
+    client = MagicMock()
+    client.messages.batches.create.return_value = SimpleNamespace(id="msgbatch_1")
+    client.messages.batches.retrieve.return_value = SimpleNamespace(processing_status="ended")
+    tracker = _queue(tmp_path, AnthropicBatchBackend(client), provider="anthropic")
+    ok_id = tracker.queue_batch("claude-3-haiku-20240307", [{"role": "user", "content": "hi"}])
+    bad_id = tracker.queue_batch("claude-3-haiku-20240307", [{"role": "user", "content": "hi"}])
+    usage = SimpleNamespace(input_tokens=10, output_tokens=5,
+                            cache_read_input_tokens=None, cache_creation_input_tokens=None)
+    client.messages.batches.results.return_value = [
+        SimpleNamespace(custom_id=ok_id, result=SimpleNamespace(
+            type="succeeded",
+            message=SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=usage))),
+        SimpleNamespace(custom_id=bad_id, result=SimpleNamespace(type="expired")),
+    ]
+
+    ok, bad = tracker.run_batch(poll_interval=0)
+
+    requests = client.messages.batches.create.call_args.kwargs["requests"]
+    assert requests[0]["params"]["model"] == "claude-3-haiku-20240307"
+    assert ok["tokens_in"] == 10
+    assert ok["mode"] == "batch"
+    assert bad["outcome"] == "failed"
+    assert bad["error_type"] == "BatchExpired"
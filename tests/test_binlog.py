@@ -0,0 +1,101 @@
+import json
+
+import pandas as pd
+import pytest
+
+from inferenceiq import binlog
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.query import LogQuery
+from inferenceiq.tracker import GenAICostTracker
+
+
+@pytest.fixture
+def entries():
+    return [
+        {"timestamp": "2026-01-15T10:00:00", "interaction_id": "int_1", "agent": "billing_bot",
+         "model": "gpt-4o", "tokens_in": 100, "tokens_out": 200, "tokens_total": 300,
+         "cost_inr": 2.5, "latency_ms": 1500.25, "outcome": "success",
+         "user_id": "u1", "session_id": "s1", "tags": ["prod", "kyc"],
+         "fingerprint": "hash_123", "customer_id": "cust_a"},
+        {"timestamp": "2026-01-15T10:05:00.123456", "interaction_id": "int_2", "agent": "billing_bot",
+         "model": "gpt-4o", "outcome": "failed", "error_type": "Timeout", "error": "timed out ✗",
+         "latency_ms": 30000.0, "user_id": None, "session_id": None, "tags": [],
+         "fingerprint": "hash_456", "extra": {"nested": [1, 2]}},
+        {"timestamp": "2026-01-16T09:00:00+05:30", "interaction_id": "int_3", "agent": "support_bot",
+         "model": "gpt-4o-mini", "tokens_in": 10, "tokens_out": 20, "tokens_total": 30,
+         "cost_inr": 0.01, "latency_ms": 200.0, "outcome": "success", "tags": ["beta"]},
+    ]
+
+
+def _write(path, entries):
+    with open(path, "wb") as f:
+        binlog.write_segment(f, entries)
+
+
+def test_round_trip(tmp_path, entries):
+    path = tmp_path / "logs.iqb"
+    _write(path, entries[:2])
+    with open(path, "ab") as f:
+        binlog.write_segment(f, entries[2:])
+
+    assert binlog.is_binary_log(str(path))
+    assert list(binlog.iter_records(str(path))) == entries
+
+
+def test_smaller_than_jsonl(tmp_path, entries):
+    jsonl = tmp_path / "logs.jsonl"
+    rows = [dict(entries[0], interaction_id=f"int_{i}") for i in range(1000)]
+    jsonl.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    count = binlog.jsonl_to_binary(str(jsonl), str(tmp_path / "logs.iqb"))
+    assert count == 1000
+    assert (tmp_path / "logs.iqb").stat().st_size < jsonl.stat().st_size / 2
+
+
+def test_converters_round_trip(tmp_path, entries):
+    jsonl = tmp_path / "logs.jsonl"
+    jsonl.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    binlog.jsonl_to_binary(str(jsonl), str(tmp_path / "logs.iqb"), batch_size=2)
+    binlog.binary_to_jsonl(str(tmp_path / "logs.iqb"), str(tmp_path / "back.jsonl"))
+    with open(tmp_path / "back.jsonl") as f:
+        assert [json.loads(line) for line in f] == entries
+
+
+def test_tracker_saves_binary_and_engine_reads_it(tmp_path, entries):
+    entries[2]["timestamp"] = "2026-01-16T09:00:00"
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    path = tmp_path / "logs.iqb"
+    for entry in entries[:2]:
+        tracker.log_interaction(entry)
+    assert tracker.save_logs(str(path)) == 2
+    tracker.log_interaction(entries[2])
+    tracker.save_logs(str(path))
+
+    binary_engine = AnalyticsEngine(log_file=str(path))
+    binary_engine.load_data()
+
+    jsonl = tmp_path / "logs.jsonl"
+    jsonl.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    json_engine = AnalyticsEngine(log_file=str(jsonl))
+    json_engine.load_data()
+
+    assert binary_engine.get_total_cost() == pytest.approx(json_engine.get_total_cost())
+    assert binary_engine.get_cost_by_model() == pytest.approx(json_engine.get_cost_by_model())
+    assert binary_engine.get_token_usage_stats() == json_engine.get_token_usage_stats()
+    assert binary_engine.get_failure_stats() == json_engine.get_failure_stats()
+    assert pd.api.types.is_datetime64_any_dtype(binary_engine.df["timestamp"])
+
+
+def test_read_frame_with_query(tmp_path, entries):
+    path = tmp_path / "logs.iqb"
+    _write(path, entries[:2])
+    df = binlog.read_frame(str(path), LogQuery(since="2026-01-15T10:01:00"))
+    assert list(df["interaction_id"]) == ["int_2"]
+    df = binlog.read_frame(str(path), LogQuery(agents=["support_bot"]))
+    assert df.empty
+
+
+def test_save_logs_rejects_index_for_binary(tmp_path):
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    tracker.log_interaction({"test": "data"})
+    with pytest.raises(ValueError):
+        tracker.save_logs(str(tmp_path / "logs.iqb"), index=True)
@@ -0,0 +1,166 @@
+import csv
+import functools
+import json
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.chargeback import export_chargeback, month_query, statement_name
+from inferenceiq.retention import RetentionPolicy
+from inferenceiq.tracker import GenAICostTracker
+
+START = datetime(2026, 1, 20)
+MODELS = ("gpt-4o", "gpt-4o-mini", "claude-3-haiku-20240307")
+
+
+@functools.lru_cache(maxsize=None)
+def _failed_call(model, length):
+    """Entry the tracker logs for a call that failed after dispatch (estimated prompt cost)."""
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="billing_bot")
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.side_effect = TimeoutError("Request timed out")
+    with pytest.raises(TimeoutError):
+        tracker.call_llm(model=model, messages=[{"role": "user", "content": "Reconcile invoice " * length}])
+    return tracker.logs[0]
+
+
+def _records(customers=50, days=20, sampled=True):
+    records = []
+    for i in range(customers * days):
+        outcome = ("success", "success", "failed", "cancelled", "success")[i % 5]
+        model = MODELS[i % 3]
+        record = {
+            "agent": "billing_bot",
+            "model": model,
+            "tokens_in": 100 + i % 11,
+            "tokens_out": 40,
+            "cost_inr": round(0.05 + (i % 17) / 10, 4),
+            "outcome": outcome,
+        }
+        if outcome == "failed":
+            record = _failed_call(model, 1 + i % 9)
+        records.append({
+            **record,
+            "timestamp": (START + timedelta(hours=i * 24 * days / (customers * days))).isoformat(),
+            "customer_id": f"cust_{i % customers}",
+            "sample_weight": 4.0 if sampled and i % 7 == 0 else 1.0,
+        })
+    records.append({"timestamp": START.isoformat(), "model": "gpt-4o", "cost_inr": 9.0, "outcome": "success"})
+    return records
+
+
+def _write(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _summary(output_dir):
+    with open(os.path.join(output_dir, "summary.csv"), newline="") as f:
+        return {row["customer_id"]: row for row in csv.DictReader(f)}
+
+
+def _attribution(log_file, query=None):
+    engine = AnalyticsEngine(log_file=log_file, query=query)
+    engine.load_data()
+    return {row["customer_id"]: row for row in engine.get_cost_attribution("customer_id")}
+
+
+def _assert_matches(summary, attribution):
+    assert summary.keys() == attribution.keys()
+    for customer, row in attribution.items():
+        line = summary[customer]
+        for field in ("calls", "tokens_in", "tokens_out", "failed_calls"):
+            assert int(line[field]) == row[field], (customer, field)
+        for field in ("cost_inr", "failure_waste_inr"):
+            assert float(line[field]) == pytest.approx(row[field], abs=1e-3), (customer, field)
+
+
+def test_statements_match_attribution(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    _write(log_file, _records())
+    output_dir = str(tmp_path / "out")
+
+    result = export_chargeback(log_file, output_dir)
+    assert result["customers"] == 50
+    summary = _summary(output_dir)
+    _assert_matches(summary, _attribution(log_file))
+    assert all(float(row["failure_waste_inr"]) > 0 for row in summary.values() if int(row["failed_calls"]))
+    assert not os.path.exists(os.path.join(output_dir, ".spill"))
+
+    with open(os.path.join(output_dir, summary["cust_7"]["statement"]), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["model"] for r in rows] == ["claude-3-haiku-20240307", "gpt-4o", "gpt-4o-mini", "TOTAL"]
+    assert sum(float(r["cost_inr"]) for r in rows[:-1]) == pytest.approx(float(rows[-1]["cost_inr"]))
+
+    # Tiny partitions, combiner and many writers give the same statements
+    other = str(tmp_path / "other")
+    export_chargeback(log_file, other, partitions=7, workers=3, combine_limit=3)
+    assert {c: {k: v for k, v in r.items() if k != "statement"} for c, r in _summary(other).items()} == \
+           {c: {k: v for k, v in r.items() if k != "statement"} for c, r in summary.items()}
+
+
+def test_month_and_json_statements(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    records = _records()
+    records.append({"timestamp": "2026-02-03T10:00:00", "customer_id": "team/ml ü", "model": "gpt-4o",
+                    "cost_inr": 2.5, "outcome": "success"})
+    _write(log_file, records)
+    output_dir = str(tmp_path / "out")
+
+    export_chargeback(log_file, output_dir, month="2026-02", fmt="json")
+    summary = _summary(output_dir)
+    _assert_matches(summary, _attribution(log_file, month_query("2026-02")))
+    with open(os.path.join(output_dir, summary["team/ml ü"]["statement"])) as f:
+        statement = json.load(f)
+    assert statement == {
+        "customer_id": "team/ml ü", "period": "2026-02", "currency": "INR", "calls": 1, "cost_inr": 2.5,
+        "tokens_in": 0, "tokens_out": 0, "failed_calls": 0, "failure_waste_inr": 0.0,
+        "lines": [{"model": "gpt-4o", "calls": 1, "cost_inr": 2.5, "tokens_in": 0, "tokens_out": 0,
+                   "failed_calls": 0, "failure_waste_inr": 0.0}],
+    }
+    with pytest.raises(ValueError):
+        export_chargeback(log_file, output_dir, month="Feb 2026")
+    with pytest.raises(ValueError):
+        export_chargeback(log_file, output_dir, fmt="xml")
+
+
+def test_statement_names_are_safe_and_distinct():
+    names = [statement_name(c) for c in ("a/b", "a%2Fb", "", ".hidden", "x" * 500, "x" * 501, "ü")]
+    assert len(set(names)) == len(names)
+    assert all("/" not in n and n and not n.startswith(".") and len(n) < 200 for n in names)
+
+
+def test_rollups_with_customer_dimension(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    _write(log_file, _records(sampled=False))
+    output_dir = str(tmp_path / "out")
+    export_chargeback(log_file, output_dir)
+    before = _summary(output_dir)
+    _assert_matches(before, _attribution(log_file))
+    assert all(float(row["failure_waste_inr"]) > 0 for row in before.values() if int(row["failed_calls"]))
+
+    policy = RetentionPolicy(raw_days=5, hourly_days=10, dimensions=("agent", "model", "customer_id"))
+    policy.compact(log_file, now=START + timedelta(days=20))
+    export_chargeback(log_file, output_dir)
+    assert _summary(output_dir) == before
+
+
+def test_many_customers_bounded_combiner(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    with open(log_file, "w") as f:
+        for i in range(40_000):
+            f.write(json.dumps({"timestamp": "2026-02-01T10:00:00", "model": "gpt-4o",
+                                "customer_id": f"tenant_{i % 20_000}", "cost_inr": 0.5,
+                                "outcome": "success"}) + "\n")
+    output_dir = str(tmp_path / "out")
+    result = export_chargeback(log_file, output_dir, partitions=16, workers=4, combine_limit=1_000)
+    assert result == {"records": 40_000, "customers": 20_000, "summary": os.path.join(output_dir, "summary.csv"),
+                      "statements": os.path.join(output_dir, "statements")}
+    summary = _summary(output_dir)
+    assert len(summary) == 20_000
+    assert {row["calls"] for row in summary.values()} == {"2"}
+    assert len({row["statement"] for row in summary.values()}) == 20_000
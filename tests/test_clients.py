@@ -0,0 +1,135 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+from inferenceiq.clients import ClientRegistry, get_default_registry, set_default_registry
+from inferenceiq.tracker import GenAICostTracker
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 1768000000,
+    "model": "gpt-4o",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "pong"},
+        "finish_reason": "stop",
+    }],
+    "usage": {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10},
+}
+
+
+class _CompletionHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def openai_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+def test_same_account_shares_one_client():
+    registry = ClientRegistry()
+    a = GenAICostTracker(api_key="key_1", provider="openai", agent_name="a", client_registry=registry)
+    b = GenAICostTracker(api_key="key_1", provider="openai", agent_name="b", client_registry=registry)
+    c = GenAICostTracker(api_key="key_2", provider="openai", client_registry=registry)
+    d = GenAICostTracker(api_key="key_1", provider="anthropic", client_registry=registry)
+
+    assert a.client is b.client
+    assert a.client is not c.client
+    assert d.client is not a.client
+
+    stats = registry.stats()
+    assert stats["clients"] == 3
+    assert stats["borrows"] == 4
+    assert stats["client_reuse_ratio"] == 0.25
+    registry.close()
+
+
+def test_unknown_provider_has_no_client():
+    registry = ClientRegistry()
+    tracker = GenAICostTracker(api_key="k", provider="bedrock", client_registry=registry)
+    assert tracker.client is None
+    assert registry.stats()["clients"] == 0
+
+
+def test_pool_limits_are_applied():
+    registry = ClientRegistry(max_connections=7, max_keepalive_connections=3, keepalive_expiry=12.0)
+    registry.get_client("openai", "k")
+    http_client = next(iter(registry._http_clients.values()))
+    pool = http_client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    registry.close()
+
+
+def test_connections_are_reused_across_trackers(openai_server):
+    registry = ClientRegistry()
+    messages = [{"role": "user", "content": "ping"}]
+    for agent in ("billing_bot", "support_bot", "kyc_agent"):
+        tracker = GenAICostTracker(api_key="k", provider="openai", agent_name=agent,
+                                   base_url=openai_server, client_registry=registry)
+        assert tracker.call_llm(model="gpt-4o", messages=messages) == "pong"
+        assert tracker.logs[0]["tokens_in"] == 7
+
+    stats = registry.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["open_connections"] == 1
+    assert stats["reuse_ratio"] == pytest.approx(2 / 3, abs=1e-3)
+    registry.close()
+
+
+def test_set_default_registry():
+    custom = ClientRegistry(max_connections=5)
+    previous = set_default_registry(custom)
+    try:
+        assert get_default_registry() is custom
+        tracker = GenAICostTracker(api_key="k", provider="openai")
+        assert tracker.client_registry is custom
+    finally:
+        set_default_registry(previous)
+        custom.close()
+
+
+def test_close_and_aclose_release_connections(openai_server):
+    import asyncio
+
+    registry = ClientRegistry()
+    messages = [{"role": "user", "content": "ping"}]
+    tracker = GenAICostTracker(api_key="k", provider="openai", base_url=openai_server,
+                               client_registry=registry)
+
+    async def main():
+        assert await tracker.acall_llm(model="gpt-4o", messages=messages) == "pong"
+        assert tracker.call_llm(model="gpt-4o", messages=messages) == "pong"
+        assert registry.stats()["open_connections"] == 2
+
+        # Sync close leaves the async client pooled until aclose
+        registry.close()
+        stats = registry.stats()
+        assert stats["clients"] == 1
+        assert stats["open_connections"] == 1
+        await registry.aclose()
+        assert registry.stats()["clients"] == 0
+        assert registry.stats()["open_connections"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+import gzip
+import json
+import os
+import socket
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from inferenceiq.collector import (
+    INGEST_PATH, ROLLUPS_PATH, CollectorServer, CollectorSink, decode_batch, encode_batch, partition_of,
+)
+
+
+def _entry(i, day="2026-02-01", agent="support_bot", **extra):
+    return {"timestamp": f"{day}T10:00:{i % 60:02d}", "interaction_id": f"{agent}_{day}_{i}",
+            "agent": agent, "model": "gpt-4o", "cost_inr": 0.5, "tokens_in": 100, "tokens_out": 20,
+            "outcome": "success", **extra}
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _stored(output_dir):
+    records = []
+    for partition in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, partition, "events.jsonl")) as f:
+            records.extend((partition, json.loads(line)) for line in f)
+    return records
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = CollectorServer(str(tmp_path / "collected"), port=0).start_in_thread()
+    yield server
+    server.stop()
+
+
+def test_wire_format_and_partitions():
+    entries = [_entry(1), _entry(2)]
+    assert decode_batch(encode_batch(entries), "gzip") == entries
+    assert decode_batch(b'{"a": 1}\n\n') == [{"a": 1}]
+    with pytest.raises(ValueError):
+        decode_batch(b"[1]\n")
+    assert partition_of(_entry(1)) == "dt=2026-02-01"
+    assert partition_of({"timestamp": "garbage"}) == "dt=unknown"
+
+
+def test_concurrent_ingest_deduplicates(server, tmp_path):
+    url = f"http://127.0.0.1:{server.port}"
+    batches = [[_entry(i, day) for i in range(50)] for day in ("2026-02-01", "2026-02-02")]
+    # Every batch is sent three times from concurrent senders
+    sinks = [CollectorSink(url, str(tmp_path / f"spool{n}"), batch_size=1000) for n in range(6)]
+    with ThreadPoolExecutor(6) as pool:
+        for n, sink in enumerate(sinks):
+            for entry in batches[n % 2]:
+                sink.send(entry)
+        assert all(pool.map(lambda s: s.flush(), sinks))
+    for sink in sinks:
+        sink.close()
+
+    stored = _stored(server.output_dir)
+    assert len(stored) == 100
+    assert {p for p, _ in stored} == {"dt=2026-02-01", "dt=2026-02-02"}
+    assert server.stats()["duplicates"] == 200
+
+    rollups = _get(url + ROLLUPS_PATH)
+    assert [(r["date"], r["calls"], r["cost_inr"], r["tokens_in"]) for r in sorted(rollups, key=lambda r: r["date"])] == [
+        ("2026-02-01", 50, 25.0, 5000), ("2026-02-02", 50, 25.0, 5000),
+    ]
+
+
+def test_plain_post_and_bad_batches(server):
+    url = f"http://127.0.0.1:{server.port}{INGEST_PATH}"
+    body = b"".join(json.dumps(e).encode() + b"\n" for e in [_entry(1), _entry(1), _entry(2, outcome="failed")])
+    with urllib.request.urlopen(urllib.request.Request(url, data=body, method="POST"), timeout=5) as response:
+        assert json.loads(response.read()) == {"accepted": 2, "duplicates": 1}
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(urllib.request.Request(url, data=b"not json", method="POST"), timeout=5)
+    assert e.value.code == 400
+    rollup, = server.rollups()
+    assert rollup["calls"] == 2 and rollup["failed_calls"] == 1
+
+
+def test_sink_spools_until_collector_is_up(tmp_path):
+    port = _free_port()
+    spool = tmp_path / "spool"
+    sink = CollectorSink(f"http://127.0.0.1:{port}", str(spool), batch_size=10, timeout=1)
+    for i in range(25):
+        sink.send(_entry(i, sample_weight=2.0))
+    assert not sink.flush()
+    sink.send(_entry(25, sample_weight=2.0))
+    assert not sink.flush()
+    assert sink.stats()["spooled_batches"] == 2
+
+    server = CollectorServer(str(tmp_path / "collected"), port=port).start_in_thread()
+    try:
+        assert sink.flush()
+        assert sink.stats()["spooled_batches"] == 0
+        assert sink.stats()["sent"] == 26
+        stored = [r["interaction_id"] for _, r in _stored(server.output_dir)]
+        assert stored == [f"support_bot_2026-02-01_{i}" for i in range(26)]
+        assert server.rollups()[0]["calls"] == 52
+    finally:
+        sink.close()
+        server.stop()
+
+
+def test_rejected_batches_are_quarantined(server, tmp_path):
+    spool = tmp_path / "spool"
+    sink = CollectorSink(f"http://127.0.0.1:{server.port}/missing", str(spool))
+    sink.send(_entry(1))
+    assert sink.flush()
+    rejected = os.listdir(spool / "rejected")
+    assert len(rejected) == 1
+    with open(spool / "rejected" / rejected[0], "rb") as f:
+        assert json.loads(gzip.decompress(f.read())) == _entry(1)
+    assert sink.stats()["batches_rejected"] == 1
+
+
+def test_restart_recovers_dedup_and_rollups(tmp_path):
+    output_dir = str(tmp_path / "collected")
+    server = CollectorServer(output_dir, port=0, dedup_days=2).start_in_thread()
+    sink = CollectorSink(f"http://127.0.0.1:{server.port}", str(tmp_path / "spool"))
+    for day in ("2026-02-01", "2026-02-02", "2026-02-03"):
+        sink.send(_entry(1, day))
+    assert sink.flush()
+    server.stop()
+
+    server = CollectorServer(output_dir, port=0, dedup_days=2).start_in_thread()
+    try:
+        assert sorted(server._seen) == ["dt=2026-02-02", "dt=2026-02-03"]
+        assert sum(r["calls"] for r in server.rollups()) == 3
+        sink.url = f"http://127.0.0.1:{server.port}{INGEST_PATH}"
+        sink.send(_entry(1, "2026-02-03"))
+        assert sink.flush()
+        assert server.stats() == {"requests": 1, "accepted": 0, "duplicates": 1}
+    finally:
+        sink.close()
+        server.stop()
+
+
+def test_tracker_sends_to_sink(tmp_path):
+    from inferenceiq.tracker import GenAICostTracker
+
+    class Sink:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, entry):
+            self.sent.append(entry)
+
+    sink = Sink()
+    tracker = GenAICostTracker(api_key="test", sink=sink)
+    tracker.log_interaction(_entry(1))
+    assert sink.sent == [_entry(1)]
@@ -0,0 +1,162 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.compression import SUMMARY_ACK, SUMMARY_PREFIX, TRUNCATION_MARKER, ContextCompressor
+from inferenceiq.tokens import TokenEstimator
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _compressor(**kwargs):
+    return ContextCompressor(estimator=TokenEstimator(use_tiktoken=False), **kwargs)
+
+
+def _conversation(turns, size=400):
+    messages = [{"role": "system", "content": "You are a banking assistant."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"q{i} " + "x" * size})
+        messages.append({"role": "assistant", "content": f"a{i} " + "y" * size})
+    messages.append({"role": "user", "content": "latest"})
+    return messages
+
+
+def test_deduplicates_system_prompts():
+    system = {"role": "system", "content": "You are a banking assistant."}
+    messages = [system, {"role": "user", "content": "hi"}, dict(system),
+                {"role": "system", "content": "Answer in Hindi."}, {"role": "user", "content": "bye"}]
+    compressed, stats = _compressor(keep_last=None).compress(messages)
+    assert [m["content"] for m in compressed] == [
+        "You are a banking assistant.", "hi", "Answer in Hindi.", "bye"]
+    assert stats["context_tokens_after"] < stats["context_tokens_before"]
+
+
+def test_truncates_turns_older_than_keep_last():
+    messages = _conversation(3)
+    compressed, stats = _compressor(keep_last=3, truncate_chars=20).compress(messages)
+    assert len(compressed) == len(messages)
+    old = compressed[1:5]
+    assert all(m["content"].endswith(TRUNCATION_MARKER) for m in old)
+    assert compressed[5]["content"] == messages[5]["content"]
+    assert compressed[-1]["content"] == "latest"
+    # Input is left untouched
+    assert not messages[1]["content"].endswith(TRUNCATION_MARKER)
+    assert stats["context_tokens_before"] - stats["context_tokens_after"] > 300
+
+
+def test_summarizes_old_turns():
+    summarized = []
+
+    def summarizer(old):
+        summarized.extend(old)
+        return "user asked about balances"
+
+    messages = _conversation(3)
+    compressed, _ = _compressor(keep_last=2, summarizer=summarizer).compress(messages)
+    assert len(summarized) == 5
+    assert compressed[0]["role"] == "system"
+    # Kept history starts with an assistant turn, so the summary is a lone user turn
+    assert compressed[1] == {"role": "user", "content": SUMMARY_PREFIX + "user asked about balances"}
+    assert compressed[2:] == messages[-2:]
+
+
+def test_summary_is_valid_anthropic_history():
+    tracker = GenAICostTracker(api_key="fake", provider="anthropic",
+                               context_compressor=_compressor(keep_last=3, summarizer=lambda old: "balances"))
+    response = MagicMock()
+    response.content = [MagicMock(text="ok")]
+    response.usage.input_tokens = 50
+    response.usage.output_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.messages.create.return_value = response
+
+    messages = _conversation(3)[1:]
+    tracker.call_llm(model="claude-3-5-sonnet-20241022", messages=messages)
+
+    sent = tracker.client.messages.create.call_args.kwargs["messages"]
+    roles = [m["role"] for m in sent]
+    assert "system" not in roles
+    assert roles == ["user", "assistant"] * (len(roles) // 2) + ["user"]
+    assert sent[:2] == [{"role": "user", "content": SUMMARY_PREFIX + "balances"},
+                        {"role": "assistant", "content": SUMMARY_ACK}]
+    assert sent[2:] == messages[-3:]
+
+
+def test_caps_context_to_token_budget():
+    messages = _conversation(4)
+    compressed, stats = _compressor(keep_last=None, max_context_tokens=250).compress(messages)
+    assert stats["context_tokens_after"] <= 250
+    assert compressed[0]["role"] == "system"
+    assert compressed[-1]["content"] == "latest"
+    # Newest turns are kept
+    assert compressed[-2] == messages[-2]
+
+
+def test_budget_cap_keeps_summary_with_its_answer():
+    messages = _conversation(4, size=100)
+    compressor = _compressor(keep_last=5, summarizer=lambda old: "s" * 200, max_context_tokens=160)
+    compressed, stats = compressor.compress(messages)
+    assert stats["context_tokens_after"] <= 160
+    roles = [m["role"] for m in compressed]
+    assert roles == ["system"] + ["user", "assistant"] * ((len(roles) - 2) // 2) + ["user"]
+    # The summary went with its acknowledgement
+    assert all(m["content"] != SUMMARY_ACK for m in compressed)
+    assert compressed[-1]["content"] == "latest"
+
+    with pytest.raises(ValueError):
+        _compressor(keep_last=0)
+
+
+def test_tracker_logs_context_tokens_and_analytics(tmp_path):
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="support_bot",
+                               context_compressor=_compressor(keep_last=2, truncate_chars=10))
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.usage.prompt_tokens = 50
+    response.usage.completion_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+
+    messages = _conversation(2)
+    tracker.call_llm(model="gpt-4o", messages=messages)
+
+    sent = tracker.client.chat.completions.create.call_args.kwargs["messages"]
+    assert sent[1]["content"].endswith(TRUNCATION_MARKER)
+    log = tracker.logs[0]
+    saved = log["context_tokens_before"] - log["context_tokens_after"]
+    assert saved > 0
+
+    log_file = str(tmp_path / "logs.jsonl")
+    tracker.save_logs(log_file)
+    with open(log_file, "a") as f:
+        f.write(json.dumps({"timestamp": "2026-01-15T10:00:00", "agent": "billing_bot",
+                            "model": "gpt-4o", "outcome": "success", "cost_inr": 1.0}) + "\n")
+
+    engine = AnalyticsEngine(log_file=log_file)
+    engine.load_data()
+    (row,) = engine.get_compression_savings()
+    assert row["agent"] == "support_bot"
+    assert row["tokens_saved"] == saved
+    assert row["compressed_calls"] == 1
+    assert row["savings_inr"] == round(saved * 0.002075, 4)
+
+
+def test_compression_savings_weight_sampled_records(tmp_path):
+    log_file = tmp_path / "logs.jsonl"
+    records = [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "support_bot", "model": "gpt-4o", "outcome": "success",
+         "context_tokens_before": 1000, "context_tokens_after": 400, "sample_weight": 10.0},
+        {"timestamp": "2026-01-15T11:00:00", "agent": "support_bot", "model": "gpt-4o", "outcome": "failed",
+         "context_tokens_before": 500, "context_tokens_after": 500},
+    ]
+    with open(log_file, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    (row,) = engine.get_compression_savings()
+    assert (row["calls"], row["compressed_calls"]) == (11, 10)
+    assert (row["tokens_before"], row["tokens_after"], row["tokens_saved"]) == (10_500, 4_500, 6_000)
+    assert row["reduction"] == round(6_000 / 10_500, 4)
+    assert row["savings_inr"] == round(6_000 * 0.002075, 4)
@@ -86,4 +86,29 @@ def test_empty_data_handling(tmp_path):
     
     content = output_file.read_text()
     assert "₹0.00" in content
-    assert "No Data" in content
\ No newline at end of file
+    assert "No Data" in content
+
+
+def test_forecast_section(mock_analytics_engine, tmp_path):
+    """The forecast section only renders when forecast_days is set."""
+    from inferenceiq.forecast import forecast_spend
+
+    frame = pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=21, freq='D'),
+        'agent': 'support_bot',
+        'model': 'gpt-4',
+        'cost_inr': 10.0,
+    })
+    mock_analytics_engine.get_spend_forecast.return_value = forecast_spend(frame, horizon_days=7)
+
+    output_file = tmp_path / "forecast_dashboard.html"
+    DashboardGenerator(mock_analytics_engine).generate_report(str(output_file))
+    assert "Month-End Projection" not in output_file.read_text()
+
+    DashboardGenerator(mock_analytics_engine, forecast_days=7).generate_report(str(output_file))
+    content = output_file.read_text()
+    mock_analytics_engine.get_spend_forecast.assert_called_once_with(horizon_days=7)
+    assert "Daily Spend Forecast" in content
+    assert "Month-End Projection (2024-01)" in content
+    assert "support_bot / gpt-4" in content
+    assert "₹310.00" in content  # 21 days so far plus 10 more at ₹10
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.forecast import HoltWinters, daily_spend_matrix, forecast_spend
+from inferenceiq.sampling import SamplingPolicy
+from inferenceiq.tracker import GenAICostTracker
+
+WEEKLY = np.array([0.0, 0.0, 0.0, 0.0, 0.0, -40.0, -40.0])
+
+
+def _frame(days=70, noise=0.0, seed=0):
+    """Daily spend for two agents: a growing weekday-heavy (additive) one and a flat one starting late."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    # 2026-01-05 is a Monday
+    for day, date in enumerate(pd.date_range("2026-01-05", periods=days, freq="D")):
+        rows.append({"timestamp": date.isoformat(), "agent": "support_bot", "model": "gpt-4o",
+                     "cost_inr": 100 + 2 * day + WEEKLY[day % 7] + rng.normal(0, noise)})
+        if day >= days - 10:
+            rows.append({"timestamp": (date + pd.Timedelta(hours=12)).isoformat(), "agent": "kyc_agent",
+                         "model": "gpt-4o-mini", "cost_inr": 10.0, "sample_weight": 2.0})
+    return pd.DataFrame(rows)
+
+
+def test_daily_spend_matrix_is_dense():
+    frame = pd.DataFrame([
+        {"timestamp": "2026-01-01T10:00:00", "agent": "a", "cost_inr": 1.0},
+        {"timestamp": "2026-01-01T11:00:00", "agent": "a", "cost_inr": 2.0, "sample_weight": 3},
+        {"timestamp": "2026-01-04T09:00:00", "agent": "b", "cost_inr": 5.0},
+    ])
+    dates, keys, values = daily_spend_matrix(frame, by=("agent",))
+    assert len(dates) == 4
+    assert keys == [("a",), ("b",)]
+    assert values[:, 0].tolist() == [7.0, 0.0, 0.0, 0.0]
+    assert values[:, 1].tolist() == [0.0, 0.0, 0.0, 5.0]
+
+
+def test_holt_winters_fits_trend_and_weekly_season():
+    _, _, values = daily_spend_matrix(_frame(days=70), by=("agent",))
+    support = values[:, [1]]
+    model = HoltWinters(alphas=(0.3,), betas=(0.1,), gammas=(0.3,)).fit(support)
+    mean, std = model.forecast(14)
+    day = np.arange(70, 84)
+    expected = 100 + 2 * day + WEEKLY[day % 7]
+    assert mean[:, 0] == pytest.approx(expected, rel=0.05)
+    # Uncertainty grows with the horizon
+    assert np.all(np.diff(std[:, 0]) >= 0)
+
+
+def test_matrix_fit_matches_per_series_fit():
+    _, _, values = daily_spend_matrix(_frame(noise=5.0), by=("agent",))
+    together = HoltWinters().fit(values)
+    for s in range(values.shape[1]):
+        alone = HoltWinters().fit(values[:, [s]])
+        assert together.level[s] == pytest.approx(alone.level[0])
+        assert together.sigma[s] == pytest.approx(alone.sigma[0])
+        assert np.allclose(together.forecast(10)[0][:, s], alone.forecast(10)[0][:, 0])
+
+
+def test_forecast_spend_month_end_projection():
+    result = forecast_spend(_frame(noise=2.0), horizon_days=7, interval=0.8)
+
+    assert result["as_of"] == "2026-03-15"
+    assert len(result["daily"]) == 2 * 7
+    assert {row["date"] for row in result["daily"]} == {f"2026-03-{d}" for d in range(16, 23)}
+    kyc = next(row for row in result["month_end"] if row["agent"] == "kyc_agent")
+    # Ten days at 20 (weighted) so far, flat for the 16 days left
+    assert kyc["to_date_inr"] == pytest.approx(200.0)
+    assert kyc["remaining_days"] == 16
+    assert kyc["projected_inr"] == pytest.approx(200.0 + 16 * 20.0, rel=0.02)
+    for row in result["month_end"] + [result["total"]["month_end"]]:
+        assert row["lower_inr"] <= row["projected_inr"] <= row["upper_inr"]
+        assert row["projected_inr"] == pytest.approx(row["to_date_inr"] + row["forecast_remaining_inr"], abs=1e-3)
+    assert result["month_end"][0]["agent"] == "support_bot"
+    assert result["total"]["month_end"]["agent"] == "all"
+    json.dumps(result)
+
+
+def test_forecast_spend_empty_and_invalid():
+    assert forecast_spend(pd.DataFrame())["daily"] == []
+    with pytest.raises(ValueError):
+        forecast_spend(_frame(), interval=1.5)
+
+
+def test_analytics_get_spend_forecast(tmp_path):
+    log_file = tmp_path / "costs.jsonl"
+    _frame().to_json(log_file, orient="records", lines=True)
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+
+    forecast = engine.get_spend_forecast(horizon_days=5, by=("model",))
+    assert forecast["by"] == ["model"]
+    assert {row["model"] for row in forecast["month_end"]} == {"gpt-4o", "gpt-4o-mini"}
+    assert len(forecast["total"]["daily"]) == 5
+
+
+def test_forecast_spend_matches_daily_trend_on_sampled_log(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    tracker = GenAICostTracker(api_key="fake", provider=None, sampling=SamplingPolicy(rate=0.1, seed=2))
+    for i in range(2_000):
+        tracker.log_interaction({"timestamp": f"2026-01-{1 + i % 14:02d}T{i % 24:02d}:00:00",
+                                 "agent": "support_bot", "model": "gpt-4o", "cost_inr": 2.0,
+                                 "outcome": "success"})
+    tracker.save_logs(log_file)
+    engine = AnalyticsEngine(log_file=log_file)
+    engine.load_data()
+    assert engine.get_total_cost() == pytest.approx(4_000.0)
+
+    trend = engine.get_daily_trend()
+    dates, _, values = daily_spend_matrix(engine._spend_frame(("agent", "model")))
+    assert dict(zip((d.date().isoformat() for d in dates), values.sum(axis=1))) == pytest.approx(trend)
+    forecast = engine.get_spend_forecast(horizon_days=3)
+    assert forecast["total"]["month_end"]["to_date_inr"] == pytest.approx(4_000.0)
+    # Dimensions the sampled-out totals do not keep fall back to the weighted records
+    assert engine._spend_frame(("customer_id",)) is engine.df
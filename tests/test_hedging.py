@@ -0,0 +1,147 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.hedging import HedgePolicy
+from inferenceiq.tracker import GenAICostTracker
+
+MESSAGES = [{"role": "user", "content": "Summarise my last statement"}]
+
+
+def _response(content):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = 100
+    response.usage.completion_tokens = 20
+    return response
+
+
+def _tracker(latencies, policy, fail=()):
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="kyc_agent",
+                               hedge_policy=policy)
+
+    async def create(model, **kwargs):
+        await asyncio.sleep(latencies[model])
+        if model in fail:
+            raise RuntimeError(f"{model} unavailable")
+        return _response(model)
+
+    tracker.async_client = MagicMock()
+    tracker.async_client.chat.completions.create = AsyncMock(side_effect=create)
+    return tracker
+
+
+def test_policy_delay_follows_observed_quantile():
+    policy = HedgePolicy({"gpt-4o": "gpt-4o-mini"}, quantile=0.9, min_samples=10)
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="kyc_agent")
+    assert policy.plan(tracker, "gpt-4o") is None
+    for latency in range(1, 11):
+        policy.observe("kyc_agent", "gpt-4o", latency * 100.0)
+    backup_tracker, backup_model, delay = policy.plan(tracker, "gpt-4o")
+    assert backup_tracker is tracker and backup_model == "gpt-4o-mini"
+    assert delay == pytest.approx(910.0)
+    assert policy.plan(tracker, "o1") is None
+
+    other = GenAICostTracker(api_key="fake", provider="anthropic", agent_name="kyc_agent")
+    cross = HedgePolicy({"gpt-4o": (other, "claude-3-haiku-20240307")}, initial_delay_ms=500)
+    assert cross.plan(tracker, "gpt-4o") == (other, "claude-3-haiku-20240307", 500)
+    with pytest.raises(ValueError):
+        HedgePolicy({}, quantile=1.5)
+
+
+def test_backup_wins_and_primary_is_cancelled():
+    policy = HedgePolicy({"gpt-4o": "gpt-4o-mini"}, initial_delay_ms=20)
+    tracker = _tracker({"gpt-4o": 5.0, "gpt-4o-mini": 0.01}, policy)
+
+    assert asyncio.run(tracker.acall_llm(model="gpt-4o", messages=MESSAGES)) == "gpt-4o-mini"
+
+    by_role = {log["hedge_role"]: log for log in tracker.logs}
+    primary, backup = by_role["primary"], by_role["backup"]
+    assert primary["hedge_group"] == backup["hedge_group"]
+    assert backup["outcome"] == "success"
+    assert primary["outcome"] == "cancelled"
+    assert primary["tokens_estimated"] is True
+    assert primary["tokens_in"] > 0 and primary["tokens_out"] == 0
+    assert primary["cost_inr"] == round(tracker.calculate_cost("gpt-4o", primary["tokens_in"], 0), 4)
+    assert primary["latency_ms"] < 1000
+
+
+def test_fast_primary_does_not_hedge():
+    policy = HedgePolicy({"gpt-4o": "gpt-4o-mini"}, initial_delay_ms=500)
+    tracker = _tracker({"gpt-4o": 0.01, "gpt-4o-mini": 0.01}, policy)
+
+    assert asyncio.run(tracker.acall_llm(model="gpt-4o", messages=MESSAGES)) == "gpt-4o"
+    assert len(tracker.logs) == 1
+    assert tracker.logs[0]["hedge_role"] == "primary"
+    assert tracker.async_client.chat.completions.create.await_count == 1
+    # Completed calls feed the latency quantile
+    assert policy._latencies[("kyc_agent", "gpt-4o")]
+
+    # hedge=False opts a call out
+    asyncio.run(tracker.acall_llm(model="gpt-4o", messages=MESSAGES, hedge=False))
+    assert "hedge_group" not in tracker.logs[-1]
+
+
+def test_failed_backup_falls_back_to_primary():
+    policy = HedgePolicy({"gpt-4o": "gpt-4o-mini"}, initial_delay_ms=10)
+    tracker = _tracker({"gpt-4o": 0.1, "gpt-4o-mini": 0.01}, policy, fail=("gpt-4o-mini",))
+
+    assert asyncio.run(tracker.acall_llm(model="gpt-4o", messages=MESSAGES)) == "gpt-4o"
+    assert sorted(log["outcome"] for log in tracker.logs) == ["failed", "success"]
+
+    failing = _tracker({"gpt-4o": 0.05, "gpt-4o-mini": 0.01}, policy, fail=("gpt-4o", "gpt-4o-mini"))
+    with pytest.raises(RuntimeError, match="gpt-4o unavailable"):
+        asyncio.run(failing.acall_llm(model="gpt-4o", messages=MESSAGES))
+
+
+def test_get_hedging_report(tmp_path):
+    log_file = tmp_path / "hedge_logs.jsonl"
+    data = []
+    # Nine fast calls where the primary answered before the hedge delay
+    for i in range(9):
+        data.append({"timestamp": "2026-01-15T10:00:00", "agent": "kyc_agent", "model": "gpt-4o",
+                     "outcome": "success", "latency_ms": 100.0, "cost_inr": 1.0,
+                     "hedge_group": f"h{i}", "hedge_role": "primary", "hedge_delay_ms": 300.0})
+    # One slow primary beaten by the backup
+    data += [
+        {"timestamp": "2026-01-15T10:00:00", "agent": "kyc_agent", "model": "gpt-4o",
+         "outcome": "cancelled", "latency_ms": 500.0, "cost_inr": 0.2,
+         "hedge_group": "h9", "hedge_role": "primary", "hedge_delay_ms": 300.0},
+        {"timestamp": "2026-01-15T10:00:00", "agent": "kyc_agent", "model": "gpt-4o-mini",
+         "outcome": "success", "latency_ms": 200.0, "cost_inr": 0.1,
+         "hedge_group": "h9", "hedge_role": "backup", "hedge_delay_ms": 300.0},
+        # Unhedged calls tell how slow the cancelled primary would have been
+        {"timestamp": "2026-01-15T10:00:00", "agent": "kyc_agent", "model": "gpt-4o",
+         "outcome": "success", "latency_ms": 800.0, "cost_inr": 1.0},
+        {"timestamp": "2026-01-15T10:00:00", "agent": "kyc_agent", "model": "gpt-4o",
+         "outcome": "success", "latency_ms": 1000.0, "cost_inr": 1.0},
+    ]
+    with open(log_file, "w") as f:
+        for entry in data:
+            f.write(json.dumps(entry) + "\n")
+
+    engine = AnalyticsEngine(log_file=str(log_file))
+    engine.load_data()
+    [row] = engine.get_hedging_report(percentile=100)
+    assert row["agent"] == "kyc_agent"
+    assert row["calls"] == 10
+    assert row["hedges_fired"] == 1
+    assert row["backup_wins"] == 1
+    # Cancelled at 500 ms: mean of the completed latencies above it
+    assert row["p100_unhedged_ms"] == 900.0
+    # The backup finished 300 + 200 ms after the call started
+    assert row["p100_hedged_ms"] == 500.0
+    assert row["p100_improvement_ms"] == 400.0
+    assert row["extra_spend_inr"] == 0.2
+    assert row["cost_per_ms_saved_inr"] == pytest.approx(0.2 / 400)
+
+    [row] = engine.get_hedging_report(percentile=50)
+    assert row["p50_improvement_ms"] == 0.0
+    assert row["cost_per_ms_saved_inr"] is None
+
+    # The cancelled loser is not a call of its own
+    assert engine.get_success_rate() == 100.0
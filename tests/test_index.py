@@ -0,0 +1,156 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.index import ID_DTYPE, LogIndex
+from inferenceiq.query import LogQuery
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _entries(day, count, session="sess_1"):
+    return [
+        {
+            "timestamp": f"2026-01-{day:02d}T{hour % 24:02d}:00:00",
+            "interaction_id": f"int_{day}_{hour}",
+            "agent": "billing_bot",
+            "model": "gpt-4o",
+            "cost_inr": 1.0,
+            "outcome": "success",
+            "session_id": session,
+        }
+        for hour in range(count)
+    ]
+
+
+def _save(tracker, entries, log_file, index=True):
+    for entry in entries:
+        tracker.log_interaction(entry)
+    tracker.save_logs(str(log_file), index=index)
+
+
+def test_save_logs_maintains_index(tmp_path):
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    log_file = tmp_path / "logs.jsonl"
+    _save(tracker, _entries(1, 3), log_file)
+    _save(tracker, _entries(2, 2, session="sess_2"), log_file)
+
+    index = LogIndex(str(log_file))
+    assert index.is_current()
+    # Small saves keep filling the same block
+    assert len(index.blocks()) == 1
+    assert index.blocks()[0]["lines"] == 5
+
+    found = index.lookup("interaction_id", "int_2_1")
+    assert len(found) == 1
+    assert found[0]["timestamp"] == "2026-01-02T01:00:00"
+    assert len(index.lookup("session_id", "sess_1")) == 3
+    assert index.lookup("interaction_id", "missing") == []
+    with pytest.raises(ValueError):
+        index.lookup("agent", "billing_bot")
+
+
+def test_index_catches_up_on_unindexed_writes(tmp_path):
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    log_file = tmp_path / "logs.jsonl"
+    _save(tracker, _entries(1, 2), log_file, index=False)
+    _save(tracker, _entries(2, 2), log_file)
+
+    index = LogIndex(str(log_file))
+    assert index.is_current()
+    assert len(index.lookup("interaction_id", "int_1_0")) == 1
+
+    _save(tracker, _entries(3, 1), log_file, index=False)
+    assert not index.is_current()
+    assert index.refresh() == 1
+    assert index.is_current()
+
+
+def test_byte_ranges_skip_blocks_outside_time_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogIndex, "BLOCK_LINES", 4)
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    log_file = tmp_path / "logs.jsonl"
+    for day in range(1, 11):
+        _save(tracker, _entries(day, 4), log_file)
+
+    index = LogIndex(str(log_file))
+    assert len(index.blocks()) == 10
+    ranges = index.byte_ranges("2026-01-05T00:00:00", "2026-01-06T00:00:00")
+    assert len(ranges) == 1
+    start, end = ranges[0]
+    assert end - start < log_file.stat().st_size / 5
+
+    lines = list(index.iter_lines("2026-01-05T00:00:00", "2026-01-06T00:00:00"))
+    assert [json.loads(line)["interaction_id"] for line in lines] == [
+        "int_5_0", "int_5_1", "int_5_2", "int_5_3"
+    ]
+
+
+def test_load_data_uses_index_for_time_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogIndex, "BLOCK_LINES", 4)
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    log_file = tmp_path / "logs.jsonl"
+    for day in range(1, 11):
+        _save(tracker, _entries(day, 4), log_file)
+
+    read_ranges = []
+    original = LogIndex.byte_ranges
+
+    def spy(self, since=None, until=None):
+        ranges = original(self, since, until)
+        read_ranges.extend(ranges)
+        return ranges
+
+    monkeypatch.setattr(LogIndex, "byte_ranges", spy)
+    engine = AnalyticsEngine(log_file=str(log_file))
+    df = engine.load_data(LogQuery(since="2026-01-05", until="2026-01-05"))
+    assert len(df) == 4
+    assert len(read_ranges) == 1
+
+
+def test_build_and_rebuild_after_rewrite(tmp_path):
+    log_file = tmp_path / "logs.jsonl"
+    with open(log_file, "w") as f:
+        for entry in _entries(1, 3):
+            f.write(json.dumps(entry) + "\n")
+
+    index = LogIndex.build(str(log_file))
+    assert index.is_current()
+    assert len(index.lookup("interaction_id", "int_1_2")) == 1
+
+    # Log rewritten smaller: refresh starts over
+    with open(log_file, "w") as f:
+        f.write(json.dumps(_entries(1, 1)[0]) + "\n")
+    index.refresh()
+    assert index.is_current()
+    assert index.lookup("interaction_id", "int_1_2") == []
+
+
+def test_id_runs_stay_sorted_and_few(tmp_path):
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    log_file = tmp_path / "logs.jsonl"
+    for day in range(1, 29):
+        _save(tracker, _entries(day, 1 + day % 5, session=f"sess_{day % 3}"), log_file)
+
+    index = LogIndex(str(log_file))
+    runs = index._runs()
+    # Each save adds a run; merging keeps O(log n) of them
+    assert len(runs) <= 6
+    pairs = np.fromfile(index.ids_file, dtype=ID_DTYPE)
+    start = 0
+    for end in runs:
+        assert (np.diff(pairs["key"][start:end].astype(np.float64)) >= 0).all()
+        start = end
+    for day in range(1, 29):
+        for hour in range(1 + day % 5):
+            assert [e["interaction_id"] for e in index.lookup("interaction_id", f"int_{day}_{hour}")] == \
+                [f"int_{day}_{hour}"]
+    assert len(index.lookup("session_id", "sess_0")) == sum(1 + d % 5 for d in range(1, 29) if d % 3 == 0)
+
+    # An index from before sorted runs is sorted once on first use
+    os.remove(index.runs_file)
+    np.random.default_rng(0).permutation(pairs).tofile(index.ids_file)
+    assert len(index.lookup("interaction_id", "int_7_2")) == 1
+    assert index._runs() == [len(pairs)]
@@ -0,0 +1,134 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.dashboard import DashboardGenerator
+from inferenceiq.infra import (InfraCostEngine, InfraPricing, load_snapshots, parse_cpu,
+                               parse_memory)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "k8s")
+POD_METRICS = os.path.join(FIXTURES, "pod_metrics.jsonl")
+USAGE_CSV = os.path.join(FIXTURES, "usage.csv")
+RATES = os.path.join(FIXTURES, "rates.json")
+
+# billing_bot: 0.5 core + 1 GiB on-demand m5 (2.5/h) plus 0.25 core + 0.5 GiB spot (0.475/h)
+BILLING_PER_MINUTE = 2.975 / 60
+# kyc_agent: 1 core + 2 GiB at the default on-demand rates (4.4/h)
+KYC_PER_MINUTE = 4.4 / 60
+
+
+def _engine(path=POD_METRICS):
+    engine = InfraCostEngine(path, pricing=InfraPricing.from_file(RATES), timezone="UTC")
+    engine.load_data()
+    return engine
+
+
+def _calls(tmp_path, entries):
+    log_file = tmp_path / "logs.jsonl"
+    with open(log_file, "w") as f:
+        for entry in entries:
+            f.write(json.dumps({"outcome": "success", "model": "gpt-4o", **entry}) + "\n")
+    engine = AnalyticsEngine(str(log_file))
+    engine.load_data()
+    return engine
+
+
+def test_quantities():
+    assert parse_cpu("250m") == pytest.approx(0.25)
+    assert parse_cpu("1500000n") == pytest.approx(0.0015)
+    assert parse_cpu("2") == 2
+    assert parse_memory("512Mi") == pytest.approx(0.5)
+    assert parse_memory("1G") == pytest.approx(1e9 / 2 ** 30)
+    assert parse_memory(2 ** 30) == 1
+    with pytest.raises(ValueError):
+        parse_cpu("lots")
+
+
+def test_load_pod_metrics_dump():
+    usage = load_snapshots(POD_METRICS)
+    # Unlabeled system pods carry no agent
+    assert usage["agent"].isna().sum() == 3
+    billing = usage[usage["pod"] == "billing-bot-7d9f-a"].iloc[0]
+    assert billing["cpu_cores"] == pytest.approx(0.5)
+    assert billing["memory_gib"] == pytest.approx(1.0)
+    assert billing["capacity_type"] == "on_demand"
+    assert billing["window_s"] == 30
+    spot = usage[usage["pod"] == "billing-bot-7d9f-b"].iloc[0]
+    assert spot["capacity_type"] == "spot"
+    assert set(usage["agent"].dropna()) == {"billing_bot", "kyc_agent"}
+
+
+def test_intervals_are_priced_per_node_and_capacity_type():
+    intervals = _engine().get_intervals()
+    billing = intervals[intervals["agent"] == "billing_bot"]
+    assert len(billing) == 3
+    assert billing["cost_inr"].sum() == pytest.approx(3 * BILLING_PER_MINUTE)
+    assert (billing["end"] - billing["start"]).dt.total_seconds().tolist() == [60, 60, 60]
+    kyc = intervals[intervals["agent"] == "kyc_agent"]
+    assert kyc["cost_inr"].sum() == pytest.approx(3 * KYC_PER_MINUTE)
+
+
+def test_csv_export_matches_dump():
+    csv_intervals = _engine(USAGE_CSV).get_intervals()
+    dump_intervals = _engine().get_intervals()
+    assert csv_intervals["cost_inr"].sum() == pytest.approx(
+        dump_intervals[dump_intervals["agent"] == "billing_bot"]["cost_inr"].sum())
+
+
+def test_join_splits_interval_cost_across_calls(tmp_path):
+    analytics = _calls(tmp_path, [
+        {"timestamp": "2026-01-05T10:00:30", "agent": "billing_bot", "cost_inr": 1.0},
+        {"timestamp": "2026-01-05T10:00:45", "agent": "billing_bot", "cost_inr": 1.0},
+        {"timestamp": "2026-01-05T10:01:10", "agent": "billing_bot", "cost_inr": 1.0},
+        {"timestamp": "2026-01-05T10:05:00", "agent": "kyc_agent", "cost_inr": 2.0},
+        {"timestamp": "2026-01-05T10:00:10", "agent": "support_bot", "cost_inr": 0.5},
+    ])
+    joined = _engine().join_calls(analytics.df)
+    shares = joined["infra_cost_inr"].tolist()
+    assert shares[0] == pytest.approx(BILLING_PER_MINUTE / 2)
+    assert shares[1] == pytest.approx(BILLING_PER_MINUTE / 2)
+    assert shares[2] == pytest.approx(BILLING_PER_MINUTE)
+    # After the last kyc interval, and an agent without pods
+    assert shares[3] == 0 and shares[4] == 0
+    assert joined["interval"].isna().tolist() == [False, False, False, True, True]
+
+
+def test_combined_cost_by_agent(tmp_path):
+    analytics = _calls(tmp_path, [
+        {"timestamp": "2026-01-05T10:00:30", "agent": "billing_bot", "cost_inr": 1.0},
+        {"timestamp": "2026-01-05T10:01:10", "agent": "billing_bot", "cost_inr": 1.0},
+        {"timestamp": "2026-01-05T10:00:10", "agent": "support_bot", "cost_inr": 0.5},
+    ])
+    rows = {row["agent"]: row for row in _engine().get_cost_by_agent(analytics)}
+
+    billing = rows["billing_bot"]
+    assert billing["calls"] == 2
+    assert billing["api_cost_inr"] == 2.0
+    assert billing["infra_cost_inr"] == pytest.approx(3 * BILLING_PER_MINUTE, abs=1e-4)
+    assert billing["idle_infra_cost_inr"] == pytest.approx(BILLING_PER_MINUTE, abs=1e-4)
+    assert billing["total_cost_inr"] == pytest.approx(2.0 + 3 * BILLING_PER_MINUTE, abs=1e-4)
+    # Infra without calls and calls without infra both show up
+    assert rows["kyc_agent"]["calls"] == 0
+    assert rows["kyc_agent"]["infra_cost_per_call_inr"] is None
+    assert rows["support_bot"]["infra_cost_inr"] == 0
+
+
+def test_offset_timestamps_are_converted(tmp_path):
+    engine = InfraCostEngine(POD_METRICS, timezone="Asia/Kolkata")
+    engine.load_data()
+    assert engine.get_intervals()["start"].min() == pd.Timestamp("2026-01-05T15:30:00")
+
+
+def test_dashboard_shows_combined_cost(tmp_path):
+    analytics = _calls(tmp_path, [
+        {"timestamp": "2026-01-05T10:00:30", "agent": "billing_bot", "cost_inr": 1.0,
+         "tokens_in": 10, "tokens_out": 5, "tokens_total": 15},
+    ])
+    output = tmp_path / "dashboard.html"
+    DashboardGenerator(analytics, _engine()).generate_report(str(output))
+    content = output.read_text()
+    assert "Infra + API Cost per Agent" in content
+    assert "kyc_agent" in content
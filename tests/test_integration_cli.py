@@ -1,5 +1,8 @@
+import csv
+import json
 import subprocess
 import sys
+from datetime import datetime, timedelta
 import pytest
 from pathlib import Path
 
@@ -80,4 +83,223 @@ def test_cli_malformed_data(tmp_path):
     assert "Warning: No data loaded" in result.stdout or "Error loading data" in result.stdout
     
     content = output_html.read_text()
-    assert "₹0.00" in content
\ No newline at end of file
+    assert "₹0.00" in content
+
+
+def test_cli_filters(tmp_path):
+    """Scenario 4: Time-range and dimension filters"""
+    log_file = tmp_path / "filtered_logs.jsonl"
+    with open(log_file, "w") as f:
+        f.write('{"timestamp": "2026-01-01T10:00:00", "agent": "billing_bot", "model": "gpt-4o", "cost_inr": 10.50, "tokens_in": 10, "tokens_out": 90, "tokens_total": 100, "outcome": "success"}\n')
+        f.write('{"timestamp": "2026-01-02T10:00:00", "agent": "billing_bot", "model": "gpt-4o", "cost_inr": 5.50, "tokens_in": 10, "tokens_out": 40, "tokens_total": 50, "outcome": "success"}\n')
+        f.write('{"timestamp": "2026-01-02T11:00:00", "agent": "support_bot", "model": "gpt-4o", "cost_inr": 2.00, "tokens_in": 10, "tokens_out": 40, "tokens_total": 50, "outcome": "success"}\n')
+
+    output_html = tmp_path / "filtered_dashboard.html"
+    result = run_cli([
+        "--log-file", str(log_file), "--output", str(output_html),
+        "--since", "2026-01-02", "--until", "2026-01-02", "--agent", "billing_bot",
+    ])
+
+    assert result.returncode == 0
+    assert "₹5.50" in output_html.read_text()
+
+def test_cli_invalid_filter(tmp_path):
+    log_file = tmp_path / "logs.jsonl"
+    log_file.write_text('{"timestamp": "2026-01-01T10:00:00", "cost_inr": 1.0, "outcome": "success"}\n')
+
+    result = run_cli(["--log-file", str(log_file), "--since", "yesterday-ish"])
+
+    assert result.returncode == 1
+    assert "Invalid filter" in result.stdout
+
+def test_cli_audit_get(tmp_path):
+    """Scenario 5: Audit lookups by interaction_id and session_id"""
+    log_file = tmp_path / "audit_logs.jsonl"
+    with open(log_file, "w") as f:
+        f.write('{"timestamp": "2026-01-01T10:00:00", "interaction_id": "int_1", "session_id": "sess_a", "cost_inr": 1.0, "outcome": "success"}\n')
+        f.write('{"timestamp": "2026-01-01T10:05:00", "interaction_id": "int_2", "session_id": "sess_a", "cost_inr": 2.0, "outcome": "success"}\n')
+
+    result = run_cli(["audit", "--log-file", str(log_file), "get", "int_2"])
+    assert result.returncode == 0
+    assert '"interaction_id": "int_2"' in result.stdout
+    assert "int_1" not in result.stdout
+    assert (tmp_path / "audit_logs.jsonl.ids").exists()
+
+    result = run_cli(["audit", "--log-file", str(log_file), "session", "sess_a"])
+    assert result.returncode == 0
+    assert len(result.stdout.strip().splitlines()) == 2
+
+    result = run_cli(["audit", "--log-file", str(log_file), "get", "int_missing"])
+    assert result.returncode == 1
+
+def test_cli_sqlite_backend(tmp_path):
+    """Scenario 6: Dashboard from the embedded SQLite backend"""
+    log_file = tmp_path / "sql_logs.jsonl"
+    with open(log_file, "w") as f:
+        f.write('{"timestamp": "2026-01-01T10:00:00", "agent": "billing_bot", "model": "gpt-4o", "cost_inr": 10.50, "tokens_in": 10, "tokens_out": 90, "tokens_total": 100, "outcome": "success"}\n')
+        f.write('{"timestamp": "2026-01-02T10:00:00", "agent": "billing_bot", "model": "gpt-4o", "cost_inr": 5.50, "tokens_in": 10, "tokens_out": 40, "tokens_total": 50, "outcome": "success"}\n')
+
+    output_html = tmp_path / "sql_dashboard.html"
+    result = run_cli([
+        "--log-file", str(log_file), "--output", str(output_html),
+        "--backend", "sqlite", "--since", "2026-01-02", "--until", "2026-01-02",
+    ])
+
+    assert result.returncode == 0, result.stderr
+    assert "₹5.50" in output_html.read_text()
+    assert (tmp_path / "sql_logs.jsonl.sqlite").exists()
+
+def test_cli_infra_snapshots(tmp_path):
+    """Scenario 7: Infra + API cost per agent from a usage export"""
+    fixtures = Path(__file__).parent / "fixtures" / "k8s"
+    log_file = tmp_path / "infra_logs.jsonl"
+    with open(log_file, "w") as f:
+        f.write('{"timestamp": "2026-01-05T10:00:30", "agent": "billing_bot", "model": "gpt-4o", "cost_inr": 1.25, "tokens_in": 10, "tokens_out": 90, "tokens_total": 100, "outcome": "success"}\n')
+
+    output_html = tmp_path / "infra_dashboard.html"
+    result = run_cli([
+        "--log-file", str(log_file), "--output", str(output_html),
+        "--infra-snapshots", str(fixtures / "usage.csv"),
+        "--infra-rates", str(fixtures / "rates.json"),
+    ])
+
+    assert result.returncode == 0, result.stdout
+    content = output_html.read_text()
+    assert "Infra + API Cost per Agent" in content
+    assert "₹1.40" in content  # 1.25 API + 3 minutes of billing_bot pods
+
+def test_cli_anomalies_with_state(tmp_path):
+    """Scenario 8: Spend anomalies resume from saved detector state"""
+    log_file = tmp_path / "spend_logs.jsonl"
+    state_file = tmp_path / "anomaly_state.json"
+    start = datetime(2026, 1, 1)
+    with open(log_file, "w") as f:
+        # A day of steady hourly spend, then a burst
+        for hour in range(30):
+            timestamp = (start + timedelta(hours=hour)).isoformat()
+            f.write(json.dumps({"timestamp": timestamp, "agent": "bot", "model": "gpt-4o", "cost_inr": 1.0}) + "\n")
+        for minute in range(30):
+            timestamp = (start + timedelta(hours=30, minutes=minute)).isoformat()
+            f.write(json.dumps({"timestamp": timestamp, "agent": "bot", "model": "gpt-4o", "cost_inr": 1.0}) + "\n")
+
+    result = run_cli(["anomalies", "--log-file", str(log_file), "--state", str(state_file)])
+    assert result.returncode == 0
+    anomalies = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [a["severity"] for a in anomalies] == ["critical"]
+    assert anomalies[0]["hour"] == "2026-01-02T06:00:00"
+    assert state_file.exists()
+
+    # Nothing new was appended: nothing is reported again
+    result = run_cli(["anomalies", "--log-file", str(log_file), "--state", str(state_file)])
+    assert result.returncode == 0
+    assert result.stdout == ""
+
+def test_cli_forecast_json(tmp_path):
+    """Scenario 9: Spend forecast as JSON and on the dashboard"""
+    log_file = tmp_path / "forecast_logs.jsonl"
+    start = datetime(2026, 1, 1)
+    with open(log_file, "w") as f:
+        for day in range(28):
+            timestamp = (start + timedelta(days=day)).isoformat()
+            f.write(json.dumps({"timestamp": timestamp, "agent": "bot", "model": "gpt-4o", "cost_inr": 5.0,
+                                "tokens_in": 10, "tokens_out": 5, "tokens_total": 15, "outcome": "success"}) + "\n")
+
+    output_json = tmp_path / "forecast.json"
+    result = run_cli(["forecast", "--log-file", str(log_file), "--output", str(output_json), "--horizon", "7"])
+    assert result.returncode == 0, result.stdout
+    forecast = json.loads(output_json.read_text())
+    assert len(forecast["daily"]) == 7
+    assert forecast["total"]["month_end"]["projected_inr"] == pytest.approx(155.0, rel=0.01)
+
+    output_html = tmp_path / "forecast_dashboard.html"
+    result = run_cli(["--log-file", str(log_file), "--output", str(output_html), "--forecast-days", "14"])
+    assert result.returncode == 0, result.stdout
+    assert "Month-End Projection (2026-01)" in output_html.read_text()
+
+def test_cli_collect_service(tmp_path):
+    """Scenario 10: Collector service receives batches from a tracker sink"""
+    import socket
+    import time
+    import urllib.request
+    from inferenceiq.collector import CollectorSink, HEALTH_PATH
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    output_dir = tmp_path / "collected"
+    process = subprocess.Popen(
+        [PYTHON_EXE, "-m", "inferenceiq.cli", "collect", "--output-dir", str(output_dir), "--port", str(port)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env={"PYTHONPATH": "src"}
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url + HEALTH_PATH, timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        sink = CollectorSink(url, str(tmp_path / "spool"))
+        for i in range(3):
+            sink.send({"timestamp": "2026-01-01T10:00:00", "interaction_id": f"id_{i % 2}",
+                       "agent": "support_bot", "model": "gpt-4o", "cost_inr": 1.0})
+        sink.close()
+        assert sink.stats()["sent"] == 3
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    with open(output_dir / "dt=2026-01-01" / "events.jsonl") as f:
+        assert [json.loads(line)["interaction_id"] for line in f] == ["id_0", "id_1"]
+
+def test_cli_compact(tmp_path):
+    """Scenario 11: Compaction keeps dashboard totals while shrinking the raw log"""
+    log_file = tmp_path / "logs.jsonl"
+    start = datetime.now() - timedelta(days=20)
+    with open(log_file, "w") as f:
+        for day in range(20):
+            f.write(json.dumps({"timestamp": (start + timedelta(days=day)).isoformat(), "agent": "bot",
+                                "model": "gpt-4o", "cost_inr": 1.0, "tokens_in": 10, "tokens_out": 5,
+                                "tokens_total": 15, "latency_ms": 100.0, "outcome": "success"}) + "\n")
+
+    result = run_cli(["compact", "--log-file", str(log_file), "--raw-days", "2", "--hourly-days", "7"])
+    assert result.returncode == 0, result.stderr
+    summary = json.loads(result.stdout)
+    assert summary["raw_purged"] >= 17
+    assert summary["daily_rows"] > 0
+
+    output_html = tmp_path / "dashboard.html"
+    result = run_cli(["--log-file", str(log_file), "--output", str(output_html)])
+    assert result.returncode == 0, result.stderr
+    assert "₹20.00" in output_html.read_text()
+
+    result = run_cli(["compact", "--log-file", str(log_file), "--raw-days", "5", "--hourly-days", "2"])
+    assert result.returncode == 1
+    assert "Error:" in result.stdout
+
+
+def test_cli_chargeback(tmp_path):
+    """Scenario 12: Per-customer chargeback statements for one month"""
+    log_file = tmp_path / "logs.jsonl"
+    with open(log_file, "w") as f:
+        for i in range(30):
+            f.write(json.dumps({"timestamp": f"2026-0{1 + i % 2}-1{i % 10}T10:00:00", "agent": "bot",
+                                "model": "gpt-4o", "customer_id": f"acme_{i % 3}", "cost_inr": 1.0,
+                                "tokens_in": 10, "tokens_out": 5, "outcome": "success"}) + "\n")
+
+    output_dir = tmp_path / "chargeback"
+    result = run_cli(["chargeback", "--log-file", str(log_file), "--output-dir", str(output_dir),
+                      "--month", "2026-02", "--format", "json"])
+    assert result.returncode == 0, result.stderr
+    assert "Statements for 3 customers" in result.stdout
+    with open(output_dir / "summary.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(r["customer_id"] for r in rows) == ["acme_0", "acme_1", "acme_2"]
+    assert sum(float(r["cost_inr"]) for r in rows) == 15.0
+    statement = json.loads((output_dir / rows[0]["statement"]).read_text())
+    assert statement["period"] == "2026-02"
+
+    result = run_cli(["chargeback", "--log-file", str(log_file), "--output-dir", str(output_dir),
+                      "--month", "February"])
+    assert result.returncode == 1
+    assert "Error:" in result.stdout
@@ -0,0 +1,93 @@
+import urllib.request
+from unittest.mock import MagicMock
+
+from inferenceiq.metrics import OVERFLOW_VALUE, MetricsRegistry
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _entry(**kwargs):
+    entry = {"agent": "billing_bot", "model": "gpt-4o", "outcome": "success",
+             "tokens_in": 100, "tokens_out": 20, "tokens_cached": 40,
+             "cost_inr": 0.5, "latency_ms": 300.0}
+    entry.update(kwargs)
+    return entry
+
+
+def test_render_counters_and_histogram():
+    metrics = MetricsRegistry(latency_buckets_ms=(100, 500, 1000))
+    metrics.record(_entry(), "openai")
+    metrics.record(_entry(latency_ms=50.0, cost_inr=0.25), "openai")
+    metrics.record({"agent": "billing_bot", "model": "gpt-4o", "outcome": "failed",
+                    "latency_ms": 2000.0}, "openai")
+    text = metrics.render()
+
+    labels = 'provider="openai",model="gpt-4o",agent="billing_bot",outcome="success"'
+    assert f"inferenceiq_calls_total{{{labels}}} 2" in text
+    assert f'inferenceiq_tokens_total{{{labels},type="input"}} 200' in text
+    assert f'inferenceiq_tokens_total{{{labels},type="cached"}} 80' in text
+    assert f"inferenceiq_cost_inr_total{{{labels}}} 0.75" in text
+    assert f'inferenceiq_latency_ms_bucket{{{labels},le="100"}} 1' in text
+    assert f'inferenceiq_latency_ms_bucket{{{labels},le="500"}} 2' in text
+    assert f'inferenceiq_latency_ms_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"inferenceiq_latency_ms_count{{{labels}}} 2" in text
+    failed = 'provider="openai",model="gpt-4o",agent="billing_bot",outcome="failed"'
+    assert f'inferenceiq_latency_ms_bucket{{{failed},le="1000"}} 0' in text
+    assert f'inferenceiq_latency_ms_bucket{{{failed},le="+Inf"}} 1' in text
+    assert "# TYPE inferenceiq_latency_ms histogram" in text
+
+
+def test_label_cardinality_is_bounded():
+    metrics = MetricsRegistry(max_label_values=3)
+    for i in range(1000):
+        metrics.record(_entry(agent=f"agent_{i}"), "openai")
+    series = metrics.snapshot()
+    assert len(series) == 4
+    assert series[("openai", "gpt-4o", OVERFLOW_VALUE, "success")][0] == 997
+
+
+def test_label_values_are_escaped():
+    metrics = MetricsRegistry()
+    metrics.record(_entry(agent='bad"agent\n'), "openai")
+    assert 'agent="bad\\"agent\\n"' in metrics.render()
+
+
+def test_textfile_and_http_endpoint(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.record(_entry(), "anthropic")
+
+    path = tmp_path / "textfile" / "inferenceiq.prom"
+    metrics.write_textfile(str(path))
+    assert 'provider="anthropic"' in path.read_text()
+
+    server = metrics.serve(port=0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "inferenceiq_calls_total" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_tracker_records_every_call():
+    metrics = MetricsRegistry()
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="bot", metrics=metrics)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}], user_id="u1")
+    tracker.client.chat.completions.create.side_effect = Exception("boom")
+    try:
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    except Exception:
+        pass
+
+    series = metrics.snapshot()
+    assert series[("openai", "gpt-4o", "bot", "success")][:3] == [1, 10, 5]
+    assert series[("openai", "gpt-4o", "bot", "failed")][0] == 1
+    assert "u1" not in metrics.render()
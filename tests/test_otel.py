@@ -0,0 +1,141 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("opentelemetry.trace")
+
+from opentelemetry import trace
+
+from inferenceiq.otel import CallTracer, inject_headers, remote_parent
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _tracker(tracer, fail=False):
+    tracker = GenAICostTracker(api_key="fake", provider="openai", agent_name="kyc_agent", tracer=tracer)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.usage.prompt_tokens = 100
+    response.usage.completion_tokens = 20
+    tracker.client = MagicMock()
+    if fail:
+        tracker.client.chat.completions.create.side_effect = RuntimeError("boom")
+    else:
+        tracker.client.chat.completions.create.return_value = response
+    return tracker
+
+
+def test_span_attributes_without_sdk():
+    tracer = MagicMock()
+    span = tracer.start_span.return_value
+    tracker = _tracker(CallTracer(tracer=tracer))
+
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}], session_id="s1")
+
+    name = tracer.start_span.call_args.args[0]
+    attributes = tracer.start_span.call_args.kwargs["attributes"]
+    assert name == "chat gpt-4o"
+    assert attributes["gen_ai.system"] == "openai"
+    assert attributes["gen_ai.request.model"] == "gpt-4o"
+    assert attributes["inferenceiq.agent"] == "kyc_agent"
+    recorded = {c.args[0]: c.args[1] for c in span.set_attribute.call_args_list}
+    assert recorded["gen_ai.usage.input_tokens"] == 100
+    assert recorded["gen_ai.usage.output_tokens"] == 20
+    assert recorded["inferenceiq.cost_inr"] == tracker.logs[0]["cost_inr"]
+    assert recorded["inferenceiq.outcome"] == "success"
+    assert recorded["session.id"] == "s1"
+    span.end.assert_called_once()
+
+
+def test_failed_call_marks_span_error():
+    tracer = MagicMock()
+    span = tracer.start_span.return_value
+    tracker = _tracker(CallTracer(tracer=tracer), fail=True)
+    with pytest.raises(RuntimeError):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    span.record_exception.assert_called_once()
+    recorded = {c.args[0]: c.args[1] for c in span.set_attribute.call_args_list}
+    assert recorded["error.type"] == "RuntimeError"
+    span.end.assert_called_once()
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_span_ends_when_logging_raises(fail):
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    tracer = MagicMock()
+    span = tracer.start_span.return_value
+    tracker = _tracker(CallTracer(tracer=tracer), fail=fail)
+    tracker.log_interaction = MagicMock(side_effect=OSError("disk full"))
+    with pytest.raises(OSError):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    span.end.assert_called_once()
+    assert isinstance(span.record_exception.call_args.args[0], OSError)
+    assert trace.get_current_span() is trace.INVALID_SPAN
+
+    span.reset_mock()
+    tracker.async_client = MagicMock()
+    tracker.async_client.chat.completions.create = AsyncMock(
+        return_value=tracker.client.chat.completions.create.return_value,
+        side_effect=tracker.client.chat.completions.create.side_effect)
+    with pytest.raises(OSError):
+        asyncio.run(tracker.acall_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}]))
+    span.end.assert_called_once()
+    assert trace.get_current_span() is trace.INVALID_SPAN
+
+
+def test_noop_tracer_logs_without_trace_ids():
+    tracker = _tracker(CallTracer())
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert "trace_id" not in tracker.logs[0]
+    assert trace.get_current_span() is trace.INVALID_SPAN
+
+
+def _sdk():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from inferenceiq.otel import configure_tracing
+    exporter = InMemorySpanExporter()
+    provider = configure_tracing(exporter, batch=True)
+    return exporter, provider
+
+
+def test_spans_exported_with_parent_context():
+    exporter, provider = _sdk()
+    tracer = CallTracer(tracer_provider=provider)
+    tracker = _tracker(tracer)
+    workflow = provider.get_tracer("test")
+
+    with workflow.start_as_current_span("agent.step") as parent:
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    provider.force_flush()
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    child = spans["chat gpt-4o"]
+    assert child.parent.span_id == parent.get_span_context().span_id
+    assert child.attributes["gen_ai.usage.input_tokens"] == 100
+    assert child.kind == trace.SpanKind.CLIENT
+    log = tracker.logs[0]
+    assert log["trace_id"] == format(child.context.trace_id, "032x")
+    assert log["span_id"] == format(child.context.span_id, "016x")
+
+
+def test_remote_parent_and_jsonl_exporter(tmp_path):
+    pytest.importorskip("opentelemetry.sdk")
+    from inferenceiq.otel import JsonlSpanExporter, configure_tracing
+    path = tmp_path / "spans.jsonl"
+    provider = configure_tracing(JsonlSpanExporter(str(path)), batch=True)
+    tracker = _tracker(CallTracer(tracer_provider=provider))
+    workflow = provider.get_tracer("test")
+
+    with workflow.start_as_current_span("upstream"):
+        headers = inject_headers()
+    with remote_parent(headers):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    provider.force_flush()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    call = next(s for s in spans if s["name"] == "chat gpt-4o")
+    assert call["context"]["trace_id"][2:] == headers["traceparent"].split("-")[1]
+    assert call["attributes"]["inferenceiq.outcome"] == "success"
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.prefixes import prefix_fields, prefix_hashes, shared_prefixes
+from inferenceiq.tracker import GenAICostTracker
+
+SYSTEM = {"role": "system", "content": "You are a careful KYC assistant. " * 600}
+START = datetime(2026, 3, 2, 10)
+
+
+def _messages(question, system=SYSTEM):
+    return [system, {"role": "user", "content": question}]
+
+
+def _call(minutes, messages, agent="kyc_bot", **extra):
+    return {"timestamp": (START + timedelta(minutes=minutes)).isoformat(), "agent": agent,
+            "model": "gpt-4o", "outcome": "success", **prefix_fields(messages, "gpt-4o"), **extra}
+
+
+def _engine(records):
+    engine = AnalyticsEngine(log_file="unused.jsonl")
+    engine._to_frame(records)
+    return engine
+
+
+def test_prefix_hashes_chain_messages():
+    a = prefix_hashes(_messages("What is a PAN card?"))
+    b = prefix_hashes(_messages("How do I update my address?"))
+    assert len(a) == 2
+    assert a[0] == b[0] and a[1] != b[1]
+    # Same last message after a different history is a different prefix
+    c = prefix_hashes(_messages("What is a PAN card?", {"role": "system", "content": "Be brief."}))
+    assert c[0] != a[0] and c[1] != a[1]
+
+    fields = prefix_fields(_messages("hi"), "gpt-4o")
+    assert fields["prefix_hashes"] == prefix_hashes(_messages("hi"))
+    assert fields["prefix_tokens"][0] > 1024
+    assert fields["prefix_tokens"][1] > fields["prefix_tokens"][0]
+    assert prefix_fields([{"content": object()}]) == {}
+
+
+def test_tracker_logs_prefixes_of_sent_messages():
+    tracker = GenAICostTracker(api_key="fake", provider="openai", prefix_hashing=True)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "ok"
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 2
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+
+    messages = _messages("hi")
+    tracker.call_llm(model="gpt-4o", messages=messages)
+    assert tracker.logs[0]["prefix_hashes"] == prefix_hashes(messages)
+    assert len(tracker.logs[0]["prefix_tokens"]) == 2
+
+    plain = GenAICostTracker(api_key="fake", provider="openai")
+    plain.client = tracker.client
+    plain.call_llm(model="gpt-4o", messages=messages)
+    assert "prefix_hashes" not in plain.logs[0]
+
+
+def test_shared_prefixes_respect_cache_lifetime():
+    frame = pd.DataFrame([
+        _call(0, _messages("q1")),
+        _call(1, _messages("q2")),
+        _call(2, _messages("q2")),
+        _call(30, _messages("q3")),
+        _call(31, _messages("q4"), agent="other"),
+    ])
+    shared = shared_prefixes(frame, ttl_minutes=5)
+    assert list(shared.index) == [1, 2, 4]
+    assert list(shared["shared_depth"]) == [1, 2, 1]
+    assert shared.loc[2, "shared_tokens"] == frame.loc[2, "prefix_tokens"][1]
+    assert shared.loc[1, "shared_hash"] == frame.loc[0, "prefix_hashes"][0]
+    # Without a lifetime the call after the gap reuses the prefix too
+    assert list(shared_prefixes(frame, ttl_minutes=None).index) == [1, 2, 3, 4]
+
+
+def test_prefix_cache_opportunities():
+    records = [_call(i, _messages(f"question {i}"), tokens_cached=0, sample_weight=2.0) for i in range(10)]
+    records[5]["tokens_cached"] = 1024
+    records += [_call(i, _messages(f"q{i}", {"role": "system", "content": f"short {i}"}), agent="chat_bot")
+                for i in range(10)]
+    engine = _engine(records)
+
+    rows = {r["agent"]: r for r in engine.get_prefix_cache_opportunities()}
+    system_tokens = records[0]["prefix_tokens"][0]
+    kyc = rows["kyc_bot"]
+    assert kyc["calls"] == 20
+    assert kyc["calls_with_shared_prefix"] == 18
+    assert kyc["cacheable_tokens"] == 18 * system_tokens
+    assert kyc["missed_tokens"] == 18 * system_tokens - 2 * 1024
+    rates = engine._pricing_ref["gpt-4o"]
+    assert kyc["potential_savings_inr"] == pytest.approx(
+        kyc["missed_tokens"] * (rates["input"] - rates["cached_input"]), rel=1e-6)
+    # Short shared prefixes are below the provider minimum
+    assert rows["chat_bot"]["cacheable_tokens"] == 0
+    assert engine.get_prefix_cache_opportunities(min_tokens=10**6)[0]["cacheable_tokens"] == 0
+
+    (top,) = engine.get_shared_prefixes()
+    assert top == {"prefix_hash": records[0]["prefix_hashes"][0], "messages": 1, "tokens": system_tokens,
+                   "reused_calls": 18, "cacheable_tokens": 18 * system_tokens, "agents": ["kyc_bot"]}
+
+
+def test_prefix_index_scales():
+    system_prompts = [{"role": "system", "content": f"policy {i} " * 50} for i in range(20)]
+    records = []
+    for i in range(50_000):
+        entry = {"timestamp": (START + timedelta(seconds=i)).isoformat(), "agent": f"agent_{i % 20}",
+                 "model": "gpt-4o", **prefix_fields(_messages(f"q{i}", system_prompts[i % 20]), "gpt-4o")}
+        records.append(entry)
+    engine = _engine(records)
+    rows = engine.get_prefix_cache_opportunities(min_tokens=0)
+    assert len(rows) == 20
+    assert sum(r["calls_with_shared_prefix"] for r in rows) == 50_000 - 20
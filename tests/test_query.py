@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.query import LogQuery, parse_time_bound
+
+
+@pytest.fixture
+def year_log_file(tmp_path):
+    log_file = tmp_path / "year_logs.jsonl"
+    entries = [
+        {"timestamp": "2025-03-01T09:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "cost_inr": 1.0, "outcome": "success", "tags": ["prod"]},
+        {"timestamp": "2026-01-15T09:00:00", "agent": "billing_bot", "model": "gpt-4o",
+         "cost_inr": 2.0, "outcome": "success", "tags": ["prod"]},
+        {"timestamp": "2026-01-15T18:30:00.250000", "agent": "support_bot", "model": "gpt-4o-mini",
+         "cost_inr": 0.5, "outcome": "success", "tags": ["beta"]},
+        {"timestamp": "2026-01-16T08:00:00", "agent": "billing_bot", "model": "gpt-4o-mini",
+         "cost_inr": 0.25, "outcome": "failed", "tags": []},
+    ]
+    with open(log_file, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    return str(log_file)
+
+
+def test_parse_time_bound():
+    assert parse_time_bound("2026-01-15") == "2026-01-15T00:00:00"
+    assert parse_time_bound("2026-01-15", end_of_day=True) == "2026-01-16T00:00:00"
+    assert parse_time_bound("2026-01-15T10:30", end_of_day=True) == "2026-01-15T10:30:00"
+    now = datetime(2026, 1, 15, 12, 0, 0)
+    assert parse_time_bound("7d", now=now) == "2026-01-08T12:00:00"
+    assert parse_time_bound("12h", now=now) == "2026-01-15T00:00:00"
+    assert parse_time_bound(None) is None
+    with pytest.raises(ValueError):
+        parse_time_bound("last tuesday")
+
+
+def test_accepts_line_skips_out_of_range_before_decode():
+    query = LogQuery(since="2026-01-15", until="2026-01-15")
+    assert query.accepts_line('{"timestamp": "2026-01-15T09:00:00", "agent": "a"}\n')
+    assert not query.accepts_line('{"timestamp": "2025-03-01T09:00:00", NOT JSON\n')
+    assert not query.accepts_line('{"timestamp": "2026-01-16T00:00:00", NOT JSON\n')
+
+
+def test_accepts_line_dimension_screen():
+    query = LogQuery(agents=["billing_bot"])
+    assert query.accepts_line('{"timestamp": "2026-01-15T09:00:00", "agent": "billing_bot"}')
+    assert not query.accepts_line('{"timestamp": "2026-01-15T09:00:00", "agent": "support_bot"}')
+
+
+def test_load_data_with_query(year_log_file):
+    engine = AnalyticsEngine(log_file=year_log_file)
+    df = engine.load_data(LogQuery(since="2026-01-15", until="2026-01-15"))
+    assert len(df) == 2
+    assert engine.get_total_cost() == 2.5
+
+    df = engine.load_data(LogQuery(since="2026-01-01", agents=["billing_bot"]))
+    assert list(df["cost_inr"]) == [2.0, 0.25]
+
+    df = engine.load_data(LogQuery(models=["gpt-4o-mini"], tags=["beta"]))
+    assert list(df["agent"]) == ["support_bot"]
+
+
+def test_query_passed_to_constructor_is_reused(year_log_file):
+    engine = AnalyticsEngine(log_file=year_log_file, query=LogQuery(agents=["support_bot"]))
+    engine.load_data()
+    assert engine.get_total_cost() == 0.5
+
+
+def test_apply_matches_pushdown(year_log_file):
+    engine = AnalyticsEngine(log_file=year_log_file)
+    full = engine.load_data()
+    query = LogQuery(since="2026-01-15", agents=["billing_bot"], tags=["prod"])
+    filtered = query.apply(full)
+    pushed = engine.load_data(query)
+    assert list(filtered["cost_inr"]) == list(pushed["cost_inr"]) == [2.0]
+
+
+def test_from_args_empty():
+    class Args:
+        since = until = agent = model = tag = None
+    assert LogQuery.from_args(Args()) is None
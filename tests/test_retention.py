@@ -0,0 +1,221 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from inferenceiq import binlog
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.index import LogIndex
+from inferenceiq.query import LogQuery
+from inferenceiq.retention import (
+    DAILY, HOURLY, LatencySketch, RetentionPolicy, load_watermarks, manifest_path, read_rows, tier_path,
+)
+from inferenceiq.sql import SQLAnalyticsEngine
+
+NOW = datetime(2026, 3, 1, 12, 30)
+
+
+def _records(days=40):
+    rng = np.random.default_rng(1)
+    records = []
+    start = NOW - timedelta(days=days)
+    for h in range(days * 24):
+        hour = start + timedelta(hours=h)
+        for agent, model in (("support_bot", "gpt-4o"), ("billing_bot", "gpt-4o-mini")):
+            outcome = ("failed", "cancelled", "coalesced", "success", "success")[h % 5]
+            records.append({
+                "timestamp": (hour + timedelta(minutes=7)).isoformat(),
+                "interaction_id": f"{agent}_{h}",
+                "agent": agent,
+                "model": model,
+                "tokens_in": 100 + h % 7,
+                "tokens_out": 50,
+                "tokens_total": 150 + h % 7,
+                "cost_inr": round(float(rng.uniform(0.1, 2.0)), 4),
+                "latency_ms": float(rng.lognormal(6, 0.7)),
+                "outcome": outcome,
+                "sample_weight": 2.0 if outcome == "success" else 1.0,
+            })
+        if h % 24 == 5:
+            records.append({"timestamp": hour.isoformat(), "record_type": "sampled_out", "agent": "support_bot",
+                            "model": "gpt-4o", "outcome": "success", "calls": 3, "tokens_in": 300,
+                            "tokens_out": 150, "tokens_total": 450, "tokens_cached": 0, "cost_inr": 1.5})
+    return records
+
+
+def _write(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _summary(engine):
+    return {
+        "total": round(engine.get_total_cost(), 4),
+        "by_model": {k: round(v, 4) for k, v in engine.get_cost_by_model().items()},
+        "tokens": engine.get_token_usage_stats(),
+        "success": round(engine.get_success_rate(), 6),
+        "failures": engine.get_failure_stats(),
+        "daily": {k: round(v, 4) for k, v in engine.get_daily_trend().items()},
+    }
+
+
+def _engine(log_file, query=None):
+    engine = AnalyticsEngine(log_file=log_file, query=query)
+    engine.load_data()
+    return engine
+
+
+def test_latency_sketch_relative_error_and_merge():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(6, 1.2, 20_000)
+    halves = LatencySketch(), LatencySketch()
+    halves[0].add(values[:7_000])
+    halves[1].add(values[7_000:])
+    merged = LatencySketch.from_dict(json.loads(json.dumps(halves[0].to_dict())))
+    merged.merge(halves[1])
+
+    whole = LatencySketch()
+    whole.add(values)
+    assert merged.buckets == pytest.approx(whole.buckets)
+
+    points, weights = merged.points()
+    estimates = AnalyticsEngine._weighted_percentiles(points, weights, (1, 50, 99, 99.9))
+    exact = AnalyticsEngine._weighted_percentiles(values, np.ones(len(values)), (1, 50, 99, 99.9))
+    for estimate, value in zip(estimates, exact):
+        assert estimate == pytest.approx(value, rel=LatencySketch.RELATIVE_ACCURACY)
+
+
+def test_policy_validation_and_watermarks():
+    with pytest.raises(ValueError):
+        RetentionPolicy(raw_days=10, hourly_days=5)
+    with pytest.raises(ValueError):
+        RetentionPolicy(raw_days=1, hourly_days=5, daily_days=2)
+    policy = RetentionPolicy(raw_days=7, hourly_days=30, daily_days=365)
+    marks = policy.watermarks(NOW)
+    assert marks == {"raw_from": "2026-02-22T12:00:00", "hourly_from": "2026-01-30T00:00:00",
+                     "daily_from": "2025-03-01T00:00:00"}
+    # Never moves back
+    assert policy.watermarks(NOW - timedelta(days=3), marks) == marks
+
+
+def test_compaction_preserves_totals(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    _write(log_file, _records())
+    LogIndex.build(log_file)
+    before = _engine(log_file)
+    expected = _summary(before)
+    latency = before.get_latency_percentiles((50, 99), by="agent")
+    attribution = before.get_cost_attribution("agent")
+    size = os.path.getsize(log_file)
+
+    result = RetentionPolicy(raw_days=3, hourly_days=20).compact(log_file, now=NOW)
+    assert result["raw_purged"] > 0 and result["hourly_rows"] > 0 and result["daily_rows"] > 0
+    assert os.path.getsize(log_file) < size / 5
+    assert LogIndex(log_file).is_current()
+    assert all(row["timestamp"] >= result["hourly_from"] for row in read_rows(tier_path(log_file, HOURLY)))
+    assert all(row["timestamp"] < result["hourly_from"] for row in read_rows(tier_path(log_file, DAILY)))
+
+    after = _engine(log_file)
+    assert len(after.df) < len(before.df) / 5
+    assert _summary(after) == expected
+    assert after.get_cost_attribution("agent") == attribution
+    for agent, percentiles in after.get_latency_percentiles((50, 99), by="agent").items():
+        for name, value in percentiles.items():
+            assert value == pytest.approx(latency[agent][name], rel=0.02)
+
+    sql = SQLAnalyticsEngine(log_file, backend="sqlite")
+    sql.load_data()
+    assert _summary(sql) == expected
+
+    # Nothing new expired: a second run changes nothing
+    RetentionPolicy(raw_days=3, hourly_days=20).compact(log_file, now=NOW)
+    assert _summary(_engine(log_file)) == expected
+
+
+def test_interrupted_compaction_never_double_counts(tmp_path, monkeypatch):
+    log_file = str(tmp_path / "costs.jsonl")
+    _write(log_file, _records())
+    expected = _summary(_engine(log_file))
+    policy = RetentionPolicy(raw_days=3, hourly_days=20)
+    policy.compact(log_file, now=NOW - timedelta(days=5))
+
+    # Crash after staging rollups but before the commit
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if dst == manifest_path(log_file):
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        policy.compact(log_file, now=NOW)
+    monkeypatch.setattr(os, "replace", real_replace)
+    assert _summary(_engine(log_file)) == expected
+
+    # Crash after the commit, before expired raw records were purged
+    monkeypatch.setattr(RetentionPolicy, "_purge_raw", staticmethod(lambda log_file, raw_from: 0))
+    policy.compact(log_file, now=NOW)
+    monkeypatch.undo()
+    assert _summary(_engine(log_file)) == expected
+
+    policy.compact(log_file, now=NOW)
+    assert _summary(_engine(log_file)) == expected
+    assert load_watermarks(log_file)["raw_from"] == "2026-02-26T12:00:00"
+
+
+def test_queries_and_daily_expiry(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    records = _records()
+    _write(log_file, records)
+    query = LogQuery(since="2026-02-10", agents=["billing_bot"])
+    expected = _summary(_engine(log_file, query))
+
+    RetentionPolicy(raw_days=2, hourly_days=10).compact(log_file, now=NOW)
+    assert _summary(_engine(log_file, query)) == expected
+    # Rollups keep no tags, so tag filters only see raw records
+    assert _engine(log_file, LogQuery(tags=["x"])).rollups.empty
+
+    RetentionPolicy(raw_days=2, hourly_days=10, daily_days=15).compact(log_file, now=NOW)
+    kept = [r for r in records if r["timestamp"] >= "2026-02-14" and r.get("record_type") != "sampled_out"]
+    assert _engine(log_file).get_failure_stats()["count"] == sum(r["outcome"] == "failed" for r in kept)
+
+
+def test_binary_log_compaction(tmp_path):
+    jsonl = str(tmp_path / "costs.jsonl")
+    log_file = str(tmp_path / "costs.iqb")
+    _write(jsonl, _records(days=10))
+    binlog.jsonl_to_binary(jsonl, log_file)
+    expected = _summary(_engine(log_file))
+
+    result = RetentionPolicy(raw_days=2, hourly_days=5).compact(log_file, now=NOW)
+    assert binlog.is_binary_log(log_file)
+    assert result["raw_purged"] > 0
+    assert _summary(_engine(log_file)) == expected
+
+
+def test_sql_sidecars_follow_compaction(tmp_path):
+    log_file = str(tmp_path / "costs.jsonl")
+    _write(log_file, _records(days=10))
+    db_path = str(tmp_path / "elsewhere.sqlite")
+    for engine in (SQLAnalyticsEngine(log_file, backend="sqlite"),
+                   SQLAnalyticsEngine(log_file, backend="sqlite", db_path=db_path)):
+        engine.load_data()
+        engine.backend.close()
+
+    RetentionPolicy(raw_days=2, hourly_days=5).compact(log_file, now=NOW)
+    assert not os.path.exists(log_file + ".sqlite")
+    # Appends grow the rewritten log past the offset the sidecars stopped at
+    with open(log_file, "a") as f:
+        for i in range(3000):
+            f.write(json.dumps({"timestamp": (NOW + timedelta(minutes=i)).isoformat(), "agent": "support_bot",
+                                "model": "gpt-4o", "cost_inr": 0.25, "outcome": "success"}) + "\n")
+
+    expected = _summary(_engine(log_file))
+    for path in (None, db_path):
+        sql = SQLAnalyticsEngine(log_file, backend="sqlite", db_path=path)
+        sql.load_data()
+        assert _summary(sql) == expected
@@ -31,3 +31,15 @@ def test_route_long_query():
     
     assert model == "gpt-4o"
     assert reason == "complexity_high"
+
+def test_route_on_token_count():
+    from inferenceiq.tokens import TokenEstimator
+    router = ModelRouter(length_threshold=50, token_threshold=20,
+                         estimator=TokenEstimator(use_tiktoken=False))
+    # 70 characters is ~18 tokens: under the token threshold despite length_threshold
+    model, reason = router.route("a" * 70, "gpt-4o", "gpt-4o-mini")
+    assert model == "gpt-4o-mini"
+
+    model, reason = router.route("a" * 200, "gpt-4o", "gpt-4o-mini")
+    assert model == "gpt-4o"
+    assert reason == "complexity_high"
@@ -0,0 +1,101 @@
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.metrics import MetricsRegistry
+from inferenceiq.sampling import SAMPLED_OUT, SampledOutCounter, SamplingPolicy
+from inferenceiq.tracker import GenAICostTracker
+
+
+def _entry(i, agent="high_volume_bot", outcome="success", cost=0.01, latency=100.0):
+    entry = {"timestamp": f"2026-01-15T{10 + i % 3:02d}:00:{i % 60:02d}", "agent": agent,
+             "model": "gpt-4o-mini", "outcome": outcome, "latency_ms": latency,
+             "customer_id": f"cust_{i % 4}", "fingerprint": f"fp_{i % 50}"}
+    if outcome == "success":
+        entry.update({"tokens_in": 100, "tokens_out": 10, "tokens_total": 110, "cost_inr": cost})
+    return entry
+
+
+def test_policy_keeps_failures_and_expensive_calls():
+    policy = SamplingPolicy(rate=0.01, keep_cost_above_inr=1.0, keep_latency_above_ms=5000, seed=1)
+    assert policy.weight(_entry(0, outcome="failed")) == 1.0
+    assert policy.weight(_entry(0, cost=2.0)) == 1.0
+    assert policy.weight(_entry(0, latency=9000.0)) == 1.0
+    weights = [policy.weight(_entry(i)) for i in range(10_000)]
+    kept = [w for w in weights if w is not None]
+    assert 50 <= len(kept) <= 150
+    assert set(kept) == {100.0}
+
+
+def test_policy_per_agent_rates():
+    policy = SamplingPolicy(agent_rates={"high_volume_bot": 0.5}, seed=1)
+    assert policy.rate_for("high_volume_bot") == 0.5
+    assert policy.rate_for("kyc_agent") == 1.0
+    assert all(policy.weight(_entry(i, agent="kyc_agent")) == 1.0 for i in range(100))
+    with pytest.raises(ValueError):
+        SamplingPolicy(rate=0)
+
+
+def test_sampled_out_counter_drains_hourly_totals():
+    counter = SampledOutCounter()
+    for i in range(6):
+        counter.add(_entry(i))
+    records = counter.drain()
+    assert [r["timestamp"] for r in records] == [
+        "2026-01-15T10:00:00", "2026-01-15T11:00:00", "2026-01-15T12:00:00"]
+    assert all(r["record_type"] == SAMPLED_OUT and r["calls"] == 2 for r in records)
+    assert records[0]["cost_inr"] == 0.02
+    assert counter.drain() == []
+
+
+def _sampled_log(tmp_path, rows=20_000):
+    metrics = MetricsRegistry()
+    tracker = GenAICostTracker(api_key="fake", provider=None, metrics=metrics,
+                               sampling=SamplingPolicy(rate=0.1, seed=7))
+    for i in range(rows):
+        outcome = "failed" if i % 100 == 0 else "success"
+        tracker.log_interaction(_entry(i, outcome=outcome, latency=float(i % 1000)))
+    log_file = str(tmp_path / "sampled.jsonl")
+    tracker.save_logs(log_file)
+    return log_file, metrics
+
+
+def test_tracker_writes_weighted_records_and_exact_totals(tmp_path):
+    log_file, metrics = _sampled_log(tmp_path)
+    engine = AnalyticsEngine(log_file=log_file)
+    df = engine.load_data()
+
+    # Far fewer records, all failures kept
+    assert len(df) < 3_000
+    assert (df["outcome"] == "failed").sum() == 200
+    assert set(df.loc[df["outcome"] == "success", "sample_weight"]) == {10.0}
+
+    # Headline totals are exact and match the in-process counters
+    exact_successes = 20_000 - 200
+    assert engine.get_total_cost() == pytest.approx(exact_successes * 0.01)
+    assert engine.get_token_usage_stats()["total_input"] == exact_successes * 100
+    assert engine.get_cost_by_model()["gpt-4o-mini"] == pytest.approx(exact_successes * 0.01)
+    assert sum(engine.get_daily_trend().values()) == pytest.approx(exact_successes * 0.01)
+    assert engine.get_success_rate() == pytest.approx(99.0)
+    assert engine.get_failure_stats() == {"count": 200, "rate": 1.0}
+    series = metrics.snapshot()[("unknown", "gpt-4o-mini", "high_volume_bot", "success")]
+    assert series[0] == exact_successes
+
+    (agent,) = engine.get_cost_attribution("agent")
+    assert agent["calls"] == 20_000
+    assert agent["cost_inr"] == pytest.approx(exact_successes * 0.01)
+
+
+def test_weighted_estimates_are_unbiased(tmp_path):
+    log_file, _ = _sampled_log(tmp_path)
+    engine = AnalyticsEngine(log_file=log_file)
+    engine.load_data()
+
+    # Customers are not in the sampled-out totals: estimated from weights
+    customers = {r["customer_id"]: r for r in engine.get_cost_attribution("customer_id")}
+    assert sum(r["calls"] for r in customers.values()) == pytest.approx(20_000, rel=0.05)
+    for row in customers.values():
+        assert row["cost_inr"] == pytest.approx(5_000 * 0.01 * 0.99, rel=0.15)
+
+    # Uniform latency 0..999 keeps its median under sampling
+    assert engine.get_latency_percentiles((50,))["p50"] == pytest.approx(500, abs=40)
+    assert engine.calculate_potential_cache_savings()["duplicate_count"] == pytest.approx(19_750, rel=0.05)
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from inferenceiq.scheduler import RateLimitScheduler, TokenBucket, is_rate_limit_error
+from inferenceiq.tracker import GenAICostTracker
+
+KEY = ("openai", "gpt-4o")
+
+
+def test_token_bucket():
+    bucket = TokenBucket(per_minute=600)  # 10 units/s, 600 burst
+    assert bucket.wait_time(600) == 0
+    bucket.take(600)
+    assert bucket.wait_time(10) == pytest.approx(1.0, abs=0.05)
+    # Charged overdraft delays later admissions
+    bucket.adjust(-100)
+    assert bucket.wait_time(10) == pytest.approx(11.0, abs=0.05)
+    # Requests larger than the bucket are clamped to its capacity instead of waiting forever
+    assert TokenBucket(per_minute=60).wait_time(10_000) == 0
+    with pytest.raises(ValueError):
+        TokenBucket(per_minute=0)
+
+
+def test_unlisted_models_are_not_limited():
+    scheduler = RateLimitScheduler({KEY: {"rpm": 1}})
+    for _ in range(5):
+        ticket = scheduler.acquire("openai", "gpt-4o-mini", tokens=10_000)
+        assert ticket.queue_wait_ms == 0.0
+    with pytest.raises(ValueError):
+        scheduler.acquire("openai", "gpt-4o-mini", lane="urgent")
+
+
+def test_requests_are_paced_to_the_limit():
+    # 20 requests/s with a burst of one
+    scheduler = RateLimitScheduler({KEY: {"rpm": 1200}}, burst_seconds=0.05)
+    start = time.monotonic()
+    tickets = [scheduler.acquire(*KEY) for _ in range(4)]
+    elapsed = time.monotonic() - start
+    assert 0.12 <= elapsed < 1.0
+    assert tickets[0].queue_wait_ms < 10
+    assert tickets[-1].queue_wait_ms > 30
+
+
+def test_interactive_lane_goes_first():
+    scheduler = RateLimitScheduler({KEY: {"rpm": 1200}}, burst_seconds=0.05)
+    scheduler.acquire(*KEY)  # empty the bucket
+    order = []
+
+    def call(lane):
+        scheduler.acquire(*KEY, lane=lane)
+        order.append(lane)
+
+    background = threading.Thread(target=call, args=("background",))
+    background.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(target=call, args=("interactive",))
+    interactive.start()
+    background.join()
+    interactive.join()
+    assert order == ["interactive", "background"]
+
+
+def test_settle_corrects_token_estimate():
+    scheduler = RateLimitScheduler({KEY: {"tpm": 6000}})
+    ticket = scheduler.acquire(*KEY, tokens=5000)
+    # Only 1000 tokens left: a 2000 token call would wait ~10s
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(*KEY, tokens=2000, timeout=0.05)
+    scheduler.settle(ticket, actual_tokens=1000)
+    assert scheduler.acquire(*KEY, tokens=2000, timeout=0.05).queue_wait_ms < 50
+    assert scheduler._queues[KEY] == []
+
+
+def test_throttled_drains_buckets():
+    scheduler = RateLimitScheduler({KEY: {"rpm": 600, "tpm": 60_000}})
+    ticket = scheduler.acquire(*KEY, tokens=10)
+    scheduler.throttled(ticket)
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(*KEY, tokens=10, timeout=0.02)
+
+
+def test_aacquire():
+    scheduler = RateLimitScheduler({KEY: {"rpm": 1200}}, burst_seconds=0.05)
+
+    async def main():
+        return await asyncio.gather(*(scheduler.aacquire(*KEY, lane="background") for _ in range(3)))
+
+    tickets = asyncio.run(main())
+    assert sorted(t.queue_wait_ms for t in tickets)[-1] > 60
+    assert {t.lane for t in tickets} == {"background"}
+
+
+def test_tracker_logs_queue_wait_and_settles_usage():
+    scheduler = RateLimitScheduler({KEY: {"tpm": 60_000}})
+    tracker = GenAICostTracker(api_key="fake", provider="openai", scheduler=scheduler)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "ok"
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}],
+                     max_tokens=100, priority="background")
+    log = tracker.logs[0]
+    assert log["priority"] == "background"
+    assert log["queue_wait_ms"] >= 0
+    # Reservation (prompt estimate + 100) was corrected to the 15 tokens used
+    assert scheduler._buckets[KEY][1].level == pytest.approx(60_000 - 15, abs=5)
+
+    error = Exception("Too Many Requests")
+    error.status_code = 429
+    assert is_rate_limit_error(error)
+    tracker.client.chat.completions.create.side_effect = error
+    with pytest.raises(Exception):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert tracker.logs[-1]["outcome"] == "failed"
+    assert "queue_wait_ms" in tracker.logs[-1]
+    assert scheduler._buckets[KEY][1].level <= 1
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from inferenceiq.singleflight import SingleFlight
+
+
+def test_do_coalesces_concurrent_threads():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in results) == [False] * 7 + [True]
+    assert {result for result, _ in results} == {"answer"}
+    assert flight.in_flight() == 0
+    # Nothing is cached once the call completed
+    assert flight.do("k", lambda: "again") == ("again", True)
+
+
+def test_do_shares_errors_with_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def run():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=run)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ["upstream down", "upstream down"]
+
+
+def test_ado_coalesces_coroutines():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado(("m", "fp"), work) for _ in range(5)),
+                                    flight.ado(("m", "other"), work))
+
+    results = asyncio.run(main())
+    assert len(calls) == 2
+    assert [leader for _, leader in results] == [True, False, False, False, False, True]
+    assert flight.in_flight() == 0
+
+
+def test_ado_propagates_errors_and_cancellation():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def main():
+        results = await asyncio.gather(flight.ado("k", failing), flight.ado("k", failing),
+                                       return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError, ValueError]
+
+        leader = asyncio.ensure_future(flight.ado("s", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("s", slow))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        assert not leader.done()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(main())
+    assert flight.in_flight() == 0
+
+
+def test_ado_followers_survive_leader_cancellation():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(main())
+    # One follower was elected to re-run the work; the others share its result
+    assert sorted(results, key=lambda r: r[1]) == [("answer", False), ("answer", False), ("answer", True)]
+    assert len(calls) == 2
+    assert flight.in_flight() == 0
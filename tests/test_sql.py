@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.query import LogQuery
+from inferenceiq.sampling import SamplingPolicy
+from inferenceiq.sql import SQLAnalyticsEngine, create_engine
+from inferenceiq.synthetic import SyntheticLogGenerator
+from inferenceiq.tracker import GenAICostTracker
+
+BACKENDS = [
+    "sqlite",
+    pytest.param("duckdb", marks=pytest.mark.skipif(
+        importlib.util.find_spec("duckdb") is None, reason="duckdb not installed")),
+]
+
+QUERIES = [
+    None,
+    LogQuery(since="2026-01-03", until="2026-01-05"),
+    LogQuery(agents=["billing_bot", "kyc_agent"]),
+    LogQuery(models=["gpt-4o"], tags=["prod"]),
+]
+
+
+@pytest.fixture(scope="module")
+def log_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("sql") / "logs.jsonl")
+    SyntheticLogGenerator(seed=3, days=7, distinct_prompts=500).write(path, 5_000, chunk_size=1_000)
+    # Sampled records plus sampled-out totals, and a few irregular rows
+    tracker = GenAICostTracker(api_key="fake", provider=None, sampling=SamplingPolicy(rate=0.2, seed=1))
+    for i in range(500):
+        tracker.log_interaction({
+            "timestamp": f"2026-01-04T{i % 24:02d}:30:00", "agent": "billing_bot", "model": "gpt-4o",
+            "tokens_in": 50, "tokens_out": 5, "tokens_total": 55, "cost_inr": 0.15,
+            "outcome": "success", "fingerprint": f"fp_{i % 7}", "tags": ["prod"],
+        })
+    tracker.save_logs(path)
+    with open(path, "a") as f:
+        f.write(json.dumps({"timestamp": "2026-01-06T10:00:00", "agent": "billing_bot",
+                            "model": "unknown-model", "outcome": "failed", "tags": []}) + "\n")
+        f.write(json.dumps({"timestamp": "2026-01-06T11:00:00.5", "agent": "kyc_agent",
+                            "model": "gpt-4o", "outcome": "success", "tokens_in": 10,
+                            "tokens_out": 1, "tokens_total": 11, "cost_inr": 0.02}) + "\n")
+        f.write(json.dumps({"timestamp": "2026-01-06T11:00:01", "agent": "kyc_agent",
+                            "model": "gpt-4o", "outcome": "coalesced", "tokens_in": 0,
+                            "tokens_out": 0, "tokens_total": 0, "cost_inr": 0.0}) + "\n")
+    return path
+
+
+def _results(engine):
+    return {
+        "total_cost": engine.get_total_cost(),
+        "cost_by_model": engine.get_cost_by_model(),
+        "tokens": engine.get_token_usage_stats(),
+        "daily_trend": engine.get_daily_trend(),
+        "success_rate": engine.get_success_rate(),
+        "failures": engine.get_failure_stats(),
+        "cache": engine.calculate_potential_cache_savings(),
+    }
+
+
+def _assert_same(actual, expected):
+    assert set(actual) == set(expected)
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            _assert_same(actual[key], value)
+        else:
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-6), key
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("query", QUERIES, ids=["all", "time", "agents", "model_tag"])
+def test_sql_getters_match_pandas(log_file, backend, query, tmp_path):
+    pandas_engine = AnalyticsEngine(log_file, query=query)
+    pandas_engine.load_data()
+    sql_engine = SQLAnalyticsEngine(log_file, query=query, backend=backend,
+                                    db_path=str(tmp_path / "logs.sqlite"))
+    sql_engine.load_data()
+    assert sql_engine.df.empty
+    _assert_same(_results(sql_engine), _results(pandas_engine))
+
+
+def test_sqlite_ingest_is_incremental(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    SyntheticLogGenerator(seed=5, days=2).write(path, 1_000)
+    engine = SQLAnalyticsEngine(path, backend="sqlite")
+    engine.load_data()
+    before = engine.get_total_cost()
+    assert os.path.exists(path + ".sqlite")
+
+    with open(path, "a") as f:
+        f.write(json.dumps({"timestamp": datetime(2026, 1, 2, 12).isoformat(), "agent": "a",
+                            "model": "gpt-4o", "outcome": "success", "cost_inr": 10.0}) + "\n")
+        f.write('{"timestamp": "2026-01-02T13:00:00", "partial')
+    engine.load_data()
+    assert engine.get_total_cost() == pytest.approx(before + 10.0)
+    count = engine.backend.execute("SELECT COUNT(*) FROM logs", [])[0][0]
+    assert count == 1_001
+
+    # A fresh engine reuses the sidecar database; a rewritten log is re-ingested
+    SyntheticLogGenerator(seed=6, days=1).write(path, 10)
+    fresh = SQLAnalyticsEngine(path, backend="sqlite")
+    fresh.load_data()
+    assert fresh.backend.execute("SELECT COUNT(*) FROM logs", [])[0][0] == 10
+
+
+def test_sqlite_reads_binary_logs(tmp_path):
+    jsonl = str(tmp_path / "logs.jsonl")
+    binary = str(tmp_path / "logs.iqb")
+    generator_args = dict(seed=8, days=2)
+    SyntheticLogGenerator(**generator_args).write(jsonl, 800)
+    SyntheticLogGenerator(**generator_args).write(binary, 800, format="binary")
+    expected = AnalyticsEngine(jsonl)
+    expected.load_data()
+    engine = SQLAnalyticsEngine(binary, backend="auto")
+    assert engine.backend.name == "sqlite"
+    engine.load_data()
+    _assert_same(_results(engine), _results(expected))
+
+
+def test_materialize_and_factory(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    SyntheticLogGenerator(seed=9, days=1).write(path, 100)
+    engine = create_engine(path, backend="sqlite")
+    assert isinstance(engine, SQLAnalyticsEngine)
+    assert len(engine.load_data(materialize=True)) == 100
+    assert engine.get_top_k("agent", k=1)
+    assert type(create_engine(path)) is AnalyticsEngine
+    with pytest.raises(ValueError):
+        create_engine(path, backend="oracle")
@@ -0,0 +1,58 @@
+import json
+
+from inferenceiq.analytics import AnalyticsEngine
+from inferenceiq.synthetic import AGENTS, MODEL_MIX, SyntheticLogGenerator
+
+
+def test_chunks_are_time_ordered_and_sized():
+    generator = SyntheticLogGenerator(seed=1, days=7)
+    chunks = list(generator.iter_chunks(2500, chunk_size=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+
+    timestamps = [e["timestamp"] for chunk in chunks for e in chunk]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] >= "2026-01-01"
+    assert timestamps[-1] < "2026-01-08"
+
+
+def test_distributions_are_realistic():
+    entries = [e for c in SyntheticLogGenerator(seed=2).iter_chunks(5000) for e in c]
+    models = {e["model"] for e in entries}
+    agents = {e["agent"] for e in entries}
+    assert models == {m[0] for m in MODEL_MIX}
+    assert agents == set(AGENTS)
+
+    failed = [e for e in entries if e["outcome"] == "failed"]
+    assert 0.02 < len(failed) / len(entries) < 0.15
+    assert all("error_type" in e and "cost_inr" not in e for e in failed)
+
+    fingerprints = [e["fingerprint"] for e in entries]
+    assert len(set(fingerprints)) < len(fingerprints)  # duplicate prompts occur
+    assert len({e["customer_id"] for e in entries}) > 100
+
+    success = [e for e in entries if e["outcome"] == "success"]
+    assert all(e["tokens_total"] == e["tokens_in"] + e["tokens_out"] for e in success)
+    assert all(e["cost_inr"] > 0 for e in success)
+
+
+def test_seeded_output_is_reproducible(tmp_path):
+    a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    SyntheticLogGenerator(seed=3).write(str(a), 300)
+    SyntheticLogGenerator(seed=3).write(str(b), 300)
+    assert a.read_bytes() == b.read_bytes()
+
+
+def test_write_formats_load_identically(tmp_path):
+    jsonl, binary = tmp_path / "s.jsonl", tmp_path / "s.iqb"
+    SyntheticLogGenerator(seed=4).write(str(jsonl), 1000)
+    SyntheticLogGenerator(seed=4).write(str(binary), 1000, format="binary")
+
+    with open(jsonl) as f:
+        assert len([json.loads(line) for line in f]) == 1000
+
+    json_engine = AnalyticsEngine(log_file=str(jsonl))
+    json_engine.load_data()
+    binary_engine = AnalyticsEngine(log_file=str(binary))
+    binary_engine.load_data()
+    assert round(json_engine.get_total_cost(), 4) == round(binary_engine.get_total_cost(), 4)
+    assert json_engine.get_failure_stats() == binary_engine.get_failure_stats()
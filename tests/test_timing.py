@@ -0,0 +1,138 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from inferenceiq.clients import ClientRegistry
+from inferenceiq.timing import PHASES, PhaseTimer, activate, current_timer, phase_field
+from inferenceiq.tracker import GenAICostTracker
+
+SERVER_DELAY_S = 0.05
+
+
+class _SlowCompletionHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(SERVER_DELAY_S)
+        body = json.dumps({
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 1768000000, "model": "gpt-4o",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowCompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+def test_phase_timer_splits_network_events():
+    timer = PhaseTimer()
+    timer.mark("prepared")
+    timer.mark("admitted")
+    timer.on_request()
+    for event in ("connection.connect_tcp.started", "connection.connect_tcp.complete",
+                  "http11.send_request_headers.started", "http11.receive_response_headers.complete",
+                  "http11.receive_response_body.started", "http11.receive_response_body.complete"):
+        timer.on_trace(event)
+    timer.mark("received")
+    timer.mark("parsed")
+
+    phases = timer.phases()
+    assert set(phases) == {"preprocess", "queue", "pool_wait", "connect", "ttfb", "transfer", "sdk", "parse"}
+    assert all(ms >= 0 for ms in phases.values())
+    assert list(timer.fields()) == [phase_field(p) for p in PHASES if p != "log"]
+
+
+def test_retry_keeps_only_last_attempt_events():
+    timer = PhaseTimer()
+    timer.on_request()
+    timer.on_trace("connection.connect_tcp.started")
+    timer.on_trace("connection.connect_tcp.complete")
+    timer.on_request()
+    timer.on_trace("http2.send_request_headers.started")
+
+    assert timer.attempts == 2
+    assert set(timer.events) == {"send_request_headers.started"}
+
+
+def test_activate_is_scoped():
+    timer = PhaseTimer()
+    assert current_timer() is None
+    with activate(timer):
+        assert current_timer() is timer
+    assert current_timer() is None
+
+
+def test_tracked_call_logs_phase_breakdown(slow_server):
+    registry = ClientRegistry()
+    tracker = GenAICostTracker(api_key="sk-test", provider="openai", base_url=slow_server,
+                               client_registry=registry)
+    for _ in range(2):
+        tracker.call_llm("gpt-4o", [{"role": "user", "content": "ping"}])
+    registry.close()
+
+    first, second = tracker.logs
+    assert first["provider"] == "openai"
+    # Server think time shows up as time-to-first-byte, not as our overhead
+    assert first["phase_ttfb_ms"] >= SERVER_DELAY_S * 1000 * 0.9
+    assert first["phase_preprocess_ms"] < first["phase_ttfb_ms"]
+    # Only the first call opened a connection
+    assert "phase_connect_ms" in first and "phase_connect_ms" not in second
+    for entry in tracker.logs:
+        assert {"phase_pool_wait_ms", "phase_transfer_ms", "phase_sdk_ms", "phase_parse_ms",
+                "phase_log_ms"} <= set(entry)
+        network = sum(entry.get(phase_field(p), 0) for p in ("pool_wait", "connect", "ttfb", "transfer"))
+        assert network <= entry["latency_ms"]
+
+
+def test_sink_receives_logging_phase():
+    from unittest.mock import MagicMock
+
+    class _Sink:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, entry):
+            self.sent.append(dict(entry))
+
+    sink = _Sink()
+    tracker = GenAICostTracker(api_key="sk-test", provider="openai", sink=sink)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+    tracker.call_llm("gpt-4o", [{"role": "user", "content": "ping"}])
+
+    (sent,) = sink.sent
+    assert sent == tracker.logs[0]
+    assert sent["phase_log_ms"] >= 0
+
+
+def test_failed_prompt_check_has_no_phases():
+    from inferenceiq.tokens import PromptGuard, PromptTooLargeError
+
+    tracker = GenAICostTracker(api_key="sk-test", provider="openai",
+                               prompt_guard=PromptGuard(max_input_tokens=1, action="refuse"))
+    with pytest.raises(PromptTooLargeError):
+        tracker.call_llm("gpt-4o", [{"role": "user", "content": "a prompt well over one token"}])
+    assert not any(key.startswith("phase_") for key in tracker.logs[0])
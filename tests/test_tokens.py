@@ -0,0 +1,167 @@
+import pytest
+from unittest.mock import MagicMock
+from inferenceiq.tokens import PromptGuard, PromptTooLargeError, TokenEstimator, estimate_tokens
+from inferenceiq.tracker import GenAICostTracker
+
+PRICING = GenAICostTracker(api_key="fake", provider=None).PRICING_INR
+
+
+def _estimator():
+    return TokenEstimator(use_tiktoken=False)
+
+
+def test_heuristic_count():
+    estimator = _estimator()
+    assert estimator.count_text("", "gpt-4o") == 0
+    assert estimator.count_text("a" * 400, "gpt-4o") == 100
+    # Claude text is denser per token
+    assert estimator.count_text("a" * 350, "claude-3-haiku-20240307") == 100
+    # Non-ASCII characters count as a token each
+    assert estimator.count_text("नमस्ते", "gpt-4o") == 6
+
+
+def test_count_messages_includes_framing():
+    estimator = _estimator()
+    messages = [{"role": "system", "content": "a" * 40}, {"role": "user", "content": "b" * 40}]
+    assert estimator.count_messages(messages, "gpt-4o") == 3 + 2 * 4 + 20
+
+
+def test_encoding_name_by_family():
+    assert TokenEstimator.encoding_name("gpt-4o-mini") == "o200k_base"
+    assert TokenEstimator.encoding_name("gpt-4-turbo") == "cl100k_base"
+    assert TokenEstimator.encoding_name("claude-3-5-sonnet-20241022") is None
+
+
+def test_estimate_tokens_is_close_to_heuristic():
+    # With or without tiktoken the estimate stays in the same ballpark
+    text = "What is the current balance of my savings account? " * 20
+    assert 150 <= estimate_tokens(text, "gpt-4o") <= 300
+
+
+def test_estimate_cost_ceiling():
+    estimate = _estimator().estimate("gpt-4o", [{"role": "user", "content": "a" * 400}],
+                                     PRICING, max_tokens=100)
+    assert estimate["tokens_in_estimate"] == 107
+    assert estimate["cost_ceiling_inr"] == round(107 * 0.002075 + 100 * 0.0083, 4)
+
+
+def _history(turns):
+    messages = [{"role": "system", "content": "You are helpful."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"{i}" * 400})
+        messages.append({"role": "assistant", "content": f"{i}" * 400})
+    messages.append({"role": "user", "content": "latest question"})
+    return messages
+
+
+def test_guard_trims_oldest_history():
+    guard = PromptGuard(max_input_tokens=300, action="trim", estimator=_estimator())
+    messages = _history(3)
+    model, trimmed, info = guard.apply("gpt-4o", messages, PRICING)
+    assert model == "gpt-4o"
+    assert trimmed[0]["role"] == "system"
+    assert trimmed[-1]["content"] == "latest question"
+    assert info["guard_action"] == "trimmed"
+    assert info["messages_dropped"] == len(messages) - len(trimmed)
+    assert info["tokens_in_estimate"] <= 300
+    # The newest history survives
+    assert trimmed[-2]["content"] == "2" * 400
+
+
+def test_guard_trim_counts_each_message_once():
+    estimator = _estimator()
+    estimator.count_text = MagicMock(wraps=estimator.count_text)
+    guard = PromptGuard(max_input_tokens=300, action="trim", estimator=estimator)
+    messages = _history(500)
+    _, trimmed, info = guard.apply("gpt-4o", messages, PRICING)
+    # One count for the initial check and one for the trim pass
+    assert estimator.count_text.call_count == 2 * len(messages)
+    assert info["tokens_in_estimate"] == _estimator().count_messages(trimmed, "gpt-4o")
+    assert info["messages_dropped"] == len(messages) - len(trimmed)
+    assert [m["content"] for m in trimmed] == ["You are helpful.", "latest question"]
+
+
+def test_guard_trims_whole_exchanges():
+    guard = PromptGuard(max_input_tokens=350, action="trim", estimator=_estimator())
+    # Odd history: an assistant greeting opens the conversation
+    messages = _history(2)
+    messages.insert(1, {"role": "assistant", "content": "g" * 400})
+    _, trimmed, info = guard.apply("gpt-4o", messages, PRICING)
+    assert [m["role"] for m in trimmed] == ["system", "user", "assistant", "user"]
+    assert trimmed[1]["content"] == "1" * 400
+    assert info["messages_dropped"] == 3
+
+    # A tool call and its result go with the exchange that made them
+    messages = [
+        {"role": "system", "content": "You are helpful."},
+        {"role": "user", "content": "a" * 400},
+        {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "balance", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "b" * 400}]},
+        {"role": "assistant", "content": "c" * 400},
+        {"role": "user", "content": "latest question"},
+    ]
+    guard = PromptGuard(max_input_tokens=200, action="trim", estimator=_estimator())
+    _, trimmed, _ = guard.apply("gpt-4o", messages, PRICING)
+    assert trimmed == [messages[0], messages[-1]]
+
+
+def test_guard_refuses():
+    guard = PromptGuard(max_input_tokens=50, action="refuse", estimator=_estimator())
+    with pytest.raises(PromptTooLargeError) as exc:
+        guard.apply("gpt-4o", _history(1), PRICING)
+    assert exc.value.details["guard_action"] == "refused"
+
+    # Trimming cannot shrink a single oversized message
+    guard = PromptGuard(max_input_tokens=50, action="trim", estimator=_estimator())
+    with pytest.raises(PromptTooLargeError):
+        guard.apply("gpt-4o", [{"role": "user", "content": "x" * 1000}], PRICING)
+
+
+def test_guard_routes_to_cheaper_model():
+    guard = PromptGuard(max_cost_inr=1.0, action="route", fallback_model="gpt-4o-mini",
+                        estimator=_estimator())
+    model, _, info = guard.apply("gpt-4o", _history(2), PRICING, max_tokens=200)
+    assert model == "gpt-4o-mini"
+    assert info["guard_action"] == "routed"
+    assert info["requested_model"] == "gpt-4o"
+
+    with pytest.raises(ValueError):
+        PromptGuard(action="route")
+
+
+def test_tracker_logs_guard_decisions():
+    guard = PromptGuard(max_input_tokens=50, action="refuse", estimator=_estimator())
+    tracker = GenAICostTracker(api_key="fake", provider="openai", prompt_guard=guard)
+    tracker.client = MagicMock()
+
+    with pytest.raises(PromptTooLargeError):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "x" * 1000}])
+
+    tracker.client.chat.completions.create.assert_not_called()
+    log = tracker.logs[0]
+    assert log["outcome"] == "failed"
+    assert log["error_type"] == "PromptTooLargeError"
+    assert log["guard_action"] == "refused"
+    assert log["tokens_in_estimate"] == 257
+    # Never dispatched, so nothing was wasted
+    assert "cost_inr" not in log
+
+
+def test_tracker_sends_routed_model():
+    guard = PromptGuard(max_input_tokens=10, action="route", fallback_model="gpt-4o-mini",
+                        estimator=_estimator())
+    tracker = GenAICostTracker(api_key="fake", provider="openai", prompt_guard=guard)
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.usage.prompt_tokens = 30
+    response.usage.completion_tokens = 5
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = response
+
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "x" * 100}])
+
+    assert tracker.client.chat.completions.create.call_args.kwargs["model"] == "gpt-4o-mini"
+    log = tracker.logs[0]
+    assert log["model"] == "gpt-4o-mini"
+    assert log["requested_model"] == "gpt-4o"
+    assert log["tokens_in_estimate"] == 32
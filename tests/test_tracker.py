@@ -26,6 +26,23 @@ def test_calculate_cost_unknown_model():
     cost = tracker.calculate_cost("unknown-model", 1000, 500)
     assert cost == 0.0
 
+def test_calculate_cost_cached_tokens():
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    # 600 uncached * 0.0020750 + 400 cached * 0.0010375 + 500 * 0.0083000
+    cost = tracker.calculate_cost("gpt-4o", 1000, 500, cached_tokens=400)
+    assert pytest.approx(cost, 0.0001) == 1.245 + 0.415 + 4.15
+
+    # Models without a cached rate fall back to the input rate
+    assert tracker.calculate_cost("gpt-4-turbo", 1000, 0, cached_tokens=400) == \
+        pytest.approx(tracker.calculate_cost("gpt-4-turbo", 1000, 0))
+
+def test_calculate_cost_cache_write():
+    tracker = GenAICostTracker(api_key="fake", provider="anthropic")
+    # 100 uncached * 0.00249 + 800 read * 0.000249 + 100 write * 0.0031125
+    cost = tracker.calculate_cost("claude-3-5-sonnet-20241022", 1000, 0,
+                                  cached_tokens=800, cache_write_tokens=100)
+    assert pytest.approx(cost, 0.0001) == 0.249 + 0.1992 + 0.31125
+
 def test_log_interaction_and_save(tmp_path):
     tracker = GenAICostTracker(api_key="fake", provider="openai")
     log_file = tmp_path / "test_logs.jsonl"
@@ -76,6 +93,27 @@ def test_call_openai_success():
     assert "latency_ms" in log
     assert log["cost_inr"] > 0
 
+def test_call_openai_cached_tokens():
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = "Hi"
+    mock_response.usage.prompt_tokens = 1000
+    mock_response.usage.completion_tokens = 10
+    mock_response.usage.prompt_tokens_details.cached_tokens = 768
+
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.return_value = mock_response
+    tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+    log = tracker.logs[0]
+    assert log["tokens_in"] == 1000
+    assert log["tokens_cached"] == 768
+    assert log["tokens_uncached"] == 232
+    assert log["tokens_cache_write"] == 0
+    assert log["cost_inr"] == round(tracker.calculate_cost("gpt-4o", 1000, 10, cached_tokens=768), 4)
+
 def test_call_openai_failure():
     tracker = GenAICostTracker(api_key="fake", provider="openai")
     
@@ -91,6 +129,36 @@ def test_call_openai_failure():
     assert log["error"] == "API Error"
     assert log["error_type"] == "Exception"
     assert "latency_ms" in log
+    # Not a failure the provider bills
+    assert "cost_inr" not in log and "failed_cost_inr" not in log
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize("error, billed", [
+    (TimeoutError("Request timed out"), True),
+    (_StatusError(503), True),
+    (_StatusError(429), False),
+    (_StatusError(401), False),
+    (ConnectionError("Connection refused"), False),
+])
+def test_failed_call_cost_is_kept_out_of_cost_inr(error, billed):
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.side_effect = error
+    with pytest.raises(type(error)):
+        tracker.call_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi " * 10_000}])
+    log = tracker.logs[0]
+    assert "cost_inr" not in log and "tokens_in" not in log
+    if billed:
+        assert log["failed_cost_inr"] == round(
+            tracker.calculate_cost("gpt-4o", log["tokens_in_estimate"], 0), 4) > 0
+    else:
+        assert "failed_cost_inr" not in log
 
 def test_save_logs_nested_directory(tmp_path):
     tracker = GenAICostTracker(api_key="fake", provider="openai")
@@ -148,4 +216,91 @@ def test_call_failure_with_metadata():
     assert log["outcome"] == "failed"
     assert log["error_type"] == "ValueError"
     assert log["user_id"] == "user_err"
-    assert log["tags"] == ["error_test"]
\ No newline at end of file
+    assert log["tags"] == ["error_test"]
+
+
+def _openai_response(content="Hello there!", tokens_in=10, tokens_out=20):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = tokens_in
+    response.usage.completion_tokens = tokens_out
+    return response
+
+def test_call_llm_single_flight_threads():
+    import threading
+    import time
+    from inferenceiq.singleflight import SingleFlight
+
+    tracker = GenAICostTracker(api_key="fake", provider="openai", single_flight=SingleFlight())
+    release = threading.Event()
+
+    def create(**kwargs):
+        release.wait(5)
+        return _openai_response()
+
+    tracker.client = MagicMock()
+    tracker.client.chat.completions.create.side_effect = create
+    messages = [{"role": "user", "content": "What is the gold rate?"}]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tracker.call_llm(model="gpt-4o", messages=messages)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while tracker.single_flight.in_flight() == 0:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["Hello there!"] * 5
+    assert tracker.client.chat.completions.create.call_count == 1
+    leader = [log for log in tracker.logs if log["outcome"] == "success"]
+    followers = [log for log in tracker.logs if log["outcome"] == "coalesced"]
+    assert len(leader) == 1 and len(followers) == 4
+    for log in followers:
+        assert log["cost_inr"] == 0.0
+        assert log["tokens_total"] == 0
+        assert log["coalesced_with"] == leader[0]["interaction_id"]
+        assert log["cost_saved_inr"] == leader[0]["cost_inr"]
+        assert log["tokens_saved"] == 30
+
+    # Different parameters are never coalesced
+    tracker.call_llm(model="gpt-4o", messages=messages, max_tokens=5)
+    assert tracker.client.chat.completions.create.call_count == 2
+
+def test_acall_llm_single_flight():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from inferenceiq.singleflight import SingleFlight
+
+    tracker = GenAICostTracker(api_key="fake", provider="openai", single_flight=SingleFlight())
+
+    async def create(**kwargs):
+        await asyncio.sleep(0.02)
+        return _openai_response("async hi")
+
+    tracker.async_client = MagicMock()
+    tracker.async_client.chat.completions.create = AsyncMock(side_effect=create)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def main():
+        return await asyncio.gather(*(tracker.acall_llm(model="gpt-4o", messages=messages) for _ in range(3)),
+                                    tracker.acall_llm(model="gpt-4o", messages=[{"role": "user", "content": "bye"}]))
+
+    assert asyncio.run(main()) == ["async hi"] * 4
+    assert tracker.async_client.chat.completions.create.await_count == 2
+    assert [log["outcome"] for log in tracker.logs].count("coalesced") == 2
+
+def test_acall_llm_failure_is_logged():
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    tracker = GenAICostTracker(api_key="fake", provider="openai")
+    tracker.async_client = MagicMock()
+    tracker.async_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+
+    with pytest.raises(Exception, match="API Error"):
+        asyncio.run(tracker.acall_llm(model="gpt-4o", messages=[{"role": "user", "content": "hi"}]))
+    assert tracker.logs[0]["outcome"] == "failed"